@@ -9,7 +9,9 @@ entry_points = {
         "nti_fix_enrollements = nti.app.assessment.scripts.nti_fix_enrollements:main",
         "nti_savepoint_migrator = nti.app.assessment.scripts.nti_savepoint_migrator:main",
         "nti_check_assessment_integrity = nti.app.assessment.scripts.nti_check_assessment_integrity:main",
-        "nti_remove_invalid_assessments = nti.app.assessment.scripts.nti_remove_invalid_assessments:main"
+        "nti_remove_invalid_assessments = nti.app.assessment.scripts.nti_remove_invalid_assessments:main",
+        "nti_rebuild_submission_catalog = nti.app.assessment.scripts.nti_rebuild_submission_catalog:main",
+        "nti_compare_assessment_benchmarks = nti.app.assessment.scripts.nti_compare_assessment_benchmarks:main"
     ],
 }
 
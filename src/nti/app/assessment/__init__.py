@@ -80,6 +80,12 @@ VIEW_USER_RESET_EVALUATION = 'UserReset'
 #: A view to reasses an evaluation
 VIEW_REGRADE_EVALUATION = 'Regrade'
 
+#: A view to fetch the progress of a batched regrade
+VIEW_REGRADE_STATUS = 'RegradeStatus'
+
+#: A view to fetch the response statistics of an assignment
+VIEW_RESPONSE_STATISTICS = 'ResponseStatistics'
+
 #: A view to unlock assignment policies
 VIEW_UNLOCK_POLICIES = 'UnlockPolicies'
 
@@ -1,6 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
+Assessment integrity checks.
+
+The check processes one host site at a time: the evaluations registered in
+a site, the assessment containers of its content packages and the indexed
+evaluation objects are collected, checked and released before the next
+site is loaded. It can be limited to some sites or packages, and the sites
+can be partitioned among several worker processes. Findings are written
+as they are made, one JSON object per line.
+
 .. $Id$
 """
 
@@ -8,11 +17,17 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
-from collections import defaultdict 
-from collections import OrderedDict 
+import json
+
+from collections import defaultdict
+from collections import OrderedDict
+
+from transaction.interfaces import TransientError
 
 from zope import component
 
+from zope.cachedescriptors.property import Lazy
+
 from zope.component.hooks import site as current_site
 
 from zope.intid.interfaces import IIntIds
@@ -23,6 +38,9 @@ from nti.app.contentlibrary.utils import yield_sync_content_packages
 
 from nti.app.assessment import get_evaluation_catalog
 
+from nti.app.assessment.index import IX_SITE
+from nti.app.assessment.index import IX_MIMETYPE
+
 from nti.assessment._question_index import QuestionIndex
 
 from nti.assessment.common import iface_of_assessment
@@ -36,6 +54,7 @@ from nti.assessment.interfaces import IQEditableEvaluation
 from nti.assessment.interfaces import IQAssessmentItemContainer
 
 from nti.contentlibrary.interfaces import IContentUnit
+from nti.contentlibrary.interfaces import IContentPackage
 
 from nti.dataserver.metadata.index import get_metadata_catalog
 
@@ -51,222 +70,422 @@ from nti.site.utils import unregisterUtility
 
 from nti.traversal.traversal import find_interface
 
+#: A registered evaluation has duplicate objects
+DUPLICATES = u'Duplicates'
+
+#: An indexed evaluation is not registered
+UNREGISTERED = u'Unregistered'
+
+#: An invalid object was removed
+REMOVED = u'Removed'
+
+#: A registered evaluation was (re)indexed
+REINDEXED = u'Reindexed'
+
+#: The registration of an evaluation was replaced
+INVALID_REGISTRATION = u'InvalidRegistration'
+
+#: A global evaluation was registered in a site
+INVALID_GLOBAL_REGISTRATION = u'InvalidGlobalRegistration'
+
+#: An assignment has an unregistered question set
+UNREGISTERED_QUESTION_SET = u'UnregisteredQuestionSet'
+
+#: The parent of an evaluation was set
+FIXED_LINEAGE = u'FixedLineage'
+
+#: A container held an object other than the registered one
+ADJUSTED_CONTAINER = u'AdjustedContainer'
+
+#: A registered evaluation is not indexed
+UNINDEXED = u'Unindexed'
+
 logger = __import__('logging').getLogger(__name__)
 
 
-def _master_data_collector(intids):
-    seen = set()
-    registered = OrderedDict()
-    containers = defaultdict(list)
-    legacy = component.getGlobalSiteManager().getUtilitiesFor(IQEvaluation)
-    legacy = {ntiid for ntiid, _ in list(legacy)}
-
-    def recur(site, unit):
-        for child in unit.children or ():
-            recur(site, child)
-        container = IQAssessmentItemContainer(unit)
-        for item in container.assessments():
-            ntiid = item.ntiid
-            if ntiid not in legacy:
-                key = (item.ntiid, site.__name__)
-                containers[key].append(container)
-
-    for site in get_all_host_sites():
+def _site_name(context):
+    folder = IHostPolicyFolder(context, None)
+    return getattr(folder, '__name__', None)
+
+
+class AssessmentIntegrityChecker(object):
+    """
+    Checks the integrity of the evaluations one site at a time.
+
+    When given a transaction manager the checker commits after every site,
+    retrying it on conflicts; otherwise the caller owns the transaction.
+    """
+
+    retries = 5
+
+    def __init__(self, remove=False, sites=None, packages=None, report=None,
+                 worker=0, workers=1, transaction_manager=None, intids=None):
+        assert 0 <= worker < workers
+        self.remove = remove
+        self.sites = set(sites) if sites else None
+        self.packages = set(packages) if packages else None
+        self.report = report
+        self.worker = worker
+        self.workers = workers
+        self.transaction_manager = transaction_manager
+        self.intids = component.getUtility(IIntIds) if intids is None else intids
+        self.duplicates = dict()
+        self.removed = set()
+        self.reindexed = set()
+        self.fixed_lineage = set()
+        self.adjusted_container = set()
+        self.checked = 0
+        self._findings = []
+
+    @Lazy
+    def legacy(self):
+        legacy = component.getGlobalSiteManager().getUtilitiesFor(IQEvaluation)
+        return {ntiid for ntiid, _ in legacy}
+
+    @Lazy
+    def catalog(self):
+        return get_evaluation_catalog()
+
+    @Lazy
+    def orphans(self):
+        """
+        Return the intids, by site name, of the evaluations in the
+        metadata catalog that are missing from the evaluation catalog.
+        """
+        result = defaultdict(list)
+        family = self.intids.family
+        query = {
+            'mimeType': {'any_of': ALL_EVALUATION_MIME_TYPES}
+        }
+        indexed = self.catalog.apply({IX_MIMETYPE: {'any_of': ALL_EVALUATION_MIME_TYPES}})
+        uids = get_metadata_catalog().apply(query)
+        uids = family.IF.difference(family.IF.Set(uids or ()),
+                                    family.IF.Set(indexed or ()))
+        for uid in uids or ():
+            item = self.intids.queryObject(uid)
+            if IQEvaluation.providedBy(item):
+                result[_site_name(item)].append(uid)
+        return result
+
+    def get_sites(self):
+        """
+        Return the host sites checked by this worker.
+        """
+        sites = sorted(get_all_host_sites(), key=lambda x: x.__name__)
+        if self.sites is not None:
+            sites = [x for x in sites if x.__name__ in self.sites]
+        return [x for idx, x in enumerate(sites)
+                if idx % self.workers == self.worker]
+
+    def _record(self, key, finding, **kwargs):
+        ntiid, site_name = key
+        logger.warn("%s: %s/%s", finding, site_name, ntiid)
+        kwargs.update(NTIID=ntiid, Site=site_name, Finding=finding)
+        self._findings.append(kwargs)
+
+    def _flush(self):
+        findings, self._findings = self._findings, []
+        if self.report is None:
+            return
+        for finding in findings:
+            self.report.write(json.dumps(finding, sort_keys=True))
+            self.report.write('\n')
+        self.report.flush()
+
+    def _selected(self, item):
+        if self.packages is None:
+            return True
+        package = find_interface(item, IContentPackage, strict=False)
+        return package is not None and package.ntiid in self.packages
+
+    def _registered(self, site):
+        seen = set()
+        result = OrderedDict()
         registry = site.getSiteManager()
-        for ntiid, item in registry.getUtilitiesFor(IQEvaluation):
-            if ntiid in legacy:
+        # only our registrations, base registries are checked in their site
+        for registration in registry.registeredUtilities():
+            if not registration.provided.isOrExtends(IQEvaluation):
                 continue
-            doc_id = intids.queryId(item)
-            if doc_id in seen:
+            ntiid, item = registration.name, registration.component
+            if ntiid in self.legacy or not self._selected(item):
                 continue
+            doc_id = self.intids.queryId(item)
             if doc_id is not None:
+                if doc_id in seen:
+                    continue
                 seen.add(doc_id)
             folder = IHostPolicyFolder(item, site)
             key = (ntiid, folder.__name__)
-            if key not in registered:
-                registered[key] = (folder, item)
+            if key not in result:
+                result[key] = (folder, item)
+        return result
+
+    def _containers(self, site):
+        seen = set()
+        result = defaultdict(list)
+
+        def recur(unit):
+            for child in unit.children or ():
+                recur(child)
+            container = IQAssessmentItemContainer(unit)
+            for item in container.assessments():
+                if item.ntiid not in self.legacy:
+                    result[(item.ntiid, site.__name__)].append(container)
 
         with current_site(site):
             for package in yield_sync_content_packages():
-                doc_id = intids.queryId(package)
+                if self.packages is not None and package.ntiid not in self.packages:
+                    continue
+                if _site_name(package) not in (None, site.__name__):
+                    continue  # checked in its own site
+                doc_id = self.intids.queryId(package)
                 if doc_id is None or doc_id in seen:
                     continue
                 seen.add(doc_id)
-                recur(site, package)
-
-    return registered, containers, legacy
-
-
-def _get_data_item_counts(intids):
-    count = defaultdict(list)
-    catalog = get_metadata_catalog()
-    query = {
-        'mimeType': {'any_of': ALL_EVALUATION_MIME_TYPES}
-    }
-    for uid in catalog.apply(query) or ():
-        item = intids.queryObject(uid)
-        if not IQEvaluation.providedBy(item):
-            continue
-        folder = IHostPolicyFolder(item, None)
-        key = (item.ntiid, getattr(folder, '__name__', None))
-        count[key].append(item)
-    return count
-
-
-def check_assessment_integrity(remove=False):
-    intids = component.getUtility(IIntIds)
-    count = _get_data_item_counts(intids)
-    logger.info('%s item(s) counted', len(count))
-    all_registered, all_containers, legacy = _master_data_collector(intids)
-
-    result = 0
-    removed = set()
-    duplicates = dict()
-    for key, data in count.items():
-        ntiid, _ = key
-        # find registry and registered objects
-        context = data[0]  # pivot
-        things = all_registered.get(key)
-        provided = iface_of_assessment(context)
-        if not things:
-            logger.warn("No registration found for %s", key)
-            if not remove:
+                recur(package)
+        return result
+
+    def _counts(self, site):
+        result = defaultdict(list)
+        query = {
+            IX_SITE: {'any_of': (site.__name__,)},
+            IX_MIMETYPE: {'any_of': ALL_EVALUATION_MIME_TYPES},
+        }
+        uids = list(self.catalog.apply(query) or ())
+        uids.extend(self.orphans.get(site.__name__) or ())
+        for uid in uids:
+            item = self.intids.queryObject(uid)
+            if not IQEvaluation.providedBy(item) or not self._selected(item):
+                continue
+            key = (item.ntiid, _site_name(item))
+            result[key].append(item)
+        return result
+
+    def _check_counts(self, count, all_registered, all_containers):
+        intids = self.intids
+        for key, data in count.items():
+            ntiid, _ = key
+            # find registry and registered objects
+            context = data[0]  # pivot
+            things = all_registered.get(key)
+            provided = iface_of_assessment(context)
+            if not things:
+                self._record(key, UNREGISTERED)
+                if not self.remove:
+                    continue
+                # remove from intid facility
+                for item in data:
+                    doc_id = intids.queryId(item)
+                    if doc_id is not None:
+                        removeIntId(item)
+                        self.removed.add(ntiid)
+                        self._record(key, REMOVED)
+                # remove from containers
+                for container in all_containers.get(key) or ():
+                    container.pop(ntiid, None)
                 continue
-            # remove from intid facility
-            for item in data:
-                doc_id = intids.queryId(item)
-                if doc_id is not None:
-                    removeIntId(item)
-                    removed.add(ntiid)
-            # remove from containers
-            for container in all_containers.get(key) or ():
-                container.pop(ntiid, None)
-            continue
-
-        if len(data) <= 1 or IQEditableEvaluation.providedBy(context):
-            continue
-        duplicates[ntiid] = len(data) - 1
-        logger.warn("%s has %s duplicate(s)", key, len(data) - 1)
-
-        site, registered = things
-        registry = site.getSiteManager()
 
-        # if registered has been found.. check validity
-        ruid = intids.queryId(registered)
-        if ruid is None:
-            logger.warn("Invalid registration for %s", key)
-            unregisterUtility(registry, provided=provided, name=ntiid)
-            # register a valid object
-            registered = context
-            ruid = intids.getId(context)
-            registerUtility(registry, context, provided, name=ntiid)
-            # update map
-            all_registered[key] = (site, registered)
-
-        # remove duplicates
-        for item in data:
-            doc_id = intids.getId(item)
-            if doc_id != ruid:
-                result += 1
-                removeIntId(item)
-                item.__home__ = item.__parent__ = None
-
-        # canonicalize
-        QuestionIndex.canonicalize_object(registered, registry)
-
-    logger.info('%s record(s) unregistered', result)
-
-    reindexed = set()
-    fixed_lineage = set()
-    adjusted_container = set()
-    catalog = get_evaluation_catalog()
-    meta_catalog = get_metadata_catalog()
-    
-    # check all registered items
-    for key, things in all_registered.items():
-        ntiid, _ = key
-        site, registered = things
-        uid = intids.queryId(registered)
-        if ntiid in legacy:
-            registry = site.getSiteManager()
-            if registry is not component.getGlobalSiteManager():
-                provided = iface_of_assessment(registered)
-                logger.warn("Invalid global registration for %s", key)
-                unregisterUtility(registry, provided=provided, name=ntiid)
-                if uid is not None:
-                    catalog.unindex(uid)
-                    removeIntId(registered)
-            continue
+            if len(data) <= 1 or IQEditableEvaluation.providedBy(context):
+                continue
+            self.duplicates[ntiid] = len(data) - 1
+            self._record(key, DUPLICATES, Count=len(data) - 1)
 
-        containers = all_containers.get(key)
-        if uid is not None and not catalog.get_containers(registered):
-            logger.warn("Reindexing %s", ntiid)
-            reindexed.add(ntiid)
-            catalog.index_doc(uid, registered)
-            meta_catalog.index_doc(uid, registered)
+            site, registered = things
+            registry = site.getSiteManager()
 
-        registry = site.getSiteManager()
-        if      registry is not component.getGlobalSiteManager() \
-            and IQAssignment.providedBy(registered):
-            for qs in registered.iter_question_sets():
-                doc_id = intids.queryId(qs)
-                if     doc_id is None \
-                    or registry.queryUtility(IQuestionSet, qs.ntiid) is None:
-                    logger.warn("Assignment %s/%s has an unregistered question set %s",
-                                site.__name__, ntiid, qs.ntiid)
-                    
-        if IQEditableEvaluation.providedBy(registered):
-            continue
-
-        # fix lineage
-        if registered.__parent__ is None:
-            if containers:
-                unit = find_interface(containers[0], 
-                                      IContentUnit, 
-                                      strict=False)
-                if unit is not None:
-                    logger.warn("Fixing lineage for %s", key)
-                    fixed_lineage.add(ntiid)
-                    registered.__parent__ = unit
-                    if uid is not None:
-                        catalog.index_doc(uid, registered)
-                        meta_catalog.index_doc(uid, registered)
-            elif remove and uid is not None and not registered.isLocked():
-                registry = site.getSiteManager()
-                removed.add(ntiid)
-                removeIntId(registered)
-                provided = iface_of_assessment(registered)
-                logger.warn("Removing unparented object %s", key)
+            # if registered has been found.. check validity
+            ruid = intids.queryId(registered)
+            if ruid is None:
+                self._record(key, INVALID_REGISTRATION)
                 unregisterUtility(registry, provided=provided, name=ntiid)
+                # register a valid object
+                registered = context
+                ruid = intids.getId(context)
+                registerUtility(registry, context, provided, name=ntiid)
+                # update map
+                all_registered[key] = (site, registered)
+
+            # remove duplicates
+            for item in data:
+                doc_id = intids.getId(item)
+                if doc_id != ruid:
+                    removeIntId(item)
+                    item.__home__ = item.__parent__ = None
+
+            # canonicalize
+            QuestionIndex.canonicalize_object(registered, registry)
+
+    def _check_registered(self, all_registered, all_containers):
+        intids = self.intids
+        catalog = self.catalog
+        meta_catalog = get_metadata_catalog()
+        for key, things in all_registered.items():
+            ntiid, _ = key
+            site, registered = things
+            uid = intids.queryId(registered)
+            if ntiid in self.legacy:
+                registry = site.getSiteManager()
+                if registry is not component.getGlobalSiteManager():
+                    provided = iface_of_assessment(registered)
+                    self._record(key, INVALID_GLOBAL_REGISTRATION)
+                    unregisterUtility(registry, provided=provided, name=ntiid)
+                    if uid is not None:
+                        catalog.unindex(uid)
+                        removeIntId(registered)
                 continue
-        elif uid is None:
-            registry = site.getSiteManager()
-            connection = IConnection(registry, None)
-            if connection is not None:
-                if IConnection(registered, None) is None:
-                    connection.add(registered)
-                addIntId(registered)
-                uid = intids.queryId(registered)
+
+            containers = all_containers.get(key)
+            if uid is not None and not catalog.get_containers(registered):
+                self.reindexed.add(ntiid)
+                self._record(key, REINDEXED)
                 catalog.index_doc(uid, registered)
                 meta_catalog.index_doc(uid, registered)
 
-        # make sure containers have registered object
-        for container in containers or ():
-            item = container.get(ntiid)
-            item_iid = intids.queryId(item) if item is not None else None
-            if uid is not None and item_iid != uid:
-                if item_iid is not None:
-                    removeIntId(item)
-                logger.warn("Adjusting container for %s", key)
-                container.pop(ntiid, None)
-                container[ntiid] = registered
-                adjusted_container.add(ntiid)
-
-    count_set = set(count.keys())
-    reg_set = set(all_registered.keys())
-    diff_set = reg_set.difference(count_set)
-    for key in sorted(diff_set):
-        logger.warn("%s is not registered with metadata catalog", key)
-
-    logger.info('%s registered item(s) checked', len(all_registered))
-    return (duplicates, removed, reindexed, fixed_lineage, adjusted_container)
+            registry = site.getSiteManager()
+            if      registry is not component.getGlobalSiteManager() \
+                and IQAssignment.providedBy(registered):
+                for qs in registered.iter_question_sets():
+                    doc_id = intids.queryId(qs)
+                    if     doc_id is None \
+                        or registry.queryUtility(IQuestionSet, qs.ntiid) is None:
+                        self._record(key, UNREGISTERED_QUESTION_SET,
+                                     QuestionSet=qs.ntiid)
+
+            if IQEditableEvaluation.providedBy(registered):
+                continue
+
+            # fix lineage
+            if registered.__parent__ is None:
+                if containers:
+                    unit = find_interface(containers[0],
+                                          IContentUnit,
+                                          strict=False)
+                    if unit is not None:
+                        self.fixed_lineage.add(ntiid)
+                        self._record(key, FIXED_LINEAGE)
+                        registered.__parent__ = unit
+                        if uid is not None:
+                            catalog.index_doc(uid, registered)
+                            meta_catalog.index_doc(uid, registered)
+                elif self.remove and uid is not None and not registered.isLocked():
+                    self.removed.add(ntiid)
+                    self._record(key, REMOVED, Unparented=True)
+                    removeIntId(registered)
+                    provided = iface_of_assessment(registered)
+                    unregisterUtility(registry, provided=provided, name=ntiid)
+                    continue
+            elif uid is None:
+                connection = IConnection(registry, None)
+                if connection is not None:
+                    if IConnection(registered, None) is None:
+                        connection.add(registered)
+                    addIntId(registered)
+                    uid = intids.queryId(registered)
+                    catalog.index_doc(uid, registered)
+                    meta_catalog.index_doc(uid, registered)
+
+            # make sure containers have registered object
+            for container in containers or ():
+                item = container.get(ntiid)
+                item_iid = intids.queryId(item) if item is not None else None
+                if uid is not None and item_iid != uid:
+                    if item_iid is not None:
+                        removeIntId(item)
+                    container.pop(ntiid, None)
+                    container[ntiid] = registered
+                    self.adjusted_container.add(ntiid)
+                    self._record(key, ADJUSTED_CONTAINER)
+
+    def _do_site(self, site):
+        self._findings = []
+        count = self._counts(site)
+        registered = self._registered(site)
+        containers = self._containers(site)
+        logger.info('%s item(s) counted in site %s', len(count), site.__name__)
+        self._check_counts(count, registered, containers)
+        self._check_registered(registered, containers)
+        for key in sorted(set(registered).difference(count)):
+            self._record(key, UNINDEXED)
+        return len(registered)
+
+    def _accumulated(self):
+        return (self.duplicates, self.removed, self.reindexed,
+                self.fixed_lineage, self.adjusted_container)
+
+    def _set_accumulated(self, accumulated):
+        (self.duplicates, self.removed, self.reindexed,
+         self.fixed_lineage, self.adjusted_container) = accumulated
+
+    def check_site(self, site):
+        """
+        Check the evaluations of the given site and return how many
+        registered evaluations were checked.
+        """
+        tm = self.transaction_manager
+        totals = self._accumulated()
+        try:
+            for attempt in range(self.retries, -1, -1):
+                # an aborted attempt must not count in the totals
+                self._set_accumulated((dict(), set(), set(), set(), set()))
+                try:
+                    result = self._do_site(site)
+                    if tm is not None:
+                        tm.commit()
+                    break
+                except TransientError:
+                    if tm is None or not attempt:
+                        raise
+                    tm.abort()
+                    logger.warning("Conflict checking site %s, retrying",
+                                   site.__name__)
+            for total, current in zip(totals, self._accumulated()):
+                total.update(current)
+        finally:
+            self._set_accumulated(totals)
+        # findings are reported once the site is done
+        self._flush()
+        self.checked += result
+        connection = IConnection(site, None)
+        if connection is not None:
+            connection.cacheGC()
+        return result
+
+    def _do_unsited(self):
+        self._findings = []
+        count = defaultdict(list)
+        for uid in self.orphans.get(None) or ():
+            item = self.intids.queryObject(uid)
+            if IQEvaluation.providedBy(item) and self._selected(item):
+                count[(item.ntiid, None)].append(item)
+        self._check_counts(count, {}, {})
+
+    def check_unsited(self):
+        """
+        Check the indexed evaluations that do not belong to any site.
+        """
+        self._do_unsited()
+        if self.transaction_manager is not None:
+            self.transaction_manager.commit()
+        self._flush()
+
+    def run(self):
+        """
+        Check the sites of this worker and return the totals, in the
+        format of :func:`check_assessment_integrity`.
+        """
+        for site in self.get_sites():
+            self.check_site(site)
+        if self.worker == 0 and self.sites is None:
+            self.check_unsited()
+        logger.info('%s registered item(s) checked', self.checked)
+        return (self.duplicates, self.removed, self.reindexed,
+                self.fixed_lineage, self.adjusted_container)
+
+
+def check_assessment_integrity(remove=False, sites=None, packages=None,
+                               report=None):
+    checker = AssessmentIntegrityChecker(remove=remove,
+                                         sites=sites,
+                                         packages=packages,
+                                         report=report)
+    return checker.run()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Resumable rebuilds of the submission catalog.
+
+The work is split in per-course batches. A checkpoint stored on the live
+catalog records the courses already indexed, so an interrupted rebuild
+resumes where it stopped, and several workers (processes sharing a
+ZEO/RelStorage database) can each take a partition of the courses.
+
+A rebuild may index into a shadow catalog that replaces the live one
+when all courses are done; until then queries keep using the live
+catalog, which forwards new (un)indexing to the shadow.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+
+from BTrees.Length import Length
+
+from persistent import Persistent
+
+from transaction.interfaces import TransientError
+
+from zope import component
+
+from zope.component.hooks import site as current_site
+
+from zope.intid.interfaces import IIntIds
+
+from zope.location import locate
+
+from nti.app.assessment.index import SUBMISSION_CATALOG_NAME
+
+from nti.app.assessment.index import get_submission_catalog
+from nti.app.assessment.index import create_submission_catalog
+
+from nti.app.assessment.interfaces import IUsersCourseInquiries
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistories
+
+from nti.contenttypes.courses.interfaces import ICourseCatalog
+from nti.contenttypes.courses.interfaces import ICourseInstance
+
+from nti.metadata import queue_add as metadata_queue_add
+
+from nti.site.hostpolicy import get_all_host_sites
+
+from nti.site.interfaces import IHostPolicyFolder
+
+from nti.traversal.traversal import find_interface
+
+from nti.zope_catalog.interfaces import IDeferredCatalog
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class SubmissionCatalogRebuild(Persistent):
+    """
+    The checkpoint of a submission catalog rebuild.
+    """
+
+    catalog = None
+
+    def __init__(self, family, catalog=None):
+        self.catalog = catalog
+        self.createdTime = time.time()
+        self.completed = family.II.TreeSet()
+        self.indexed = Length()
+
+    def __len__(self):
+        return len(self.completed)
+
+
+def _index_item(obj, catalog, intids):
+    doc_id = intids.queryId(obj)
+    if doc_id is not None:
+        catalog.index_doc(doc_id, obj)
+        metadata_queue_add(obj)
+        return True
+    return False
+
+
+def index_course_submissions(course, catalog, intids=None):
+    """
+    Index all the submission items of the given course and return how
+    many were indexed.
+    """
+    result = 0
+    intids = component.getUtility(IIntIds) if intids is None else intids
+    for provided in (IUsersCourseAssignmentHistories, IUsersCourseInquiries):
+        container = provided(course, None) or {}
+        for user_data in container.values():
+            for obj in user_data.values():
+                if _index_item(obj, catalog, intids):
+                    result += 1
+                try:
+                    # Assignment histories now in containers
+                    for submission in obj.values():
+                        if _index_item(submission, catalog, intids):
+                            result += 1
+                except AttributeError:
+                    pass
+    return result
+
+
+def get_all_course_ids(intids=None):
+    """
+    Return the sorted intids of the courses in all sites.
+    """
+    result = set()
+    intids = component.getUtility(IIntIds) if intids is None else intids
+
+    def _collect():
+        catalog = component.queryUtility(ICourseCatalog)
+        if catalog is None or catalog.isEmpty():
+            return
+        for entry in catalog.iterCatalogEntries():
+            doc_id = intids.queryId(ICourseInstance(entry, None))
+            if doc_id is not None:
+                result.add(doc_id)
+
+    _collect()
+    for host_site in get_all_host_sites():  # check all sites
+        with current_site(host_site):
+            _collect()
+    return sorted(result)
+
+
+class SubmissionCatalogRebuilder(object):
+    """
+    Rebuilds the submission catalog one course at a time.
+
+    When given a transaction manager the rebuilder commits after every
+    course, retrying it on conflicts; otherwise the caller owns the
+    transaction, e.g. a request that processes a few courses per call.
+    """
+
+    retries = 5
+
+    def __init__(self, worker=0, workers=1, transaction_manager=None,
+                 intids=None):
+        assert 0 <= worker < workers
+        self.worker = worker
+        self.workers = workers
+        self.transaction_manager = transaction_manager
+        self.intids = component.getUtility(IIntIds) if intids is None else intids
+
+    @property
+    def catalog(self):
+        return get_submission_catalog()
+
+    @property
+    def checkpoint(self):
+        return getattr(self.catalog, 'rebuild', None)
+
+    def _run(self, func, *args):
+        tm = self.transaction_manager
+        if tm is None:
+            return func(*args)
+        for attempt in range(self.retries, -1, -1):
+            try:
+                result = func(*args)
+                tm.commit()
+                return result
+            except TransientError:
+                tm.abort()
+                if not attempt:
+                    raise
+                logger.warning("Conflict in submission catalog rebuild, retrying")
+
+    def _do_start(self, shadow, restart):
+        catalog = self.catalog
+        checkpoint = catalog.rebuild
+        if checkpoint is not None and not restart:
+            return checkpoint
+        family = self.intids.family
+        if shadow:
+            target = create_submission_catalog(family=family)
+            locate(target, catalog.__parent__, SUBMISSION_CATALOG_NAME)
+        else:
+            target = None
+            for index in catalog.values():
+                index.clear()
+        checkpoint = catalog.rebuild = SubmissionCatalogRebuild(family, target)
+        return checkpoint
+
+    def start(self, shadow=False, restart=False):
+        """
+        Return the checkpoint of the rebuild in progress or start a new
+        one. A new non-shadow rebuild clears the live catalog.
+        """
+        return self._run(self._do_start, shadow, restart)
+
+    def pending(self):
+        """
+        Return the intids of the courses of this worker not yet indexed.
+        """
+        checkpoint = self.checkpoint
+        completed = checkpoint.completed if checkpoint is not None else ()
+        return [doc_id for doc_id in get_all_course_ids(self.intids)
+                if doc_id % self.workers == self.worker and doc_id not in completed]
+
+    def _do_course(self, doc_id):
+        checkpoint = self.checkpoint
+        if checkpoint is None or doc_id in checkpoint.completed:
+            return 0
+        result = 0
+        course = self.intids.queryObject(doc_id)
+        if ICourseInstance.providedBy(course):
+            catalog = checkpoint.catalog
+            catalog = self.catalog if catalog is None else catalog
+            site = find_interface(course, IHostPolicyFolder, strict=False)
+            if site is not None:
+                with current_site(site):
+                    result = index_course_submissions(course, catalog, self.intids)
+            else:
+                result = index_course_submissions(course, catalog, self.intids)
+        checkpoint.completed.add(doc_id)
+        checkpoint.indexed.change(result)
+        return result
+
+    def _do_finish(self):
+        catalog = self.catalog
+        checkpoint = catalog.rebuild
+        if checkpoint is None:
+            return False
+        remaining = [x for x in get_all_course_ids(self.intids)
+                     if x not in checkpoint.completed]
+        if remaining:
+            return False
+        catalog.rebuild = None
+        shadow = checkpoint.catalog
+        if shadow is not None:
+            # swap the shadow in, in one transaction
+            lsm = catalog.__parent__.getSiteManager()
+            lsm.unregisterUtility(catalog,
+                                  provided=IDeferredCatalog,
+                                  name=SUBMISSION_CATALOG_NAME)
+            for obj in list(catalog.values()) + [catalog]:
+                if self.intids.queryId(obj) is not None:
+                    self.intids.unregister(obj)
+            self.intids.register(shadow)
+            for index in shadow.values():
+                self.intids.register(index)
+            lsm.registerUtility(shadow,
+                                provided=IDeferredCatalog,
+                                name=SUBMISSION_CATALOG_NAME)
+        return True
+
+    def finish(self):
+        """
+        Complete the rebuild, swapping in the shadow catalog if any, once
+        all courses are indexed. Returns whether the rebuild is complete.
+        """
+        return self._run(self._do_finish)
+
+    def run(self, max_courses=None):
+        """
+        Index the pending courses of this worker, at most ``max_courses``
+        of them, and finish the rebuild if nothing is left.
+        """
+        courses = items = 0
+        for doc_id in self.pending():
+            if max_courses is not None and courses >= max_courses:
+                break
+            items += self._run(self._do_course, doc_id)
+            courses += 1
+            logger.debug("Indexed submissions of course %s (%s)", doc_id, courses)
+        checkpoint = self.checkpoint
+        completed = len(checkpoint) if checkpoint is not None else 0
+        finished = self.finish()
+        return {
+            'Courses': courses,
+            'Items': items,
+            'Completed': completed,
+            'Finished': finished,
+        }
@@ -10,6 +10,8 @@ from __future__ import absolute_import
 
 import sys
 
+import six
+
 from zope import component
 from zope import interface
 
@@ -26,6 +28,8 @@ from nti.app.assessment import MessageFactory as _
 from nti.app.assessment.common.assessed import set_parent
 from nti.app.assessment.common.assessed import get_part_value
 
+from nti.app.assessment.common.caching import LRUCache
+
 from nti.app.base.abstract_views import get_source
 
 from nti.app.contentfile import transfer_data
@@ -34,14 +38,22 @@ from nti.app.externalization.error import raise_json_error
 
 from nti.assessment.interfaces import IQuestion
 from nti.assessment.interfaces import IQFilePart
+from nti.assessment.interfaces import IQAssignment
 from nti.assessment.interfaces import IQPollSubmission
 from nti.assessment.interfaces import IQSurveySubmission
 from nti.assessment.interfaces import IInternalUploadedFileRef
 
 from nti.base.interfaces import IFile
 
+from nti.contentlibrary.interfaces import IContentPackage
+
+from nti.traversal.traversal import find_interface
+
 logger = __import__('logging').getLogger(__name__)
 
+#: Process wide submission plans; see :func:`get_submission_plan`
+_SUBMISSION_PLANS = LRUCache(size=2000)
+
 
 def check_max_size(part, max_file_size=None):
     size = part.size
@@ -56,72 +68,150 @@ def check_max_size(part, max_file_size=None):
     return part
 
 
-def check_upload_files(submission):
-    for question_set in submission.parts:
-        for sub_question in question_set.questions:
-            question = component.getUtility(IQuestion, sub_question.questionId)
-            for part, sub_part in zip(question.parts, sub_question.parts):
-                part_value = get_part_value(sub_part)
-                if not IFile.providedBy(part_value):
-                    continue
+class SubmissionPlan(object):
+    """
+    What the submissions to an assignment are validated against, compiled
+    once per assignment version so that validating a submission takes no
+    registry lookups: the expected question set ids and, per question,
+    whether each part takes files and their maximum size.
+    """
+
+    __slots__ = ('ntiid', 'stamp', 'question_set_ids', 'questions')
+
+    def __init__(self, assignment):
+        self.ntiid = assignment.ntiid
+        self.stamp = _plan_stamp(assignment)
+        self.question_set_ids = tuple(sorted(
+            part.question_set.ntiid for part in assignment.parts or ()
+        ))
+        self.questions = {}
+        for part in assignment.parts or ():
+            for question in part.question_set.questions or ():
+                self.questions[question.ntiid] = _compile_question(question)
+
+    def question_parts(self, questionId):
+        """
+        Return a (takes files, max file size, description) tuple for each
+        part of the given question.
+        """
+        try:
+            return self.questions[questionId]
+        except KeyError:
+            # not part of the assignment
+            question = component.getUtility(IQuestion, questionId)
+            return _compile_question(question)
+
+
+def _compile_question(question):
+    result = []
+    for part in question.parts or ():
+        if IQFilePart.providedBy(part):
+            result.append((True, part.max_file_size, None))
+        else:
+            result.append((False, None, repr(part)))
+    return tuple(result)
 
-                if not IQFilePart.providedBy(part):
-                    msg = 'Invalid submission. Expected a IQFilePart, ' \
-                          'instead it found %s' % part
-                    raise_json_error(get_current_request(),
-                                     hexc.HTTPUnprocessableEntity,
-                                     {
-                                         'message': msg,
-                                     },
-                                     None)
-                max_size = part.max_file_size
-                check_max_size(part_value, max_size)
-    return submission
 
+def _evaluation_stamp(evaluation):
+    return (getattr(evaluation, 'ntiid', None),
+            getattr(evaluation, 'lastModified', None))
 
-def read_multipart_sources(submission, request):
+
+def _plan_stamp(assignment):
+    package = find_interface(assignment, IContentPackage, strict=False)
+    # questions can be edited without changing their assignment
+    evaluations = []
+    for part in assignment.parts or ():
+        question_set = part.question_set
+        evaluations.append(_evaluation_stamp(question_set))
+        for question in question_set.questions or ():
+            evaluations.append(_evaluation_stamp(question))
+    return (getattr(assignment, 'version', None),
+            getattr(assignment, 'lastModified', None),
+            getattr(package, 'lastModified', None),
+            tuple(evaluations))
+
+
+def get_submission_plan(assignment):
+    """
+    Return the :class:`SubmissionPlan` of the given assignment (or
+    assignment ntiid), rebuilt when the assignment or any of its
+    questions changes.
+    """
+    if isinstance(assignment, six.string_types):
+        assignment = component.queryUtility(IQAssignment, name=assignment)
+    if assignment is None:
+        return None
+    key = (assignment.ntiid, getattr(assignment, '_p_oid', None))
+    result = _SUBMISSION_PLANS.get(key)
+    if result is None or result.stamp != _plan_stamp(assignment):
+        result = SubmissionPlan(assignment)
+        _SUBMISSION_PLANS.set(key, result)
+    return result
+
+
+def _iter_file_parts(submission, plan=None):
+    """
+    Yield the (file, max file size) of the file responses of the given
+    submission, failing if a file is given to a part that takes none.
+    """
+    plan = get_submission_plan(submission.assignmentId) if plan is None else plan
     for question_set in submission.parts:
         for sub_question in question_set.questions:
-            question = component.getUtility(IQuestion, sub_question.questionId)
-            for part, sub_part in zip(question.parts, sub_question.parts):
+            if plan is not None:
+                parts = plan.question_parts(sub_question.questionId)
+            else:
+                question = component.getUtility(IQuestion, sub_question.questionId)
+                parts = _compile_question(question)
+            for (takes_files, max_size, description), sub_part in zip(parts, sub_question.parts):
                 part_value = get_part_value(sub_part)
                 if not IFile.providedBy(part_value):
                     continue
 
-                if not IQFilePart.providedBy(part):
+                if not takes_files:
                     msg = 'Invalid submission. Expected a IQFilePart, ' \
-                          'instead it found %s' % part
+                          'instead it found %s' % description
                     raise_json_error(get_current_request(),
                                      hexc.HTTPUnprocessableEntity,
                                      {
                                          'message': msg,
                                      },
                                      None)
-                max_size = part.max_file_size
-                if part_value.size > 0:
-                    check_max_size(part_value, max_size)
+                yield part_value, max_size
 
-                if not part_value.name:
-                    msg = _(u'No name was given to uploded file.')
-                    raise_json_error(get_current_request(),
-                                     hexc.HTTPUnprocessableEntity,
-                                     {
-                                         'message': msg,
-                                     },
-                                     None)
 
-                source = get_source(request, part_value.name)
-                if source is None:
-                    msg = 'Could not find data for file %s' % part_value.name
-                    raise_json_error(get_current_request(),
-                                     hexc.HTTPUnprocessableEntity,
-                                     {
-                                         'message': msg,
-                                     },
-                                    None)
+def check_upload_files(submission, plan=None):
+    for part_value, max_size in _iter_file_parts(submission, plan):
+        check_max_size(part_value, max_size)
+    return submission
+
 
-                # copy data
-                transfer_data(source, part_value)
+def read_multipart_sources(submission, request, plan=None):
+    for part_value, max_size in _iter_file_parts(submission, plan):
+        if part_value.size > 0:
+            check_max_size(part_value, max_size)
+
+        if not part_value.name:
+            msg = _(u'No name was given to uploded file.')
+            raise_json_error(get_current_request(),
+                             hexc.HTTPUnprocessableEntity,
+                             {
+                                 'message': msg,
+                             },
+                             None)
+
+        source = get_source(request, part_value.name)
+        if source is None:
+            msg = 'Could not find data for file %s' % part_value.name
+            raise_json_error(get_current_request(),
+                             hexc.HTTPUnprocessableEntity,
+                             {
+                                 'message': msg,
+                             },
+                            None)
+
+        # copy data
+        transfer_data(source, part_value)
     return submission
 
 
@@ -239,3 +329,11 @@ def transfer_submission_file_data(source, target,  force=False):
             logger.exception("Failed to transfer data from savepoints")
             break
     return target
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_SUBMISSION_PLANS.clear)
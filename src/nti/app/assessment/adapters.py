@@ -32,6 +32,8 @@ from pyramid.interfaces import IExceptionResponse
 
 from pyramid.renderers import render_to_response
 
+from nti.app.assessment._submission import get_submission_plan
+
 from nti.app.assessment.common.assessed import set_assessed_lineage
 from nti.app.assessment.common.assessed import assess_assignment_submission
 
@@ -215,20 +217,18 @@ def _begin_assessment_for_assignment_submission(submission):
     # Get the assignment
     assignment = component.getUtility(IQAssignment,
                                       name=submission.assignmentId)
+    plan = get_submission_plan(assignment)
     # Submissions to an assignment with zero parts are not allowed;
     # those are reserved for the professor
-    if len(assignment.parts) == 0:
+    if not plan.question_set_ids:
         ex = ConstraintNotSatisfied("Cannot submit zero-part assignment")
         ex.field = IQAssignment['parts']
         raise ex
 
     # Check that the submission has something for all parts
-    assignment_part_ids = [
-        part.question_set.ntiid for part in assignment.parts
-    ]
     submission_part_ids = [part.questionSetId for part in submission.parts]
 
-    if sorted(assignment_part_ids) != sorted(submission_part_ids):
+    if plan.question_set_ids != tuple(sorted(submission_part_ids)):
         ex = ConstraintNotSatisfied("Incorrect submission parts")
         ex.field = IQAssignmentSubmission['parts']
         raise ex
@@ -0,0 +1,510 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Columnar storage and aggregates of the assessed responses of assignments.
+
+Each history item is stored as a block: a header with the user intid,
+attempt and submission time followed by four packed columns with one row
+per question part: the question code, the part index, the assessed value
+and the response key. Aggregates read the blocks of an assignment into
+arrays and scan them, never loading a submission.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import six
+import struct
+import hashlib
+
+from array import array
+
+from collections import Counter
+from collections import defaultdict
+
+from BTrees.LOBTree import LOBTree
+
+from BTrees.Length import Length
+
+from BTrees.OOBTree import OOBTree
+
+from persistent import Persistent
+
+from zope import component
+from zope import interface
+
+from zope.annotation.interfaces import IAnnotations
+
+from zope.container.contained import Contained
+
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IIntIdAddedEvent
+from zope.intid.interfaces import IIntIdRemovedEvent
+
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+
+from nti.app.assessment.common.submissions import evaluation_submissions
+
+from nti.app.assessment.interfaces import ICourseResponseColumns
+from nti.app.assessment.interfaces import IAssignmentResponseColumns
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItem
+
+from nti.base.interfaces import IFile
+
+from nti.contenttypes.courses.interfaces import ICourseInstance
+
+from nti.dataserver.interfaces import IUser
+
+#: Version of the block format
+BLOCK_FORMAT = 1
+
+#: Response keys of hashed (non choice index) responses have this bit set
+HASHED_RESPONSE = 1 << 61
+
+#: Only the last attempt of each user is aggregated
+ATTEMPT_LAST = u'last'
+
+#: Only the first attempt of each user is aggregated
+ATTEMPT_FIRST = u'first'
+
+#: All attempts are aggregated
+ATTEMPT_ALL = u'all'
+
+#: The fraction of submissions in the upper and lower discrimination groups
+DISCRIMINATION_FRACTION = 0.27
+
+NAN = float('nan')
+
+_HEADER = struct.Struct('=BqidI')
+
+# typecode of the 8-byte integer array
+_INT64 = 'l' if array('l').itemsize == 8 else 'q'
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def question_code(ntiid):
+    """
+    Return the (stable) integer code of a question ntiid.
+    """
+    if isinstance(ntiid, six.text_type):
+        ntiid = ntiid.encode('utf-8')
+    return int(hashlib.md5(ntiid or b'').hexdigest()[:8], 16) & 0x7fffffff
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return tuple(sorted((_canonical(k), _canonical(v))
+                            for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(x) for x in value)
+    if IFile.providedBy(value):
+        return 'file'
+    if isinstance(value, six.text_type):
+        return value.encode('utf-8')
+    return value
+
+
+def response_key(response):
+    """
+    Return the integer key of a submitted response: the choice index of
+    single choice responses, a hash flagged with :data:`HASHED_RESPONSE`
+    otherwise.
+    """
+    value = getattr(response, 'value', response)
+    if      isinstance(value, six.integer_types) \
+        and 0 <= value < HASHED_RESPONSE:
+        return int(value)
+    text = repr(_canonical(value))
+    if isinstance(text, six.text_type):
+        text = text.encode('utf-8')
+    return int(hashlib.md5(text).hexdigest()[:15], 16) | HASHED_RESPONSE
+
+
+def _extend(target, data):
+    try:
+        target.frombytes(data)
+    except AttributeError:  # PY2
+        target.fromstring(data)
+
+
+def _tobytes(source):
+    try:
+        return source.tobytes()
+    except AttributeError:  # PY2
+        return source.tostring()
+
+
+def encode_block(user, attempt, timestamp, rows):
+    """
+    Pack the given (question code, part, assessed value, response key)
+    rows of a submission.
+    """
+    questions, parts = array('i'), array('i')
+    values, responses = array('d'), array(_INT64)
+    for question, part, value, response in rows:
+        questions.append(question)
+        parts.append(part)
+        values.append(NAN if value is None else float(value))
+        responses.append(response)
+    header = _HEADER.pack(BLOCK_FORMAT, user or 0, attempt or 0,
+                          timestamp or 0, len(questions))
+    return b''.join((header,
+                     _tobytes(questions), _tobytes(parts),
+                     _tobytes(values), _tobytes(responses)))
+
+
+def decode_header(block):
+    """
+    Return the (user, attempt, timestamp, rows) of a packed block.
+    """
+    version, user, attempt, timestamp, rows = _HEADER.unpack_from(block)
+    if version != BLOCK_FORMAT:
+        raise ValueError("Unsupported response block format")
+    return user, attempt, timestamp, rows
+
+
+def _iter_item_rows(item):
+    pending = item.pendingAssessment
+    for question_set in getattr(pending, 'parts', None) or ():
+        for question in getattr(question_set, 'questions', None) or ():
+            code = question_code(question.questionId)
+            for idx, part in enumerate(question.parts or ()):
+                value = getattr(part, 'assessedValue', None)
+                response = getattr(part, 'submittedResponse', part)
+                yield code, idx, value, response_key(response)
+
+
+def _attempt(item):
+    container = item.__parent__
+    try:
+        return list(container.keys()).index(item.__name__) + 1
+    except (AttributeError, ValueError):
+        return 1
+
+
+def encode_history_item(item, intids=None):
+    intids = component.getUtility(IIntIds) if intids is None else intids
+    user = IUser(item, None)
+    user_id = intids.queryId(user) if user is not None else None
+    return encode_block(user_id,
+                        _attempt(item),
+                        item.createdTime,
+                        _iter_item_rows(item))
+
+
+@interface.implementer(IAssignmentResponseColumns)
+class AssignmentResponseColumns(Persistent, Contained):
+
+    def __init__(self, assignmentId=None):
+        self.assignmentId = assignmentId
+        self._blocks = LOBTree()
+        self._count = Length()
+
+    def record(self, doc_id, block):
+        if doc_id not in self._blocks:
+            self._count.change(1)
+        self._blocks[doc_id] = block
+
+    def remove(self, doc_id):
+        if self._blocks.pop(doc_id, None) is not None:
+            self._count.change(-1)
+
+    def blocks(self):
+        return self._blocks.items()
+
+    def __contains__(self, doc_id):
+        return doc_id in self._blocks
+
+    def __len__(self):
+        return self._count()
+
+
+@interface.implementer(ICourseResponseColumns)
+class CourseResponseColumns(Persistent, Contained):
+
+    def __init__(self):
+        self._columns = OOBTree()
+
+    def get(self, assignmentId, default=None):
+        return self._columns.get(assignmentId, default)
+
+    def get_or_create(self, assignmentId):
+        result = self._columns.get(assignmentId)
+        if result is None:
+            result = AssignmentResponseColumns(assignmentId)
+            result.__parent__ = self
+            result.__name__ = assignmentId
+            self._columns[assignmentId] = result
+        return result
+
+    def remove(self, assignmentId):
+        return self._columns.pop(assignmentId, None)
+
+    def __contains__(self, assignmentId):
+        return assignmentId in self._columns
+
+    def __len__(self):
+        return len(self._columns)
+
+
+@component.adapter(ICourseInstance)
+@interface.implementer(ICourseResponseColumns)
+def _response_columns_for_course(course):
+    annotations = IAnnotations(course)
+    try:
+        KEY = u'ResponseColumns'
+        result = annotations[KEY]
+    except KeyError:
+        result = CourseResponseColumns()
+        annotations[KEY] = result
+        result.__name__ = KEY
+        result.__parent__ = course
+    return result
+
+
+def _item_columns(item, create=False):
+    course = ICourseInstance(item, None)
+    submission = item.Submission
+    if course is None or submission is None:
+        return None
+    container = ICourseResponseColumns(course)
+    if create:
+        return container.get_or_create(submission.assignmentId)
+    return container.get(submission.assignmentId)
+
+
+def record_history_item(item, intids=None):
+    """
+    Store (or replace) the response block of the given history item.
+    """
+    intids = component.getUtility(IIntIds) if intids is None else intids
+    doc_id = intids.queryId(item)
+    columns = _item_columns(item, True) if doc_id is not None else None
+    if columns is not None:
+        columns.record(doc_id, encode_history_item(item, intids))
+    return columns
+
+
+def unrecord_history_item(item, intids=None):
+    intids = component.getUtility(IIntIds) if intids is None else intids
+    doc_id = intids.queryId(item)
+    columns = _item_columns(item) if doc_id is not None else None
+    if columns is not None:
+        columns.remove(doc_id)
+    return columns
+
+
+def rebuild_response_columns(assignment, course, intids=None):
+    """
+    Rebuild the response columns of the assignment in the course from
+    its history items and return how many were stored.
+    """
+    result = 0
+    intids = component.getUtility(IIntIds) if intids is None else intids
+    container = ICourseResponseColumns(course)
+    container.remove(assignment.ntiid)
+    columns = container.get_or_create(assignment.ntiid)
+    for item in evaluation_submissions(assignment, course):
+        if not IUsersCourseAssignmentHistoryItem.providedBy(item):
+            continue
+        doc_id = intids.queryId(item)
+        if doc_id is not None:
+            columns.record(doc_id, encode_history_item(item, intids))
+            result += 1
+    return result
+
+
+@component.adapter(IUsersCourseAssignmentHistoryItem, IIntIdAddedEvent)
+def _on_history_item_registered(item, unused_event):
+    record_history_item(item)
+
+
+@component.adapter(IUsersCourseAssignmentHistoryItem, IIntIdRemovedEvent)
+def _on_history_item_unregistered(item, unused_event):
+    unrecord_history_item(item)
+
+
+@component.adapter(IUsersCourseAssignmentHistoryItem, IObjectModifiedEvent)
+def _on_history_item_modified(item, unused_event):
+    # e.g. regraded
+    if _item_columns(item) is not None:
+        record_history_item(item)
+
+
+class ResponseTable(object):
+    """
+    The columns of a selection of submissions of an assignment. Rows of
+    the i-th submission are in ``offsets[i]:offsets[i + 1]``.
+    """
+
+    def __init__(self):
+        self.users = array(_INT64)
+        self.attempts = array('i')
+        self.timestamps = array('d')
+        self.offsets = array(_INT64, [0])
+        self.questions = array('i')
+        self.parts = array('i')
+        self.values = array('d')
+        self.responses = array(_INT64)
+
+    def __len__(self):
+        return len(self.users)
+
+    def append(self, block, header=None):
+        user, attempt, timestamp, rows = header or decode_header(block)
+        self.users.append(user)
+        self.attempts.append(attempt)
+        self.timestamps.append(timestamp)
+        self.offsets.append(self.offsets[-1] + rows)
+        start = _HEADER.size
+        for column, size in ((self.questions, 4),
+                             (self.parts, 4),
+                             (self.values, 8),
+                             (self.responses, 8)):
+            end = start + rows * size
+            _extend(column, block[start:end])
+            start = end
+
+
+def load_response_table(columns, attempt=ATTEMPT_LAST):
+    """
+    Read the blocks of the given columns into a :class:`ResponseTable`,
+    keeping the last, first or all attempts of each user.
+    """
+    result = ResponseTable()
+    blocks = []
+    for unused_doc_id, block in columns.blocks():
+        blocks.append((decode_header(block), block))
+    if attempt != ATTEMPT_ALL:
+        selected = {}
+        for header, block in blocks:
+            user, number, timestamp = header[:3]
+            current = selected.get(user)
+            key = (number, timestamp)
+            if     current is None \
+                or (attempt == ATTEMPT_LAST and key > current[0]) \
+                or (attempt == ATTEMPT_FIRST and key < current[0]):
+                selected[user] = (key, header, block)
+        blocks = [x[1:] for x in selected.values()]
+    for header, block in blocks:
+        result.append(block, header)
+    return result
+
+
+def submission_scores(table):
+    """
+    Return the fraction of the assessed value of each submission, None
+    for submissions without assessed parts.
+    """
+    result = []
+    values, offsets = table.values, table.offsets
+    for idx in range(len(table)):
+        assessed = [x for x in values[offsets[idx]:offsets[idx + 1]] if x == x]
+        result.append(sum(assessed) / len(assessed) if assessed else None)
+    return result
+
+
+def _means(table, submissions=None, by_part=False):
+    sums = defaultdict(float)
+    counts = defaultdict(int)
+    if submissions is None:
+        ranges = ((0, len(table.values)),)
+    else:
+        offsets = table.offsets
+        ranges = ((offsets[x], offsets[x + 1]) for x in submissions)
+    questions, parts, values = table.questions, table.parts, table.values
+    for start, end in ranges:
+        for idx in range(start, end):
+            value = values[idx]
+            if value != value:  # not assessed
+                continue
+            key = (questions[idx], parts[idx]) if by_part else questions[idx]
+            sums[key] += value
+            counts[key] += 1
+    return {key: sums[key] / counts[key] for key in counts}
+
+
+def p_values(table, by_part=False):
+    """
+    Return the mean assessed value (difficulty) of each question, or of
+    each (question, part) pair.
+    """
+    return _means(table, by_part=by_part)
+
+
+def discrimination_indexes(table, scores=None, fraction=DISCRIMINATION_FRACTION):
+    """
+    Return the difference between the p-values of the upper and lower
+    scoring groups of submissions for each question.
+    """
+    scores = submission_scores(table) if scores is None else scores
+    ranked = sorted((score, idx) for idx, score in enumerate(scores)
+                    if score is not None)
+    size = int(round(len(ranked) * fraction))
+    if len(ranked) < 2 or not size:
+        return {}
+    lower = _means(table, [idx for _, idx in ranked[:size]])
+    upper = _means(table, [idx for _, idx in ranked[-size:]])
+    return {key: upper.get(key, 0) - lower.get(key, 0)
+            for key in set(upper) | set(lower)}
+
+
+def distractor_frequencies(table):
+    """
+    Return a :class:`collections.Counter` of the response keys of each
+    (question, part) pair.
+    """
+    result = defaultdict(Counter)
+    for question, part, response in zip(table.questions,
+                                        table.parts,
+                                        table.responses):
+        result[(question, part)][response] += 1
+    return result
+
+
+def score_histogram(scores, bins=10):
+    """
+    Return the number of submission scores in each of ``bins`` equal
+    intervals of [0, 1].
+    """
+    result = [0] * bins
+    for score in scores:
+        if score is not None:
+            idx = int(min(max(score, 0), 1) * bins)
+            result[min(idx, bins - 1)] += 1
+    return result
+
+
+def response_statistics(columns, attempt=ATTEMPT_LAST, bins=10):
+    """
+    Return the aggregates of the given columns keyed by question code.
+    """
+    table = load_response_table(columns, attempt)
+    scores = submission_scores(table)
+    question_p = p_values(table)
+    part_p = p_values(table, by_part=True)
+    discrimination = discrimination_indexes(table, scores)
+    distractors = distractor_frequencies(table)
+    questions = {}
+    for question, part in set(distractors) | set(part_p):
+        stats = questions.setdefault(question, {
+            'PValue': question_p.get(question),
+            'Discrimination': discrimination.get(question),
+            'Parts': {},
+        })
+        stats['Parts'][part] = {
+            'PValue': part_p.get((question, part)),
+            'Distractors': distractors.get((question, part)) or Counter(),
+        }
+    assessed = [x for x in scores if x is not None]
+    return {
+        'Submissions': len(table),
+        'Users': len(set(table.users)),
+        'MeanScore': sum(assessed) / len(assessed) if assessed else None,
+        'Histogram': score_histogram(scores, bins),
+        'Questions': questions,
+    }
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the assessment hot paths.
+
+The benchmarks are not collected by the regular test run; use the
+``benchmark`` tox environment, i.e.::
+
+    zope-testrunner --test-path=src --tests-pattern='^benchmarks$' \\
+                    --test-file-pattern='^bench_'
+
+Each path is timed over a number of calls and the results, including the
+ZODB object loads and the memory high-water mark, are written as JSON.
+Two runs are compared with ``nti_compare_assessment_benchmarks``.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import json
+import time
+import platform
+import resource
+
+from contextlib import contextmanager
+
+from ZODB.ActivityMonitor import ActivityMonitor
+
+#: Version of the format of the result files
+BENCHMARK_FORMAT = 1
+
+#: Relative slowdown reported as a regression by default
+REGRESSION_THRESHOLD = 0.1
+
+#: CPU time of this process; time.clock is gone from py3.8
+process_time = getattr(time, 'process_time', None) or time.clock
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def max_rss():
+    """
+    Return the memory high-water mark of this process in KB.
+    """
+    result = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # bytes
+        result = result // 1024
+    return result
+
+
+class BenchmarkRecorder(object):
+    """
+    Records the samples of the benchmarked paths.
+
+    When given a database, object loads and stores are counted with an
+    activity monitor, which tallies every connection closed while a
+    path runs, including the ones opened by requests.
+    """
+
+    def __init__(self, db=None, **parameters):
+        self.db = db
+        self.monitor = None
+        self.parameters = parameters
+        self.paths = {}
+        if db is not None:
+            self.monitor = ActivityMonitor()
+            db.setActivityMonitor(self.monitor)
+
+    def close(self):
+        if self.db is not None:
+            self.db.setActivityMonitor(None)
+            self.db = self.monitor = None
+
+    def _activity(self, start, end):
+        if self.monitor is None:
+            return None, None
+        analysis = self.monitor.getActivityAnalysis(start, end, divisions=1)
+        return analysis[0]['loads'], analysis[0]['stores']
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Time one call of the named path.
+        """
+        start = time.time()
+        clock = process_time()
+        try:
+            yield
+        finally:
+            cpu = process_time() - clock
+            end = time.time()
+            loads, stores = self._activity(start, end)
+            path = self.paths.setdefault(name, [])
+            path.append({
+                'Elapsed': end - start,
+                'CPU': cpu,
+                'Loads': loads,
+                'Stores': stores,
+                'MaxRSS': max_rss(),
+            })
+
+    def _summarize(self, samples):
+        elapsed = sorted(x['Elapsed'] for x in samples)
+        result = {
+            'Calls': len(samples),
+            'Total': sum(elapsed),
+            'Min': elapsed[0],
+            'Max': elapsed[-1],
+            'Mean': sum(elapsed) / len(elapsed),
+            'Median': elapsed[len(elapsed) // 2],
+            'CPU': sum(x['CPU'] for x in samples),
+            'MaxRSS': max(x['MaxRSS'] for x in samples),
+        }
+        loads = [x['Loads'] for x in samples if x['Loads'] is not None]
+        if loads:
+            result['Loads'] = sum(loads)
+            result['LoadsPerCall'] = sum(loads) / len(loads)
+            result['Stores'] = sum(x['Stores'] for x in samples
+                                   if x['Stores'] is not None)
+        return result
+
+    def results(self):
+        return {
+            'Format': BENCHMARK_FORMAT,
+            'CreatedTime': time.time(),
+            'Python': platform.python_version(),
+            'Platform': platform.platform(),
+            'Parameters': self.parameters,
+            'MaxRSS': max_rss(),
+            'Paths': {
+                name: self._summarize(samples)
+                for name, samples in self.paths.items() if samples
+            },
+        }
+
+    def write(self, path):
+        results = self.results()
+        with open(path, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+        logger.info("Benchmark results written to %s", path)
+        return results
+
+
+def load_results(path):
+    with open(path, 'r') as fp:
+        result = json.load(fp)
+    if result.get('Format') != BENCHMARK_FORMAT:
+        raise ValueError("Unsupported benchmark format in %s" % path)
+    return result
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD,
+                    metric='Median'):
+    """
+    Compare the paths of two runs and return a list of
+    (name, baseline, current, ratio, regression) tuples, sorted by name.
+    The loads per call are compared too; more loads is a regression.
+    """
+    result = []
+    base_paths = baseline.get('Paths') or {}
+    current_paths = current.get('Paths') or {}
+    for name in sorted(set(base_paths) | set(current_paths)):
+        base = base_paths.get(name) or {}
+        cur = current_paths.get(name) or {}
+        base_value = base.get(metric)
+        cur_value = cur.get(metric)
+        ratio = None
+        regression = False
+        if base_value and cur_value is not None:
+            ratio = cur_value / base_value
+            regression = ratio > 1 + threshold
+        base_loads = base.get('LoadsPerCall')
+        cur_loads = cur.get('LoadsPerCall')
+        if base_loads is not None and cur_loads is not None:
+            regression = regression or cur_loads > base_loads * (1 + threshold)
+        result.append((name, base_value, cur_value, ratio, regression))
+    return result
+
+
+def format_comparison(rows):
+    lines = ['%-40s %12s %12s %8s' % ('Path', 'Baseline', 'Current', 'Ratio')]
+    for name, base, cur, ratio, regression in rows:
+        lines.append('%-40s %12s %12s %8s%s' % (
+            name,
+            '-' if base is None else '%.4f' % base,
+            '-' if cur is None else '%.4f' % cur,
+            '-' if ratio is None else '%.2f' % ratio,
+            ' REGRESSION' if regression else ''))
+    return '\n'.join(lines)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks the assessment hot paths against a synthetic course.
+
+The size of the course is set with the ``NTI_BENCHMARK_STUDENTS``,
+``NTI_BENCHMARK_ASSIGNMENTS`` and ``NTI_BENCHMARK_ATTEMPTS`` environment
+variables; ``NTI_BENCHMARK_REPEAT`` is the number of calls of each read
+path and ``NTI_BENCHMARK_OUTPUT`` the path of the JSON results.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+import os
+import json
+
+from six.moves.urllib_parse import quote
+
+import fudge
+
+from nti.app.assessment.benchmarks import BenchmarkRecorder
+
+from nti.app.assessment.tests import InstructedCourseApplicationTestLayer
+
+from nti.app.testing.application_webtest import ApplicationLayerTest
+
+from nti.app.testing.decorators import WithSharedApplicationMockDS
+
+from nti.assessment.response import QModeledContentResponse
+
+from nti.assessment.submission import QuestionSubmission
+from nti.assessment.submission import AssignmentSubmission
+from nti.assessment.submission import QuestionSetSubmission
+
+from nti.assessment.survey import QPollSubmission
+from nti.assessment.survey import QSurveySubmission
+
+from nti.dataserver.tests import mock_dataserver
+
+from nti.externalization.externalization import to_external_object
+
+PAGEINFO_MIME_TYPE = 'application/vnd.nextthought.pageinfo+json'
+
+
+def _get_int(name, default):
+    return int(os.getenv(name) or default)
+
+
+class BenchmarkAssessment(ApplicationLayerTest):
+
+    layer = InstructedCourseApplicationTestLayer
+
+    default_origin = 'http://janux.ou.edu'
+
+    instructor = 'tryt3968'
+    course_ntiid = u'tag:nextthought.com,2011-10:NTI-CourseInfo-Fall2015_CS_1323'
+    course_url = '/dataserver2/%2B%2Betc%2B%2Bhostsites/platform.ou.edu/%2B%2Betc%2B%2Bsite/Courses/Fall2015/CS%201323'
+    page_ntiid = 'tag:nextthought.com,2011-10:OU-HTML-CS1323_F_2015_Intro_to_Computer_Programming.project_10_(100_points)'
+
+    students = _get_int('NTI_BENCHMARK_STUDENTS', 20)
+    assignments = _get_int('NTI_BENCHMARK_ASSIGNMENTS', 5)
+    attempts = _get_int('NTI_BENCHMARK_ATTEMPTS', 2)
+    repeat = _get_int('NTI_BENCHMARK_REPEAT', 5)
+    output = os.getenv('NTI_BENCHMARK_OUTPUT') or 'assessment-benchmark.json'
+
+    def _load_json_resource(self, resource):
+        path = os.path.join(os.path.dirname(__file__), '..', 'tests', resource)
+        with open(path, "r") as fp:
+            return json.load(fp)
+
+    def _create_evaluation(self, resource, **kwargs):
+        data = self._load_json_resource(resource)
+        data.update(kwargs)
+        href = '%s/CourseEvaluations' % self.course_url
+        result = self.testapp.post_json(href, data, status=201).json_body
+        self.testapp.post(self.require_link_href_with_rel(result, 'publish'))
+        return result
+
+    def _create_assignment(self):
+        result = self._create_evaluation('assignment_with_multiple_question_parts.json')
+        self.testapp.put_json('%s/Assessments/%s' % (self.course_url, result['NTIID']),
+                              {'max_submissions': self.attempts})
+        return result
+
+    def _enroll(self, username):
+        with mock_dataserver.mock_db_trans(self.ds):
+            self._create_user(username=username)
+        self.testapp.post_json('/dataserver2/CourseAdmin/UserCourseEnroll',
+                               {'ntiid': self.course_ntiid,
+                                'username': username,
+                                'scope': 'ForCredit'})
+        return self._make_extra_environ(username=username)
+
+    def _assignment_submission(self, assignment):
+        question_set = assignment['parts'][0]['question_set']
+        ids = [x['NTIID'] for x in question_set['questions']]
+        questions = [QuestionSubmission(questionId=ids[0], parts=[0, 0]),
+                     QuestionSubmission(questionId=ids[1], parts=[[0, 1], [0]]),
+                     QuestionSubmission(questionId=ids[2], parts=["OK", "Bye"]),
+                     QuestionSubmission(questionId=ids[3],
+                                        parts=[QModeledContentResponse(value=["go"]),
+                                               QModeledContentResponse(value=["stay"])])]
+        submission = AssignmentSubmission(assignmentId=assignment['NTIID'],
+                                          parts=(QuestionSetSubmission(questionSetId=question_set['NTIID'],
+                                                                       questions=questions),))
+        return to_external_object(submission)
+
+    def _survey_submission(self, survey):
+        polls = [QPollSubmission(pollId=poll['NTIID'], parts=['answer'])
+                 for poll in survey['questions']]
+        submission = QSurveySubmission(surveyId=survey['NTIID'],
+                                       questions=polls)
+        result = to_external_object(submission)
+        result.pop('Class', None)
+        return result
+
+    def _submit(self, recorder, assignment, environ):
+        ntiid = assignment['NTIID']
+        res = self.testapp.get('/dataserver2/Objects/%s' % quote(ntiid),
+                               extra_environ=environ)
+        start_href = self.require_link_href_with_rel(res.json_body, 'Commence')
+        self.testapp.post(start_href, extra_environ=environ)
+        submission_url = '%s/Assessments/%s' % (self.course_url, ntiid)
+        ext_obj = self._assignment_submission(assignment)
+        with recorder.measure('AssignmentSubmissionPost'):
+            self.testapp.post_json(submission_url, ext_obj,
+                                   extra_environ=environ, status=201)
+
+    def _repeat(self, recorder, name, func, *args, **kwargs):
+        for _ in range(self.repeat):
+            with recorder.measure(name):
+                func(*args, **kwargs)
+
+    @WithSharedApplicationMockDS(users=True, testapp=True)
+    @fudge.patch('nti.app.assessment.common.evaluations.get_completed_item')
+    def test_benchmark(self, mock_completed_item):
+        # completed assignments do not take more attempts
+        mock_completed_item.is_callable().returns(None)
+        recorder = BenchmarkRecorder(getattr(self.ds, 'db', None),
+                                     Students=self.students,
+                                     Assignments=self.assignments,
+                                     Attempts=self.attempts,
+                                     Repeat=self.repeat)
+        try:
+            self._run(recorder)
+        finally:
+            recorder.close()
+        recorder.write(self.output)
+
+    def _run(self, recorder):
+        assignments = [self._create_assignment() for _ in range(self.assignments)]
+        survey = self._create_evaluation('survey-freeresponse.json')
+        course = self.testapp.get(self.course_url).json_body
+        inquiries_href = self.require_link_href_with_rel(course, 'CourseInquiries')
+
+        environs = [self._enroll('bench_student%04d' % i)
+                    for i in range(self.students)]
+        survey_submission = self._survey_submission(survey)
+        for environ in environs:
+            for assignment in assignments:
+                for _ in range(self.attempts):
+                    self._submit(recorder, assignment, environ)
+            with recorder.measure('InquirySubmissionPost'):
+                self.testapp.post_json('%s/%s' % (inquiries_href, survey['NTIID']),
+                                       survey_submission,
+                                       extra_environ=environ)
+
+        student = environs[0] if environs else None
+        self._repeat(recorder, 'PageInfo',
+                     self.testapp.get,
+                     '/dataserver2/Objects/%s' % quote(self.page_ntiid),
+                     headers={'Accept': PAGEINFO_MIME_TYPE},
+                     extra_environ=student)
+
+        instructor = self._make_extra_environ(username=self.instructor)
+        self._repeat(recorder, 'AssignmentsByOutlineNode',
+                     self.testapp.get,
+                     '%s/@@AssignmentsByOutlineNode' % self.course_url,
+                     extra_environ=instructor)
+
+        survey_href = '/dataserver2/Objects/%s' % quote(survey['NTIID'])
+        survey_res = self.testapp.get(survey_href).json_body
+        aggregated_href = self.require_link_href_with_rel(survey_res, 'Aggregated')
+        self._repeat(recorder, 'InquiryAggregated',
+                     self.testapp.get, aggregated_href)
+
+        self._repeat(recorder, 'InquiryReportCSV',
+                     self.testapp.get, survey_href + '/@@InquiryReport.csv')
+
+        for assignment in assignments:
+            href = '/dataserver2/Objects/%s' % quote(assignment['NTIID'])
+            with recorder.measure('AssignmentSubmissionsReportCSV'):
+                self.testapp.get(href + '/@@AssignmentSubmissionsReport')
+            with recorder.measure('RegradeEvaluation'):
+                self.testapp.post(href + '/@@Regrade',
+                                  params={'username': self.instructor})
+
+        self._repeat(recorder, 'RebuildSubmissionCatalog',
+                     self.testapp.post,
+                     '/dataserver2/@@RebuildSubmissionCatalog')
@@ -109,3 +109,17 @@ def reassess_assignment_history_item(item):
 
     # dispatch to sublocations
     lifecycleevent.modified(item)
+
+
+def get_assessed_score(item):
+    """
+    Return the sum of the assessed values of the parts of the pending
+    assessment of the given history item.
+    """
+    result = 0
+    pending_assessment = getattr(item, 'pendingAssessment', None)
+    for bundle in getattr(pending_assessment, 'parts', None) or ():
+        for question in getattr(bundle, 'questions', None) or ():
+            for part in getattr(question, 'parts', None) or ():
+                result += getattr(part, 'assessedValue', None) or 0
+    return result
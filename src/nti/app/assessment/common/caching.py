@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Request scoped and process wide caches.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import uuid
+import threading
+
+from collections import OrderedDict
+
+from BTrees.Length import Length
+
+from pyramid.threadlocal import get_current_request
+
+import six
+
+from zope.annotation.interfaces import IAnnotations
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The request attribute holding the request scoped caches
+REQUEST_CACHES_ATTR = '_v_nti_assessment_caches'
+
+#: Suffix of the annotation key holding the token of a generation
+GENERATION_TOKEN_SUFFIX = u'Token'
+
+_marker = object()
+
+
+def get_request_cache(name, request=None):
+    """
+    Return the named dictionary cached on the current request or ``None``
+    if there is no request (e.g. scripts and background jobs).
+    """
+    request = get_current_request() if request is None else request
+    if request is None:
+        return None
+    caches = getattr(request, REQUEST_CACHES_ATTR, None)
+    if caches is None:
+        caches = {}
+        setattr(request, REQUEST_CACHES_ATTR, caches)
+    try:
+        result = caches[name]
+    except KeyError:
+        result = caches[name] = {}
+    return result
+
+
+def clear_request_cache(name, request=None):
+    request = get_current_request() if request is None else request
+    caches = getattr(request, REQUEST_CACHES_ATTR, None)
+    if caches:
+        caches.pop(name, None)
+
+
+class LRUCache(object):
+    """
+    A small, thread-safe, least recently used mapping shared across
+    requests. Values must be immutable and never reference persistent
+    objects, since they outlive the connection that produced them.
+    """
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.pop(key, _marker)
+            if value is _marker:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+def get_generation(context, key):
+    """
+    Return the generation stored in the annotations of the context under
+    the given key and whether it is unmodified in this transaction, i.e.
+    whether results validated by it can be shared across requests.
+
+    The generation is a (token, counter) tuple; the random token keeps
+    generations from different databases apart.
+    """
+    annotations = IAnnotations(context, None)
+    counter = None
+    if annotations is not None:
+        counter = annotations.get(key)
+    if counter is None:
+        return (None, 0), True
+    token = annotations.get(key + GENERATION_TOKEN_SUFFIX)
+    # pylint: disable=protected-access
+    clean = counter._p_jar is not None and not counter._p_changed
+    return (token, counter()), clean
+
+
+def bump_generation(context, key):
+    """
+    Increment the generation stored in the annotations of the context under
+    the given key. Counters are :class:`BTrees.Length.Length` objects so
+    concurrent bumps do not conflict.
+    """
+    annotations = IAnnotations(context, None)
+    if annotations is None:
+        return
+    counter = annotations.get(key)
+    if counter is None:
+        token = six.text_type(uuid.uuid4().hex)
+        annotations[key + GENERATION_TOKEN_SUFFIX] = token
+        counter = annotations[key] = Length()
+    counter.change(1)
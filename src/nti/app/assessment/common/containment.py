@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+An in-memory evaluation containment graph.
+
+The containment index of the evaluation catalog maps each question set,
+assignment and survey to the ntiids of the items it contains. The graph
+keeps that mapping, and its inverse, in memory so the containers of an
+item are found without querying the catalog. It is versioned by a
+generation counter of the catalog, bumped whenever the containment of a
+document changes, and updated incrementally once those changes commit.
+Commits that cannot be applied in order drop the graph instead.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import uuid
+import threading
+
+from BTrees.Length import Length
+
+import six
+
+import transaction
+
+from ZODB.utils import z64
+
+from nti.app.assessment.common.caching import LRUCache
+
+#: Catalog attribute holding the containment generation counter
+CONTAINMENT_GENERATION_ATTR = '_containment_generation'
+
+#: Catalog attribute holding the token of the containment generation
+CONTAINMENT_TOKEN_ATTR = '_containment_token'
+
+#: Process wide containment graphs, keyed by generation token
+_GRAPHS = LRUCache(size=20)
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class EvaluationContainmentGraph(object):
+    """
+    A bidirectional map of container doc ids to the ntiids of the items
+    they contain, valid for a generation of the containment index.
+    """
+
+    def __init__(self, generation=None):
+        self.generation = generation
+        self._lock = threading.Lock()
+        self._contained = {}  # container doc id -> frozenset of ntiids
+        self._containers = {}  # item ntiid -> set of container doc ids
+
+    def __len__(self):
+        return len(self._contained)
+
+    def _unindex(self, doc_id):
+        for ntiid in self._contained.pop(doc_id, ()):
+            containers = self._containers.get(ntiid)
+            if containers is not None:
+                containers.discard(doc_id)
+                if not containers:
+                    del self._containers[ntiid]
+
+    def _index(self, doc_id, ntiids):
+        self._unindex(doc_id)
+        ntiids = frozenset(ntiids or ())
+        if ntiids:
+            self._contained[doc_id] = ntiids
+            for ntiid in ntiids:
+                self._containers.setdefault(ntiid, set()).add(doc_id)
+
+    def index(self, doc_id, ntiids):
+        with self._lock:
+            self._index(doc_id, ntiids)
+
+    def unindex(self, doc_id):
+        with self._lock:
+            self._unindex(doc_id)
+
+    def update(self, changes, generation, base=None):
+        """
+        Apply the given map of doc ids to their new containment (``None``
+        when unindexed) and move the graph to the given generation. Nothing
+        is done, and ``False`` returned, unless the graph is at the ``base``
+        generation, if given.
+        """
+        with self._lock:
+            if base is not None and self.generation != base:
+                return False
+            for doc_id, ntiids in changes.items():
+                self._index(doc_id, ntiids)
+            self.generation = generation
+            return True
+
+    def get_containers(self, ntiid):
+        """
+        Return the doc ids of the containers of the given item ntiid.
+        """
+        with self._lock:
+            return frozenset(self._containers.get(ntiid) or ())
+
+    def get_contained(self, doc_id):
+        """
+        Return the ntiids of the items of the given container doc id.
+        """
+        with self._lock:
+            return self._contained.get(doc_id) or frozenset()
+
+    @classmethod
+    def build(cls, documents_to_values, generation=None):
+        result = cls(generation)
+        for doc_id, ntiids in documents_to_values.items():
+            result._index(doc_id, ntiids)
+        return result
+
+
+def get_containment_generation(catalog):
+    """
+    Return the containment generation of the given catalog and whether it
+    is unmodified in this transaction, i.e. whether a shared graph may be
+    used to answer containment queries. The counter is created by the first
+    containment change; until then there is no shared graph.
+
+    The generation is the (token, serial) of the counter: the serial is
+    the id of the transaction that committed the state of the counter seen
+    by this one, so transactions bumping it from the same state never get
+    the same generation.
+    """
+    counter = getattr(catalog, CONTAINMENT_GENERATION_ATTR, None)
+    if counter is None:
+        return (None, z64), False
+    token = getattr(catalog, CONTAINMENT_TOKEN_ATTR, None)
+    # pylint: disable=protected-access
+    counter._p_activate()
+    clean = counter._p_jar is not None and not counter._p_changed
+    return (token, counter._p_serial), clean
+
+
+def _apply_containment_changes(success, token, base, counter, pending):
+    if not success:
+        return
+    graph = _GRAPHS.get(token)
+    if graph is None:
+        return
+    # pylint: disable=protected-access
+    serial = counter._p_serial
+    if graph.generation == (token, serial):
+        # already built from our committed state
+        return
+    if     counter._p_changed is None \
+        or serial == base[1] \
+        or not graph.update(pending, (token, serial), base=base):
+        # A concurrent change was resolved into our commit (the counter
+        # was invalidated) or the graph is not at the state we changed;
+        # it cannot be updated, the next reader rebuilds it.
+        _GRAPHS.pop(token)
+
+
+def _transaction(catalog):
+    # pylint: disable=protected-access
+    jar = getattr(catalog, '_p_jar', None)
+    manager = getattr(jar, 'transaction_manager', None)
+    return manager.get() if manager is not None else transaction.get()
+
+
+def _pending_containment_changes(catalog, counter):
+    current = _transaction(catalog)
+    for hook, args, _ in current.getAfterCommitHooks():
+        if hook is _apply_containment_changes and args[2] is counter:
+            return args[3]
+    base, _ = get_containment_generation(catalog)
+    pending = {}
+    current.addAfterCommitHook(_apply_containment_changes,
+                               args=(base[0], base, counter, pending))
+    return pending
+
+
+def record_containment_change(catalog, doc_id, ntiids):
+    """
+    Bump the containment generation of the given catalog and record the new
+    containment of the given doc id (``None`` if it was unindexed), to be
+    applied to the shared graph when the transaction commits.
+    """
+    counter = getattr(catalog, CONTAINMENT_GENERATION_ATTR, None)
+    if counter is None:
+        token = six.text_type(uuid.uuid4().hex)
+        setattr(catalog, CONTAINMENT_TOKEN_ATTR, token)
+        counter = Length()
+        setattr(catalog, CONTAINMENT_GENERATION_ATTR, counter)
+    else:
+        pending = _pending_containment_changes(catalog, counter)
+        pending[doc_id] = frozenset(ntiids) if ntiids else None
+    counter.change(1)
+
+
+def get_containment_graph(catalog):
+    """
+    Return the shared containment graph of the given evaluation catalog, or
+    ``None`` if it cannot answer the queries of this transaction, i.e. the
+    containment was modified in this transaction or the graph has already
+    moved past the state seen by it. Callers should then query the catalog.
+    """
+    if catalog is None:
+        return None
+    generation, clean = get_containment_generation(catalog)
+    if not clean:
+        return None
+    token, serial = generation
+    graph = _GRAPHS.get(token)
+    if graph is not None:
+        current = graph.generation
+        if current == generation:
+            return graph
+        if current[1] > serial:
+            return None
+    documents = catalog.containment_index.documents_to_values
+    graph = EvaluationContainmentGraph.build(documents, generation)
+    _GRAPHS.set(token, graph)
+    logger.info("Evaluation containment graph built (%s container(s))",
+                len(graph))
+    return graph
+
+
+def clear_containment_graphs():
+    _GRAPHS.clear()
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(clear_containment_graphs)
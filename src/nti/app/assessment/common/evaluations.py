@@ -14,6 +14,8 @@ from datetime import timedelta
 
 import six
 
+import transaction
+
 from ZODB import loglevels
 
 from zope import component
@@ -22,11 +24,20 @@ from zope.intid.interfaces import IIntIds
 
 from zope.proxy import isProxy
 from zope.proxy import ProxyBase
+from zope.proxy import removeAllProxies
 
 from zope.schema.interfaces import RequiredMissing
 
 from nti.app.assessment.assignment_filters import AssessmentPolicyExclusionFilter
 
+from nti.app.assessment.common.caching import LRUCache
+from nti.app.assessment.common.caching import get_generation
+from nti.app.assessment.common.caching import bump_generation
+
+from nti.app.assessment.common.containment import get_containment_graph
+
+from nti.app.assessment.common.resultsets import resolve_intids
+
 from nti.app.assessment.common.utils import is_published
 from nti.app.assessment.common.utils import get_policy_field
 from nti.app.assessment.common.utils import get_evaluation_catalog_entry
@@ -49,14 +60,19 @@ from nti.assessment.interfaces import QUESTION_SET_MIME_TYPE
 from nti.assessment.interfaces import QUESTION_BANK_MIME_TYPE
 from nti.assessment.interfaces import ALL_ASSIGNMENT_MIME_TYPES
 
+from nti.assessment.interfaces import IQSurvey
 from nti.assessment.interfaces import IQAssignment
 from nti.assessment.interfaces import IQuestionSet
 from nti.assessment.interfaces import IQEvaluation
 from nti.assessment.interfaces import IQEditableEvaluation
 from nti.assessment.interfaces import IQDiscussionAssignment
+from nti.assessment.interfaces import IQAssessmentPolicies
 from nti.assessment.interfaces import IQAssessmentItemContainer
 from nti.assessment.interfaces import IPlaceholderAssignmentSubmission
 
+from nti.assessment.randomized.interfaces import IQuestionBank
+from nti.assessment.randomized.interfaces import IRandomizedQuestionSet
+
 from nti.contentlibrary.interfaces import IContentUnit
 from nti.contentlibrary.interfaces import IContentPackage
 from nti.contentlibrary.interfaces import IGlobalContentPackage
@@ -81,6 +97,7 @@ from nti.contenttypes.courses.legacy_catalog import ILegacyCourseInstance
 from nti.contenttypes.courses.common import get_course_packages
 
 from nti.contenttypes.courses.utils import get_parent_course
+from nti.contenttypes.courses.utils import get_courses_for_packages
 
 from nti.dataserver.contenttypes.forums.interfaces import ITopic
 
@@ -94,20 +111,58 @@ from nti.traversal.traversal import find_interface
 
 logger = __import__('logging').getLogger(__name__)
 
+#: Annotation key of the course assignment generation counter
+ASSIGNMENT_GENERATION_KEY = u'AssignmentGeneration'
+
+#: Process wide course assignment snapshots; see :func:`get_course_assignments`
+_ASSIGNMENT_SNAPSHOTS = LRUCache(size=2000)
+
+#: Annotation key of the content package assessment items generation counter
+UNIT_ASSESSMENT_GENERATION_KEY = u'UnitAssessmentGeneration'
+
+#: Process wide content unit assessment indexes; see :func:`get_unit_assessment_index`
+_UNIT_ASSESSMENT_INDEXES = LRUCache(size=5000)
+
+#: Annotation key of the course outline assessment refs generation counter
+OUTLINE_GENERATION_KEY = u'OutlineAssessmentGeneration'
+
+
+def _graph_container_ids(catalog, graph, ntiid, sites, mime_types=None):
+    """
+    Return the doc ids of the containers of the given ntiid in the
+    containment graph, in the given sites and of the given mime types.
+    """
+    sites = set(sites)
+    mime_types = set(mime_types) if mime_types else None
+    site_index = catalog[IX_SITE].documents_to_values
+    mime_index = catalog[IX_ASSESS_MIMETYPE].documents_to_values
+    result = []
+    for doc_id in graph.get_containers(ntiid):
+        if site_index.get(doc_id) not in sites:
+            continue
+        if mime_types is not None and mime_index.get(doc_id) not in mime_types:
+            continue
+        result.append(doc_id)
+    return result
+
 
 def get_evaluation_containment(ntiid, sites=None, intids=None):
     result = []
     sites = get_component_hierarchy_names() if not sites else sites
     sites = sites.split() if isinstance(sites, six.string_types) else sites
-    query = {
-        IX_SITE: {'any_of': sites},
-        IX_CONTAINMENT: {'any_of': (ntiid,)}
-    }
     catalog = get_evaluation_catalog()
+    graph = get_containment_graph(catalog)
+    if graph is not None:
+        doc_ids = _graph_container_ids(catalog, graph, ntiid, sites)
+    else:
+        query = {
+            IX_SITE: {'any_of': sites},
+            IX_CONTAINMENT: {'any_of': (ntiid,)}
+        }
+        doc_ids = catalog.apply(query)
     intids = component.getUtility(IIntIds) if intids is None else intids
-    for uid in catalog.apply(query) or ():
-        container = intids.queryObject(uid)
-        if container is not None and container.ntiid != ntiid:
+    for container in resolve_intids(doc_ids, intids=intids):
+        if container.ntiid != ntiid:
             result.append(container)
     return result
 
@@ -141,14 +196,9 @@ def get_container_evaluations(context, sites=None, intids=None, mimetypes=None):
     if mimetypes:
         query[IX_ASSESS_MIMETYPE] = {'any_of': mimetypes}
 
-    result = []
     catalog = get_evaluation_catalog()
-    intids = component.getUtility(IIntIds) if intids is None else intids
-    for uid in catalog.apply(query) or ():
-        evaluation = intids.queryObject(uid)
-        if IQEvaluation.providedBy(evaluation):  # extra check
-            result.append(evaluation)
-    return result
+    # extra interface check
+    return list(resolve_intids(catalog.apply(query), IQEvaluation, intids))
 
 
 def get_course_evaluations(context, sites=None, intids=None, mimetypes=None,
@@ -240,6 +290,121 @@ def get_assessment_items_from_unit(contentUnit):
     return result
 
 
+def compute_unit_assessment_index(items):
+    """
+    Split the given assessment items (by ntiid) of a content unit in the
+    items returned as top-level items and the assignments, which callers
+    must still filter for their user.
+
+    To keep the size down, the questions of question banks, randomized
+    question sets and surveys, and the question sets (and questions) of
+    assignments, are not returned as top-level items.
+    """
+    to_strip = set()
+    top_level = []
+    assignments = []
+    for ntiid, item in items.items():
+        if     IQuestionBank.providedBy(item) \
+            or IRandomizedQuestionSet.providedBy(item) \
+            or IQSurvey.providedBy(item):
+            to_strip.update(q.ntiid for q in item.questions)
+            top_level.append(item)
+        elif IQuestionSet.providedBy(item):
+            # CS:20150729 allow the questions to return along with question set
+            # this is for legacy iPad.
+            top_level.append(item)
+        elif IQAssignment.providedBy(item):
+            assignments.append(item)
+            # We are assuming that these are on the same page
+            # for now and that they are only referenced by
+            # this assignment. We need to fix this
+            for assignment_part in item.parts or ():
+                question_set = assignment_part.question_set
+                to_strip.add(question_set.ntiid)
+                to_strip.update(q.ntiid for q in question_set.questions)
+        else:
+            top_level.append(item)
+    top_level = [x for x in top_level if x.ntiid not in to_strip]
+    assignments = [x for x in assignments if x.ntiid not in to_strip]
+    return top_level, assignments
+
+
+def get_unit_assessment_generation(unit):
+    """
+    Return the stamp that validates the assessment index of the given
+    content unit and whether it can be shared across requests.
+    """
+    package = find_interface(unit, IContentPackage, strict=False)
+    if package is None:
+        return None, False
+    generation, clean = get_generation(package, UNIT_ASSESSMENT_GENERATION_KEY)
+    container = IQAssessmentItemContainer(package, None)
+    stamp = (package.ntiid,
+             generation,
+             getattr(package, 'lastModified', None),
+             getattr(container, 'lastModified', None))
+    return stamp, clean
+
+
+def bump_unit_assessment_generation(context):
+    """
+    Invalidate the assessment indexes of the units of the content package
+    of the given context.
+    """
+    package = find_interface(context, IContentPackage, strict=False)
+    if package is not None:
+        bump_generation(package, UNIT_ASSESSMENT_GENERATION_KEY)
+
+
+def _load_unit_assessment_index(key, stamp, intids):
+    cached = _UNIT_ASSESSMENT_INDEXES.get(key)
+    if cached is None or cached[0] != stamp:
+        return None
+    result = []
+    for doc_ids in cached[1]:
+        items = [intids.queryObject(x) for x in doc_ids]
+        if None in items:
+            return None
+        result.append(items)
+    return tuple(result)
+
+
+def _store_unit_assessment_index(key, stamp, index, intids):
+    records = []
+    for items in index:
+        doc_ids = tuple(intids.queryId(x) for x in items)
+        if None in doc_ids:
+            # not everything is registered; do not cache
+            return
+        records.append(doc_ids)
+    _UNIT_ASSESSMENT_INDEXES.set(key, (stamp, tuple(records)))
+
+
+def get_unit_assessment_index(contentUnit):
+    """
+    Return the top-level assessment items and the assignments of the given
+    content unit and its embedded units (see :func:`compute_unit_assessment_index`).
+
+    The index is cached by content unit as intids, validated by the
+    generation of the content package, which is bumped on content sync and
+    when evaluations change.
+    """
+    ntiid = getattr(contentUnit, 'ntiid', None)
+    stamp, clean = get_unit_assessment_generation(contentUnit)
+    if not ntiid or stamp is None:
+        items = get_assessment_items_from_unit(contentUnit)
+        return compute_unit_assessment_index(items)
+    key = (ntiid, tuple(get_component_hierarchy_names()))
+    intids = component.getUtility(IIntIds)
+    result = _load_unit_assessment_index(key, stamp, intids)
+    if result is None:
+        items = get_assessment_items_from_unit(contentUnit)
+        result = compute_unit_assessment_index(items)
+        if clean:
+            _store_unit_assessment_index(key, stamp, result, intids)
+    return result
+
+
 def get_content_packages_assessment_items(package):
     result = []
     def _recur(unit):
@@ -335,30 +500,198 @@ def assignment_comparator(a, b):
     return 0
 
 
-def get_all_course_assignments(context):
+def get_course_assignment_generation(course):
+    """
+    Return the stamp that validates the assignment snapshots of the given
+    course and whether it can be shared across requests.
+
+    Besides our own generation counters (bumped when evaluations are
+    added, removed, published or modified and when policies change) the
+    stamp includes the modification times of the course policies and
+    packages, which are updated by course and content syncs.
+    """
+    courses = [course]
+    if ICourseSubInstance.providedBy(course):
+        parent = get_parent_course(course)
+        if parent is not None and parent is not course:
+            courses.append(parent)
+    stamp = []
+    result = True
+    for context in courses:
+        generation, clean = get_generation(context, ASSIGNMENT_GENERATION_KEY)
+        policies = IQAssessmentPolicies(context, None)
+        stamp.append((generation,
+                      getattr(policies, 'lastModified', None)))
+        result = result and clean
+    for package in get_course_packages(course):
+        stamp.append((package.ntiid,
+                      getattr(package, 'lastModified', None)))
+    return tuple(stamp), result
+
+
+def bump_course_assignment_generation(course):
+    """
+    Invalidate the assignment snapshots of the given course.
+    """
+    bump_generation(course, ASSIGNMENT_GENERATION_KEY)
+
+
+def _bump_package_assignment_generations(packages):
+    for ntiid in sorted(packages):
+        for course in get_courses_for_packages(packages=ntiid) or ():
+            bump_course_assignment_generation(course)
+
+
+def _pending_package_bumps(create=False):
+    current = transaction.get()
+    for hook, args, _ in current.getBeforeCommitHooks():
+        if hook is _bump_package_assignment_generations:
+            return args[0]
+    if not create:
+        return None
+    result = set()
+    current.addBeforeCommitHook(_bump_package_assignment_generations,
+                                args=(result,))
+    return result
+
+
+def bump_package_assignment_generation(package):
+    """
+    Invalidate the assignment snapshots of the courses of the given
+    package. A sync registers many evaluations of a package, so the
+    courses are looked up and bumped once per package, when the
+    transaction commits; until then no snapshot is used.
+    """
+    _pending_package_bumps(create=True).add(package.ntiid)
+
+
+def get_course_outline_generation(course):
+    """
+    Return the stamp that validates the assignments by outline node of the
+    given course and whether it can be shared across requests.
+
+    The stamp extends the course assignment stamp with our outline
+    generation counters (bumped when the assessment refs of the lessons
+    change) and the modification time of the course outline.
+    """
+    stamp, result = get_course_assignment_generation(course)
+    stamp = [stamp]
+    courses = [course]
+    parent = get_parent_course(course)
+    if parent is not None and parent is not course:
+        courses.append(parent)
+    for context in courses:
+        generation, clean = get_generation(context, OUTLINE_GENERATION_KEY)
+        outline = getattr(context, 'Outline', None)
+        stamp.append((generation,
+                      getattr(outline, 'lastModified', None)))
+        result = result and clean
+    return tuple(stamp), result
+
+
+def bump_course_outline_generation(course):
     """
-    Get all un-proxied, non-filtered course assignments for the given context.
-    This is a relatively expensive call, because we fetch assignments in
-    content packages (necessary for new content backed assignments) and then
-    look for all API-created assignments to merge with.
+    Invalidate the assignments by outline node of the given course.
     """
+    bump_generation(course, OUTLINE_GENERATION_KEY)
+
+
+def _snapshot_key(context, *args):
+    course = ICourseInstance(context, None)
+    entry = ICourseCatalogEntry(course, None)
+    if entry is None or ILegacyCourseInstance.providedBy(course):
+        return None, None
+    key = (entry.ntiid, tuple(get_component_hierarchy_names())) + args
+    return course, key
+
+
+def _load_snapshot(key, stamp, intids):
+    cached = _ASSIGNMENT_SNAPSHOTS.get(key)
+    if cached is None or cached[0] != stamp:
+        return None
+    result = []
+    for doc_id, proxied, content_unit, catalog_entry in cached[1]:
+        obj = intids.queryObject(doc_id)
+        if not IQAssignment.providedBy(obj):
+            return None
+        if proxied:
+            obj = proxy(obj,
+                        content_unit=content_unit,
+                        catalog_entry=catalog_entry)
+        result.append(obj)
+    return result
+
+
+def _store_snapshot(key, stamp, items, intids):
+    records = []
+    for item in items:
+        obj = removeAllProxies(item)
+        doc_id = intids.queryId(obj)
+        if doc_id is None:
+            # not everything is registered; do not cache
+            return
+        # items are rebuilt as they were returned: proxied or not
+        records.append((doc_id,
+                        isProxy(item, AssessmentItemProxy),
+                        getattr(item, 'ContentUnitNTIID', None),
+                        getattr(item, 'CatalogEntryNTIID', None)))
+    _ASSIGNMENT_SNAPSHOTS.set(key, (stamp, tuple(records)))
+
+
+def _snapshot(func):
+    """
+    Cache the result of the decorated assignment getter as a tuple of
+    intids per course, validated by the course assignment generation.
+    The (cheap) proxies are rebuilt from the snapshot on each call.
+    """
+    def wrapper(context, *args):
+        course, key = _snapshot_key(context, func.__name__, *args)
+        if key is None:
+            return func(context, *args)
+        if _pending_package_bumps():
+            # evaluations of packages changed in this transaction
+            return func(context, *args)
+        stamp, clean = get_course_assignment_generation(course)
+        intids = component.getUtility(IIntIds)
+        result = _load_snapshot(key, stamp, intids)
+        if result is None:
+            result = func(context, *args)
+            if clean:
+                _store_snapshot(key, stamp, result, intids)
+        return result
+    return wrapper
+
+
+def _compute_all_course_assignments(context):
     seen = set()
     results = []
     package_items = get_course_assessment_items(context)
     # For API created assignments, get from parent if we're a subinstance.
-    course_items = get_course_assignments(context, sort=False,
-                                          do_filtering=False,
-                                          parent_course=True)
+    course_items = _get_course_assignments(context, False, False, False,
+                                           True, False)
     for item in itertools.chain(package_items, course_items):
         if not IQAssignment.providedBy(item) or item.ntiid in seen:
             continue
         seen.add(item.ntiid)
         results.append(item)
     return results
+_get_all_course_assignments = _snapshot(_compute_all_course_assignments)
 
 
-def get_course_assignments(context, sort=True, reverse=False, do_filtering=True,
-                           parent_course=False, require_published=False):
+def get_all_course_assignments(context):
+    """
+    Get all non-filtered course assignments for the given context, proxied
+    with their content unit or catalog entry. This is a relatively expensive
+    call, because we fetch assignments in content packages (necessary for
+    new content backed assignments) and then look for all API-created
+    assignments to merge with. The result is cached per course until the
+    course assignments change.
+    """
+    return _get_all_course_assignments(context)
+
+
+def _compute_course_assignments(context, sort, reverse, do_filtering,
+                            parent_course, require_published):
     items = get_course_evaluations(context,
                                    mimetypes=ALL_ASSIGNMENT_MIME_TYPES,
                                    parent_course=parent_course)
@@ -382,6 +715,15 @@ def get_course_assignments(context, sort=True, reverse=False, do_filtering=True,
                              cmp=assignment_comparator,
                              reverse=reverse)
     return assignments
+_get_course_assignments = _snapshot(_compute_course_assignments)
+
+
+def get_course_assignments(context, sort=True, reverse=False, do_filtering=True,
+                           parent_course=False, require_published=False):
+    # Publication may depend on the current time, so those are not cached
+    getter = _compute_course_assignments if require_published else _get_course_assignments
+    return getter(context, bool(sort), bool(reverse), bool(do_filtering),
+                  bool(parent_course), bool(require_published))
 
 
 def get_course_self_assessments(context, exclude_editable=True):
@@ -445,20 +787,101 @@ def get_containers_for_evaluation_object(context, sites=None, include_question_s
 
     sites = get_component_hierarchy_names() if not sites else sites
     sites = sites.split() if isinstance(sites, six.string_types) else sites
+    catalog = get_evaluation_catalog()
+    graph = get_containment_graph(catalog)
+    if graph is not None:
+        doc_ids = _graph_container_ids(catalog, graph, ntiid,
+                                       sites, mime_types)
+    else:
+        query = {
+            IX_SITE: {'any_of': sites},
+            IX_CONTAINMENT: {'any_of': contained},
+            IX_ASSESS_MIMETYPE: {'any_of': mime_types}
+        }
+        doc_ids = catalog.apply(query)
+    # extra interface check
+    return tuple(resolve_intids(doc_ids, IQEvaluation))
+
+
+def get_containers_for_evaluation_objects(contexts, sites=None,
+                                          include_question_sets=False):
+    """
+    The batch version of :func:`get_containers_for_evaluation_object`,
+    using a single catalog query. Returns a map of the ntiids of the given
+    evaluation objects (or ntiids) to a tuple of their containers.
+    """
+    result = {}
+    ntiids = set()
+    for context in contexts or ():
+        if IQAssignment.providedBy(context):
+            result[context.ntiid] = (context,)
+        else:
+            ntiid = context if isinstance(context, six.string_types) \
+                    else context.ntiid
+            ntiids.add(ntiid)
+            result[ntiid] = ()
+    if not ntiids:
+        return result
+
+    mime_types = list(ALL_ASSIGNMENT_MIME_TYPES)
+    mime_types.append(SURVEY_MIME_TYPE)
+    if include_question_sets:
+        mime_types.extend((QUESTION_SET_MIME_TYPE, QUESTION_BANK_MIME_TYPE))
+
+    sites = get_component_hierarchy_names() if not sites else sites
+    sites = sites.split() if isinstance(sites, six.string_types) else sites
+    catalog = get_evaluation_catalog()
+    intids = component.getUtility(IIntIds)
+    graph = get_containment_graph(catalog)
+    if graph is not None:
+        for ntiid in ntiids:
+            doc_ids = _graph_container_ids(catalog, graph, ntiid,
+                                           sites, mime_types)
+            result[ntiid] = tuple(resolve_intids(doc_ids, IQEvaluation, intids))
+        return result
+
     query = {
         IX_SITE: {'any_of': sites},
-        IX_CONTAINMENT: {'any_of': contained},
+        IX_CONTAINMENT: {'any_of': ntiids},
         IX_ASSESS_MIMETYPE: {'any_of': mime_types}
     }
+    containment = catalog.containment_index.documents_to_values
+    doc_ids = catalog.apply(query)
+    containers = resolve_intids(doc_ids, IQEvaluation, intids)
+    for container in containers:
+        doc_id = intids.queryId(container)
+        for ntiid in ntiids.intersection(containment.get(doc_id) or ()):
+            result[ntiid] += (container,)
+    return result
 
-    result = []
+
+def get_containers_with_evaluations(ntiids, sites=None, mimetypes=None):
+    """
+    Return the subset of the given container (e.g. content unit) ntiids
+    that contain evaluations, using a single catalog query.
+    """
+    ntiids = set(ntiids or ())
+    if not ntiids:
+        return set()
+    sites = get_component_hierarchy_names() if not sites else sites
+    sites = sites.split() if isinstance(sites, six.string_types) else sites
+    query = {
+        IX_SITE: {'any_of': sites},
+        IX_CONTAINERS: {'any_of': ntiids},
+    }
+    if isinstance(mimetypes, six.string_types):
+        mimetypes = mimetypes.split()
+    if mimetypes:
+        query[IX_ASSESS_MIMETYPE] = {'any_of': mimetypes}
+
+    result = set()
     catalog = get_evaluation_catalog()
-    intids = component.getUtility(IIntIds)
-    for uid in catalog.apply(query) or ():
-        evaluation = intids.queryObject(uid)
-        if IQEvaluation.providedBy(evaluation):  # extra check
-            result.append(evaluation)
-    return tuple(result)
+    containers = catalog.containers_index.documents_to_values
+    for doc_id in catalog.apply(query) or ():
+        result.update(ntiids.intersection(containers.get(doc_id) or ()))
+        if len(result) == len(ntiids):
+            break
+    return result
 
 
 def get_available_assignments_for_evaluation_object(context):
@@ -590,3 +1013,12 @@ def is_global_evaluation(evaluation):
     library = find_interface(evaluation, IContentPackageLibrary, strict=False)
     return IGlobalContentPackage.providedBy(package) \
         or IGlobalContentPackageLibrary.providedBy(library)
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_ASSIGNMENT_SNAPSHOTS.clear)
+    addCleanUp(_UNIT_ASSESSMENT_INDEXES.clear)
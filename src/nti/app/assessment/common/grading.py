@@ -8,35 +8,272 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+from collections import OrderedDict
+
+from zope import component
+
+from zope.component.hooks import site as current_site
+
 from zope.event import notify
 
+from zope.intid.interfaces import IIntIds
+
+from transaction.interfaces import TransientError
+
+from nti.app.assessment.common.assessed import get_assessed_score
 from nti.app.assessment.common.assessed import reassess_assignment_history_item
 
 from nti.app.assessment.common.policy import get_policy_submission_priority
 
+from nti.app.assessment.common.resultsets import resolve_intids
+
 from nti.app.assessment.common.submissions import evaluation_submissions
+from nti.app.assessment.common.submissions import count_evaluation_submissions
 
+from nti.app.assessment.interfaces import ICourseRegradeJobs
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItem
 
 from nti.app.assessment.interfaces import ObjectRegradeEvent
 
+from nti.app.assessment.regrade import REGRADE_FAILED
+from nti.app.assessment.regrade import REGRADE_PENDING
+from nti.app.assessment.regrade import REGRADE_RUNNING
+from nti.app.assessment.regrade import REGRADE_SUCCESS
+
+from nti.app.assessment.regrade import get_regrade_job
+
+from nti.metadata import METADATA_QUEUE_NAME
+
+from nti.metadata.processing import put_metadata_job
+
+from nti.ntiids.ntiids import find_object_with_ntiid
+
+from nti.site.interfaces import IHostPolicyFolder
+
+from nti.traversal.traversal import find_interface
+
+#: The number of submissions regraded per committed batch of a job
+REGRADE_BATCH_SIZE = 200
+
 logger = __import__('logging').getLogger(__name__)
 
 
+def _get_username(item):
+    creator = item.creator
+    return getattr(creator, 'username', creator)
+
+
+def _get_key(item):
+    return (_get_username(item), item.Submission.assignmentId)
+
+
+def get_user_submissions(context, course):
+    """
+    Return an ordered mapping of (username, assignmentId) keys to the
+    assignment history items of the evaluation in the course, sorted in
+    order of submission. A question may be used by several assignments,
+    each graded on its own.
+    """
+    result = OrderedDict()
+    for item in evaluation_submissions(context, course):
+        if IUsersCourseAssignmentHistoryItem.providedBy(item):
+            result.setdefault(_get_key(item), []).append(item)
+    result = OrderedDict(sorted(result.items()))
+    for items in result.values():
+        items.sort(key=lambda x: x.createdTime)
+    return result
+
+
+def get_graded_submission(items, priority):
+    """
+    Return the item, among the regraded history items of a user for an
+    assignment sorted in order of submission, whose grade is stored under the given submission
+    priority policy: the most recent or the highest graded one.
+    """
+    if priority == 'most_recent':
+        return items[-1]
+    # ties go to the most recent item
+    return max(reversed(items), key=get_assessed_score)
+
+
+def regrade_user_submissions(items, priority='most_recent'):
+    """
+    Regrade the history items of a single user for an assignment, in
+    order of submission. The grade is recomputed once, from the item
+    selected by the submission priority policy, rather than per item.
+    """
+    for item in items:
+        logger.info('Regrading (%s) (user=%s)',
+                    item.Submission.assignmentId, item.creator)
+        reassess_assignment_history_item(item)
+    if items:
+        # Now broadcast we need a new grade
+        notify(ObjectRegradeEvent(get_graded_submission(items, priority)))
+    return items
+
+
+def _get_priority(assignmentId, course, cache):
+    try:
+        result = cache[assignmentId]
+    except KeyError:
+        result = cache[assignmentId] = \
+            get_policy_submission_priority(assignmentId, course)
+    return result
+
+
 def regrade_evaluation(context, course):
     result = []
-    submissions = evaluation_submissions(context, course)
-    # For multiple submissions, we want to make sure we re-grade in the order
-    # of submission so that we store the grade appropriately (most_recent vs
-    # highest_grade).
-    if get_policy_submission_priority(context, course) == 'most_recent':
-        submissions = sorted(submissions, key=lambda x: x.createdTime)
-    for item in submissions:
-        if IUsersCourseAssignmentHistoryItem.providedBy(item):
-            logger.info('Regrading (%s) (user=%s)',
-                        item.Submission.assignmentId, item.creator)
-            result.append(item)
-            reassess_assignment_history_item(item)
-            # Now broadcast we need a new grade
-            notify(ObjectRegradeEvent(item))
+    priorities = {}
+    # We regrade in the order of submission and grade the item selected by
+    # the policy of each assignment so that we store the grade
+    # appropriately (most_recent vs highest_grade).
+    for key, items in get_user_submissions(context, course).items():
+        priority = _get_priority(key[1], course, priorities)
+        result.extend(regrade_user_submissions(items, priority))
     return result
+
+
+def _set_regrade_cursor(context, course, job, intids):
+    entries = []
+    total = job.done
+    for key, items in get_user_submissions(context, course).items():
+        if not job.is_done(key):
+            entries.append((key, [intids.getId(x) for x in items]))
+            total += len(items)
+    job.set_cursor(entries)
+    job.total = total
+
+
+def process_regrade_batch(context, course, job, batch_size=REGRADE_BATCH_SIZE):
+    """
+    Regrade the submissions of the users and assignments not yet done by
+    the job, until at least ``batch_size`` submissions have been regraded.
+
+    The (username, assignmentId) keys and the intids of their history
+    items are stored in the job by its first batch; later batches only
+    load their own submissions.
+
+    :return: Whether submissions remain to be regraded
+    """
+    count = 0
+    priorities = {}
+    intids = component.getUtility(IIntIds)
+    if not job.has_cursor:
+        _set_regrade_cursor(context, course, job, intids)
+    job.state = REGRADE_RUNNING
+    job.updateLastMod()  # heartbeat
+    for position, (key, doc_ids) in job.iter_cursor():
+        if count >= batch_size:
+            return True
+        items = list(resolve_intids(doc_ids,
+                                    IUsersCourseAssignmentHistoryItem,
+                                    intids))
+        priority = _get_priority(key[1], course, priorities)
+        regrade_user_submissions(items, priority)
+        job.mark_done(key, len(items))
+        job.advance(position)
+        count += len(doc_ids)
+    job.state = REGRADE_SUCCESS
+    return False
+
+
+def _queue_regrade_batch(context, course, job):
+    intids = component.getUtility(IIntIds)
+    course_id = intids.getId(course)
+    job_id = "%s_%s_regrade_%s_%s" % (course_id, context.ntiid,
+                                      job.createdTime, job.done)
+    return put_metadata_job(METADATA_QUEUE_NAME,
+                            _run_regrade_batch,
+                            job_id=job_id,
+                            course_id=course_id,
+                            ntiid=context.ntiid,
+                            created=job.createdTime)
+
+
+def _run_regrade_batch(course_id, ntiid, created=None):
+    intids = component.getUtility(IIntIds)
+    course = intids.queryObject(course_id)
+    job = get_regrade_job(course, ntiid) if course is not None else None
+    if job is None or job.is_finished():
+        return
+    if created is not None and job.createdTime != created:
+        # the job was replaced, e.g. restarted after it stalled
+        return
+    site = find_interface(course, IHostPolicyFolder, strict=False)
+    if site is not None:
+        with current_site(site):
+            _do_run_regrade_batch(course, job, ntiid)
+    else:
+        _do_run_regrade_batch(course, job, ntiid)
+
+
+def _do_run_regrade_batch(course, job, ntiid):
+    context = find_object_with_ntiid(ntiid)
+    if context is None:
+        job.state = REGRADE_FAILED
+        job.error = u'Evaluation not found'
+        return
+    try:
+        if process_regrade_batch(context, course, job):
+            _queue_regrade_batch(context, course, job)
+        elif job.rerun:
+            # the policies changed while we were running
+            schedule_regrade(context, course)
+    except TransientError:
+        # e.g. conflicts; let the queue retry the batch
+        raise
+    except Exception as e:  # pylint: disable=broad-except
+        logger.exception("Cannot regrade %s", ntiid)
+        job.state = REGRADE_FAILED
+        job.error = getattr(e, 'message', None) or repr(e)
+
+
+def start_regrade_job(context, course, restart=False):
+    """
+    Start a job regrading the evaluation in committed batches and return
+    it. A job in progress is returned as is, unless it is stale or
+    ``restart`` is given; a failed one is resumed, skipping the
+    submissions already regraded. Submissions are collected by the job's
+    first batch, not in the request.
+    """
+    jobs = ICourseRegradeJobs(course)
+    job = jobs.get(context.ntiid)
+    if job is not None and (restart or job.is_stale()):
+        logger.warning("Restarting regrade of %s (state=%s)",
+                       context.ntiid, job.state)
+        job = None
+    if job is not None and job.state == REGRADE_FAILED:
+        job.error = None
+        job.state = REGRADE_RUNNING
+        _queue_regrade_batch(context, course, job)
+    elif job is None or job.state == REGRADE_SUCCESS:
+        # an estimate from the catalog until the first batch runs
+        total = count_evaluation_submissions(context, course)
+        job = jobs.create(context.ntiid, total)
+        _queue_regrade_batch(context, course, job)
+    return job
+
+
+def schedule_regrade(context, course):
+    """
+    Queue a regrade of the evaluation in the course, coalescing it with a
+    regrade that is already scheduled. A pending job has not read the
+    policies yet, so it absorbs further changes; a running job is marked
+    to be run again from the start once it is done. A stale job is dead
+    and is replaced instead.
+    """
+    jobs = ICourseRegradeJobs(course)
+    job = jobs.get(context.ntiid)
+    if job is not None and job.is_stale():
+        logger.warning("Replacing stale regrade of %s (state=%s)",
+                       context.ntiid, job.state)
+        job = None
+    if job is not None and job.state == REGRADE_PENDING:
+        logger.info("Regrade of %s already scheduled", context.ntiid)
+    elif job is not None and job.state == REGRADE_RUNNING:
+        job.rerun = True
+    else:
+        # submissions are counted when the job starts
+        job = jobs.create(context.ntiid, 0)
+        _queue_regrade_batch(context, course, job)
+    return job
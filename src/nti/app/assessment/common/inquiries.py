@@ -14,7 +14,7 @@ from datetime import datetime
 
 from zope import component
 
-from zope.intid.interfaces import IIntIds
+from zope.annotation.interfaces import IAnnotations
 
 from zope.schema.interfaces import RequiredMissing
 
@@ -26,13 +26,16 @@ from nti.app.assessment.common.evaluations import get_evaluation_courses
 
 from nti.app.assessment.common.policy import get_policy_for_assessment
 
+from nti.app.assessment.common.resultsets import resolve_intids
+
 from nti.app.assessment.common.submissions import inquiry_submissions
 
 from nti.app.assessment.common.utils import get_evaluation_catalog_entry
 from nti.app.assessment.common.utils import get_available_for_submission_ending
 
-from nti.app.assessment.interfaces import IUsersCourseInquiryItem
 from nti.app.assessment.interfaces import IUsersCourseInquiry
+from nti.app.assessment.interfaces import IUsersCourseInquiryItem
+from nti.app.assessment.interfaces import ICourseRunningAggregatedInquiries
 
 from nti.assessment.interfaces import DISCLOSURE_NEVER
 from nti.assessment.interfaces import DISCLOSURE_ALWAYS
@@ -50,7 +53,10 @@ from nti.dataserver.metadata.index import IX_CONTAINERID
 
 from nti.dataserver.metadata.index import get_metadata_catalog
 
-from nti.zope_catalog.catalog import ResultSet
+from nti.externalization.externalization import to_external_object
+
+#: Course annotation key of the running inquiry aggregates
+RUNNING_AGGREGATED_INQUIRIES_KEY = u'RunningAggregatedInquiries'
 
 logger = __import__('logging').getLogger(__name__)
 
@@ -122,32 +128,157 @@ def _has_inquiry_submission(course, user, inquiry):
     return inquiry.ntiid in course_inquiry
 
 
-def aggregate_course_inquiry(inquiry, course, *items):
-    result = None
+def _running_key(item):
+    creator = item.creator
+    return getattr(creator, 'username', creator)
+
+
+def _iter_course_inquiry_items(inquiry, course, items=(), excluded=None):
+    seen = set()
+    if excluded is not None:
+        seen.add(id(excluded))
     submissions = inquiry_submissions(inquiry, course)
-    items = itertools.chain(submissions, items)
-    for item in items:
+    for item in itertools.chain(submissions, items):
         if not IUsersCourseInquiryItem.providedBy(item):  # always check
             continue
+        if id(item) in seen:  # extra items may already be indexed
+            continue
+        seen.add(id(item))
+        yield item
+
+
+def _running_entries(inquiry, course, items=(), excluded=None):
+    """
+    Return the (key, aggregated) running entries of all the submissions
+    of the inquiry in the course.
+    """
+    return [(_running_key(item), IQAggregatedInquiry(item.Submission))
+            for item in _iter_course_inquiry_items(inquiry, course,
+                                                   items, excluded)]
+
+
+def _fold_course_inquiry(inquiry, course, *items):
+    """
+    Fold all the submissions of the inquiry in the course.
+
+    :return: A tuple with the aggregated inquiry and the submission count
+    """
+    count = 0
+    result = None
+    for item in _iter_course_inquiry_items(inquiry, course, items):
         submission = item.Submission
         aggregated = IQAggregatedInquiry(submission)
         if result is None:
             result = aggregated
         else:
             result += aggregated
+        count += 1
+    return result, count
+
+
+def aggregate_course_inquiry(inquiry, course, *items):
+    return _fold_course_inquiry(inquiry, course, *items)[0]
+
+
+def query_running_inquiry_aggregates(course):
+    """
+    Return the running aggregates of the course, or ``None`` if none has
+    been built yet. Unlike the adapter, this never creates them.
+    """
+    annotations = IAnnotations(course, None)
+    if annotations is None:
+        return None
+    return annotations.get(RUNNING_AGGREGATED_INQUIRIES_KEY)
+
+
+def get_running_inquiry_aggregate(inquiry, course, *items):
+    """
+    Return the running aggregate for the inquiry in the course. Reads never
+    write: a missing aggregate is computed on the fly with a full fold and
+    built when the next submission is recorded.
+    """
+    running = query_running_inquiry_aggregates(course)
+    result = running.get(inquiry.ntiid) if running is not None else None
+    if result is None:
+        result = _fold_course_inquiry(inquiry, course, *items)[0]
+    return result
+
+
+def fold_running_inquiry_aggregate(inquiry, course, item):
+    """
+    Fold the given (recorded) inquiry item into the running aggregate for
+    the inquiry in the course, building it with a full fold if missing.
+    """
+    running = ICourseRunningAggregatedInquiries(course)
+    aggregated = IQAggregatedInquiry(item.Submission)
+    if not running.fold(inquiry.ntiid, _running_key(item), aggregated):
+        running.store(inquiry.ntiid,
+                      _running_entries(inquiry, course, (item,)))
+
+
+def unfold_running_inquiry_aggregate(inquiry, course, item):
+    """
+    Remove the given (removed) inquiry item from the running aggregate for
+    the inquiry in the course, keeping the aggregate valid. It is rebuilt
+    without the item if its submission can no longer be subtracted.
+    """
+    running = query_running_inquiry_aggregates(course)
+    if running is not None and inquiry.ntiid in running \
+        and not running.remove(inquiry.ntiid, _running_key(item)):
+        running.store(inquiry.ntiid,
+                      _running_entries(inquiry, course, excluded=item))
+
+
+def _comparable_aggregate(aggregated):
+    result = to_external_object(aggregated, decorate=False)
+    for key in ('Last Modified', 'CreatedTime', 'OID', 'NTIID', 'href'):
+        result.pop(key, None)
+    return result
+
+
+def check_running_inquiry_aggregate(inquiry, course, rebuild=False):
+    """
+    Compare the running aggregate of the inquiry against a full fold of
+    its submissions.
+
+    :param rebuild: Replace the running aggregate if it is inconsistent
+    :return: A dictionary describing the check
+    """
+    running = query_running_inquiry_aggregates(course)
+    current = running.get(inquiry.ntiid) if running is not None else None
+    expected, count = _fold_course_inquiry(inquiry, course)
+    if current is None:
+        # nothing built yet; it is always consistent
+        consistent = True
+    else:
+        consistent = expected is not None \
+                 and running.count(inquiry.ntiid) == count \
+                 and _comparable_aggregate(current) == _comparable_aggregate(expected)
+    result = {
+        'Consistent': consistent,
+        'Count': running.count(inquiry.ntiid) if current is not None else None,
+        'Expected': count,
+        'Rebuilt': False,
+    }
+    if not consistent and rebuild:
+        if expected is None:
+            running.invalidate(inquiry.ntiid)
+        else:
+            running.store(inquiry.ntiid,
+                          _running_entries(inquiry, course))
+        result['Rebuilt'] = True
     return result
 
 
 def aggregate_page_inquiry(containerId, mimeType, *items):
     catalog = get_metadata_catalog()
-    intids = component.getUtility(IIntIds)
     query = {
         IX_MIMETYPE: {'any_of': (mimeType,)},
         IX_CONTAINERID: {'any_of': (containerId,)}
     }
     result = None
     uids = catalog.apply(query) or ()
-    items = itertools.chain(ResultSet(uids, intids, True), items)
+    items = itertools.chain(resolve_intids(uids, IQInquirySubmission), items)
     for item in items:
         if not IQInquirySubmission.providedBy(item):  # always check
             continue
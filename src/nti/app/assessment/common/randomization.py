@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memoized randomization permutations.
+
+A randomized object is shuffled by a generator seeded with the seed of the
+metadata attempt (or the user intid); the order it produces depends only on
+that seed and the number of shuffled items. The permutations are computed
+once and shared by the decorators and the report unshuffling.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import random
+
+from zope import component
+
+from nti.app.assessment.common.caching import LRUCache
+
+from nti.assessment.randomized.interfaces import IPrincipalSeedSelector
+
+#: The name of the request scoped randomization predicate cache
+RANDOMIZATION_REQUEST_CACHE = 'randomization'
+
+#: Process wide permutations, keyed by seed and size
+_PERMUTATIONS = LRUCache(size=10000)
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def get_randomization_seed(user=None):
+    """
+    Return the randomization seed of the given (or remote) user, i.e.
+    the seed of the metadata attempt of the request, if any.
+    """
+    selector = component.queryUtility(IPrincipalSeedSelector)
+    return selector(user) if selector is not None else None
+
+
+def get_permutation(seed, size):
+    """
+    Return the order in which a generator seeded with ``seed`` shuffles a
+    list of ``size`` items, as a tuple of the original indexes.
+    """
+    key = (seed, size)
+    result = _PERMUTATIONS.get(key)
+    if result is None:
+        indexes = list(range(size))
+        random.Random(seed).shuffle(indexes)
+        result = tuple(indexes)
+        _PERMUTATIONS.set(key, result)
+    return result
+
+
+class PermutationGenerator(object):
+    """
+    A stand-in for the random generator of a seed that shuffles lists with
+    the memoized permutations, as a new generator would on its first
+    shuffle. It can be given to the ``shuffle_*`` functions.
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def shuffle(self, target):
+        permutation = get_permutation(self.seed, len(target))
+        target[:] = [target[idx] for idx in permutation]
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_PERMUTATIONS.clear)
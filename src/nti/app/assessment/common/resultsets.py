@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Resolution of catalog result sets.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from itertools import islice
+
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+
+#: The number of intids resolved and prefetched at a time
+BATCH_SIZE = 100
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _is_ghost(obj):
+    return getattr(obj, '_p_changed', False) is None
+
+
+def prefetch(objects):
+    """
+    Ask the storages of the given ghosts to load their state in bulk, when
+    they support it (e.g. ZEO and RelStorage), instead of one round-trip
+    per object on activation.
+    """
+    jars = {}
+    for obj in objects:
+        if _is_ghost(obj):
+            jar = obj._p_jar
+            if jar is not None:
+                jars.setdefault(id(jar), (jar, []))[1].append(obj._p_oid)
+    for jar, oids in jars.values():
+        method = getattr(jar, 'prefetch', None)
+        if method is None:
+            continue
+        try:
+            method(oids)
+        except Exception:  # pylint: disable=broad-except
+            # only an optimization
+            logger.debug("Cannot prefetch %s object(s)", len(oids),
+                         exc_info=True)
+
+
+def _filter(objects, provided):
+    """
+    Return the given objects providing the given interface, checking the
+    classes first so that ghosts are not activated when possible.
+    """
+    by_class = [provided.implementedBy(type(x)) for x in objects]
+    # the others are activated by the check, so load them together
+    prefetch([x for x, known in zip(objects, by_class) if not known])
+    return [x for x, known in zip(objects, by_class)
+            if known or provided.providedBy(x)]
+
+
+def resolve_intids(doc_ids, provided=None, intids=None, batch_size=BATCH_SIZE):
+    """
+    Generate the objects of the given intids in order, skipping the ones
+    that no longer exist and, if ``provided`` is given, the ones that do
+    not provide that interface.
+
+    The intids are resolved ``batch_size`` at a time and the state of the
+    objects of each batch is prefetched from the storage in bulk.
+    """
+    intids = component.getUtility(IIntIds) if intids is None else intids
+    doc_ids = iter(doc_ids or ())
+    while True:
+        batch = list(islice(doc_ids, batch_size))
+        if not batch:
+            break
+        objects = [intids.queryObject(x) for x in batch]
+        objects = [x for x in objects if x is not None]
+        if provided is not None:
+            objects = _filter(objects, provided)
+        prefetch(objects)
+        for obj in objects:
+            yield obj
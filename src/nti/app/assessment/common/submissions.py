@@ -20,12 +20,17 @@ from zope.intid.interfaces import IIntIds
 
 from nti.app.assessment import MessageFactory as _
 
+from nti.app.assessment.common.caching import LRUCache
+from nti.app.assessment.common.caching import get_request_cache
+
 from nti.app.assessment.common.evaluations import get_containers_for_evaluation_object
 
 from nti.app.assessment.common.hostpolicy import get_resource_site_name
 
 from nti.app.assessment.common.policy import get_policy_full_submission
 
+from nti.app.assessment.common.resultsets import resolve_intids
+
 from nti.app.assessment.common.utils import get_user
 from nti.app.assessment.common.utils import get_courses
 from nti.app.assessment.common.utils import to_course_list
@@ -33,14 +38,19 @@ from nti.app.assessment.common.utils import get_entry_ntiids
 
 from nti.app.assessment.index import IX_SITE
 from nti.app.assessment.index import IX_COURSE
+from nti.app.assessment.index import IX_CREATOR
 from nti.app.assessment.index import IX_SUBMITTED
 from nti.app.assessment.index import IX_ASSESSMENT_ID
 
+from nti.app.assessment.index import get_feedback_catalog
 from nti.app.assessment.index import get_submission_catalog
+from nti.app.assessment.index import get_submission_generation
+from nti.app.assessment.index import SUBMISSION_REQUEST_CACHE
 
 from nti.app.assessment.interfaces import IUsersCourseInquiry
 from nti.app.assessment.interfaces import IUsersCourseSubmissionItem
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistory
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemFeedback
 
 from nti.app.externalization.error import raise_json_error
 
@@ -50,6 +60,10 @@ from nti.contenttypes.courses.interfaces import ICourseInstance
 
 from nti.traversal.traversal import find_interface
 
+#: The process wide submission query cache; entries are validated
+#: against the generations of the courses in the query
+_SUBMISSION_CACHE = LRUCache(size=5000)
+
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -85,13 +99,18 @@ def get_all_submissions(context, sites=(), index_name=IX_ASSESSMENT_ID):
         sites = sites.split()
     if sites:
         query[IX_SITE] = {'any_of': sites}
-    # execute query
-    catalog = get_submission_catalog()
-    intids = component.getUtility(IIntIds)
-    for doc_id in catalog.apply(query) or ():
-        obj = intids.queryObject(doc_id)
-        if IUsersCourseSubmissionItem.providedBy(obj):
-            yield obj
+    # execute query; we cannot tell which courses are involved, so only
+    # cache within this request
+    key = ('all', index_name, ntiid, tuple(sorted(sites or ())))
+    cache = get_request_cache(SUBMISSION_REQUEST_CACHE)
+    doc_ids = cache.get(key) if cache is not None else None
+    if doc_ids is None:
+        catalog = get_submission_catalog()
+        doc_ids = tuple(catalog.apply(query) or ())
+        if cache is not None:
+            cache[key] = doc_ids
+    for obj in resolve_intids(doc_ids, IUsersCourseSubmissionItem):
+        yield obj
 
 
 def get_all_submissions_courses(context, sites=(), index_name=IX_ASSESSMENT_ID):
@@ -105,7 +124,10 @@ def get_all_submissions_courses(context, sites=(), index_name=IX_ASSESSMENT_ID):
 
 def get_submission_intids_for_courses(context, courses=(), index_name=IX_ASSESSMENT_ID):
     """
-    Return all submissions intids for the given evaluation object and courses
+    Return all submissions intids for the given evaluation object and courses.
+
+    Results are cached for the request and across requests; the latter are
+    validated against the submission generation of the courses.
     """
     courses = to_course_list(courses)
     if not courses:
@@ -117,7 +139,6 @@ def get_submission_intids_for_courses(context, courses=(), index_name=IX_ASSESSM
         context_ntiids = [x.ntiid for x in assignments] if assignments else []
         context_ntiid = getattr(context, 'ntiid', context)
         context_ntiids.append(context_ntiid)
-        catalog = get_submission_catalog()
         entry_ntiids = get_entry_ntiids(courses)
 
         query = {
@@ -130,7 +151,30 @@ def get_submission_intids_for_courses(context, courses=(), index_name=IX_ASSESSM
         sites.discard(None)  # tests
         if sites:
             query[IX_SITE] = {'any_of': sites}
-        return catalog.apply(query)
+
+        key = (index_name,
+               tuple(sorted(set(context_ntiids))),
+               tuple(sorted(entry_ntiids)),
+               tuple(sorted(sites)))
+        # request cache is dropped when a generation is bumped
+        cache = get_request_cache(SUBMISSION_REQUEST_CACHE)
+        result = cache.get(key) if cache is not None else None
+        if result is not None:
+            return result
+
+        stamp, shareable = get_submission_generation(courses)
+        cached = _SUBMISSION_CACHE.get(key)
+        if cached is not None and cached[0] == stamp:
+            result = cached[1]
+        else:
+            catalog = get_submission_catalog()
+            result = tuple(catalog.apply(query) or ())
+            # Never share results that may include uncommitted changes
+            if shareable:
+                _SUBMISSION_CACHE.set(key, (stamp, result))
+        if cache is not None:
+            cache[key] = result
+        return result
 
 
 def get_submissions(*args, **kwargs):
@@ -139,9 +183,7 @@ def get_submissions(*args, **kwargs):
     """
     result = get_submission_intids_for_courses(*args, **kwargs)
     if result is not None:
-        intids = component.getUtility(IIntIds)
-        result = (intids.queryObject(x) for x in result)
-        result = [x for x in result if IUsersCourseSubmissionItem.providedBy(x)]
+        result = list(resolve_intids(result, IUsersCourseSubmissionItem))
     return result
 
 
@@ -179,6 +221,18 @@ def evaluation_submissions(context, course, subinstances=True):
     return result
 
 
+def count_evaluation_submissions(context, course, subinstances=True):
+    """
+    Return the number of submissions of the evaluation in the course,
+    counted from the catalog without loading them.
+    """
+    course = ICourseInstance(course, None)
+    result = get_submission_intids_for_courses(context,
+                                               index_name=IX_SUBMITTED,
+                                               courses=get_courses(course, subinstances=subinstances))
+    return len(result)
+
+
 def inquiry_submissions(context, course, subinstances=True):
     course = ICourseInstance(course, None)
     result = get_submissions(context,
@@ -234,4 +288,34 @@ def check_full_submission(submission, evaluation, course):
                                      {
                                          'message': _(u'Must answer all questions.'),
                                      },
-                                     None)
\ No newline at end of file
+                                     None)
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_SUBMISSION_CACHE.clear)
+
+
+def get_feedback_by_creator(username, courses=(), sites=()):
+    """
+    Return all the assignment feedback written by the given user, optionally
+    restricted to the given courses and sites, with a single index query.
+    """
+    username = getattr(username, 'username', username)
+    query = {
+        IX_CREATOR: {'any_of': (username.lower(),)}
+    }
+    courses = to_course_list(courses)
+    if courses:
+        query[IX_COURSE] = {'any_of': get_entry_ntiids(courses)}
+    if isinstance(sites, six.string_types):
+        sites = sites.split()
+    if sites:
+        query[IX_SITE] = {'any_of': sites}
+    catalog = get_feedback_catalog()
+    doc_ids = catalog.apply(query) if catalog is not None else ()
+    return list(resolve_intids(doc_ids,
+                               IUsersCourseAssignmentHistoryItemFeedback))
@@ -166,8 +166,11 @@ def is_published(context):
 
 
 def get_available_for_submission_beginning(assesment, context=None):
-    course = ICourseInstance(context, None)
-    dates = IQAssessmentDateContext(course, None)
+    if IQAssessmentDateContext.providedBy(context):
+        dates = context
+    else:
+        course = ICourseInstance(context, None)
+        dates = IQAssessmentDateContext(course, None)
     if dates is not None:
         # pylint: disable=too-many-function-args
         result = dates.of(assesment).available_for_submission_beginning
@@ -177,8 +180,11 @@ def get_available_for_submission_beginning(assesment, context=None):
 
 
 def get_available_for_submission_ending(assesment, context=None):
-    course = ICourseInstance(context, None)
-    dates = IQAssessmentDateContext(course, None)
+    if IQAssessmentDateContext.providedBy(context):
+        dates = context
+    else:
+        course = ICourseInstance(context, None)
+        dates = IQAssessmentDateContext(course, None)
     if dates is not None:
         # pylint: disable=too-many-function-args
         result = dates.of(assesment).available_for_submission_ending
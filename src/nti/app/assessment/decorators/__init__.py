@@ -18,6 +18,8 @@ from zope.location.interfaces import ILocationInfo
 
 from nti.app.assessment.common.evaluations import get_course_from_evaluation
 
+from nti.app.assessment.decorators.batching import get_batch_decoration_context
+
 from nti.app.assessment.interfaces import ACT_VIEW_SOLUTIONS
 
 from nti.app.assessment.utils import get_course_from_request
@@ -81,7 +83,11 @@ class AbstractAssessmentDecoratorPredicate(PreviewCourseAccessPredicateDecorator
 
 
 def _get_course_from_evaluation(evaluation, user=None, catalog=None, request=None):
-    result = get_course_from_request(request)
+    batch = get_batch_decoration_context(request)
+    if batch is not None:
+        result = batch.request_course()
+    else:
+        result = get_course_from_request(request)
     if result is None:
         result = get_course_from_evaluation(evaluation=evaluation,
                                             user=user,
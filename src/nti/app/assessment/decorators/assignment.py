@@ -28,6 +28,7 @@ from nti.app.assessment import VIEW_UNRANDOMIZE
 from nti.app.assessment import VIEW_INSERT_PART
 from nti.app.assessment import VIEW_REMOVE_PART
 from nti.app.assessment import VIEW_RESOLVE_TOPIC
+from nti.app.assessment import VIEW_REGRADE_STATUS
 from nti.app.assessment import VIEW_IS_NON_PUBLIC
 from nti.app.assessment import VIEW_ASSESSMENT_MOVE
 from nti.app.assessment import VIEW_RANDOMIZE_PARTS
@@ -72,9 +73,13 @@ from nti.app.assessment.decorators import InstructedCourseDecoratorMixin
 from nti.app.assessment.decorators import decorate_assessed_values
 from nti.app.assessment.decorators import decorate_question_solutions
 
+from nti.app.assessment.decorators.batching import get_batch_decoration_context
+
 from nti.app.assessment.interfaces import ISolutionDecorationConfig
 from nti.app.assessment.interfaces import IUsersCourseAssignmentAttemptMetadataItem
 
+from nti.app.assessment.regrade import get_regrade_job
+
 from nti.app.assessment.utils import get_course_from_request
 from nti.app.assessment.utils import assignment_download_precondition
 from nti.app.assessment.utils import course_assignments_download_precondition
@@ -112,6 +117,7 @@ from nti.contenttypes.courses.legacy_catalog import ILegacyCourseInstance
 
 from nti.contenttypes.courses.interfaces import ICourseCatalog
 from nti.contenttypes.courses.interfaces import ICourseInstance
+from nti.contenttypes.courses.interfaces import ICourseCatalogEntry
 
 from nti.contenttypes.courses.utils import is_course_instructor
 from nti.contenttypes.courses.utils import is_course_instructor_or_editor
@@ -261,18 +267,25 @@ class _AssignmentOverridesDecorator(AbstractAuthenticatedRequestAwareDecorator):
         if course is None:
             return
 
+        dates = policies = course
+        batch = get_batch_decoration_context(self.request)
+        if batch is not None:
+            # The policy and date helpers accept the resolved objects too
+            dates = batch.dates(course)
+            policies = batch.policies(course)
+
         # start date
-        start_date = get_available_for_submission_beginning(assignment, course)
+        start_date = get_available_for_submission_beginning(assignment, dates)
         ext_obj = to_external_object(start_date)
         result['available_for_submission_beginning'] = ext_obj
 
         # end date
-        end_date = get_available_for_submission_ending(assignment, course)
+        end_date = get_available_for_submission_ending(assignment, dates)
         ext_obj = to_external_object(end_date)
         result['available_for_submission_ending'] = ext_obj
 
         if IQTimedAssignment.providedBy(assignment):
-            max_time_allowed = get_max_time_allowed(assignment, course)
+            max_time_allowed = get_max_time_allowed(assignment, policies)
             result['IsTimedAssignment'] = True
             result['MaximumTimeAllowed'] = max_time_allowed
             result['maximum_time_allowed'] = max_time_allowed
@@ -280,14 +293,14 @@ class _AssignmentOverridesDecorator(AbstractAuthenticatedRequestAwareDecorator):
             result['IsTimedAssignment'] = False
 
         # Max submissions
-        result['max_submissions'] = get_policy_max_submissions(assignment, course)
-        result['unlimited_submissions'] = is_policy_max_submissions_unlimited(assignment, course)
-        result['completion_passing_percent'] = get_policy_completion_passing_percent(assignment, course)
-        result['full_submission'] = get_policy_full_submission(assignment, course)
-        result['submission_priority'] = get_policy_submission_priority(assignment, course)
+        result['max_submissions'] = get_policy_max_submissions(assignment, policies)
+        result['unlimited_submissions'] = is_policy_max_submissions_unlimited(assignment, policies)
+        result['completion_passing_percent'] = get_policy_completion_passing_percent(assignment, policies)
+        result['full_submission'] = get_policy_full_submission(assignment, policies)
+        result['submission_priority'] = get_policy_submission_priority(assignment, policies)
 
         # auto_grade/total_points
-        auto_grade = get_auto_grade_policy(assignment, course)
+        auto_grade = get_auto_grade_policy(assignment, policies)
         if auto_grade:
             disabled = auto_grade.get('disable')
             # If we have policy but no disabled flag, default to True.
@@ -296,9 +309,57 @@ class _AssignmentOverridesDecorator(AbstractAuthenticatedRequestAwareDecorator):
         else:
             result['auto_grade'] = False
             result['total_points'] = None
-        result['policy_locked'] = get_policy_locked(assignment, course)
-        result['excluded'] = get_policy_excluded(assignment, course)
-        result['submission_buffer'] = get_submission_buffer_policy(assignment, course)
+        result['policy_locked'] = get_policy_locked(assignment, policies)
+        result['excluded'] = get_policy_excluded(assignment, policies)
+        result['submission_buffer'] = get_submission_buffer_policy(assignment, policies)
+
+
+@component.adapter(IQAssignment, IRequest)
+@interface.implementer(IExternalMappingDecorator)
+class _AssignmentRegradeStatusDecorator(AbstractAuthenticatedRequestAwareDecorator):
+    """
+    Give instructors the state of the regrade of the assignment in the
+    course, e.g. while a regrade triggered by a policy change is pending.
+    """
+
+    @Lazy
+    def _batch(self):
+        return get_batch_decoration_context(self.request)
+
+    def _get_course(self, context):
+        course = None
+        if self._batch is not None:
+            course = self._batch.request_course()
+        if course is None:
+            course = _get_course_from_evaluation(context,
+                                                 user=self.remoteUser,
+                                                 request=self.request)
+        return course
+
+    def _is_instructor(self, course):
+        if self._batch is not None:
+            return self._batch.is_instructor(course, self.remoteUser)
+        return is_course_instructor(course, self.remoteUser)
+
+    def _do_decorate_external(self, context, result):
+        course = self._get_course(context)
+        if course is None or not self._is_instructor(course):
+            return
+        job = get_regrade_job(course, context.ntiid)
+        if job is None:
+            return
+        result['RegradeState'] = job.state
+        result['RegradeStale'] = job.is_stale()
+        entry = ICourseCatalogEntry(course, None)
+        _links = result.setdefault(LINKS, [])
+        link = Link(context,
+                    rel=VIEW_REGRADE_STATUS,
+                    elements=('@@' + VIEW_REGRADE_STATUS,),
+                    params={'course': getattr(entry, 'ntiid', None)})
+        interface.alsoProvides(link, ILocation)
+        link.__name__ = ''
+        link.__parent__ = context
+        _links.append(link)
 
 
 @component.adapter(IQTimedAssignment, IRequest)
@@ -601,11 +662,25 @@ class _AssessmentEditorDecorator(AbstractAuthenticatedRequestAwareDecorator):
                     VIEW_MOVE_PART_OPTION, VIEW_INSERT_PART_OPTION,
                     VIEW_REMOVE_PART_OPTION, VIEW_DELETE, VIEW_IS_NON_PUBLIC)
 
+    @Lazy
+    def _batch(self):
+        return get_batch_decoration_context(self.request)
+
+    def _get_course_hierarchy(self, course):
+        if self._batch is not None:
+            return self._batch.course_hierarchy(course)
+        return get_courses(course)
+
+    def _get_request_course(self):
+        if self._batch is not None:
+            return self._batch.request_course()
+        return get_course_from_request(self.request)
+
     def get_courses(self, context):
         result = set()
         courses = get_evaluation_courses(context)
         for course in courses or ():
-            hierarchy = get_courses(course)
+            hierarchy = self._get_course_hierarchy(course)
             result.update(hierarchy)
         return result
 
@@ -732,7 +807,7 @@ class _AssessmentEditorDecorator(AbstractAuthenticatedRequestAwareDecorator):
 
         # chose link context according to the presence of a course
         start_elements = ()
-        course = get_course_from_request(self.request)
+        course = self._get_request_course()
         link_context = context if course is None else course
         if course is not None:
             start_elements = ('Assessments', context.ntiid)
@@ -777,7 +852,7 @@ class _DiscussionAssignmentEditorDecorator(_AssessmentEditorDecorator):
 
         # chose link context according to the presence of a course
         start_elements = ()
-        course = get_course_from_request(self.request)
+        course = self._get_request_course()
         link_context = context if course is None else course
         if course is not None:
             start_elements = ('Assessments', context.ntiid)
@@ -833,15 +908,24 @@ class AssessmentPolicyEditLinkDecorator(AbstractAuthenticatedRequestAwareDecorat
     assignments/inquiries.
     """
 
+    @Lazy
+    def _batch(self):
+        return get_batch_decoration_context(self.request)
+
     @Lazy
     def request_course(self):
+        if self._batch is not None:
+            return self._batch.request_course()
         course = get_course_from_request(self.request)
         return course
 
     @Lazy
     def is_instructor(self):
-        return  self.request_course is not None \
-            and is_course_instructor(self.request_course, self.remoteUser)
+        if self.request_course is None:
+            return False
+        if self._batch is not None:
+            return self._batch.is_instructor(self.request_course, self.remoteUser)
+        return is_course_instructor(self.request_course, self.remoteUser)
 
     def is_editor(self, context):
         return has_permission(ACT_CONTENT_EDIT, context, self.request)
@@ -856,6 +940,8 @@ class AssessmentPolicyEditLinkDecorator(AbstractAuthenticatedRequestAwareDecorat
         result = _get_course_from_evaluation(context,
                                              user=self.remoteUser,
                                              request=self.request)
+        if self._batch is not None and result is not None:
+            return self._batch.course_hierarchy(result)
         return get_courses(result)
 
     def _can_edit(self, context):
@@ -905,6 +991,8 @@ class AssessmentPolicyEditLinkDecorator(AbstractAuthenticatedRequestAwareDecorat
 
     def _assignment_has_end_date(self, context, course):
         result = False
+        if self._batch is not None and course is not None:
+            course = self._batch.dates(course)
         if      IQAssignment.providedBy(context) \
             and get_available_for_submission_ending(context, course):
             result = True
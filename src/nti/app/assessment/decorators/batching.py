@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shared per-course state for decorating listings of assessments.
+
+Listing views externalize many assessments of the same course, and each
+decorator re-resolves the request course, the course hierarchy, the
+policies, the date context and the instructor status for every item. A
+:class:`BatchDecorationContext` set on the request resolves each of them
+once and counts the lookups it saved.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from pyramid.threadlocal import get_current_request
+
+from nti.app.assessment.common.utils import get_courses
+
+from nti.app.assessment.utils import get_course_from_request
+
+from nti.assessment.interfaces import IQAssessmentPolicies
+from nti.assessment.interfaces import IQAssessmentDateContext
+
+from nti.contenttypes.courses.utils import is_course_instructor
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The request attribute holding the batch decoration context
+BATCH_DECORATION_CONTEXT_ATTR = '_v_nti_assessment_batch_decoration'
+
+_marker = object()
+
+
+class BatchDecorationContext(object):
+    """
+    Resolves per-course facts once for a whole listing.
+    """
+
+    def __init__(self, request, user=None):
+        self.user = user
+        self.request = request
+        self.lookups = 0
+        self.resolved = 0
+        self._cache = {}
+
+    @property
+    def saved(self):
+        return self.lookups - self.resolved
+
+    def _get(self, kind, key, factory, *args):
+        self.lookups += 1
+        key = (kind, key)
+        result = self._cache.get(key, _marker)
+        if result is _marker:
+            self.resolved += 1
+            result = self._cache[key] = factory(*args)
+        return result
+
+    def request_course(self):
+        return self._get('request_course', None,
+                         get_course_from_request, self.request)
+
+    def course_hierarchy(self, course):
+        return self._get('hierarchy', course, get_courses, course)
+
+    def policies(self, course):
+        return self._get('policies', course,
+                         IQAssessmentPolicies, course, None)
+
+    def dates(self, course):
+        return self._get('dates', course,
+                         IQAssessmentDateContext, course, None)
+
+    def is_instructor(self, course, user=None):
+        user = self.user if user is None else user
+        return self._get('instructor', (course, user),
+                         is_course_instructor, course, user)
+
+
+def get_batch_decoration_context(request=None):
+    request = get_current_request() if request is None else request
+    return getattr(request, BATCH_DECORATION_CONTEXT_ATTR, None)
+
+
+def _log_batch_decoration_context(request):
+    context = get_batch_decoration_context(request)
+    if context is not None and context.lookups:
+        logger.debug("Batch decoration of %s resolved %s of %s lookup(s) (%s saved)",
+                     request.view_name, context.resolved, context.lookups,
+                     context.saved)
+
+
+def set_batch_decoration_context(request=None, user=None):
+    """
+    Install a :class:`BatchDecorationContext` on the request, to be used
+    while the response of a listing is externalized.
+    """
+    request = get_current_request() if request is None else request
+    result = get_batch_decoration_context(request)
+    if result is None:
+        result = BatchDecorationContext(request, user)
+        setattr(request, BATCH_DECORATION_CONTEXT_ATTR, result)
+        request.add_finished_callback(_log_batch_decoration_context)
+    return result
@@ -11,9 +11,11 @@ from __future__ import absolute_import
 from zope import component
 from zope import interface
 
-from nti.app.assessment.common.evaluations import get_assessment_items_from_unit
+from nti.app.assessment.common.evaluations import get_unit_assessment_index
 from nti.app.assessment.common.evaluations import AssessmentItemProxy as AssignmentProxy
 
+from nti.app.assessment.decorators.batching import set_batch_decoration_context
+
 from nti.app.assessment.utils import check_assignment
 from nti.app.assessment.utils import get_course_from_request
 
@@ -23,13 +25,6 @@ from nti.app.contentlibrary.interfaces import IContentUnitInfo
 
 from nti.appserver.pyramid_authorization import has_permission
 
-from nti.assessment.interfaces import IQSurvey
-from nti.assessment.interfaces import IQAssignment
-from nti.assessment.interfaces import IQuestionSet
-
-from nti.assessment.randomized.interfaces import IQuestionBank
-from nti.assessment.randomized.interfaces import IRandomizedQuestionSet
-
 from nti.contenttypes.courses.interfaces import ICourseInstance
 from nti.contenttypes.courses.interfaces import ICourseCatalogEntry
 from nti.contenttypes.courses.interfaces import get_course_assessment_predicate_for_user
@@ -44,8 +39,6 @@ from nti.externalization.externalization import to_external_object
 from nti.externalization.interfaces import StandardExternalFields
 from nti.externalization.interfaces import IExternalMappingDecorator
 
-from nti.ntiids.oids import to_external_ntiid_oid
-
 TOTAL = StandardExternalFields.TOTAL
 ITEM_COUNT = StandardExternalFields.ITEM_COUNT
 
@@ -83,77 +76,44 @@ class _ContentUnitAssessmentItemDecorator(AbstractAuthenticatedRequestAwareDecor
     # pylint: disable=arguments-differ
     def _do_decorate_external(self, context, result_map):
         entry_ntiid = None
-        qsids_to_strip = set()
         assignment_predicate = None
 
         # When we return page info, we return questions
-        # for all of the embedded units as well
-        result = get_assessment_items_from_unit(context.contentUnit)
+        # for all of the embedded units as well. To keep size down,
+        # when we send back assignments or question sets, we don't send
+        # back the things they contain as top-level.
+        top_level, assignments = get_unit_assessment_index(context.contentUnit)
 
         # Filter out things they aren't supposed to see...currently only
         # assignments...we can only do this if we have a user and a course
         user = self.remoteUser
-        unit_ntiid = getattr(context.contentUnit, 'ntiid', None)
-        course = self._get_course(context.contentUnit, user)
+        course = None
+        if assignments:
+            course = self._get_course(context.contentUnit, user)
         if course is not None:
-            if not unit_ntiid:
-                unit_ntiid = to_external_ntiid_oid(course)
             # Only things in context of a course should have assignments
             predicate = get_course_assessment_predicate_for_user(user, course)
             entry = ICourseCatalogEntry(course, None)
             entry_ntiid = getattr(entry, 'ntiid', None)
             assignment_predicate = predicate
 
-        new_result = {}
+        result = list(top_level)
         is_instructor = self._is_instructor_or_editor(course, user)
-        for ntiid, x in result.iteritems():
-            # To keep size down, when we send back assignments or question sets,
-            # we don't send back the things they contain as top-level. Moreover,
-            # for assignments we need to apply a visibility predicate to the assignment
-            # itself.
-            if IQuestionBank.providedBy(x):
-                qsids_to_strip.update(q.ntiid for q in x.questions)
-                new_result[ntiid] = x
-            elif IRandomizedQuestionSet.providedBy(x):
-                qsids_to_strip.update(q.ntiid for q in x.questions)
-                new_result[ntiid] = x
-            elif IQuestionSet.providedBy(x):
-                # CS:20150729 allow the questions to return along with question set
-                # this is for legacy iPad.
-                new_result[ntiid] = x
-            elif IQSurvey.providedBy(x):
-                new_result[ntiid] = x
-                qsids_to_strip.update(poll.ntiid for poll in x.questions)
-            elif IQAssignment.providedBy(x):
-                if assignment_predicate is None:
-                    logger.warning("Found assignment (%s) outside of course context "
-                                   "in %s; dropping", x, context.contentUnit)
-                elif assignment_predicate(x) or is_instructor:
-                    # Yay, keep the assignment
-                    x = check_assignment(x, user)
-                    x = AssignmentProxy(x, entry_ntiid)
-                    new_result[ntiid] = x
-
-                # But in all cases, don't echo back the things
-                # it contains as top-level items.
-                # We are assuming that these are on the same page
-                # for now and that they are only referenced by
-                # this assignment. We need to fix this
-                for assignment_part in x.parts or ():
-                    question_set = assignment_part.question_set
-                    qsids_to_strip.add(question_set.ntiid)
-                    qsids_to_strip.update(
-                        q.ntiid for q in question_set.questions
-                    )
-            else:
-                new_result[ntiid] = x
-
-        # remove invalid
-        for bad_ntiid in qsids_to_strip:
-            new_result.pop(bad_ntiid, None)
-        result = new_result.values()
+        for x in assignments:
+            # For assignments we need to apply a visibility predicate to
+            # the assignment itself.
+            if assignment_predicate is None:
+                logger.warning("Found assignment (%s) outside of course context "
+                               "in %s; dropping", x, context.contentUnit)
+            elif assignment_predicate(x) or is_instructor:
+                # Yay, keep the assignment
+                x = check_assignment(x, user)
+                x = AssignmentProxy(x, entry_ntiid)
+                result.append(x)
 
         if result:
+            # share per-course lookups while decorating the items
+            set_batch_decoration_context(self.request, user)
             ext_items = to_external_object(result)
             result_map['AssessmentItems'] = ext_items
             result_map[TOTAL] = result_map[ITEM_COUNT] = len(result)
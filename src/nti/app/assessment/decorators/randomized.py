@@ -11,6 +11,12 @@ from __future__ import absolute_import
 from zope import component
 from zope import interface
 
+from nti.app.assessment.common.caching import get_request_cache
+
+from nti.app.assessment.common.randomization import PermutationGenerator
+from nti.app.assessment.common.randomization import get_randomization_seed
+from nti.app.assessment.common.randomization import RANDOMIZATION_REQUEST_CACHE
+
 from nti.app.assessment.decorators import _get_course_from_evaluation
 
 from nti.app.renderers.decorators import AbstractAuthenticatedRequestAwareDecorator
@@ -22,6 +28,8 @@ from nti.assessment.interfaces import IQOrderingPart
 from nti.assessment.interfaces import IQMultipleChoicePart
 from nti.assessment.interfaces import IQMultipleChoiceMultipleAnswerPart
 
+from nti.assessment.interfaces import IQEvaluation
+
 from nti.assessment.randomized import randomize
 from nti.assessment.randomized import shuffle_list
 from nti.assessment.randomized import questionbank_question_chooser
@@ -39,6 +47,8 @@ from nti.dataserver.authorization import ACT_CONTENT_EDIT
 
 from nti.externalization.interfaces import IExternalObjectDecorator
 
+from nti.traversal.traversal import find_interface
+
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -49,18 +59,51 @@ class _AbstractNonEditorRandomizingDecorator(AbstractAuthenticatedRequestAwareDe
     an editor, and a non-randomized interface.
     """
 
-    def _predicate(self, context, unused_result):
+    def _is_instructor_or_editor(self, context, cache):
         user = self.remoteUser
         course = _get_course_from_evaluation(context, user,
                                              request=self.request)
+        key = ('course', id(course))
+        result = cache.get(key) if cache is not None else None
+        if result is None:
+            result = is_course_instructor_or_editor(course, user)
+            if cache is not None:
+                cache[key] = result
+        return result
+
+    def _do_predicate(self, context, cache):
         # XXX: Not sure this is what we want here, regarding the meta attempt
         # We cannot randomize correctly without it; a better solution might be
         # to never return questions/parts for assignments for non-editors
         # without a meta attempt item.
-        return  self._is_authenticated \
-            and not is_course_instructor_or_editor(course, user) \
+        return  not self._is_instructor_or_editor(context, cache) \
             and not has_permission(ACT_CONTENT_EDIT, context, self.request)
 
+    def _predicate(self, context, unused_result):
+        if not self._is_authenticated:
+            return False
+        # The parts of an evaluation share its course and permissions,
+        # so the decision is made once per evaluation in a request
+        cache = get_request_cache(RANDOMIZATION_REQUEST_CACHE, self.request)
+        evaluation = find_interface(context, IQEvaluation, strict=False)
+        key = getattr(evaluation, 'ntiid', None)
+        if cache is None or not key:
+            return self._do_predicate(context, cache)
+        result = cache.get(key)
+        if result is None:
+            result = cache[key] = self._do_predicate(context, cache)
+        return result
+
+    def _generator(self, context):
+        """
+        Return the generator shuffling the given object for the remote
+        user, replaying the memoized permutations of its seed.
+        """
+        seed = get_randomization_seed(self.remoteUser)
+        if seed is None:
+            return randomize(context=context)
+        return PermutationGenerator(seed)
+
 
 # pylint: disable=abstract-method
 class _AbstractNonEditorRandomizingPartDecorator(_AbstractNonEditorRandomizingDecorator):
@@ -78,11 +121,11 @@ class _AbstractNonEditorRandomizingPartDecorator(_AbstractNonEditorRandomizingDe
 class _QRandomizedMatchingPartDecorator(_AbstractNonEditorRandomizingPartDecorator):
 
     def _do_decorate_external(self, context, result):
-        generator = randomize(context=context)
+        generator = self._generator(context)
         if generator is not None:
             values = list(result['values'])
             shuffle_list(generator, result['values'])
-            shuffle_matching_part_solutions(randomize(context=context),  # new generator
+            shuffle_matching_part_solutions(self._generator(context),  # new generator
                                             values,
                                             result['solutions'])
 
@@ -104,12 +147,12 @@ class _QRandomizedMultipleChoicePartDecorator(_AbstractNonEditorRandomizingPartD
            and super(_QRandomizedMultipleChoicePartDecorator, self)._predicate(context, result)
 
     def _do_decorate_external(self, context, result):
-        generator = randomize(context=context)
+        generator = self._generator(context)
         if generator is not None:
             solutions = result['solutions']
             choices = list(result['choices'])
             shuffle_list(generator, result['choices'])
-            shuffle_multiple_choice_part_solutions(randomize(context=context),  # new generator
+            shuffle_multiple_choice_part_solutions(self._generator(context),  # new generator
                                                    choices,
                                                    solutions)
 
@@ -119,11 +162,11 @@ class _QRandomizedMultipleChoicePartDecorator(_AbstractNonEditorRandomizingPartD
 class _QRandomizedMultipleChoiceMultipleAnswerPartDecorator(_AbstractNonEditorRandomizingPartDecorator):
 
     def _do_decorate_external(self, context, result):
-        generator = randomize(context=context)
+        generator = self._generator(context)
         if generator is not None:
             choices = list(result['choices'])
             shuffle_list(generator, result['choices'])
-            shuffle_multiple_choice_multiple_answer_part_solutions(randomize(context=context),  # new generator
+            shuffle_multiple_choice_multiple_answer_part_solutions(self._generator(context),  # new generator
                                                                    choices,
                                                                    result['solutions'])
 
@@ -133,7 +176,7 @@ class _QRandomizedMultipleChoiceMultipleAnswerPartDecorator(_AbstractNonEditorRa
 class _QRandomizedQuestionSetDecorator(_AbstractNonEditorRandomizingDecorator):
 
     def _do_decorate_external(self, context, result):
-        generator = randomize(context=context)
+        generator = self._generator(context)
         questions = result.get('questions', ())
         # XXX: How do we get a non-empty tuple here?
         result['questions'] = questions = list(questions)
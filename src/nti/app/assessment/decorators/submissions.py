@@ -10,6 +10,8 @@ from __future__ import absolute_import
 
 from zope import interface
 
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemSummary
+
 from nti.assessment.interfaces import IPlaceholderAssignmentSubmission
 
 from nti.externalization.interfaces import IExternalMappingDecorator
@@ -26,6 +28,10 @@ class _SyntheticSubmissionDecorator(Singleton):
     """
 
     def decorateExternalMapping(self, item, result_map):
-        submission = item.Submission
-        is_synth = IPlaceholderAssignmentSubmission.providedBy(submission)
+        if IUsersCourseAssignmentHistoryItemSummary.providedBy(item):
+            # Summaries never load the submission
+            is_synth = item.SyntheticSubmission
+        else:
+            submission = item.Submission
+            is_synth = IPlaceholderAssignmentSubmission.providedBy(submission)
         result_map['SyntheticSubmission'] = is_synth
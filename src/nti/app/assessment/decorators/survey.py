@@ -49,6 +49,8 @@ from nti.app.assessment.decorators import _get_course_from_evaluation
 from nti.app.assessment.decorators import _AbstractTraversableLinkDecorator
 from nti.app.assessment.decorators import AbstractAssessmentDecoratorPredicate
 
+from nti.app.assessment.decorators.batching import get_batch_decoration_context
+
 from nti.app.assessment.evaluations.utils import is_inquiry_closed
 
 from nti.app.assessment.interfaces import IUsersCourseInquiry
@@ -177,6 +179,27 @@ class _InquiryDecorator(_AbstractTraversableLinkDecorator):
     def _intids(self):
         return component.getUtility(IIntIds)
 
+    @Lazy
+    def _batch(self):
+        return get_batch_decoration_context(self.request)
+
+    def _is_instructor(self, course, user):
+        if self._batch is not None:
+            return self._batch.is_instructor(course, user)
+        return is_course_instructor(course, user)
+
+    def _get_dates(self, course):
+        if self._batch is not None:
+            return self._batch.dates(course)
+        return IQAssessmentDateContext(course)
+
+    def _get_policy(self, context, course):
+        if self._batch is not None:
+            policies = self._batch.policies(course)
+            # pylint: disable=too-many-function-args
+            return policies.getPolicyForAssessment(context.ntiid)
+        return get_policy_for_assessment(context.ntiid, course)
+
     def _submissions(self, course, context):
         return len(inquiry_submissions(context, course))
 
@@ -191,7 +214,10 @@ class _InquiryDecorator(_AbstractTraversableLinkDecorator):
         # ref lineage to distinguish between multiple courses. Ideally, we'll want
         # to make sure we have a course context wherever this ref is being accessed
         # (lesson overview) to handle subinstances correctly.
-        course = get_course_from_request()
+        if self._batch is not None:
+            course = self._batch.request_course()
+        else:
+            course = get_course_from_request()
         if course is None:
             course = find_interface(context, ICourseInstance, strict=False)
             if course is None:
@@ -240,7 +266,7 @@ class _InquiryDecorator(_AbstractTraversableLinkDecorator):
             available = []
             now = datetime.utcnow()
             # pylint: disable=too-many-function-args
-            dates = IQAssessmentDateContext(course).of(context)
+            dates = self._get_dates(course).of(context)
             for k, func in (
                     ('available_for_submission_beginning', get_available_for_submission_beginning),
                     ('available_for_submission_ending', get_available_for_submission_ending)):
@@ -256,7 +282,7 @@ class _InquiryDecorator(_AbstractTraversableLinkDecorator):
                                                        begin_date=available[0],
                                                        end_date=available[1])
 
-            policy = get_policy_for_assessment(context.ntiid, course)
+            policy = self._get_policy(context, course)
             if policy and 'disclosure' in policy:
                 result_map['disclosure'] = policy['disclosure']
 
@@ -277,7 +303,7 @@ class _InquiryDecorator(_AbstractTraversableLinkDecorator):
         # aggregated
         if      course is not None \
             and submission_count \
-            and (   is_course_instructor(course, user) \
+            and (   self._is_instructor(course, user) \
                  or is_admin_or_site_admin(user) \
                  or can_disclose_inquiry(context, user, course)):
             links.append(Link(course,
@@ -288,7 +314,7 @@ class _InquiryDecorator(_AbstractTraversableLinkDecorator):
                               elements=elements + ('@@Submissions',)))
 
         # close/open
-        if course is not None and is_course_instructor(course, user):
+        if course is not None and self._is_instructor(course, user):
             if not context.closed:
                 links.append(Link(course,
                                   rel='close',
@@ -10,11 +10,20 @@ from __future__ import absolute_import
 
 from collections import Mapping
 
+from tempfile import SpooledTemporaryFile
+
+import simplejson
+
+import six
+
 from zope import component
 from zope import interface
 
 from nti.app.assessment.common.evaluations import get_course_evaluations
 
+from nti.app.assessment.common.resultsets import BATCH_SIZE
+from nti.app.assessment.common.resultsets import prefetch
+
 from nti.app.assessment.evaluations.interfaces import ICourseEvaluationsSectionExporter
 from nti.app.assessment.evaluations.interfaces import ICourseEvaluationExporter
 
@@ -86,9 +95,37 @@ ITEM_COUNT = StandardExternalFields.ITEM_COUNT
 
 INTERNAL_NTIID = StandardInternalFields.NTIID
 
+#: The size of an exported evaluation index kept in memory before spooling
+#: it to disk
+SPOOL_SIZE = 5 * 1024 * 1024
+
 logger = __import__('logging').getLogger(__name__)
 
 
+def _write(fp, data):
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+    fp.write(data)
+
+
+def stream_evaluation_index(items, fp):
+    """
+    Write an evaluation index with the given externalized evaluations to
+    the given file as they are produced, and return their number.
+    """
+    count = 0
+    encoder = simplejson.JSONEncoder(indent='\t', sort_keys=True)
+    _write(fp, '{\n"%s": [' % ITEMS)
+    for item in items:
+        _write(fp, ',\n' if count else '\n')
+        for chunk in encoder.iterencode(item):
+            _write(fp, chunk)
+        count += 1
+    _write(fp, '\n],\n"%s": %s,\n"%s": %s\n}\n'
+           % (ITEM_COUNT, count, TOTAL, count))
+    return count
+
+
 class EvaluationsExporterMixin(object):
 
     def change_evaluation_ntiid(self, ext_obj, salt=None):
@@ -107,12 +144,22 @@ class EvaluationsExporterMixin(object):
                 self.change_evaluation_ntiid(value, salt)
 
     def evaluations(self, context):
-        evaluations = IQEvaluations(context)
-        for item in evaluations.values():
+        evaluations = list(IQEvaluations(context).values())
+        # load their state in bulk rather than one by one
+        for index in range(0, len(evaluations), BATCH_SIZE):
+            prefetch(evaluations[index:index + BATCH_SIZE])
+        for item in evaluations:
             if IQEditableEvaluation.providedBy(item):
                 yield item
 
     def do_evaluations_export(self, context, backup=True, salt=None, filer=None):
+        return list(self.iter_evaluations_export(context, backup, salt, filer))
+
+    def iter_evaluations_export(self, context, backup=True, salt=None, filer=None):
+        """
+        Generate the externalized evaluations of the given context in
+        dependency order.
+        """
         if filer is None:
             filer = get_source_filer(context, get_remote_user())
 
@@ -157,12 +204,10 @@ class EvaluationsExporterMixin(object):
             return ext_obj
 
         ordered = sorted(self.evaluations(context), key=sort_evaluation_key)
-        result = []
         for assessment_item in ordered:
             ext_item = _ext(assessment_item)
             if ext_item:
-                result.append(ext_item)
-        return result
+                yield ext_item
 
     def export_evaluations(self, context, backup=True, salt=None, filer=None):
         result = LocatedExternalDict()
@@ -181,14 +226,20 @@ class EvaluationsExporter(EvaluationsExporterMixin, BaseSectionExporter):
         return self.export_evaluations(course, backup, salt, filer)
 
     def export(self, context, filer, backup=True, salt=None):
+        result = 0
         course = ICourseInstance(context)
         for course in get_course_hierarchy(course):
             filer.default_bucket = bucket = self.course_bucket(course)
-            result = self.externalize(course, backup, salt, filer)
-            if result:  # check
-                source = self.dump(result)
-                filer.save("evaluation_index.json", source, bucket=bucket,
-                           contentType="application/json", overwrite=True)
+            items = self.iter_evaluations_export(course, backup, salt, filer)
+            # stream the index rather than holding all the externalized
+            # evaluations and their serialization in memory
+            with SpooledTemporaryFile(max_size=SPOOL_SIZE) as source:
+                count = stream_evaluation_index(items, source)
+                if count:  # check
+                    source.seek(0)
+                    filer.save("evaluation_index.json", source, bucket=bucket,
+                               contentType="application/json", overwrite=True)
+            result += count
         return result
 
 
@@ -18,6 +18,8 @@ import uuid
 
 from docutils import statemachine
 
+import transaction
+
 from six.moves.urllib_parse import urlparse
 
 from zope import component
@@ -38,6 +40,7 @@ from nti.app.assessment.evaluations.interfaces import ICourseEvaluationsSectionI
 
 from nti.app.assessment.evaluations.utils import indexed_iter
 from nti.app.assessment.evaluations.utils import register_context
+from nti.app.assessment.evaluations.utils import sort_evaluation_factory_key
 from nti.app.assessment.evaluations.utils import course_discussions
 from nti.app.assessment.evaluations.utils import import_evaluation_content
 from nti.app.assessment.evaluations.utils import re_register_assessment_object
@@ -107,6 +110,10 @@ from nti.publishing.interfaces import ICalendarPublishable
 from nti.recorder.interfaces import IRecordable
 
 ITEMS = StandardExternalFields.ITEMS
+MIMETYPE = StandardExternalFields.MIMETYPE
+
+#: The number of evaluations imported between savepoints
+IMPORT_BATCH_SIZE = 50
 
 
 class EvaluationsImporterMixin(object):
@@ -320,8 +327,41 @@ class EvaluationsImporterMixin(object):
             lifecycleevent.modified(result)
         return result
 
+    def evaluation_import_order(self, items):
+        """
+        Return the given external evaluations in dependency order, i.e.
+        questions and polls before the question sets and surveys that may
+        contain them, before the assignments.
+        """
+        ranks = {}
+        ranked = []
+        for index, ext_obj in enumerate(items or ()):
+            mime_type = ext_obj.get(MIMETYPE)
+            if mime_type not in ranks:
+                factory = find_factory_for(ext_obj)
+                ranks[mime_type] = sort_evaluation_factory_key(factory) \
+                                   if factory is not None else 0
+            ranked.append((ranks[mime_type], index, ext_obj))
+        ranked.sort(key=lambda x: x[:2])
+        result = [x[2] for x in ranked]
+        if [x[1] for x in ranked] != list(range(len(ranked))):
+            logger.info("Importing evaluations in dependency order")
+        return result
+
+    def checkpoint(self, context):
+        """
+        Write the changes of the import so far to a savepoint, so that the
+        connection cache can be shrunk during large imports. The import
+        stays in a single transaction.
+        """
+        transaction.savepoint(optimistic=True)
+        jar = getattr(context, '_p_jar', None)
+        if jar is not None:
+            jar.cacheGC()
+
     def handle_evaluation_items(self, items, context, filer=None):
-        for ext_obj in items or ():
+        items = self.evaluation_import_order(items)
+        for index, ext_obj in enumerate(items, 1):
             # For timed assignments, they must be built as regular assignments
             # so that users can toggle timed state.
             mime_type = ext_obj.get('MimeType')
@@ -341,6 +381,8 @@ class EvaluationsImporterMixin(object):
                 interface.alsoProvides(the_object, IQTimedAssignment)
                 the_object.maximum_time_allowed = max_time_allowed
                 re_register_assessment_object(the_object, IQAssignment, IQTimedAssignment)
+            if index % IMPORT_BATCH_SIZE == 0:
+                self.checkpoint(context)
 
 
 @interface.implementer(ICourseEvaluationsSectionImporter, ICourseEvaluationImporter)
@@ -29,6 +29,7 @@ from nti.app.assessment.common.evaluations import get_evaluation_courses
 from nti.app.assessment.common.evaluations import get_evaluation_containment
 from nti.app.assessment.common.evaluations import get_containers_for_evaluation_object
 
+from nti.app.assessment.common.grading import schedule_regrade
 from nti.app.assessment.common.grading import regrade_evaluation
 
 from nti.app.assessment.common.history import delete_all_evaluation_data
@@ -42,6 +43,8 @@ from nti.app.assessment.evaluations.adapters import evaluations_for_course
 
 from nti.app.assessment.evaluations.utils import validate_structural_edits
 
+from nti.app.assessment.index import get_evaluation_catalog
+
 from nti.app.assessment.interfaces import IQEvaluations
 from nti.app.assessment.interfaces import IQAvoidSolutionCheck
 from nti.app.assessment.interfaces import IQPartChangeAnalyzer
@@ -100,10 +103,17 @@ def _on_course_added(course, unused_event):
     evaluations_for_course(course)
 
 
+def _reindex_containment(container, intids=None):
+    catalog = get_evaluation_catalog()
+    if catalog is not None:
+        catalog.update_containment(container, intids)
+
+
 def _update_containment(item, intids=None):
     for container in get_evaluation_containment(item.ntiid, intids=intids):
         if IQEvaluationItemContainer.providedBy(container):
             container.remove(item)
+            _reindex_containment(container, intids)
             lifecycleevent.modified(container)
 
 
@@ -165,6 +175,7 @@ def _on_question_inserted_in_container(container, unused_event):
     validate_structural_edits(container, course)
     if IRecordableContainer.providedBy(container):
         container.childOrderLock()
+    _reindex_containment(container)
     # Now update any assignments for our container
     assignments = get_containers_for_evaluation_object(container)
     for assignment in assignments or ():
@@ -240,7 +251,10 @@ def _on_assessment_policies_modified_event(course, event):
         if          (event_key == 'auto_grade' \
                 and event.value) \
             or event_key in ('total_points', 'completion_passing_percent'):
-            regrade_evaluation(assesment, course)
+            # Regrade in the job queue; edits made before the job
+            # starts are coalesced into it.
+            if has_submissions(assesment, course):
+                schedule_regrade(assesment, course)
 
 
 @component.adapter(IQAssignment, IObjectUnlockedEvent)
@@ -25,22 +25,35 @@ does_not = is_not
 
 import os
 import time
+import unittest
+
+from six import BytesIO
+
+import fudge
 
 import simplejson
 
 from zope import component
 from zope import interface
 
+from zope.component.factory import Factory
+
 import zlib
 
 from nti.app.assessment.interfaces import IQEvaluations
 
 from nti.app.assessment.evaluations.exporter import EvaluationsExporter
+from nti.app.assessment.evaluations.exporter import stream_evaluation_index
+
 from nti.app.assessment.evaluations.importer import EvaluationsImporter
 
 from nti.app.assessment.evaluations.utils import delete_evaluation
+from nti.app.assessment.evaluations.utils import sort_evaluation_key
 
+from nti.assessment.interfaces import IQuestion
 from nti.assessment.interfaces import IQEvaluation
+from nti.assessment.interfaces import IQAssignment
+from nti.assessment.interfaces import IQuestionSet
 from nti.assessment.interfaces import IQTimedAssignment
 
 from nti.assessment.survey import QPoll
@@ -272,3 +285,63 @@ class TestSurveyImportExport(ImportExportTestMixin, ApplicationLayerTest):
             assert_that(expected_survey_ntiid, is_in(course_evals))
             assert_that(course_evals[expected_survey_ntiid].contents,
                         is_(expected_contents))
+
+
+@interface.implementer(IQuestion)
+class _Question(object):
+    pass
+
+
+@interface.implementer(IQuestionSet)
+class _QuestionSet(object):
+    pass
+
+
+@interface.implementer(IQAssignment)
+class _Assignment(object):
+    pass
+
+
+class TestImportExportOrder(unittest.TestCase):
+
+    def test_stream_evaluation_index(self):
+        items = [{'NTIID': u'a', 'title': u'\xe9'}, {'NTIID': u'b'}]
+        fp = BytesIO()
+        assert_that(stream_evaluation_index(iter(items), fp), is_(2))
+        assert_that(simplejson.loads(fp.getvalue().decode('utf-8')),
+                    has_entries('Items', is_(items),
+                                'Total', 2,
+                                'ItemCount', 2))
+
+        fp = BytesIO()
+        assert_that(stream_evaluation_index((), fp), is_(0))
+        assert_that(simplejson.loads(fp.getvalue()),
+                    has_entries('Items', has_length(0)))
+
+    @fudge.patch('nti.app.assessment.evaluations.importer.find_factory_for')
+    def test_import_order(self, mock_find_factory):
+        factories = {
+            u'q': Factory(_Question),
+            u's': Factory(_QuestionSet),
+            u'a': Factory(_Assignment),
+        }
+        lookups = []
+
+        def _find_factory(ext_obj):
+            lookups.append(ext_obj['MimeType'])
+            return factories[ext_obj['MimeType']]
+        mock_find_factory.is_callable().calls(_find_factory)
+        items = [{'MimeType': u'a', 'id': 1}, {'MimeType': u's', 'id': 2},
+                 {'MimeType': u'q', 'id': 3}, {'MimeType': u'a', 'id': 4},
+                 {'MimeType': u'q', 'id': 5}]
+        ordered = EvaluationsImporter().evaluation_import_order(items)
+        # in export order, keeping the given order of each kind
+        ranks = [sort_evaluation_key(factories[x['MimeType']]())
+                 for x in ordered]
+        assert_that(ranks, is_(sorted(ranks)))
+        assert_that([x['id'] for x in ordered if x['MimeType'] == u'q'],
+                    is_([3, 5]))
+        assert_that([x['id'] for x in ordered if x['MimeType'] == u'a'],
+                    is_([1, 4]))
+        # factories are looked up once per mime type
+        assert_that(sorted(lookups), is_([u'a', u'q', u's']))
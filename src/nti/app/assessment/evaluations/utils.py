@@ -414,6 +414,21 @@ def sort_evaluation_key(item):
     return 0
 
 
+def sort_evaluation_factory_key(factory):
+    """
+    Return the :func:`sort_evaluation_key` of the objects created by the
+    given factory without creating one.
+    """
+    try:
+        spec = factory.getInterfaces()
+    except AttributeError:
+        return 0
+    for i, iface in EVALUATION_SORT_ORDER:
+        if spec.isOrExtends(iface):
+            return i
+    return 0
+
+
 def re_register_assessment_object(context, old_iface, new_iface):
     """
     Unregister the assessment context under the given old interface and register
@@ -211,7 +211,10 @@ def when_feedback_container_modified_modify_history_item(container,
             # because we dont know what order these fire in,
             # the main last mod subscriber may or may not have run yet
             container.updateLastMod()
-        container.__parent__.updateLastModIfGreater(container.lastModified)
+        item = container.__parent__
+        item.updateLastModIfGreater(container.lastModified)
+        # keep the feedback count of the summary record current
+        item.update_summary()
     except AttributeError:
         pass
 
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+generation = 48
+
+from zope import component
+from zope import interface
+
+from zope.component.hooks import site
+from zope.component.hooks import setHooks
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.assessment.index import install_feedback_catalog
+
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemFeedback
+
+from nti.dataserver.interfaces import IDataserver
+from nti.dataserver.interfaces import IOIDResolver
+
+from nti.dataserver.metadata.index import get_metadata_catalog
+
+FEEDBACK_MIME_TYPE = 'application/vnd.nextthought.assessment.userscourseassignmenthistoryitemfeedback'
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IDataserver)
+class MockDataserver(object):
+
+    root = None
+
+    def get_by_oid(self, oid, ignore_creator=False):
+        resolver = component.queryUtility(IOIDResolver)
+        if resolver is None:
+            logger.warn("Using dataserver without a proper ISiteManager.")
+        else:
+            return resolver.get_object_by_oid(oid, ignore_creator=ignore_creator)
+        return None
+
+
+def do_evolve(context, generation=generation):
+    logger.info("Assessment evolution %s started", generation)
+
+    setHooks()
+    conn = context.connection
+    ds_folder = conn.root()['nti.dataserver']
+    lsm = ds_folder.getSiteManager()
+
+    mock_ds = MockDataserver()
+    mock_ds.root = ds_folder
+    component.provideUtility(mock_ds, IDataserver)
+    intids = lsm.getUtility(IIntIds)
+
+    with site(ds_folder):
+        assert component.getSiteManager() == ds_folder.getSiteManager(), \
+               "Hooks not installed?"
+
+        total = 0
+        catalog = install_feedback_catalog(ds_folder, intids)
+        metadata_catalog = get_metadata_catalog()
+        index = metadata_catalog['mimeType']
+        item_intids = index.apply({'any_of': (FEEDBACK_MIME_TYPE,)})
+        for doc_id in item_intids or ():
+            item = intids.queryObject(doc_id)
+            if IUsersCourseAssignmentHistoryItemFeedback.providedBy(item):
+                catalog.index_doc(doc_id, item)
+                total += 1
+
+    component.getGlobalSiteManager().unregisterUtility(mock_ds, IDataserver)
+    logger.info('Assessment evolution %s done; %s feedback item(s) indexed',
+                generation, total)
+
+
+def evolve(context):
+    """
+    Evolve to generation 48 by installing and populating the feedback
+    catalog.
+    """
+    do_evolve(context)
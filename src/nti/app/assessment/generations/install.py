@@ -11,12 +11,13 @@ __docformat__ = "restructuredtext en"
 
 logger = __import__('logging').getLogger(__name__)
 
-generation = 46
+generation = 48
 
 from zope.generations.generations import SchemaManager
 
 from zope.intid.interfaces import IIntIds
 
+from nti.app.assessment.index import install_feedback_catalog
 from nti.app.assessment.index import install_evaluation_catalog
 from nti.app.assessment.index import install_submission_catalog
 
@@ -45,3 +46,4 @@ def install_catalog(context):
     intids = lsm.getUtility(IIntIds)
     install_submission_catalog(dataserver_folder, intids)
     install_evaluation_catalog(dataserver_folder, intids)
+    install_feedback_catalog(dataserver_folder, intids)
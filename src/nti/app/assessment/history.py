@@ -14,6 +14,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+from collections import namedtuple
+
 from datetime import datetime
 
 from zope import component
@@ -30,6 +32,9 @@ from zope.container.interfaces import INameChooser
 
 from zope.container.ordered import OrderedContainer
 
+from zope.lifecycleevent.interfaces import IObjectRemovedEvent
+from zope.lifecycleevent.interfaces import IObjectModifiedEvent
+
 from zope.location.interfaces import ISublocations
 
 from nti.app.assessment.common.assessed import set_assessed_lineage
@@ -46,7 +51,10 @@ from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItem
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemSummary
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemContainer
 
+from nti.assessment.common import has_submitted_file
+
 from nti.assessment.interfaces import IQAssignment
+from nti.assessment.interfaces import IPlaceholderAssignmentSubmission
 
 from nti.containers.containers import CheckingLastModifiedBTreeContainer
 from nti.containers.containers import CaseInsensitiveCheckingLastModifiedBTreeContainer
@@ -85,6 +93,17 @@ from nti.zodb.minmax import NumericPropertyDefaultingToZero
 logger = __import__('logging').getLogger(__name__)
 
 
+#: The denormalized state a history item summary externalizes, so that
+#: summaries never need to activate the submission, the pending assessment
+#: or the feedback container of the item.
+HistoryItemSummaryRecord = namedtuple('HistoryItemSummaryRecord',
+                                      ('SubmissionCreatedTime',
+                                       'FeedbackCount',
+                                       'HasFile',
+                                       'HasGrade',
+                                       'SyntheticSubmission'))
+
+
 @interface.implementer(IUsersCourseAssignmentHistories)
 class UsersCourseAssignmentHistories(CaseInsensitiveCheckingLastModifiedBTreeContainer):
     """
@@ -154,6 +173,8 @@ class UsersCourseAssignmentHistory(CheckingLastModifiedBTreeContainer):
         key = chooser.chooseName('', item)
         # fire object added, which is dispatched to sublocations
         submission_container[key] = item
+        # after the added subscribers, e.g. auto-grading, have run
+        item.update_summary()
         return item
 
     def __conform__(self, iface):
@@ -240,6 +261,10 @@ class UsersCourseAssignmentHistoryItem(PersistentCreatedModDateTrackingObject,
 
     assignment = alias('Assignment')
 
+    # A plain tuple in the order of the fields of HistoryItemSummaryRecord,
+    # None for items created before the record existed
+    _summary = None
+
     @Lazy
     def Feedback(self):
         container = UsersCourseAssignmentHistoryItemFeedbackContainer()
@@ -258,6 +283,41 @@ class UsersCourseAssignmentHistoryItem(PersistentCreatedModDateTrackingObject,
             return len(self.Feedback)
         return 0
 
+    def _compute_summary(self):
+        submission = self.Submission
+        try:
+            created = submission.createdTime
+        except AttributeError:
+            # Tests may not have a submission
+            created = 0.0
+        return HistoryItemSummaryRecord(
+            created,
+            self.FeedbackCount,
+            bool(submission is not None and has_submitted_file(submission)),
+            bool(self._has_grade),
+            IPlaceholderAssignmentSubmission.providedBy(submission))
+
+    @property
+    def summary(self):
+        """
+        The :class:`HistoryItemSummaryRecord` of this item; computed (but not
+        stored) for items that do not have one yet.
+        """
+        if self._summary is None:
+            return self._compute_summary()
+        return HistoryItemSummaryRecord(*self._summary)
+
+    def update_summary(self, **overrides):
+        """
+        Recompute the summary record of this item, writing only if it changed.
+
+        :param overrides: Summary fields known better by the caller
+        """
+        record = tuple(self._compute_summary()._replace(**overrides))
+        if self._summary != record:
+            self._summary = record  # pylint: disable=attribute-defined-outside-init
+        return HistoryItemSummaryRecord(*record)
+
     def __conform__(self, iface):
         if IUser.isOrExtends(iface):
             # If the user is deleted, we will not be able to do this
@@ -441,13 +501,27 @@ class UsersCourseAssignmentHistoryItemSummary(Contained):
     def lastModified(self):
         return self._history_item.lastModified
 
+    # The following come from the denormalized summary record of the item
+
     @property
     def SubmissionCreatedTime(self):
-        try:
-            return self._history_item.Submission.createdTime
-        except AttributeError:
-            # Tests may not have a submission
-            return 0.0
+        return self._history_item.summary.SubmissionCreatedTime
+
+    @property
+    def FeedbackCount(self):
+        return self._history_item.summary.FeedbackCount
+
+    @property
+    def HasFile(self):
+        return self._history_item.summary.HasFile
+
+    @property
+    def HasGrade(self):
+        return self._history_item.summary.HasGrade
+
+    @property
+    def SyntheticSubmission(self):
+        return self._history_item.summary.SyntheticSubmission
 
     @property
     def links(self):
@@ -467,3 +541,24 @@ class UsersCourseAssignmentHistoryItemSummary(Contained):
         This isn't really correct from a model perspective.
         """
         return to_external_ntiid_oid(self._history_item)
+
+
+@component.adapter(IUsersCourseAssignmentHistoryItem, IObjectModifiedEvent)
+def _on_history_item_modified_update_summary(item, unused_event):
+    item.update_summary()
+
+
+def _on_grade_update_history_item_summary(grade, event):
+    """
+    Grades live in the gradebook, which is built on top of us, and do not
+    modify the history item they belong to; registered for the gradebook
+    events when it is installed.
+    """
+    item = IUsersCourseAssignmentHistoryItem(grade, None)
+    if item is None or not hasattr(item, 'update_summary'):
+        return
+    if IObjectRemovedEvent.providedBy(event):
+        # the grade is still found in its container at this point
+        item.update_summary(HasGrade=False)
+    else:
+        item.update_summary()
@@ -17,15 +17,25 @@ from zope import interface
 
 from zope.deprecation import deprecated
 
+from zope.catalog.interfaces import ICatalog
+
 from zope.intid.interfaces import IIntIds
 
 from zope.location import locate
 
 from nti.assessment.common import has_submitted_file
 
+from nti.app.assessment.common.caching import get_generation
+from nti.app.assessment.common.caching import bump_generation
+from nti.app.assessment.common.caching import clear_request_cache
+
+from nti.app.assessment.common.containment import get_containment_graph
+from nti.app.assessment.common.containment import record_containment_change
+
 from nti.app.assessment.interfaces import IUsersCourseInquiryItem
 from nti.app.assessment.interfaces import IUsersCourseSubmissionItem
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItem
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemFeedback
 
 from nti.assessment.interfaces import IQSurvey
 from nti.assessment.interfaces import IQuestionSet
@@ -106,6 +116,12 @@ IX_ASSESSMENT_ID = 'assesmentId'
 IX_ASSESSMENT_TYPE = 'assesmentType'
 IX_CREATOR = IX_STUDENT = IX_USERNAME = 'creator'
 
+#: Annotation key of the course submission generation counter
+SUBMISSION_GENERATION_KEY = u'SubmissionGeneration'
+
+#: The name of the request scoped submission query cache
+SUBMISSION_REQUEST_CACHE = 'submissions'
+
 
 deprecated('ValidatingCourseIntID', 'No longer used')
 class ValidatingCourseIntID(object):
@@ -304,6 +320,30 @@ class MetadataSubmissionCatalog(DeferredCatalog):
 
     family = BTrees.family64
 
+    #: The checkpoint of a rebuild in progress, if any; see :mod:`._rebuild`
+    rebuild = None
+
+    @property
+    def shadow(self):
+        return getattr(self.rebuild, 'catalog', None)
+
+    def index_doc(self, docid, ob):
+        super(MetadataSubmissionCatalog, self).index_doc(docid, ob)
+        # keep a shadow catalog being rebuilt up to date
+        shadow = self.shadow
+        if shadow is not None:
+            shadow.index_doc(docid, ob)
+        # indexing is deferred; cached queries may have missed this item
+        course = find_interface(ob, ICourseInstance, strict=False)
+        if course is not None:
+            bump_submission_generation(course)
+
+    def unindex_doc(self, docid):
+        super(MetadataSubmissionCatalog, self).unindex_doc(docid)
+        shadow = self.shadow
+        if shadow is not None:
+            shadow.unindex_doc(docid)
+
     def force_index_doc(self, docid, ob): # BWC
         self.index_doc(docid, ob)
 MetadataAssesmentCatalog = MetadataSubmissionCatalog # BWC
@@ -314,6 +354,30 @@ def get_submission_catalog(registry=component):
                                  name=SUBMISSION_CATALOG_NAME)
 
 
+def get_submission_generation(courses):
+    """
+    Return the submission generation stamp of the given courses and
+    whether it is unmodified in this transaction, i.e. whether results
+    validated by it can be shared across requests.
+    """
+    stamp = []
+    result = True
+    for course in courses or ():
+        generation, clean = get_generation(course, SUBMISSION_GENERATION_KEY)
+        stamp.append(generation)
+        result = result and clean
+    return tuple(stamp), result
+
+
+def bump_submission_generation(course):
+    """
+    Invalidate the cached submission queries of the given course. This
+    is called whenever a submission item is added, removed or indexed.
+    """
+    bump_generation(course, SUBMISSION_GENERATION_KEY)
+    clear_request_cache(SUBMISSION_REQUEST_CACHE)
+
+
 def create_submission_catalog(catalog=None, family=BTrees.family64):
     if catalog is None:
         catalog = MetadataSubmissionCatalog(family=family)
@@ -349,6 +413,129 @@ def install_submission_catalog(site_manager_container, intids=None):
     return catalog
 
 
+# Feedback catalog
+
+FEEDBACK_CATALOG_NAME = 'nti.dataserver.++etc++assessment-feedback-catalog'
+
+
+class ValidatingFeedbackSite(ValidatingSite):
+
+    __slots__ = ()
+
+    @classmethod
+    def _folder(cls, obj):
+        if IUsersCourseAssignmentHistoryItemFeedback.providedBy(obj):
+            return find_interface(obj, IHostPolicyFolder, strict=False)
+        return None
+
+
+class FeedbackSiteIndex(ValueIndex):
+    default_field_name = 'site'
+    default_interface = ValidatingFeedbackSite
+
+
+class ValidatingFeedbackCatalogEntryID(ValidatingCatalogEntryID):
+
+    __slots__ = ()
+
+    @classmethod
+    def _entry(cls, obj):
+        if IUsersCourseAssignmentHistoryItemFeedback.providedBy(obj):
+            course = ICourseInstance(obj, None)  # course is lineage
+            return ICourseCatalogEntry(course, None)
+        return None
+
+
+class FeedbackCatalogEntryIDIndex(ValueIndex):
+    default_field_name = 'ntiid'
+    default_interface = ValidatingFeedbackCatalogEntryID
+
+
+class ValidatingFeedbackCreatedUsername(object):
+
+    __slots__ = ('creator_username',)
+
+    def __init__(self, obj, unused_default=None):
+        if not IUsersCourseAssignmentHistoryItemFeedback.providedBy(obj):
+            return
+        try:
+            creator = obj.creator
+            username = getattr(creator, 'username', creator)
+            username = getattr(username, 'id', username)
+            if isinstance(username, six.string_types):
+                self.creator_username = username.lower()
+        except (AttributeError, TypeError):
+            pass
+
+    def __reduce__(self):
+        raise TypeError()
+
+
+def FeedbackCreatorIndex(family=BTrees.family64):
+    return NormalizationWrapper(field_name='creator_username',
+                                interface=ValidatingFeedbackCreatedUsername,
+                                index=CreatorRawIndex(family=family),
+                                normalizer=StringTokenNormalizer())
+
+
+class ValidatingFeedbackAssesmentID(object):
+
+    __slots__ = ('assesmentId',)
+
+    def __init__(self, obj, unused_default=None):
+        if IUsersCourseAssignmentHistoryItemFeedback.providedBy(obj):
+            # feedback -> feedback container -> history item
+            item = getattr(obj.__parent__, '__parent__', None)
+            if IUsersCourseAssignmentHistoryItem.providedBy(item):
+                self.assesmentId = item.assignmentId
+
+    def __reduce__(self):
+        raise TypeError()
+
+
+class FeedbackAssesmentIdIndex(ValueIndex):
+    default_field_name = 'assesmentId'
+    default_interface = ValidatingFeedbackAssesmentID
+
+
+class FeedbackCatalog(Catalog):
+    family = BTrees.family64
+
+
+def get_feedback_catalog(registry=component):
+    return registry.queryUtility(ICatalog, name=FEEDBACK_CATALOG_NAME)
+
+
+def create_feedback_catalog(catalog=None, family=BTrees.family64):
+    catalog = FeedbackCatalog() if catalog is None else catalog
+    for name, clazz in ((IX_SITE, FeedbackSiteIndex),
+                        (IX_CREATOR, FeedbackCreatorIndex),
+                        (IX_COURSE, FeedbackCatalogEntryIDIndex),
+                        (IX_ASSESSMENT_ID, FeedbackAssesmentIdIndex)):
+        index = clazz(family=family)
+        locate(index, catalog, name)
+        catalog[name] = index
+    return catalog
+
+
+def install_feedback_catalog(site_manager_container, intids=None):
+    lsm = site_manager_container.getSiteManager()
+    intids = lsm.getUtility(IIntIds) if intids is None else intids
+    catalog = get_feedback_catalog(lsm)
+    if catalog is not None:
+        return catalog
+
+    catalog = create_feedback_catalog(family=intids.family)
+    locate(catalog, site_manager_container, FEEDBACK_CATALOG_NAME)
+    intids.register(catalog)
+    lsm.registerUtility(catalog,
+                        provided=ICatalog,
+                        name=FEEDBACK_CATALOG_NAME)
+    for index in catalog.values():
+        intids.register(index)
+    return catalog
+
+
 # Evaluation / Containment catalog
 
 
@@ -366,8 +553,6 @@ from pyramid.location import lineage
 
 from zc.catalog.index import SetIndex as ZC_SetIndex
 
-from zope.catalog.interfaces import ICatalog
-
 from nti.contentlibrary.interfaces import IContentUnit
 from nti.contentlibrary.interfaces import IContentPackage
 
@@ -567,9 +752,43 @@ class EvaluationCatalog(Catalog):
     def containment_index(self):
         return self[IX_CONTAINMENT]
 
+    def _get_doc_containment(self, doc_id):
+        index = self.get(IX_CONTAINMENT)
+        if index is None:
+            return None
+        return set(index.documents_to_values.get(doc_id) or ())
+
+    def _containment_changed(self, doc_id, before):
+        after = self._get_doc_containment(doc_id)
+        if before is not None and after is not None and before != after:
+            record_containment_change(self, doc_id, after)
+
+    def index_doc(self, docid, ob):
+        before = self._get_doc_containment(docid)
+        super(EvaluationCatalog, self).index_doc(docid, ob)
+        self._containment_changed(docid, before)
+
+    def unindex_doc(self, docid):
+        before = self._get_doc_containment(docid)
+        super(EvaluationCatalog, self).unindex_doc(docid)
+        self._containment_changed(docid, before)
+
+    def update_containment(self, item, intids=None):
+        """
+        Reindex the containment of the given container.
+        """
+        doc_id = get_uid(item, intids)
+        if doc_id is not None:
+            before = self._get_doc_containment(doc_id)
+            self.containment_index.index_doc(doc_id, item)
+            self._containment_changed(doc_id, before)
+
     def get_containment(self, item, intids=None):
         doc_id = get_uid(item, intids)
         if doc_id is not None:
+            graph = get_containment_graph(self)
+            if graph is not None:
+                return set(graph.get_contained(doc_id))
             result = self.containment_index.documents_to_values.get(doc_id)
             return set(result or ())
         return set()
@@ -156,6 +156,25 @@ class IUsersCourseAssignmentSavepoint(IContainer,
         :param event: Flag to avoid sending a removal/modified event
         """
 
+    def patchSubmission(submission):
+        """
+        Store in the recorded save point of the submission assignment
+        only the question responses that changed.
+
+        :return: The updated :class:`.IUsersCourseAssignmentSavepointItem`
+            or None if there is no save point of the same structure and
+            version, in which case the submission must be recorded.
+        """
+
+    def replaceSubmission(submission):
+        """
+        Replace in place the submission of the recorded save point of the
+        submission assignment, keeping the save point item.
+
+        :return: The updated :class:`.IUsersCourseAssignmentSavepointItem`
+            or None if there is no recorded save point.
+        """
+
 
 class IUsersCourseAssignmentSavepointItem(IContained,
                                           ILastModified,
@@ -321,6 +340,12 @@ class IUsersCourseAssignmentHistoryItemSummary(IContained,
                                    description=u"Typically set automatically by the object.",
                                    default=0.0)
 
+    HasFile = Bool(title=u"Whether the submission has a file part response.",
+                   default=False)
+
+    HasGrade = Bool(title=u"Whether the item has been graded.",
+                    default=False)
+
 
 class IUsersCourseAssignmentHistoryItemFeedback(ITitledContent,
                                                 IModeledContent,
@@ -592,6 +617,62 @@ class ICourseAggregatedInquiries(IContainer,
     contains(IQAggregatedInquiry)
 
 
+class ICourseRunningAggregatedInquiries(IContained):
+    """
+    Running aggregates for the open surveys and polls of a course, keyed
+    by inquiry ntiid.
+
+    The aggregated submission of each :class:`IUsersCourseInquiryItem` is
+    folded in, keyed by its creator, as the item is added, and removed
+    with the item; an aggregate is rebuilt by a full fold only when the
+    removed submission can no longer be subtracted.
+    """
+
+    def get(inquiryId, default=None):
+        """
+        Return the running :class:`IQAggregatedInquiry` for the inquiry
+        or the default if one is not available
+        """
+
+    def count(inquiryId):
+        """
+        Return the number of submissions folded into the running aggregate
+        """
+
+    def store(inquiryId, entries):
+        """
+        Replace the running aggregate for the inquiry
+
+        :param entries: The (key, :class:`IQAggregatedInquiry`) pairs of
+            the submissions in the aggregate
+        """
+
+    def fold(inquiryId, key, aggregated):
+        """
+        Fold the specified :class:`IQAggregatedInquiry` of the submission
+        with the given key into an existing running aggregate.
+
+        :return: ``True`` if there was a running aggregate to update
+        """
+
+    def remove(inquiryId, key):
+        """
+        Remove the submission with the given key from the running aggregate.
+
+        :return: ``False`` if the aggregate must be rebuilt instead
+        """
+
+    def invalidate(inquiryId):
+        """
+        Drop the running aggregate for the inquiry
+        """
+
+    def clear():
+        """
+        Drop all running aggregates
+        """
+
+
 class IQEvaluations(IContainer,
                     IContained,
                     ILastModified,
@@ -698,6 +779,113 @@ class RegradeEvaluationEvent(ObjectRegradeEvent):
 RegradeQuestionEvent = RegradeEvaluationEvent
 
 
+class IRegradeJob(IContained, ILastModified):
+    """
+    The progress of a batched regrade of an evaluation in a course.
+
+    Submissions are regraded user by user; users already done are
+    skipped when the job is resumed.
+    """
+
+    evaluationId = interface.Attribute("The regraded evaluation ntiid")
+
+    total = interface.Attribute("The number of submissions to regrade")
+
+    done = interface.Attribute("The number of submissions regraded")
+
+    state = interface.Attribute("The job state")
+
+    error = interface.Attribute("The error message of a failed job")
+
+    def is_done(key):
+        """
+        Return whether the submissions of the (username, assignmentId)
+        key have been regraded
+        """
+
+    def mark_done(key, count):
+        """
+        Record that the ``count`` submissions of the (username,
+        assignmentId) key were regraded
+        """
+
+    def is_finished():
+        """
+        Return whether the job ran to completion or failed
+        """
+
+
+class ICourseRegradeJobs(IContained):
+    """
+    The regrade jobs of a course, keyed by evaluation ntiid.
+    """
+
+    def get(evaluationId, default=None):
+        """
+        Return the :class:`IRegradeJob` of the evaluation
+        """
+
+    def create(evaluationId, total):
+        """
+        Create and return a new job for the evaluation, replacing any
+        previous one
+        """
+
+    def remove(evaluationId):
+        """
+        Remove the job of the evaluation
+        """
+
+
+class IAssignmentResponseColumns(IContained):
+    """
+    The assessed responses of the submissions of an assignment in a course,
+    stored as one packed block of columns per history item so aggregates
+    can be computed without loading the submissions. Blocks are only
+    added and removed, so concurrent submissions do not conflict.
+    """
+
+    assignmentId = interface.Attribute("The assignment ntiid")
+
+    def record(doc_id, block):
+        """
+        Store the packed block of the history item with the given intid,
+        replacing any previous one
+        """
+
+    def remove(doc_id):
+        """
+        Remove the block of the history item with the given intid
+        """
+
+    def blocks():
+        """
+        Return an iterable of (intid, block) tuples
+        """
+
+
+class ICourseResponseColumns(IContained):
+    """
+    The :class:`IAssignmentResponseColumns` of a course, keyed by
+    assignment ntiid.
+    """
+
+    def get(assignmentId, default=None):
+        """
+        Return the columns of the assignment
+        """
+
+    def get_or_create(assignmentId):
+        """
+        Return the columns of the assignment, creating them if needed
+        """
+
+    def remove(assignmentId):
+        """
+        Remove the columns of the assignment
+        """
+
+
 class ISolutionDecorationConfig(interface.Interface):
     """
     Should solutions be decorated at all?  Some sites (e.g. SkillsUSA)
@@ -706,3 +894,19 @@ class ISolutionDecorationConfig(interface.Interface):
     """
 
     ShouldExposeSolutions = Bool(title=u"ShouldExposeSolutions")
+
+
+class ISavepointConfig(interface.Interface):
+    """
+    How assignment save points are stored. Differential save points only
+    write the question responses changed since the last save point; with
+    a coalescing interval, the save points posted within that many seconds
+    of the last one written are buffered in memory rather than written.
+    """
+
+    Differential = Bool(title=u"Store only the changed question responses",
+                        default=False)
+
+    CoalesceInterval = Int(title=u"Seconds during which save points are buffered",
+                           default=0,
+                           min=0)
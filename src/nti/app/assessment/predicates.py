@@ -10,7 +10,7 @@ from __future__ import absolute_import
 
 from zope import component
 
-from zope.security.interfaces import IPrincipal
+from nti.app.assessment.common.submissions import get_feedback_by_creator
 
 from nti.app.assessment.interfaces import IUsersCourseInquiry
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistory
@@ -20,7 +20,6 @@ from nti.assessment.interfaces import IQEvaluation
 from nti.assessment.interfaces import IQEditableEvaluation
 
 from nti.contenttypes.courses.interfaces import ICourseInstance
-from nti.contenttypes.courses.interfaces import ICourseEnrollments
 from nti.contenttypes.courses.interfaces import IPrincipalEnrollments
 from nti.contenttypes.courses.interfaces import IPrincipalAdministrativeRoleCatalog
 
@@ -29,8 +28,6 @@ from nti.dataserver.interfaces import ISystemUserPrincipal
 
 from nti.dataserver.metadata.predicates import BasePrincipalObjects
 
-from nti.dataserver.users.users import User
-
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -88,25 +85,11 @@ class _AssignmentHistoryPrincipalObjects(BasePrincipalObjects):
         return result
 
     def instructor_feedback_items(self):
-        result = []
-        for course in self.get_instructed_courses(self.user):
-            enrollments = ICourseEnrollments(course)
-            # pylint: disable=too-many-function-args
-            for record in enrollments.iter_enrollments():
-                student = IPrincipal(record, None)
-                if student is None:
-                    continue
-                student = User.get_user(student.id)
-                items = component.queryMultiAdapter((course, student),
-                                                    IUsersCourseAssignmentHistory)
-                if not items:
-                    continue
-                for item in items:
-                    if not item.has_feedback():
-                        continue
-                    result.extend(self.feedback_items(item.Feedback, 
-                                                      self.username))
-        return result
+        courses = list(self.get_instructed_courses(self.user))
+        if not courses:
+            return []
+        # feedback is indexed by creator and course
+        return get_feedback_by_creator(self.username, courses)
 
     def iter_objects(self):
         result = self.history_items()
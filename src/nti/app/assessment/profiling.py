@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Request scoped profiling of the assessment views and decorators.
+
+When profiling is enabled (with the ``AssessmentProfiling`` admin view or
+the ``NTI_ASSESSMENT_PROFILING`` environment variable) the ZODB object
+loads, the queries of the evaluation, submission and metadata catalogs
+and the calls of each of our external decorators are counted and timed
+for every request served by one of our views. The totals are sent to
+admins in a ``Server-Timing`` response header and aggregated per
+endpoint.
+
+The flag set by the admin view is stored in the dataserver folder, and
+every process reads it as its requests are traversed. Profiling works by
+wrapping the measured callables while it is enabled; when it is disabled
+the originals are restored and the only cost left is one flag check per
+request. The aggregated statistics are kept by each process and only
+cover the requests it served.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import time
+import inspect
+import pkgutil
+import functools
+import importlib
+import threading
+
+from persistent import Persistent
+
+from pyramid.interfaces import IView
+from pyramid.interfaces import IViewClassifier
+
+from ZODB.Connection import Connection
+
+from zope.annotation.interfaces import IAnnotations
+
+from zope.catalog.catalog import Catalog as ZopeCatalog
+
+from zope.component.hooks import getSite
+
+from zope.interface import providedBy
+
+from nti.app.assessment.index import EVALUATION_CATALOG_NAME
+from nti.app.assessment.index import SUBMISSION_CATALOG_NAME
+
+from nti.app.assessment.index import EvaluationCatalog
+from nti.app.assessment.index import MetadataSubmissionCatalog
+
+from nti.app.authentication import get_remote_user
+
+from nti.common.string import is_true
+
+from nti.dataserver.authorization import is_admin
+
+from nti.dataserver.interfaces import IDataserverFolder
+
+from nti.traversal.traversal import find_interface
+
+from nti.zope_catalog.catalog import Catalog
+from nti.zope_catalog.catalog import DeferredCatalog
+
+#: The environment variable enabling profiling in a process
+PROFILING_ENV = 'NTI_ASSESSMENT_PROFILING'
+
+#: The annotation key of the profiling settings in the dataserver folder
+PROFILING_SETTINGS_KEY = u'nti.app.assessment.profiling.ProfilingSettings'
+
+#: The response header with the profile of the request
+PROFILE_HEADER = 'Server-Timing'
+
+#: The number of endpoints aggregated before new ones are ignored
+MAX_ENDPOINTS = 500
+
+ZODB_LOADS = u'zodb'
+CATALOG_QUERIES = u'catalog'
+DECORATOR_CALLS = u'decorator'
+
+#: The methods of the external decorators that are timed
+DECORATOR_METHODS = ('decorateExternalMapping', 'decorateExternalObject')
+
+_CATALOG_LABELS = {
+    EVALUATION_CATALOG_NAME: u'evaluation',
+    SUBMISSION_CATALOG_NAME: u'submission',
+}
+
+_installed = False
+
+_patches = []
+
+_marker = object()
+
+_state = threading.local()
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class RequestProfile(object):
+    """
+    The counts and times of the profiled calls of one request.
+    """
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self.start = time.time()
+        self.elapsed = None
+        self.counters = {}
+        self.active = set()
+
+    def add(self, key, elapsed):
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = [0, 0.0]
+        counter[0] += 1
+        counter[1] += elapsed
+
+    def finish(self):
+        self.elapsed = time.time() - self.start
+        return self
+
+    def header(self):
+        """
+        Return the value of the ``Server-Timing`` header of this profile,
+        in milliseconds.
+        """
+        result = []
+        for key, (count, elapsed) in sorted(self.counters.items()):
+            result.append('%s;desc="%s";dur=%.2f'
+                          % (key.replace('.', '-'), count, elapsed * 1000))
+        if self.elapsed is not None:
+            result.append('total;dur=%.2f' % (self.elapsed * 1000))
+        return ', '.join(result)
+
+
+class ProfileStatistics(object):
+    """
+    The aggregated profiles of the endpoints.
+    """
+
+    def __init__(self, max_endpoints=MAX_ENDPOINTS):
+        self.max_endpoints = max_endpoints
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, profile):
+        with self.lock:
+            stats = self.endpoints.get(profile.endpoint)
+            if stats is None:
+                if len(self.endpoints) >= self.max_endpoints:
+                    return
+                stats = self.endpoints[profile.endpoint] = {
+                    'Count': 0, 'Total': 0.0, 'Max': 0.0, 'Counters': {},
+                }
+            stats['Count'] += 1
+            stats['Total'] += profile.elapsed
+            stats['Max'] = max(stats['Max'], profile.elapsed)
+            counters = stats['Counters']
+            for key, (count, elapsed) in profile.counters.items():
+                counter = counters.get(key)
+                if counter is None:
+                    counter = counters[key] = [0, 0.0]
+                counter[0] += count
+                counter[1] += elapsed
+
+    def slowest(self, limit=None, sort_on='Mean'):
+        """
+        Return the statistics of the slowest endpoints.
+        """
+        result = []
+        with self.lock:
+            for endpoint, stats in self.endpoints.items():
+                count = stats['Count']
+                counters = {
+                    key: {'Count': x[0], 'Total': x[1], 'PerRequest': x[0] / count}
+                    for key, x in stats['Counters'].items()
+                }
+                result.append({
+                    'Endpoint': endpoint,
+                    'Count': count,
+                    'Total': stats['Total'],
+                    'Max': stats['Max'],
+                    'Mean': stats['Total'] / count,
+                    'Counters': counters,
+                })
+        result.sort(key=lambda x: x[sort_on], reverse=True)
+        return result[:limit] if limit else result
+
+    def clear(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+statistics = ProfileStatistics()
+
+
+def current_profile():
+    return getattr(_state, 'profile', None)
+
+
+def _timed(func, category, key=None):
+    """
+    Wrap the given function so that its calls are counted under ``key``
+    (or the key returned by calling ``key`` with the arguments) when a
+    profile is active. Nested calls of the same category are counted once.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = getattr(_state, 'profile', None)
+        if profile is None or category in profile.active:
+            return func(*args, **kwargs)
+        name = key(*args) if callable(key) else (key or category)
+        if name is None:
+            return func(*args, **kwargs)
+        profile.active.add(category)
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.add(name, time.time() - start)
+            profile.active.discard(category)
+    return wrapper
+
+
+def _patch(owner, name, wrapper):
+    _patches.append((owner, name, owner.__dict__.get(name, _marker)))
+    setattr(owner, name, wrapper)
+
+
+def _unpatch_all():
+    while _patches:
+        owner, name, original = _patches.pop()
+        if original is _marker:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+
+
+def _catalog_key(catalog, *unused_args):
+    name = getattr(catalog, '__name__', None) or u''
+    label = _CATALOG_LABELS.get(name)
+    if label is None and u'metadata' in name:
+        label = u'metadata'
+    return u'%s.%s' % (CATALOG_QUERIES, label) if label else None
+
+
+def _function(attr):
+    return getattr(attr, '__func__', attr)
+
+
+def _decorator_classes():
+    from nti.app.assessment import decorators
+    for _, module_name, is_pkg in pkgutil.iter_modules(decorators.__path__):
+        if is_pkg:
+            continue
+        name = '%s.%s' % (decorators.__name__, module_name)
+        module = importlib.import_module(name)
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ == name:
+                yield module_name, cls
+
+
+def _patch_decorators():
+    # resolve all the originals before wrapping, as our decorators
+    # subclass each other
+    methods = []
+    for module_name, cls in _decorator_classes():
+        key = u'%s.%s.%s' % (DECORATOR_CALLS, module_name, cls.__name__)
+        for name in DECORATOR_METHODS:
+            method = getattr(cls, name, None)
+            if method is not None:
+                methods.append((cls, name, _function(method), key))
+    for cls, name, func, key in methods:
+        _patch(cls, name, _timed(func, DECORATOR_CALLS, key))
+
+
+def _catalog_classes():
+    seen = set()
+    for cls in (ZopeCatalog, Catalog, DeferredCatalog,
+                EvaluationCatalog, MetadataSubmissionCatalog):
+        if 'apply' in cls.__dict__ and cls not in seen:
+            seen.add(cls)
+            yield cls
+
+
+class ProfilingSettings(Persistent):
+    """
+    The profiling settings shared by all the processes.
+    """
+
+    enabled = False
+
+
+def _dataserver_folder(context=None):
+    return find_interface(context if context is not None else getSite(),
+                          IDataserverFolder,
+                          strict=False)
+
+
+def get_profiling_settings(context=None, create=False):
+    folder = _dataserver_folder(context)
+    annotations = IAnnotations(folder, None) if folder is not None else None
+    if annotations is None:
+        return None
+    result = annotations.get(PROFILING_SETTINGS_KEY)
+    if result is None and create:
+        result = annotations[PROFILING_SETTINGS_KEY] = ProfilingSettings()
+    return result
+
+
+def is_profiling_enabled(context=None):
+    if is_true(os.getenv(PROFILING_ENV)):
+        return True
+    settings = get_profiling_settings(context)
+    return bool(getattr(settings, 'enabled', False))
+
+
+def _install_hooks():
+    global _installed
+    if _installed:
+        return
+    _patch(Connection, 'setstate',
+           _timed(_function(Connection.setstate), ZODB_LOADS))
+    for cls in _catalog_classes():
+        _patch(cls, 'apply',
+               _timed(_function(cls.apply), CATALOG_QUERIES, _catalog_key))
+    _patch_decorators()
+    _installed = True
+    logger.info("Assessment profiling enabled")
+
+
+def _remove_hooks():
+    global _installed
+    _state.profile = None
+    if not _installed:
+        return
+    _unpatch_all()
+    _installed = False
+    logger.info("Assessment profiling disabled")
+
+
+def _sync_hooks(enabled):
+    if enabled:
+        _install_hooks()
+    else:
+        _remove_hooks()
+
+
+def enable_profiling(context=None):
+    """
+    Start profiling the assessment requests of all the processes.
+    """
+    settings = get_profiling_settings(context, create=True)
+    settings.enabled = True
+    _install_hooks()
+
+
+def disable_profiling(context=None):
+    """
+    Stop profiling; the profiled callables are restored by each process.
+    """
+    settings = get_profiling_settings(context)
+    if settings is not None and settings.enabled:
+        settings.enabled = False
+    _remove_hooks()
+
+
+def _endpoint(request):
+    context = getattr(request, 'context', None)
+    view_name = getattr(request, 'view_name', None) or u''
+    return u'%s %s/@@%s' % (request.method, type(context).__name__, view_name)
+
+
+def _is_assessment_view(request):
+    """
+    Return whether the request is served by one of our views.
+    """
+    view = request.registry.adapters.lookup((IViewClassifier,
+                                             request.request_iface,
+                                             providedBy(request.context)),
+                                            IView,
+                                            name=request.view_name or u'')
+    # pyramid combines the views with predicates
+    views = getattr(view, 'views', None)
+    views = [x[1] for x in views] if views else [view]
+    package = __name__.rsplit('.', 1)[0] + '.'
+    for view in views:
+        view = getattr(view, '__original_view__', view)
+        if (getattr(view, '__module__', None) or '').startswith(package):
+            return True
+    return False
+
+
+def _on_context_found(event):
+    _state.profile = None
+    enabled = is_profiling_enabled()
+    _sync_hooks(enabled)
+    request = event.request
+    if enabled and _is_assessment_view(request):
+        _state.profile = RequestProfile()
+
+
+def _on_new_response(event):
+    profile = getattr(_state, 'profile', None)
+    if profile is None:
+        return
+    _state.profile = None
+    request = event.request
+    profile.endpoint = _endpoint(request)
+    statistics.record(profile.finish())
+    try:
+        user = get_remote_user(request)
+        if user is not None and is_admin(user):
+            event.response.headers[PROFILE_HEADER] = profile.header()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Cannot add the profile of %s", profile.endpoint)
+
+
+def _cleanup():
+    _remove_hooks()
+    statistics.clear()
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_cleanup)
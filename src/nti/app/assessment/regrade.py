@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batched regrade jobs.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+
+from BTrees.IOBTree import IOBTree
+
+from BTrees.Length import Length
+
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+
+from zope import component
+from zope import interface
+
+from zope.annotation.interfaces import IAnnotations
+
+from zope.container.contained import Contained
+
+from nti.app.assessment.interfaces import IRegradeJob
+from nti.app.assessment.interfaces import ICourseRegradeJobs
+
+from nti.contenttypes.courses.interfaces import ICourseInstance
+
+from nti.dublincore.datastructures import PersistentCreatedModDateTrackingObject
+
+#: The job is waiting for its first batch
+REGRADE_PENDING = u'Pending'
+
+#: Some batches have been processed
+REGRADE_RUNNING = u'Running'
+
+#: All submissions have been regraded
+REGRADE_SUCCESS = u'Success'
+
+#: A batch failed; the job can be resumed
+REGRADE_FAILED = u'Failed'
+
+#: The annotation key of the regrade jobs of a course
+REGRADE_JOBS_KEY = u'RegradeJobs'
+
+#: The number of seconds after which an unfinished job that made no
+#: progress is considered dead
+REGRADE_JOB_TIMEOUT = 3600
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IRegradeJob)
+class RegradeJob(PersistentCreatedModDateTrackingObject, Contained):
+
+    error = None
+    state = REGRADE_PENDING
+
+    #: Whether the job must be run again once done, e.g. because the
+    #: policies of the evaluation changed while it was running
+    rerun = False
+
+    #: The (username, assignmentId) keys to regrade and the intids of
+    #: their history items, by position, and the position of the next
+    #: key to regrade
+    _cursor = None
+    position = 0
+
+    def __init__(self, evaluationId=None, total=0):
+        super(RegradeJob, self).__init__()
+        self.evaluationId = evaluationId
+        self.total = total
+        self._done = Length()
+        self._users = OOTreeSet()
+
+    @property
+    def done(self):
+        return self._done()
+
+    def is_done(self, key):
+        return key in self._users
+
+    def mark_done(self, key, count):
+        self._users.add(key)
+        self._done.change(count)
+        self.updateLastMod()
+
+    @property
+    def has_cursor(self):
+        return self._cursor is not None
+
+    def set_cursor(self, entries):
+        """
+        Store the (key, intids) entries to regrade, where the key is the
+        (username, assignmentId) pair the history items belong to.
+        """
+        self._cursor = IOBTree()
+        for position, (key, doc_ids) in enumerate(entries):
+            self._cursor[position] = (tuple(key), tuple(doc_ids))
+        self.position = 0
+
+    def iter_cursor(self):
+        """
+        Iterate the (position, (key, intids)) entries not regraded yet.
+        """
+        if self._cursor is None:
+            return iter(())
+        return self._cursor.iteritems(self.position)
+
+    def advance(self, position):
+        self.position = position + 1
+
+    def is_finished(self):
+        return self.state in (REGRADE_SUCCESS, REGRADE_FAILED)
+
+    def is_stale(self, timeout=REGRADE_JOB_TIMEOUT):
+        """
+        Return whether the job is unfinished but made no progress in the
+        last ``timeout`` seconds, e.g. because its worker died.
+        """
+        return  not self.is_finished() \
+            and time.time() - self.lastModified > timeout
+
+    @property
+    def eta(self):
+        """
+        The estimated number of seconds until the job is done.
+        """
+        done = self.done
+        if self.state != REGRADE_RUNNING or not done:
+            return None
+        elapsed = max(self.lastModified - self.createdTime, 0)
+        return elapsed / done * max(self.total - done, 0)
+
+
+@interface.implementer(ICourseRegradeJobs)
+class CourseRegradeJobs(PersistentCreatedModDateTrackingObject, Contained):
+
+    def __init__(self):
+        super(CourseRegradeJobs, self).__init__()
+        self._jobs = OOBTree()
+
+    def get(self, evaluationId, default=None):
+        return self._jobs.get(evaluationId, default)
+
+    def create(self, evaluationId, total):
+        job = RegradeJob(evaluationId, total)
+        job.createdTime = job.lastModified = time.time()
+        job.__parent__ = self
+        job.__name__ = evaluationId
+        self._jobs[evaluationId] = job
+        self.updateLastMod()
+        return job
+
+    def remove(self, evaluationId):
+        return self._jobs.pop(evaluationId, None)
+
+    def __contains__(self, evaluationId):
+        return evaluationId in self._jobs
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+@component.adapter(ICourseInstance)
+@interface.implementer(ICourseRegradeJobs)
+def _regrade_jobs_for_course(course):
+    annotations = IAnnotations(course)
+    try:
+        result = annotations[REGRADE_JOBS_KEY]
+    except KeyError:
+        result = CourseRegradeJobs()
+        annotations[REGRADE_JOBS_KEY] = result
+        result.__name__ = REGRADE_JOBS_KEY
+        result.__parent__ = course
+    return result
+
+
+def get_regrade_job(course, evaluationId):
+    """
+    Return the regrade job of the evaluation in the course, if any,
+    without creating the jobs container.
+    """
+    annotations = IAnnotations(course, None)
+    jobs = annotations.get(REGRADE_JOBS_KEY) if annotations else None
+    return jobs.get(evaluationId) if jobs is not None else None
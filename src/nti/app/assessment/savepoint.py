@@ -10,6 +10,11 @@ from __future__ import absolute_import
 
 # pylint: disable=too-many-function-args
 
+import copy
+import time
+
+from persistent import Persistent
+
 from pyramid.interfaces import IRequest
 
 from ZODB.interfaces import IConnection
@@ -36,12 +41,15 @@ from nti.app.assessment.adapters import course_from_context_lineage
 
 from nti.app.assessment.common.assessed import set_assessed_lineage
 
+from nti.app.assessment.common.caching import LRUCache
+
 from nti.app.assessment.interfaces import IUsersCourseAssignmentSavepoint
 from nti.app.assessment.interfaces import IUsersCourseAssignmentSavepoints
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItem
 from nti.app.assessment.interfaces import IUsersCourseAssignmentSavepointItem
 
 from nti.assessment.interfaces import IQAssessment
+from nti.assessment.interfaces import IQUploadedFile
 
 from nti.containers.containers import CheckingLastModifiedBTreeContainer
 from nti.containers.containers import CaseInsensitiveCheckingLastModifiedBTreeContainer
@@ -63,6 +71,8 @@ from nti.dataserver.users.users import User
 
 from nti.dublincore.datastructures import PersistentCreatedModDateTrackingObject
 
+from nti.externalization.externalization import to_external_object
+
 from nti.externalization.interfaces import StandardExternalFields
 
 from nti.property.property import alias
@@ -159,6 +169,31 @@ class UsersCourseAssignmentSavepoint(CheckingLastModifiedBTreeContainer):
             self._delitemf(submission.assignmentId, False)
             locate(item, None, None)
 
+    def patchSubmission(self, submission):
+        item = self.get(submission.assignmentId)
+        stored = getattr(item, 'Submission', None)
+        if stored is None or not patch_savepoint_submission(stored, submission):
+            return None
+        item.updateLastMod()
+        self.lastModified = max(self.lastModified, item.lastModified)
+        return item
+
+    def replaceSubmission(self, submission):
+        item = self.get(submission.assignmentId)
+        if item is None:
+            return None
+        transfer_submission_file_data(source=item.Submission,
+                                      target=submission)
+        # bypass the field validation, as in recordSavepointItem
+        item.__dict__['Submission'] = submission
+        item._p_changed = True
+        submission.__parent__ = item
+        set_assessed_lineage(submission)
+        item.updateLastMod()
+        self.lastModified = max(self.lastModified, item.lastModified)
+        lifecycleevent.modified(item)
+        return item
+
     def _append(self, key, item, event=False):
         if CheckingLastModifiedBTreeContainer.__contains__(self, key):
             if item.__parent__ is self:
@@ -190,6 +225,144 @@ class UsersCourseAssignmentSavepoint(CheckingLastModifiedBTreeContainer):
         return acl_from_aces(aces)
 
 
+def _has_files(question):
+    return any(IQUploadedFile.providedBy(x) for x in question.parts or ())
+
+
+def submission_has_files(submission):
+    for part in submission.parts or ():
+        for question in getattr(part, 'questions', None) or ():
+            if _has_files(question):
+                return True
+    return False
+
+
+#: The responses of the save points posted inside the coalescing window
+#: of a stored save point item, by item oid. They are held in memory
+#: rather than written; each process has its own.
+_SAVEPOINT_BUFFER = LRUCache(size=10000)
+
+
+def buffer_savepoint_submission(item, submission):
+    """
+    Hold the responses of the given save point submission in memory
+    instead of writing them to the stored save point item.
+
+    :return: Whether the submission was buffered
+    """
+    oid = getattr(item, '_p_oid', None)
+    if oid is None:
+        return False
+    parts = to_external_object(submission.parts, decorate=False)
+    # the buffer is only valid until the item is written again
+    _SAVEPOINT_BUFFER.set(oid, (item.lastModified, time.time(), parts))
+    return True
+
+
+def get_buffered_savepoint(item):
+    """
+    Return the external form of the stored save point item with the
+    responses buffered since it was last written, or None.
+    """
+    oid = getattr(item, '_p_oid', None)
+    buffered = _SAVEPOINT_BUFFER.get(oid) if oid is not None else None
+    if buffered is None:
+        return None
+    written, lastModified, parts = buffered
+    if written != item.lastModified:
+        # written since, possibly by another process
+        _SAVEPOINT_BUFFER.pop(oid)
+        return None
+    result = to_external_object(item)
+    submission = result.get('Submission')
+    if isinstance(submission, dict):
+        submission['parts'] = copy.deepcopy(parts)
+        submission[StandardExternalFields.LAST_MODIFIED] = lastModified
+    result[StandardExternalFields.LAST_MODIFIED] = lastModified
+    return result
+
+
+def discard_buffered_savepoint(item):
+    oid = getattr(item, '_p_oid', None)
+    if oid is not None:
+        _SAVEPOINT_BUFFER.pop(oid)
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_SAVEPOINT_BUFFER.clear)
+
+
+def _responses(question):
+    return to_external_object(question.parts, decorate=False)
+
+
+def _changed_questions(stored_part, part):
+    """
+    Return the (index, question) pairs of the given question set
+    submission whose responses differ from the stored ones or None if
+    the question sets differ.
+    """
+    if stored_part.questionSetId != part.questionSetId:
+        return None
+    stored_questions = list(stored_part.questions or ())
+    questions = list(part.questions or ())
+    if     [q.questionId for q in stored_questions] \
+        != [q.questionId for q in questions]:
+        return None
+    result = []
+    for idx, (old, new) in enumerate(zip(stored_questions, questions)):
+        if _has_files(old) or _has_files(new):
+            # files are transferred by a full replacement
+            return None
+        if _responses(old) != _responses(new):
+            result.append((idx, new))
+    return result
+
+
+def patch_savepoint_submission(stored, submission):
+    """
+    Replace in the stored save point submission the question submissions
+    whose responses changed in the given submission, leaving the others
+    (and their persistent state) untouched. Returns False, without any
+    change, when the submissions differ in assignment, version or
+    structure.
+    """
+    if     stored.assignmentId != submission.assignmentId \
+        or getattr(stored, 'version', None) != getattr(submission, 'version', None):
+        return False
+    stored_parts = list(stored.parts or ())
+    parts = list(submission.parts or ())
+    if len(stored_parts) != len(parts):
+        return False
+    patches = []
+    for stored_part, part in zip(stored_parts, parts):
+        changed = _changed_questions(stored_part, part)
+        if changed is None:
+            return False
+        if changed:
+            patches.append((stored_part, changed))
+    for stored_part, changed in patches:
+        questions = stored_part.questions
+        if isinstance(questions, tuple):
+            questions = list(questions)
+        for idx, question in changed:
+            question.__parent__ = stored_part
+            questions[idx] = question
+        if isinstance(stored_part.questions, tuple):
+            stored_part.questions = tuple(questions)
+        # the question set submission may be stored with the submission
+        owner = stored_part if isinstance(stored_part, Persistent) else stored
+        if isinstance(owner, Persistent):
+            owner._p_changed = True
+    if patches and hasattr(stored, 'updateLastMod'):
+        stored.updateLastMod()
+    return True
+
+
 @interface.implementer(IUsersCourseAssignmentSavepointItem,
                        IACLProvider,
                        ISublocations)
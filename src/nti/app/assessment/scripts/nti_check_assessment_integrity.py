@@ -13,9 +13,11 @@ import os
 import sys
 import argparse
 
+import transaction
+
 from zope import component
 
-from nti.app.assessment._integrity_check import check_assessment_integrity
+from nti.app.assessment._integrity_check import AssessmentIntegrityChecker
 
 from nti.contentlibrary.interfaces import IContentPackageLibrary
 
@@ -24,10 +26,29 @@ from nti.dataserver.utils import run_with_dataserver
 from nti.dataserver.utils.base_script import create_context
 
 
-def _process_args(unparented=False):
+def _report_path(args):
+    if not args.report or args.workers <= 1:
+        return args.report
+    return '%s.%s' % (args.report, args.worker)
+
+
+def _process_args(args):
     library = component.getUtility(IContentPackageLibrary)
     library.syncContentPackages()
-    check_assessment_integrity(unparented)
+    path = _report_path(args)
+    report = open(path, 'a') if path else None
+    try:
+        checker = AssessmentIntegrityChecker(remove=args.remove,
+                                             sites=args.sites,
+                                             packages=args.packages,
+                                             report=report,
+                                             worker=args.worker,
+                                             workers=args.workers,
+                                             transaction_manager=transaction.manager)
+        checker.run()
+    finally:
+        if report is not None:
+            report.close()
 
 
 def main():
@@ -40,12 +61,41 @@ def main():
                             action='store_true',
                             dest='remove')
 
+    arg_parser.add_argument('-s', '--site',
+                            help="Check this site; may be repeated",
+                            action='append',
+                            dest='sites')
+
+    arg_parser.add_argument('-p', '--package',
+                            help="Check the evaluations of this package; may be repeated",
+                            action='append',
+                            dest='packages')
+
+    arg_parser.add_argument('-o', '--report',
+                            help="Append the findings to this JSONL file; "
+                                 "workers add their index to the name",
+                            dest='report')
+
+    arg_parser.add_argument('-w', '--workers',
+                            help="Number of worker processes",
+                            type=int,
+                            default=1,
+                            dest='workers')
+
+    arg_parser.add_argument('-i', '--worker',
+                            help="Index of this worker process",
+                            type=int,
+                            default=0,
+                            dest='worker')
+
     args = arg_parser.parse_args()
+    if not 0 <= args.worker < args.workers:
+        raise ValueError("Invalid worker index")
+
     env_dir = os.getenv('DATASERVER_DIR')
     if not env_dir or not os.path.exists(env_dir) and not os.path.isdir(env_dir):
         raise IOError("Invalid dataserver environment root directory")
 
-    remove = args.remove
     verbose = args.verbose
 
     context = create_context(env_dir, with_library=True)
@@ -55,7 +105,7 @@ def main():
                         context=context,
                         minimal_ds=True,
                         verbose=verbose,
-                        function=lambda: _process_args(remove))
+                        function=lambda: _process_args(args))
     sys.exit(0)
 
 
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import print_function, absolute_import, division
+__docformat__ = "restructuredtext en"
+
+logger = __import__('logging').getLogger(__name__)
+
+import sys
+import argparse
+
+from nti.app.assessment.benchmarks import REGRESSION_THRESHOLD
+
+from nti.app.assessment.benchmarks import load_results
+from nti.app.assessment.benchmarks import compare_results
+from nti.app.assessment.benchmarks import format_comparison
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare two assessment benchmark runs")
+    arg_parser.add_argument('baseline', help="The baseline results file")
+    arg_parser.add_argument('current', help="The current results file")
+
+    arg_parser.add_argument('-m', '--metric',
+                            help="The timing to compare",
+                            choices=('Min', 'Max', 'Mean', 'Median', 'Total', 'CPU'),
+                            default='Median',
+                            dest='metric')
+
+    arg_parser.add_argument('-t', '--threshold',
+                            help="Relative slowdown reported as a regression",
+                            type=float,
+                            default=REGRESSION_THRESHOLD,
+                            dest='threshold')
+
+    args = arg_parser.parse_args()
+    rows = compare_results(load_results(args.baseline),
+                           load_results(args.current),
+                           threshold=args.threshold,
+                           metric=args.metric)
+    print(format_comparison(rows))
+    sys.exit(1 if any(row[-1] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
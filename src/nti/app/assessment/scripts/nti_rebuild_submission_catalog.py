@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import print_function, absolute_import, division
+__docformat__ = "restructuredtext en"
+
+logger = __import__('logging').getLogger(__name__)
+
+import os
+import sys
+import argparse
+
+import transaction
+
+from nti.app.assessment._rebuild import SubmissionCatalogRebuilder
+
+from nti.dataserver.utils import run_with_dataserver
+
+from nti.dataserver.utils.base_script import create_context
+
+
+def _process_args(args):
+    rebuilder = SubmissionCatalogRebuilder(worker=args.worker,
+                                           workers=args.workers,
+                                           transaction_manager=transaction.manager)
+    rebuilder.start(shadow=args.shadow, restart=args.restart)
+    stats = rebuilder.run(args.courses)
+    logger.info("Indexed %s item(s) in %s course(s); %s course(s) done overall. Finished: %s",
+                stats['Items'], stats['Courses'], stats['Completed'], stats['Finished'])
+    return stats
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Rebuild the submission catalog")
+    arg_parser.add_argument('-v', '--verbose', help="Be Verbose",
+                            action='store_true', dest='verbose')
+
+    arg_parser.add_argument('-s', '--shadow',
+                            help="Build into a shadow catalog swapped in when done",
+                            action='store_true',
+                            dest='shadow')
+
+    arg_parser.add_argument('-r', '--restart',
+                            help="Discard the rebuild in progress, if any",
+                            action='store_true',
+                            dest='restart')
+
+    arg_parser.add_argument('-c', '--courses',
+                            help="Maximum number of courses to index",
+                            type=int,
+                            dest='courses')
+
+    arg_parser.add_argument('-w', '--workers',
+                            help="Number of worker processes",
+                            type=int,
+                            default=1,
+                            dest='workers')
+
+    arg_parser.add_argument('-i', '--worker',
+                            help="Index of this worker process",
+                            type=int,
+                            default=0,
+                            dest='worker')
+
+    args = arg_parser.parse_args()
+    if not 0 <= args.worker < args.workers:
+        raise ValueError("Invalid worker index")
+
+    env_dir = os.getenv('DATASERVER_DIR')
+    if not env_dir or not os.path.exists(env_dir) and not os.path.isdir(env_dir):
+        raise IOError("Invalid dataserver environment root directory")
+
+    context = create_context(env_dir, with_library=True)
+    conf_packages = ('nti.appserver',)
+    run_with_dataserver(environment_dir=env_dir,
+                        xmlconfig_packages=conf_packages,
+                        context=context,
+                        minimal_ds=True,
+                        verbose=args.verbose,
+                        function=lambda: _process_args(args))
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from nti.contentsearch.interfaces import ISearchHitPredicate
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class IBatchSearchHitPredicate(ISearchHitPredicate):
+    """
+    A search hit predicate that can evaluate a whole page of hits at once,
+    sharing its catalog queries and per-course lookups.
+    """
+
+    def allow_all(items, scores, query=None):
+        """
+        Return a list with the decision of ``allow`` for each of the given
+        items, in order.
+        """
@@ -17,16 +17,19 @@ from zope import interface
 
 from zope.cachedescriptors.property import Lazy
 
-from nti.app.assessment.common.evaluations import is_assignment_available
-from nti.app.assessment.common.evaluations import get_container_evaluations
-from nti.app.assessment.common.evaluations import get_containers_for_evaluation_object
+from nti.app.assessment.common.caching import get_request_cache
 
-from nti.app.assessment.common.submissions import has_submitted_assigment
+from nti.app.assessment.common.evaluations import is_assignment_available
+from nti.app.assessment.common.evaluations import get_containers_with_evaluations
+from nti.app.assessment.common.evaluations import get_containers_for_evaluation_objects
 
 from nti.app.assessment.common.utils import get_available_for_submission_beginning
 
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistory
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemFeedback
 
+from nti.app.assessment.search.interfaces import IBatchSearchHitPredicate
+
 from nti.appserver.pyramid_authorization import has_permission
 
 from nti.assessment.interfaces import SURVEY_MIME_TYPE
@@ -62,31 +65,177 @@ from nti.publishing.interfaces import IPublishable
 
 from nti.traversal.traversal import find_interface
 
+#: The name of the request scoped search hit context cache
+SEARCH_HITS_REQUEST_CACHE = 'search_hits'
+
 logger = __import__('logging').getLogger(__name__)
 
 
-@interface.implementer(ISearchHitPredicate)
+def allow_search_hits(predicate, items, scores=None, query=None):
+    """
+    Return the decisions of the given predicate for the given items,
+    in a single batch when the predicate supports it.
+    """
+    items = list(items or ())
+    scores = [None] * len(items) if scores is None else list(scores)
+    if IBatchSearchHitPredicate.providedBy(predicate):
+        return predicate.allow_all(items, scores, query)
+    return [predicate.allow(x, s, query) for x, s in zip(items, scores)]
+
+
+def filter_search_hits(items, scores=None, query=None):
+    """
+    Return the decisions of all the search hit predicates subscribed for
+    the given page of hits, as a list of booleans in order. The hits of
+    each kind of predicate are evaluated in a single batch.
+    """
+    items = list(items or ())
+    scores = [None] * len(items) if scores is None else list(scores)
+    groups = {}
+    for idx, item in enumerate(items):
+        for predicate in component.subscribers((item,), ISearchHitPredicate):
+            _, indexes = groups.setdefault(type(predicate), (predicate, []))
+            indexes.append(idx)
+    result = [True] * len(items)
+    for predicate, indexes in groups.values():
+        decisions = allow_search_hits(predicate,
+                                      [items[x] for x in indexes],
+                                      [scores[x] for x in indexes],
+                                      query)
+        for idx, decision in zip(indexes, decisions):
+            result[idx] = result[idx] and bool(decision)
+    return result
+
+
+class _SearchHitContext(object):
+    """
+    The user, course and enrollment facts of a principal, resolved at most
+    once per batch of search hits.
+    """
+
+    def __init__(self, principal):
+        self.principal = principal
+        self.pid = principal.id
+        self._memos = {}
+
+    def _memo(self, name, key, factory, *args):
+        memo = self._memos.setdefault(name, {})
+        try:
+            return memo[key]
+        except KeyError:
+            result = memo[key] = factory(*args)
+            return result
+
+    @Lazy
+    def user(self):
+        return User.get_user(self.pid)
+
+    def courses(self, item):
+        course = find_interface(item, ICourseInstance, strict=False)
+        if course is not None:
+            return (course,)
+        package = find_interface(item, IContentPackage, strict=False)
+        if package is not None:
+            return self._memo('courses', package.ntiid,
+                              self._package_courses, package.ntiid)
+        return ()
+
+    def _package_courses(self, ntiid):
+        return get_courses_for_packages(packages=ntiid)
+
+    def is_instructor(self, course):
+        return self._memo('instructor', id(course),
+                          is_instructed_by_name, course, self.pid)
+
+    def is_enrolled(self, course):
+        return self._memo('enrolled', id(course),
+                          is_enrolled, course, self.principal)
+
+    def record(self, course):
+        return self._memo('record', id(course),
+                          get_enrollment_record, course, self.user)
+
+    def _histories(self, course):
+        return component.queryMultiAdapter((course, self.user),
+                                           IUsersCourseAssignmentHistory)
+
+    def has_submitted(self, course, assignment):
+        histories = self._memo('histories', id(course),
+                               self._histories, course)
+        return bool(histories and assignment.ntiid in histories)
+
+    def is_available(self, course, assignment):
+        return self._memo('available', (id(course), assignment.ntiid),
+                          is_assignment_available, assignment, course,
+                          self.user)
+
+    def containers(self, items):
+        """
+        Return a map of the ntiids of the given evaluations to their
+        containers, querying only the ones not seen yet.
+        """
+        memo = self._memos.setdefault('containers', {})
+        missing = [x for x in items if x.ntiid not in memo]
+        if missing:
+            memo.update(get_containers_for_evaluation_objects(missing))
+        return {x.ntiid: memo.get(x.ntiid) or () for x in items}
+
+    def units_with_evaluations(self, ntiids, mimetypes):
+        """
+        Return the subset of the given content unit ntiids that contain
+        evaluations of the given mime types.
+        """
+        memo = self._memos.setdefault('units', {})
+        missing = {x for x in ntiids if x not in memo}
+        if missing:
+            found = get_containers_with_evaluations(missing,
+                                                    mimetypes=mimetypes)
+            memo.update((x, x in found) for x in missing)
+        return {x for x in ntiids if memo[x]}
+
+
+def get_search_hit_context(principal):
+    """
+    Return the search hit context of the principal, shared by the
+    predicates of all the hits of the current request, so the hits of a
+    results page evaluated one at a time still share their lookups.
+    """
+    cache = get_request_cache(SEARCH_HITS_REQUEST_CACHE)
+    if cache is None:
+        return _SearchHitContext(principal)
+    try:
+        return cache[principal.id]
+    except KeyError:
+        result = cache[principal.id] = _SearchHitContext(principal)
+        return result
+
+
+@interface.implementer(IBatchSearchHitPredicate)
 @component.adapter(IUsersCourseAssignmentHistoryItemFeedback)
 class _AssignmentFeedbackItemSearchHitPredicate(DefaultSearchHitPredicate):
 
     __name__ = u'AssignmentFeedback'
 
-    def allow(self, feedback, unused_score, unused_query=None):  # pylint: disable=arguments-differ
+    def allow(self, feedback, score, query=None):  # pylint: disable=arguments-differ
+        return self.allow_all((feedback,), (score,), query)[0]
+
+    def allow_all(self, items, unused_scores, unused_query=None):
         if self.principal is None:
-            return True
-        else:
-            pid = self.principal.id
-            user = User.get_user(pid)
-            owner = feedback.creator
+            return [True] * len(items)
+        context = get_search_hit_context(self.principal)
+        user = context.user
+        if not IUser.providedBy(user):
+            return [False] * len(items)
+        result = []
+        for feedback in items:
             course = find_interface(feedback, ICourseInstance, strict=False)
-            if      IUser.providedBy(user) \
-                and (owner == user is not None or is_instructed_by_name(course, pid)):
-                return True
-        return False
+            result.append(feedback.creator == user
+                          or context.is_instructor(course))
+        return result
 
 
 @component.adapter(IQEvaluation)
-@interface.implementer(ISearchHitPredicate)
+@interface.implementer(IBatchSearchHitPredicate)
 class _EvaluationSearchHitPredicate(DefaultSearchHitPredicate):
 
     __name__ = u'Evaluation'
@@ -98,105 +247,108 @@ class _EvaluationSearchHitPredicate(DefaultSearchHitPredicate):
     def is_published(self, item):
         return not IPublishable.providedBy(item) or item.is_published()
 
-    def get_courses(self, item):
-        course = find_interface(item, ICourseInstance, strict=False)
-        if course is not None:
-            return (course,)
-        else:
-            package = find_interface(item, IContentPackage, strict=False)
-            if package is not None:
-                return get_courses_for_packages(packages=package.ntiid)
-        return ()
-
-    def check_visible(self, user, course, item):
+    def check_visible(self, context, course, containers):
         # Get containing assignments/surveys
-        for container in get_containers_for_evaluation_object(item):
+        for container in containers:
             if IQTimedAssignment.providedBy(container):
-                if has_submitted_assigment(course, user, container):
+                if context.has_submitted(course, container):
                     return True
             elif IQAssignment.providedBy(container):
                 # XXX: Use this in assingment predicate below?
-                if is_assignment_available(container, course, user):
+                if context.is_available(course, container):
                     return True
             elif IQSurvey.providedBy(container):
                 # TODO: Improve this branch
                 return True
+        return False
+
+    def allow(self, item, score, query=None):  # pylint: disable=arguments-differ
+        return self.allow_all((item,), (score,), query)[0]
 
-    def allow(self, item, unused_score, unused_query=None):  # pylint: disable=arguments-differ
+    def allow_all(self, items, unused_scores, unused_query=None):
         if self.principal is None:
-            return True
-        else:
-            if not self.is_published(item):
+            return [True] * len(items)
+        context = get_search_hit_context(self.principal)
+        # the items that need their containers, resolved all at once
+        pending = []
+        result = [None] * len(items)
+        for idx, item in enumerate(items):
+            courses = context.courses(item) if self.is_published(item) else ()
+            if not courses:
                 # XXX: Just creator acl?
-                return has_permission(ACT_READ, item, self.request)
-            courses = self.get_courses(item)
+                result[idx] = bool(has_permission(ACT_READ, item, self.request))
+                continue
+            courses = [x for x in courses
+                       if context.is_instructor(x) or context.is_enrolled(x)]
             if not courses:
-                return has_permission(ACT_READ, item, self.request)
-            pid = self.principal.id
-            user = User.get_user(pid)
-            for course in courses:
-                if     (   is_instructed_by_name(course, self.principal.id) \
-                        or is_enrolled(course, self.principal)) \
-                    and self.check_visible(user, course, item):
-                    return True
-        return False
+                result[idx] = False
+            else:
+                pending.append((idx, item, courses))
+        containers = context.containers([item for _, item, _ in pending])
+        for idx, item, courses in pending:
+            item_containers = containers.get(item.ntiid) or ()
+            result[idx] = any(self.check_visible(context, course, item_containers)
+                              for course in courses)
+        return result
 
 
 @component.adapter(IQAssignment)
-@interface.implementer(ISearchHitPredicate)
+@interface.implementer(IBatchSearchHitPredicate)
 class _AssignmentSearchHitPredicate(_EvaluationSearchHitPredicate):
 
     __name__ = u'Assignment'
 
-    def allow(self, item, unused_score, unused_query=None):
-        if self.principal is None:
+    def is_visible(self, context, course, item, now):
+        if context.is_instructor(course):
             return True
-        else:
-            pid = self.principal.id
-            user = User.get_user(pid)
-            if not IUser.providedBy(user):
-                return False
+        record = context.record(course)
+        if record is None:
+            return False
+        # Enrollment
+        if IQTimedAssignment.providedBy(item):
+            return context.has_submitted(course, item)
+        beginning = get_available_for_submission_beginning(item, course)
+        if not beginning or now >= beginning:
+            return not item.is_non_public or record.Scope != ES_PUBLIC
+        return False
+
+    def allow_all(self, items, unused_scores, unused_query=None):
+        if self.principal is None:
+            return [True] * len(items)
+        context = get_search_hit_context(self.principal)
+        if not IUser.providedBy(context.user):
+            return [False] * len(items)
+        result = []
+        now = datetime.datetime.utcnow()
+        for item in items:
             if not self.is_published(item):
-                return has_permission(ACT_READ, item, self.request)
-            now = datetime.datetime.utcnow()
-            courses = self.get_courses(item)
+                result.append(bool(has_permission(ACT_READ, item, self.request)))
+                continue
+            courses = context.courses(item)
             if not courses:
-                return True  # always
-            for course in courses or ():
-                if is_instructed_by_name(course, self.principal.id):
-                    return True
-                record = get_enrollment_record(course, user)
-                if record is None:
-                    continue
-                # Enrollment
-                if IQTimedAssignment.providedBy(item):
-                    if has_submitted_assigment(course, user, item):
-                        return True
-                else:
-                    beginning = get_available_for_submission_beginning(item, course)
-                    if not beginning or now >= beginning:
-                        if item.is_non_public:
-                            if record.Scope != ES_PUBLIC:
-                                return True
-                        else:
-                            return True
-        return False
+                result.append(True)  # always
+                continue
+            result.append(any(self.is_visible(context, course, item, now)
+                              for course in courses))
+        return result
 
 
 @component.adapter(IContentUnit)
-@interface.implementer(ISearchHitPredicate)
+@interface.implementer(IBatchSearchHitPredicate)
 class _ContentUnitAssesmentHitPredicate(DefaultSearchHitPredicate):
 
     __name__ = u'ContentUnitAssesment'
 
     SEARCH_MTS = ALL_ASSIGNMENT_MIME_TYPES + (SURVEY_MIME_TYPE,)
 
-    def _is_allowed(self, ntiid, unused_query=None):
-        evaluations = get_container_evaluations((ntiid,),
-                                                mimetypes=self.SEARCH_MTS)
-        return not bool(evaluations)
+    def allow(self, item, score, query=None):  # pylint: disable=arguments-differ
+        return self.allow_all((item,), (score,), query)[0]
 
-    def allow(self, item, unused_score, query=None):  # pylint: disable=arguments-differ
+    def allow_all(self, items, unused_scores, unused_query=None):
         if self.principal is None:
-            return True
-        return self._is_allowed(item.ntiid, query)
+            return [True] * len(items)
+        # units with evaluations are not search hits
+        ntiids = [x.ntiid for x in items]
+        context = get_search_hit_context(self.principal)
+        excluded = context.units_with_evaluations(ntiids, self.SEARCH_MTS)
+        return [x not in excluded for x in ntiids]
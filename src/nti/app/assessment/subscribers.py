@@ -29,6 +29,7 @@ from zope.container.interfaces import IContainer
 from zope.event import notify
 
 from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IIntIdAddedEvent
 from zope.intid.interfaces import IIntIdRemovedEvent
 
 from zope.lifecycleevent.interfaces import IObjectAddedEvent
@@ -42,8 +43,13 @@ from nti.app.assessment import MessageFactory as _
 from nti.app.assessment.common.containers import index_course_package_assessments
 
 from nti.app.assessment.common.evaluations import get_unit_assessments
+from nti.app.assessment.common.evaluations import get_evaluation_courses
 from nti.app.assessment.common.evaluations import get_course_from_evaluation
 from nti.app.assessment.common.evaluations import get_course_self_assessments
+from nti.app.assessment.common.evaluations import bump_unit_assessment_generation
+from nti.app.assessment.common.evaluations import bump_course_outline_generation
+from nti.app.assessment.common.evaluations import bump_course_assignment_generation
+from nti.app.assessment.common.evaluations import bump_package_assignment_generation
 from nti.app.assessment.common.evaluations import is_discussion_assignment_non_public
 
 from nti.app.assessment.common.hostpolicy import get_resource_site_name
@@ -54,10 +60,12 @@ from nti.app.assessment.index import IX_SITE
 from nti.app.assessment.index import IX_COURSE
 from nti.app.assessment.index import IX_CREATOR
 from nti.app.assessment.index import get_submission_catalog
+from nti.app.assessment.index import bump_submission_generation
 
 from nti.app.assessment.interfaces import IQEvaluations
 from nti.app.assessment.interfaces import IUsersCourseInquiries
 from nti.app.assessment.interfaces import IUsersCourseInquiryItem
+from nti.app.assessment.interfaces import IUsersCourseSubmissionItem
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistories
 from nti.app.assessment.interfaces import IUsersCourseAssignmentSavepoints
 from nti.app.assessment.interfaces import ICourseAssignmentAttemptMetadata
@@ -79,14 +87,17 @@ from nti.assessment.interfaces import TRX_QUESTION_MOVE_TYPE
 from nti.assessment.interfaces import IQuestion
 from nti.assessment.interfaces import IQuestionSet
 from nti.assessment.interfaces import IQAssignment
+from nti.assessment.interfaces import IQEvaluation
 from nti.assessment.interfaces import IQSurveySubmission
 from nti.assessment.interfaces import IQuestionMovedEvent
 from nti.assessment.interfaces import IQEditableEvaluation
 from nti.assessment.interfaces import IQAssessedQuestionSet
 from nti.assessment.interfaces import IQDiscussionAssignment
+from nti.assessment.interfaces import IQAssessmentPoliciesModified
 
 from nti.assessment.question import QQuestionSet
 
+from nti.contentlibrary.interfaces import IContentPackage
 from nti.contentlibrary.interfaces import IContentPackageLibrary
 from nti.contentlibrary.interfaces import IEditableContentPackage
 from nti.contentlibrary.interfaces import IRenderableContentPackage
@@ -106,6 +117,12 @@ from nti.contenttypes.courses.interfaces import ICourseCatalogEntry
 from nti.contenttypes.courses.interfaces import ICourseBundleUpdatedEvent
 from nti.contenttypes.courses.interfaces import ICourseContentLibraryProvider
 
+
+from nti.contenttypes.presentation.interfaces import INTIAssignmentRef
+from nti.contenttypes.presentation.interfaces import INTIQuestionSetRef
+from nti.contenttypes.presentation.interfaces import INTILessonOverview
+from nti.contenttypes.presentation.interfaces import INTICourseOverviewGroup
+
 from nti.coremetadata.interfaces import IContainerContext
 from nti.coremetadata.interfaces import UserProcessedContextsEvent
 
@@ -182,6 +199,134 @@ def remove_object_from_course_activity(submission, unused_event):
     activity.remove(submission)
 
 
+# submissions
+
+
+def _bump_submission_generation(item):
+    course = find_interface(item, ICourseInstance, strict=False)
+    if course is not None:
+        bump_submission_generation(course)
+
+
+@component.adapter(IUsersCourseSubmissionItem, IObjectAddedEvent)
+def _on_submission_item_added(item, unused_event):
+    _bump_submission_generation(item)
+
+
+@component.adapter(IUsersCourseSubmissionItem, IObjectRemovedEvent)
+def _on_submission_item_removed(item, unused_event):
+    _bump_submission_generation(item)
+
+
+# assignment snapshots
+
+
+def _bump_assignment_generation(evaluation):
+    course = find_interface(evaluation, ICourseInstance, strict=False)
+    if course is not None:
+        courses = (course,)
+    else:
+        package = find_interface(evaluation, IContentPackage, strict=False)
+        if package is not None:
+            bump_package_assignment_generation(package)
+            return
+        courses = get_evaluation_courses(evaluation)
+    for course in courses or ():
+        bump_course_assignment_generation(course)
+
+
+@component.adapter(IQEvaluation, IIntIdAddedEvent)
+def _on_evaluation_registered(evaluation, unused_event):
+    _bump_assignment_generation(evaluation)
+
+
+@component.adapter(IQEvaluation, IIntIdRemovedEvent)
+def _on_evaluation_unregistered(evaluation, unused_event):
+    _bump_assignment_generation(evaluation)
+
+
+@component.adapter(IQEvaluation, IObjectPublishedEvent)
+def _on_evaluation_published(evaluation, unused_event):
+    _bump_assignment_generation(evaluation)
+
+
+@component.adapter(IQEvaluation, IObjectUnpublishedEvent)
+def _on_evaluation_unpublished(evaluation, unused_event):
+    _bump_assignment_generation(evaluation)
+
+
+@component.adapter(IQAssignment, IObjectModifiedEvent)
+def _on_assignment_modified(assignment, unused_event):
+    _bump_assignment_generation(assignment)
+
+
+# content unit assessment indexes
+
+
+@component.adapter(IQEvaluation, IIntIdAddedEvent)
+def _on_evaluation_registered_bump_unit(evaluation, unused_event):
+    bump_unit_assessment_generation(evaluation)
+
+
+@component.adapter(IQEvaluation, IIntIdRemovedEvent)
+def _on_evaluation_unregistered_bump_unit(evaluation, unused_event):
+    bump_unit_assessment_generation(evaluation)
+
+
+@component.adapter(IQEvaluation, IObjectModifiedEvent)
+def _on_evaluation_modified_bump_unit(evaluation, unused_event):
+    bump_unit_assessment_generation(evaluation)
+
+
+@component.adapter(ICourseInstance, ICourseBundleUpdatedEvent)
+def _on_course_bundle_updated_bump(course, unused_event):
+    bump_course_assignment_generation(course)
+
+
+@component.adapter(ICourseInstance, IQAssessmentPoliciesModified)
+def _on_course_policies_modified(course, unused_event):
+    bump_course_assignment_generation(course)
+
+
+# assignments by outline node
+
+
+def _bump_outline_generation(item):
+    course = find_interface(item, ICourseInstance, strict=False)
+    if course is not None:
+        bump_course_outline_generation(course)
+
+
+@component.adapter(INTIAssignmentRef, IIntIdAddedEvent)
+def _on_assignment_ref_registered(ref, unused_event):
+    _bump_outline_generation(ref)
+
+
+@component.adapter(INTIAssignmentRef, IIntIdRemovedEvent)
+def _on_assignment_ref_unregistered(ref, unused_event):
+    _bump_outline_generation(ref)
+
+
+@component.adapter(INTIQuestionSetRef, IIntIdAddedEvent)
+def _on_question_set_ref_registered(ref, unused_event):
+    _bump_outline_generation(ref)
+
+
+@component.adapter(INTIQuestionSetRef, IIntIdRemovedEvent)
+def _on_question_set_ref_unregistered(ref, unused_event):
+    _bump_outline_generation(ref)
+
+
+@component.adapter(INTICourseOverviewGroup, IObjectModifiedEvent)
+def _on_overview_group_modified(group, unused_event):
+    _bump_outline_generation(group)
+
+
+@component.adapter(INTILessonOverview, IObjectModifiedEvent)
+def _on_lesson_overview_modified(lesson, unused_event):
+    _bump_outline_generation(lesson)
+
+
 # UGD
 
 
@@ -336,6 +481,7 @@ def on_question_moved(question, event):
     if ntiid:
         record_transaction(question, principal=event.principal,
                            type_=TRX_QUESTION_MOVE_TYPE)
+    bump_unit_assessment_generation(question)
 
 
 @component.adapter(ICourseInstance, ICourseBundleUpdatedEvent)
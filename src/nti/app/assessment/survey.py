@@ -8,6 +8,14 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import copy
+import itertools
+
+from BTrees.Length import Length
+
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+
 from pyramid.interfaces import IRequest
 
 from zope import component
@@ -20,21 +28,29 @@ from zope.cachedescriptors.property import readproperty
 from zope.container.contained import Contained
 
 from zope.lifecycleevent.interfaces import IObjectAddedEvent
+from zope.lifecycleevent.interfaces import IObjectRemovedEvent
 
 from zope.location.interfaces import ISublocations
 from zope.location.interfaces import LocationError
 
+from persistent import Persistent
+
 from nti.app.assessment._submission import set_inquiry_submission_lineage
 
 from nti.app.assessment.adapters import course_from_context_lineage
 
 from nti.app.assessment.common.inquiries import get_course_inquiries
+from nti.app.assessment.common.inquiries import fold_running_inquiry_aggregate
+from nti.app.assessment.common.inquiries import query_running_inquiry_aggregates
+from nti.app.assessment.common.inquiries import unfold_running_inquiry_aggregate
+from nti.app.assessment.common.inquiries import RUNNING_AGGREGATED_INQUIRIES_KEY
 
 from nti.app.assessment.interfaces import IUsersCourseInquiry
 from nti.app.assessment.interfaces import ICourseInquiryCatalog
 from nti.app.assessment.interfaces import IUsersCourseInquiries
 from nti.app.assessment.interfaces import IUsersCourseInquiryItem
 from nti.app.assessment.interfaces import ICourseAggregatedInquiries
+from nti.app.assessment.interfaces import ICourseRunningAggregatedInquiries
 from nti.app.assessment.interfaces import IUsersCourseInquiryItemResponse
 
 from nti.assessment.interfaces import IQInquiry
@@ -328,14 +344,203 @@ def _aggreated_inquiries_for_courseenrollment_path_adapter(enrollment, unused_re
     return _aggreated_inquiries_for_course(ICourseInstance(enrollment))
 
 
+#: The number of submission aggregates a running aggregate holds before
+#: they are compacted into its base
+RUNNING_AGGREGATE_COMPACT_SIZE = 100
+
+
+class RunningInquiryAggregate(Persistent):
+    """
+    The running aggregate of an inquiry in a course.
+
+    Each submission is stored as its own entry, keyed by its creator, so
+    that concurrent submissions insert different keys and their changes
+    are resolved by the BTree rather than conflict. Entries are compacted
+    into a base aggregate every :data:`RUNNING_AGGREGATE_COMPACT_SIZE`
+    submissions. Aggregates cannot be subtracted: an entry may be removed
+    until it is compacted, after which the aggregate must be rebuilt.
+    """
+
+    _base = None
+
+    def __init__(self):
+        super(RunningInquiryAggregate, self).__init__()
+        self._count = Length()
+        self._entries = OOBTree()
+        self._base_keys = OOTreeSet()
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._base_keys
+
+    def __len__(self):
+        return self._count()
+
+    def aggregate(self):
+        """
+        Return a new aggregate of all the submissions, or ``None``.
+        """
+        result = None
+        values = itertools.chain((self._base,), self._entries.values())
+        for aggregated in values:
+            if aggregated is None:
+                continue
+            if result is None:
+                # never fold into the stored aggregates
+                result = copy.deepcopy(aggregated)
+            else:
+                result += aggregated
+        return result
+
+    def add(self, key, aggregated):
+        if key in self:
+            return
+        self._entries[key] = aggregated
+        self._count.change(1)
+        if len(self._entries) >= RUNNING_AGGREGATE_COMPACT_SIZE:
+            self._compact()
+
+    def remove(self, key):
+        """
+        Remove the submission entry of the given key.
+
+        :return: ``False`` if the entry is part of the base aggregate and
+            cannot be subtracted from it
+        """
+        if key in self._base_keys:
+            return False
+        if key in self._entries:
+            del self._entries[key]
+            self._count.change(-1)
+        return True
+
+    def _compact(self):
+        self._base = self.aggregate()
+        self._base_keys.update(self._entries.keys())
+        self._entries.clear()
+
+    def reset(self, entries):
+        """
+        Replace the submissions with the given (key, aggregated) entries,
+        which are folded into a new base aggregate.
+        """
+        base = None
+        self._base_keys.clear()
+        self._entries.clear()
+        for key, aggregated in entries:
+            if key in self._base_keys:
+                continue
+            self._base_keys.add(key)
+            if base is None:
+                base = aggregated
+            else:
+                base += aggregated
+        self._base = base
+        self._count.set(len(self._base_keys))
+
+
+@interface.implementer(ICourseRunningAggregatedInquiries)
+class CourseRunningAggregatedInquiries(PersistentCreatedModDateTrackingObject,
+                                       Contained):
+    """
+    Running aggregates of the open inquiries in a course.
+
+    Each inquiry has its own :class:`RunningInquiryAggregate`; folding a
+    submission only changes the aggregate of its inquiry, never this
+    (course-wide) object.
+    """
+
+    __external_can_create__ = False
+
+    def __init__(self):
+        super(CourseRunningAggregatedInquiries, self).__init__()
+        self._aggregates = OOBTree()
+
+    def __contains__(self, inquiryId):
+        return inquiryId in self._aggregates
+
+    def __len__(self):
+        return len(self._aggregates)
+
+    def get(self, inquiryId, default=None):
+        running = self._aggregates.get(inquiryId)
+        result = running.aggregate() if running is not None else None
+        return result if result is not None else default
+
+    def count(self, inquiryId):
+        running = self._aggregates.get(inquiryId)
+        return len(running) if running is not None else 0
+
+    def store(self, inquiryId, entries):
+        running = self._aggregates.get(inquiryId)
+        if running is None:
+            running = self._aggregates[inquiryId] = RunningInquiryAggregate()
+            self.updateLastMod()
+        running.reset(entries)
+
+    def fold(self, inquiryId, key, aggregated):
+        running = self._aggregates.get(inquiryId)
+        if running is None:
+            return False
+        running.add(key, aggregated)
+        return True
+
+    def remove(self, inquiryId, key):
+        running = self._aggregates.get(inquiryId)
+        return running is None or running.remove(key)
+
+    def invalidate(self, inquiryId):
+        if self._aggregates.pop(inquiryId, None) is not None:
+            self.updateLastMod()
+
+    def clear(self):
+        if len(self._aggregates) == 0:
+            return
+        self._aggregates.clear()
+        self.updateLastMod()
+
+
+@component.adapter(ICourseInstance)
+@interface.implementer(ICourseRunningAggregatedInquiries)
+def _running_aggregated_inquiries_for_course(course):
+    annotations = IAnnotations(course)
+    try:
+        KEY = RUNNING_AGGREGATED_INQUIRIES_KEY
+        result = annotations[KEY]
+    except KeyError:
+        result = CourseRunningAggregatedInquiries()
+        annotations[KEY] = result
+        result.__name__ = KEY
+        result.__parent__ = course
+    return result
+
+
 @component.adapter(ICourseInstance, IObjectAddedEvent)
 def _on_course_added(course, unused_event):
     _inquiries_for_course(course)
 
 
 @component.adapter(IUsersCourseInquiryItem, IObjectAddedEvent)
-def _on_course_inquiry_item_added(unused_item, unused_event):
-    pass
+def _on_course_inquiry_item_added(item, unused_event):
+    course = ICourseInstance(item, None)
+    submission = item.Submission
+    if course is None or submission is None:
+        return
+    inquiry = component.queryUtility(IQInquiry, name=item.inquiryId)
+    # closed inquiries are served from their final aggregate
+    if inquiry is not None and not inquiry.closed:
+        fold_running_inquiry_aggregate(inquiry, course, item)
+
+
+@component.adapter(IUsersCourseInquiryItem, IObjectRemovedEvent)
+def _on_course_inquiry_item_removed(item, unused_event):
+    course = ICourseInstance(item, None)
+    running = query_running_inquiry_aggregates(course) if course is not None else None
+    if running is not None and item.inquiryId in running:
+        inquiry = component.queryUtility(IQInquiry, name=item.inquiryId)
+        if inquiry is not None:
+            unfold_running_inquiry_aggregate(inquiry, course, item)
+        else:
+            running.invalidate(item.inquiryId)
 
 
 def aggregate_survey_submission(storage, submission):
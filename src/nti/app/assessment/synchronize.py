@@ -8,6 +8,10 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import hashlib
+
+import simplejson
+
 from zope import component
 
 from zope.intid.interfaces import IIntIds
@@ -20,6 +24,7 @@ from nti.app.assessment._question_map import QuestionMap
 from nti.app.assessment._question_map import new_sync_results
 from nti.app.assessment._question_map import get_assess_item_dict
 
+from nti.app.assessment.common.evaluations import bump_unit_assessment_generation
 from nti.app.assessment.common.evaluations import get_content_packages_assessment_items
 
 from nti.assessment._question_index import _load_question_map_json
@@ -32,6 +37,8 @@ from nti.contentlibrary.interfaces import IContentPackage
 from nti.contentlibrary.interfaces import IEditableContentPackage
 from nti.contentlibrary.interfaces import IContentPackageSyncResults
 
+from nti.externalization.interfaces import StandardExternalFields
+
 from nti.intid.common import removeIntId
 
 from nti.ntiids.ntiids import find_object_with_ntiid
@@ -45,6 +52,11 @@ from nti.recorder.record import remove_transaction_history
 
 from nti.site.utils import unregisterUtility
 
+#: The attribute of a content package with the hashes of its indexed items
+ITEM_HASHES_ATTR = '_assessment_index_item_hashes'
+
+NTIID = StandardExternalFields.NTIID
+
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -118,18 +130,100 @@ def add_assessment_items_from_new_content(content_package, key=None, sync_result
     key_lastModified = key.lastModified if key is not None else None
 
     question_map = QuestionMap()
-    asm_index_text = key.readContentsAsText()
-    result = populate_question_map_from_text(question_map,
-                                             asm_index_text,
-                                             content_package,
-                                             sync_results=sync_results,
-                                             key_lastModified=key_lastModified)
+    index = _load_question_map_json(key.readContentsAsText())
+    result = populate_question_map_json(asm_index_json=index,
+                                        question_map=question_map,
+                                        sync_results=sync_results,
+                                        content_package=content_package,
+                                        key_lastModified=key_lastModified)
+    set_assessment_index_hashes(content_package,
+                                get_assessment_index_hashes(index))
 
     logger.info("%s assessment item(s) read from %s %s",
                 len(result or ()), content_package, key)
     return result
 
 
+def hash_assessment_item(ext_obj):
+    """
+    Return a digest of the external form of an indexed assessment item.
+    """
+    data = simplejson.dumps(ext_obj, sort_keys=True)
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return hashlib.md5(data).hexdigest()
+
+
+def iter_assessment_index_items(index):
+    """
+    Generate the (ntiid, external object, level ntiid) of the assessment
+    items of the given index, with the same level resolution as
+    ``QuestionMap._from_root_index``.
+    """
+    def _walk(entry, nearest_ntiid):
+        level_ntiid = entry.get(NTIID) or nearest_ntiid
+        for ntiid, ext_obj in (entry.get('AssessmentItems') or {}).items():
+            yield ntiid, ext_obj, level_ntiid
+        for child in (entry.get('Items') or {}).values():
+            for item in _walk(child, level_ntiid):
+                yield item
+
+    for child_ntiid, child in ((index or {}).get('Items') or {}).items():
+        for item in _walk(child, child_ntiid):
+            yield item
+
+
+def get_assessment_index_hashes(index):
+    """
+    Return a map of the ntiids of the items of the given index to their
+    digest and level ntiid, or None if an item is indexed more than once.
+    """
+    result = {}
+    for ntiid, ext_obj, level_ntiid in iter_assessment_index_items(index):
+        if ntiid in result:
+            return None
+        result[ntiid] = (hash_assessment_item(ext_obj), level_ntiid)
+    return result
+
+
+def set_assessment_index_hashes(content_package, hashes):
+    setattr(content_package, ITEM_HASHES_ATTR, hashes)
+
+
+def prune_assessment_index(index, ntiids):
+    """
+    Return a copy of the given index with only the given assessment items.
+    """
+    def _prune(entry):
+        result = {k: v for k, v in entry.items()
+                  if k not in ('Items', 'AssessmentItems')}
+        items = entry.get('AssessmentItems') or {}
+        result['AssessmentItems'] = {
+            k: v for k, v in items.items() if k in ntiids
+        }
+        result['Items'] = {
+            k: _prune(v) for k, v in (entry.get('Items') or {}).items()
+        }
+        return result
+    return _prune(index)
+
+
+def diff_assessment_index_hashes(stored, current):
+    """
+    Return the ntiids of the (removed, changed, added, unchanged) items
+    between the given index hashes. Moving an item to another level
+    changes it.
+    """
+    stored_ntiids = set(stored)
+    current_ntiids = set(current)
+    common = stored_ntiids & current_ntiids
+    changed = {x for x in common if stored[x] != current[x]}
+    return (stored_ntiids - current_ntiids,
+            changed,
+            current_ntiids - stored_ntiids,
+            common - changed)
+
+
 def get_last_mod_namespace(content_package):
     return '%s.%s.LastModified' % (content_package.ntiid, 'assessment_index.json')
 
@@ -171,6 +265,23 @@ def on_content_package_added(package, event, key=None):
     return result or set()
 
 
+def gather_locked_ntiids(items, to_ignore_accum, force=False):
+    """
+    Add the ntiids of the given map of locked items, and of all the items
+    exploded from them, to the given set, so they are not processed.
+    """
+    for name, item in items.items():
+        if not can_be_removed(item, force):
+            provided = iface_of_assessment(item)
+            logger.warn("Object (%s,%s) is locked cannot be removed during sync",
+                        provided.__name__, name)
+            # Make sure we add to the ignore list all items that are exploded
+            # so they are not processed
+            exploded = QuestionMap.explode_object_to_register(item)
+            to_ignore_accum.update(x.ntiid for x in exploded or ())
+    return to_ignore_accum
+
+
 def remove_assessment_items_from_oldcontent(package, force=False, sync_results=None):
     if sync_results is None:
         sync_results = new_sync_results(package)
@@ -221,15 +332,7 @@ def remove_assessment_items_from_oldcontent(package, force=False, sync_results=N
     def _gather_to_ignore(unit, to_ignore_accum):
         unit_items = IQAssessmentItemContainer(unit)
         items = get_assess_item_dict(unit_items)
-        for name, item in items.items():
-            if not can_be_removed(item, force):
-                provided = iface_of_assessment(item)
-                logger.warn("Object (%s,%s) is locked cannot be removed during sync",
-                            provided.__name__, name)
-                # Make sure we add to the ignore list all items that are exploded
-                # so they are not processed
-                exploded = QuestionMap.explode_object_to_register(item)
-                to_ignore_accum.update(x.ntiid for x in exploded or ())
+        gather_locked_ntiids(items, to_ignore_accum, force)
         for child in unit.children or ():
             _gather_to_ignore(child, to_ignore_accum)
 
@@ -245,6 +348,8 @@ def remove_assessment_items_from_oldcontent(package, force=False, sync_results=N
     for ntiid in _ntiids_to_ignore:
         sync_results.add_assessment(ntiid, locked=True)
 
+    # our items are gone, the next load must be a full one
+    set_assessment_index_hashes(package, None)
     return result, _ntiids_to_ignore
 
 
@@ -299,12 +404,136 @@ def transfer_transaction_records(removed):
         remove_transaction_history(item)
 
 
+def _iter_units(unit):
+    yield unit
+    for child in unit.children or ():
+        for x in _iter_units(child):
+            yield x
+
+
+def sync_assessment_index_incrementally(original, updated, key, event=None):
+    """
+    Update the assessment items of the given content package from its new
+    ``assessment_index.json`` by only removing, re-registering and adding
+    the items whose external form has changed since the last load.
+
+    Returns False, without changing anything, when an incremental update
+    is not possible and the full reload must be done.
+    """
+    stored = getattr(original, ITEM_HASHES_ATTR, None)
+    if not stored:
+        return False
+    index = _load_question_map_json(key.readContentsAsText())
+    current = get_assessment_index_hashes(index)
+    if current is None:
+        return False
+    removed, changed, added, unchanged = \
+        diff_assessment_index_hashes(stored, current)
+
+    sm = component.getSiteManager()
+    units = list(_iter_units(original))
+    containers = {}
+    for unit in units:
+        containers.update(IQAssessmentItemContainer(unit).items())
+
+    # the unchanged items must be the ones registered
+    keep = set()
+    for ntiid in unchanged:
+        item = containers.get(ntiid)
+        if item is None \
+                or sm.queryUtility(iface_of_assessment(item), name=ntiid) is not item:
+            return False
+        exploded = QuestionMap.explode_object_to_register(item)
+        keep.update(x.ntiid for x in exploded or ())
+    keep.update(unchanged)
+    # an item changed within an unchanged one
+    if keep & (removed | changed):
+        return False
+
+    targets = {}
+    if original is not updated:
+        targets = {x.ntiid: x for x in _iter_units(updated)}
+        if any(x.ntiid not in targets for x in units):
+            return False
+
+    logger.info("Updating assessment items incrementally from %s "
+                "(removed=%s, changed=%s, added=%s, unchanged=%s)",
+                key, len(removed), len(changed), len(added), len(unchanged))
+
+    sync_results = get_sync_results(updated, event)
+    intids = component.queryUtility(IIntIds)  # test mode
+
+    # As in a full sync, a first pass gathers the locked items and all
+    # the items exploded from them, so that an item shared with a locked
+    # one (e.g. a question of a locked assignment) is not removed.
+    locked = gather_locked_ntiids(containers, set())
+    for ntiid in locked:
+        sync_results.add_assessment(ntiid, locked=True)
+
+    # remove the old and changed items and their exploded children
+    removed_items = []
+    for ntiid in sorted(removed | changed):
+        item = containers.get(ntiid)
+        if item is None or ntiid in locked:
+            continue
+        exploded = QuestionMap.explode_object_to_register(item) or (item,)
+        for child in exploded:
+            name = child.ntiid
+            if name in keep or name in locked or name not in containers:
+                continue
+            child = containers.pop(name)
+            removed_items.append(child)
+            provided = iface_of_assessment(child)
+            if not unregisterUtility(sm, provided=provided, name=name):
+                logger.warn("Could not unregister %s from %s", name, sm)
+            if intids is not None and intids.queryId(child) is not None:
+                removeIntId(child)
+            for unit in units:
+                IQAssessmentItemContainer(unit).pop(name, None)
+
+    # move the others to the units of the new package
+    if original is not updated:
+        for unit in units:
+            target = targets[unit.ntiid]
+            container = IQAssessmentItemContainer(unit)
+            for item in list(container.values()):
+                IQAssessmentItemContainer(target).append(item)
+                exploded = QuestionMap.explode_object_to_register(item)
+                for child in exploded or (item,):
+                    if child.__parent__ is unit:
+                        child.__parent__ = target
+            container.clear()
+
+    registered = ()
+    if changed or added:
+        pruned = prune_assessment_index(index, changed | added)
+        registered = populate_question_map_json(pruned,
+                                                updated,
+                                                sync_results=sync_results,
+                                                key_lastModified=key.lastModified)
+
+    transfer_transaction_records(removed_items)
+    set_assessment_index_hashes(updated, current)
+    if original is not updated:
+        set_assessment_index_hashes(original, None)
+    IQAssessmentItemContainer(updated).lastModified = key.lastModified
+    logger.info("%s assessment item(s) have been removed and %s registered "
+                "for content %s", len(removed_items), len(registered), updated)
+    return True
+
+
 def update_assessment_items_when_modified(original, updated, event=None):
     # Check if original or updated has assessments
     update_key = needs_load_or_update(updated)
     if not (update_key or needs_load_or_update(original)):
         return
 
+    # Only touch the items that changed when we can
+    if      update_key \
+        and sync_assessment_index_incrementally(original, updated,
+                                                update_key, event):
+        return
+
     logger.info("Updating assessment items from modified content %s %s",
                 updated, event)
 
@@ -337,6 +566,8 @@ def update_assessment_items_when_modified(original, updated, event=None):
 
 @component.adapter(IContentPackage, IObjectModifiedEvent)
 def on_content_package_modified(package, event=None):
+    # invalidate the page-info assessment indexes of the package units
+    bump_unit_assessment_generation(package)
     if IEditableContentPackage.providedBy(package):
         return
     # The event may be an IContentPackageReplacedEvent, a subtype of the
@@ -670,6 +670,12 @@ class TestAssignmentGrading(RegisterAssignmentLayerMixin, ApplicationLayerTest):
         assert_that(res.json_body['Items'], has_entry(self.lesson_page_id,
                                                       contains(has_entries('Class', 'Assignment',
                                                                            'NTIID', self.assignment_id))))
+        # Conditional GETs
+        etag = res.headers['ETag']
+        self.testapp.get(enrollment_assignments,
+                         headers={'If-None-Match': etag},
+                         status=304)
+
         # The due date strips these
         assg = res.json_body['Items'][self.lesson_page_id][0]
         for part in assg['parts']:
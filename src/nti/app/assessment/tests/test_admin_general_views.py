@@ -11,6 +11,7 @@ from hamcrest import is_
 from hamcrest import is_not
 from hamcrest import assert_that
 from hamcrest import has_entries
+from hamcrest import less_than_or_equal_to
 from hamcrest import greater_than_or_equal_to
 does_not = is_not
 
@@ -43,7 +44,20 @@ class TestAdminGeneralViews(ApplicationLayerTest):
                                  status=200)
         assert_that(res.json_body,
                     has_entries('Total', is_(greater_than_or_equal_to(0)),
-                                'ItemCount', is_(greater_than_or_equal_to(0))))
+                                'ItemCount', is_(greater_than_or_equal_to(0)),
+                                'Finished', is_(True)))
+
+    @WithSharedApplicationMockDS(testapp=True, users=True)
+    def test_rebuild_submission_catalog_batches(self):
+        self.testapp.post('/dataserver2/@@RebuildSubmissionCatalog?courses=x',
+                          status=422)
+        href = '/dataserver2/@@RebuildSubmissionCatalog?courses=1&shadow=true'
+        for _ in range(100):
+            res = self.testapp.post(href, status=200)
+            assert_that(res.json_body['Courses'], is_(less_than_or_equal_to(1)))
+            if res.json_body['Finished']:
+                break
+        assert_that(res.json_body, has_entries('Finished', is_(True)))
 
     @WithSharedApplicationMockDS(testapp=True, users=True)
     def test_unregister_regiser_items(self):
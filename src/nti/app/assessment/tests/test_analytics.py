@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import close_to
+from hamcrest import contains
+from hamcrest import has_entry
+from hamcrest import has_length
+from hamcrest import has_entries
+from hamcrest import assert_that
+from hamcrest import greater_than
+
+import unittest
+
+from nti.app.assessment.analytics import ATTEMPT_ALL
+from nti.app.assessment.analytics import ATTEMPT_FIRST
+from nti.app.assessment.analytics import HASHED_RESPONSE
+
+from nti.app.assessment.analytics import encode_block
+from nti.app.assessment.analytics import response_key
+from nti.app.assessment.analytics import decode_header
+from nti.app.assessment.analytics import score_histogram
+from nti.app.assessment.analytics import submission_scores
+from nti.app.assessment.analytics import load_response_table
+from nti.app.assessment.analytics import response_statistics
+
+
+class _Columns(object):
+
+    def __init__(self):
+        self._blocks = {}
+
+    def record(self, doc_id, block):
+        self._blocks[doc_id] = block
+
+    def blocks(self):
+        return sorted(self._blocks.items())
+
+
+class _Single(object):
+
+    def __init__(self, block):
+        self.block = block
+
+    def blocks(self):
+        return [(1, self.block)]
+
+
+class TestAnalytics(unittest.TestCase):
+
+    def _columns(self):
+        columns = _Columns()
+        # user 1 misses question 2 then gets everything right
+        columns.record(10, encode_block(1, 1, 100.0,
+                                        [(1, 0, 1.0, 0), (2, 0, 0.0, 2)]))
+        columns.record(11, encode_block(1, 2, 200.0,
+                                        [(1, 0, 1.0, 0), (2, 0, 1.0, 1)]))
+        # user 2 gets everything wrong
+        columns.record(12, encode_block(2, 1, 150.0,
+                                        [(1, 0, 0.0, 3), (2, 0, 0.0, 2)]))
+        # user 3 has an ungraded part
+        columns.record(13, encode_block(3, 1, 160.0,
+                                        [(1, 0, 1.0, 0), (2, 0, None, 1)]))
+        return columns
+
+    def test_block(self):
+        block = encode_block(5, 2, 10.0, [(7, 0, 1.0, 3), (7, 1, None, 4)])
+        assert_that(decode_header(block), contains(5, 2, 10.0, 2))
+        table = load_response_table(_Single(block))
+        assert_that(list(table.questions), is_([7, 7]))
+        assert_that(list(table.parts), is_([0, 1]))
+        assert_that(list(table.responses), is_([3, 4]))
+        assert_that(table.values[0], is_(1.0))
+        assert_that(table.values[1] != table.values[1], is_(True))
+
+    def test_response_key(self):
+        assert_that(response_key(2), is_(2))
+        key = response_key([0, 2])
+        assert_that(key & HASHED_RESPONSE, greater_than(0))
+        assert_that(response_key([0, 2]), is_(key))
+        assert_that(response_key({u'a': 1, u'b': 2}),
+                    is_(response_key({u'b': 2, u'a': 1})))
+        assert_that(response_key(u'two') & HASHED_RESPONSE, greater_than(0))
+
+    def test_attempts(self):
+        columns = self._columns()
+        assert_that(load_response_table(columns), has_length(3))
+        assert_that(load_response_table(columns, ATTEMPT_ALL), has_length(4))
+        table = load_response_table(columns, ATTEMPT_FIRST)
+        assert_that(sorted(zip(table.users, table.attempts)),
+                    is_([(1, 1), (2, 1), (3, 1)]))
+
+    def test_statistics(self):
+        columns = self._columns()
+        table = load_response_table(columns)
+        assert_that(sorted(submission_scores(table)), is_([0.0, 1.0, 1.0]))
+        assert_that(score_histogram([0.0, 0.5, 1.0, None], bins=2),
+                    is_([1, 2]))
+
+        stats = response_statistics(columns, bins=4)
+        assert_that(stats, has_entries('Submissions', 3,
+                                       'Users', 3,
+                                       'Histogram', [1, 0, 0, 2]))
+        question = stats['Questions'][1]
+        assert_that(question['PValue'], close_to(2 / 3, 0.001))
+        assert_that(question['Discrimination'], is_(1.0))
+        assert_that(question['Parts'][0]['Distractors'],
+                    has_entry(0, 2))
+        question = stats['Questions'][2]
+        assert_that(question['PValue'], is_(0.5))
+        assert_that(question['Parts'][0]['Distractors'],
+                    has_entries(1, 2, 2, 1))
+
+        assert_that(response_statistics(_Columns())['MeanScore'], is_(none()))
@@ -24,6 +24,7 @@ import time
 import fudge
 from six import StringIO
 from zipfile import ZipFile
+from zipfile import ZIP_STORED
 from datetime import datetime
 from six.moves.urllib_parse import unquote
 
@@ -318,6 +319,8 @@ class TestAssignmentFileGrading(ApplicationLayerTest):
         name = 'sjohnson@nextthought.com-0-0-0-image.gif'
         assert_that(zipfile.namelist(), contains(name))
         info = zipfile.getinfo(name)
+        # Already compressed files are stored
+        assert_that(info.compress_type, is_(ZIP_STORED))
         # Rounding means the second data may not be accurate
         assert_that(info.date_time[:5],
                     is_(download_res.last_modified.timetuple()[:5]))
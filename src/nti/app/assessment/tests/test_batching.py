@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import assert_that
+from hamcrest import same_instance
+
+import unittest
+
+from pyramid.testing import DummyRequest
+
+from nti.app.assessment.decorators.batching import get_batch_decoration_context
+from nti.app.assessment.decorators.batching import set_batch_decoration_context
+
+
+class TestBatchDecorationContext(unittest.TestCase):
+
+    def test_context(self):
+        request = DummyRequest()
+        assert_that(get_batch_decoration_context(request), is_(none()))
+        context = set_batch_decoration_context(request)
+        assert_that(get_batch_decoration_context(request),
+                    same_instance(context))
+        assert_that(set_batch_decoration_context(request),
+                    same_instance(context))
+
+        course = object()
+        for _ in range(3):
+            assert_that(context.policies(course), is_(none()))
+            assert_that(context.dates(course), is_(none()))
+        assert_that(context.lookups, is_(6))
+        assert_that(context.resolved, is_(2))
+        assert_that(context.saved, is_(4))
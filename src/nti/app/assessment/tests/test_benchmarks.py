@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import has_key
+from hamcrest import has_entries
+from hamcrest import assert_that
+
+import unittest
+
+from nti.app.assessment.benchmarks import BenchmarkRecorder
+
+from nti.app.assessment.benchmarks import compare_results
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_recorder(self):
+        recorder = BenchmarkRecorder(Students=1)
+        for _ in range(3):
+            with recorder.measure('path'):
+                pass
+        results = recorder.results()
+        assert_that(results, has_entries('Parameters', {'Students': 1}))
+        assert_that(results['Paths'], has_key('path'))
+        assert_that(results['Paths']['path'], has_entries('Calls', 3))
+
+    def test_compare(self):
+        baseline = {'Paths': {'a': {'Median': 1.0, 'LoadsPerCall': 10},
+                              'b': {'Median': 1.0}}}
+        current = {'Paths': {'a': {'Median': 1.05, 'LoadsPerCall': 20},
+                             'b': {'Median': 2.0},
+                             'c': {'Median': 1.0}}}
+        rows = compare_results(baseline, current)
+        a, b, c = rows
+        # more loads per call
+        assert_that(a[-1], is_(True))
+        assert_that(b[-2:], is_((2.0, True)))
+        assert_that(c[1], is_(none()))
+        assert_that(c[-1], is_(False))
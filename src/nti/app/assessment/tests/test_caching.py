@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import same_instance
+from hamcrest import contains_inanyorder
+
+import fudge
+
+import unittest
+
+import transaction
+
+from pyramid.testing import DummyRequest
+
+from zope import interface
+
+from zope.annotation.interfaces import IAnnotations
+
+from nti.app.assessment.common.caching import LRUCache
+from nti.app.assessment.common.caching import get_generation
+from nti.app.assessment.common.caching import bump_generation
+from nti.app.assessment.common.caching import get_request_cache
+from nti.app.assessment.common.caching import clear_request_cache
+
+from nti.app.assessment.common.evaluations import ASSIGNMENT_GENERATION_KEY
+
+from nti.app.assessment.common.evaluations import proxy
+from nti.app.assessment.common.evaluations import _load_snapshot
+from nti.app.assessment.common.evaluations import _store_snapshot
+from nti.app.assessment.common.evaluations import AssessmentItemProxy
+from nti.app.assessment.common.evaluations import _pending_package_bumps
+from nti.app.assessment.common.evaluations import compute_unit_assessment_index
+from nti.app.assessment.common.evaluations import bump_package_assignment_generation
+
+from nti.assessment.interfaces import IQuestion
+from nti.assessment.interfaces import IQAssignment
+from nti.assessment.interfaces import IQuestionSet
+
+from nti.assessment.randomized.interfaces import IQuestionBank
+
+
+@interface.implementer(IAnnotations)
+class _Annotations(dict):
+    pass
+
+
+class _Item(object):
+
+    def __init__(self, ntiid, iface, questions=(), parts=()):
+        self.ntiid = ntiid
+        self.parts = parts
+        self.questions = questions
+        interface.alsoProvides(self, iface)
+
+
+class _IntIds(object):
+
+    def __init__(self, *items):
+        self.items = dict(enumerate(items))
+
+    def queryId(self, obj):
+        for doc_id, item in self.items.items():
+            if item is obj:
+                return doc_id
+
+    def queryObject(self, doc_id):
+        return self.items.get(doc_id)
+
+
+class _Package(object):
+
+    def __init__(self, ntiid):
+        self.ntiid = ntiid
+
+
+class _Part(object):
+
+    def __init__(self, question_set):
+        self.question_set = question_set
+
+
+class TestCaching(unittest.TestCase):
+
+    def test_lru(self):
+        cache = LRUCache(size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert_that(cache.get('a'), is_(1))
+        # b is now the least recently used
+        cache.set('c', 3)
+        assert_that(cache, has_length(2))
+        assert_that(cache.get('b'), is_(none()))
+        assert_that(cache.get('c'), is_(3))
+        assert_that(cache.hits, is_(2))
+        assert_that(cache.misses, is_(1))
+        cache.clear()
+        assert_that(cache, has_length(0))
+
+    def test_request_cache(self):
+        assert_that(get_request_cache('foo'), is_(none()))
+        request = DummyRequest()
+        cache = get_request_cache('foo', request)
+        cache['key'] = 'value'
+        assert_that(get_request_cache('foo', request), same_instance(cache))
+        clear_request_cache('foo', request)
+        assert_that(get_request_cache('foo', request), has_length(0))
+
+    def test_generation(self):
+        context = _Annotations()
+        assert_that(get_generation(context, u'Gen'), is_(((None, 0), True)))
+        bump_generation(context, u'Gen')
+        (token, value), clean = get_generation(context, u'Gen')
+        assert_that(token, is_(context[u'GenToken']))
+        assert_that(value, is_(1))
+        # not stored in a database
+        assert_that(clean, is_(False))
+        bump_generation(context, u'Gen')
+        assert_that(get_generation(context, u'Gen')[0], is_((token, 2)))
+
+    def test_unit_assessment_index(self):
+        q1 = _Item(u'q1', IQuestion)
+        q2 = _Item(u'q2', IQuestion)
+        q3 = _Item(u'q3', IQuestion)
+        q4 = _Item(u'q4', IQuestion)
+        qset = _Item(u'qset', IQuestionSet, questions=(q1,))
+        bank = _Item(u'bank', IQuestionBank, questions=(q2,))
+        aset = _Item(u'aset', IQuestionSet, questions=(q3,))
+        assignment = _Item(u'assignment', IQAssignment, parts=(_Part(aset),))
+        items = {x.ntiid: x for x in (q1, q2, q3, q4, qset, bank, aset, assignment)}
+        top_level, assignments = compute_unit_assessment_index(items)
+        # question set questions are kept for legacy clients
+        assert_that(top_level, contains_inanyorder(q1, q4, qset, bank))
+        assert_that(assignments, is_([assignment]))
+
+    def test_snapshot(self):
+        a1 = _Item(u'a1', IQAssignment)
+        a2 = _Item(u'a2', IQAssignment)
+        intids = _IntIds(a1, a2)
+        items = [proxy(a1, content_unit=u'unit'), a2]
+        _store_snapshot(u'key', u'stamp', items, intids)
+        assert_that(_load_snapshot(u'key', u'other', intids), is_(none()))
+        # items are loaded as they were stored
+        loaded = _load_snapshot(u'key', u'stamp', intids)
+        assert_that(loaded, has_length(2))
+        assert_that(loaded[0], is_(AssessmentItemProxy))
+        assert_that(loaded[0].ContentUnitNTIID, is_(u'unit'))
+        assert_that(loaded[1], is_(same_instance(a2)))
+
+    @fudge.patch('nti.app.assessment.common.evaluations.get_courses_for_packages')
+    def test_package_bumps(self, mock_courses):
+        course = _Annotations()
+        mock_courses.expects_call().with_args(packages=u'pkg').returns((course,)).times_called(1)
+        transaction.begin()
+        try:
+            assert_that(_pending_package_bumps(), is_(none()))
+            bump_package_assignment_generation(_Package(u'pkg'))
+            bump_package_assignment_generation(_Package(u'pkg'))
+            assert_that(_pending_package_bumps(), is_({u'pkg'}))
+            transaction.commit()
+        finally:
+            transaction.abort()
+        # courses are bumped once per package
+        generation, _ = get_generation(course, ASSIGNMENT_GENERATION_KEY)
+        assert_that(generation[1], is_(1))
+        assert_that(_pending_package_bumps(), is_(none()))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import is_not
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import same_instance
+from hamcrest import contains_inanyorder
+
+import unittest
+
+import transaction
+
+from BTrees.OOBTree import OOBTree
+
+from persistent import Persistent
+
+from ZODB import DB
+
+from ZODB.DemoStorage import DemoStorage
+
+from ZODB.utils import z64
+
+from nti.app.assessment.common.containment import _GRAPHS
+
+from nti.app.assessment.common.containment import get_containment_graph
+from nti.app.assessment.common.containment import clear_containment_graphs
+from nti.app.assessment.common.containment import record_containment_change
+from nti.app.assessment.common.containment import get_containment_generation
+
+from nti.app.assessment.common.containment import EvaluationContainmentGraph
+
+
+class _Index(Persistent):
+
+    def __init__(self):
+        self.documents_to_values = OOBTree()
+
+
+class _Catalog(Persistent):
+
+    def __init__(self):
+        self.containment_index = _Index()
+
+    def change(self, doc_id, ntiids):
+        if ntiids:
+            self.containment_index.documents_to_values[doc_id] = frozenset(ntiids)
+        else:
+            self.containment_index.documents_to_values.pop(doc_id, None)
+        record_containment_change(self, doc_id, ntiids)
+
+
+class TestContainmentGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DB(DemoStorage())
+        self.connections = []
+        tm, _ = self._open()
+        catalog = _Catalog()
+        catalog.change(1, {'q1'})
+        self.connections[0][1].root()['catalog'] = catalog
+        tm.commit()
+
+    def tearDown(self):
+        for tm, connection in self.connections:
+            tm.abort()
+            connection.close()
+        self.db.close()
+        clear_containment_graphs()
+
+    def _open(self):
+        tm = transaction.TransactionManager()
+        connection = self.db.open(transaction_manager=tm)
+        self.connections.append((tm, connection))
+        return tm, connection.root().get('catalog')
+
+    def test_graph(self):
+        graph = EvaluationContainmentGraph.build({1: {'q1', 'q2'},
+                                                  2: {'q2'}})
+        assert_that(graph, has_length(2))
+        assert_that(graph.get_containers('q2'), contains_inanyorder(1, 2))
+        assert_that(graph.get_contained(1), contains_inanyorder('q1', 'q2'))
+
+        graph.index(1, {'q3'})
+        assert_that(graph.get_containers('q1'), is_(frozenset()))
+        assert_that(graph.get_containers('q2'), contains_inanyorder(2))
+        assert_that(graph.get_containers('q3'), contains_inanyorder(1))
+
+        graph.unindex(2)
+        assert_that(graph.get_containers('q2'), is_(frozenset()))
+        assert_that(graph.get_contained(2), is_(frozenset()))
+
+        # updates only apply to the expected generation
+        assert_that(graph.update({3: {'q4'}}, 5, base=4), is_(False))
+        assert_that(graph.update({3: {'q4'}, 1: None}, 5), is_(True))
+        assert_that(graph.generation, is_(5))
+        assert_that(graph.get_contained(1), is_(frozenset()))
+        assert_that(graph.get_containers('q4'), contains_inanyorder(3))
+
+    def test_no_counter(self):
+        catalog = _Catalog()
+        assert_that(get_containment_generation(catalog),
+                    is_(((None, z64), False)))
+        assert_that(get_containment_graph(catalog), is_(none()))
+
+    def test_commit(self):
+        tm, catalog = self._open()
+        graph = get_containment_graph(catalog)
+        assert_that(graph.get_containers('q1'), contains_inanyorder(1))
+        base = graph.generation
+
+        # aborted changes are not applied
+        catalog.change(2, {'q1'})
+        assert_that(get_containment_graph(catalog), is_(none()))
+        tm.abort()
+        assert_that(graph.generation, is_(base))
+        assert_that(graph.get_containers('q1'), contains_inanyorder(1))
+
+        catalog.change(2, {'q1'})
+        catalog.change(1, ())
+        tm.commit()
+        generation, clean = get_containment_generation(catalog)
+        assert_that(clean, is_(True))
+        assert_that(generation, is_not(base))
+        assert_that(graph.generation, is_(generation))
+        assert_that(graph.get_containers('q1'), contains_inanyorder(2))
+
+        # other transactions share the updated graph
+        _, other = self._open()
+        assert_that(get_containment_graph(other), same_instance(graph))
+
+    def test_concurrent_commits(self):
+        tm1, catalog1 = self._open()
+        tm2, catalog2 = self._open()
+        graph = get_containment_graph(catalog1)
+        assert_that(get_containment_graph(catalog2), same_instance(graph))
+
+        # both change the containment from the same state
+        catalog1.change(2, {'q2'})
+        catalog2.change(3, {'q3'})
+        tm1.commit()
+        assert_that(graph.get_containers('q2'), contains_inanyorder(2))
+        # the counter conflict is resolved; the graph cannot be updated
+        tm2.commit()
+        token = get_containment_generation(catalog1)[0][0]
+        assert_that(_GRAPHS.get(token), is_(none()))
+
+        _, catalog = self._open()
+        rebuilt = get_containment_graph(catalog)
+        assert_that(rebuilt, is_not(same_instance(graph)))
+        assert_that(rebuilt.get_containers('q2'), contains_inanyorder(2))
+        assert_that(rebuilt.get_containers('q3'), contains_inanyorder(3))
@@ -13,6 +13,11 @@ from hamcrest import has_length
 from hamcrest import has_entries
 from hamcrest import assert_that
 from hamcrest import has_property
+from hamcrest import has_properties
+
+from zope import lifecycleevent
+
+from zope.lifecycleevent import ObjectRemovedEvent
 
 from zope.dublincore.interfaces import IWriteZopeDublinCore
 
@@ -26,6 +31,8 @@ from nti.app.assessment.history import UsersCourseAssignmentHistories
 from nti.app.assessment.history import UsersCourseAssignmentHistoryItem
 from nti.app.assessment.history import UsersCourseAssignmentHistoryItemContainer
 
+from nti.app.assessment.history import _on_grade_update_history_item_summary
+
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistory
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItem
 from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemSummary
@@ -139,3 +146,52 @@ class TestHistory(AssessmentLayerTest):
         # in the absence of info, it's false
         assert_that(item,
 					has_property('_student_nuclear_reset_capable', is_false()))
+
+    def test_summary_record(self):
+        history = UsersCourseAssignmentHistory()
+        submission = AssignmentSubmission(assignmentId=u'b')
+        pending = QAssignmentSubmissionPendingAssessment(assignmentId=u'b',
+                                                         parts=())
+
+        item = history.recordSubmission(submission, pending)
+        assert_that(item._summary, is_not(none()))
+        assert_that(item.summary,
+                    has_properties('SubmissionCreatedTime', submission.createdTime,
+                                   'FeedbackCount', 0,
+                                   'HasFile', False,
+                                   'HasGrade', False,
+                                   'SyntheticSubmission', False))
+
+        # summaries are served from the record alone
+        item._summary = (42.0, 3, True, True, True)
+        summ = IUsersCourseAssignmentHistoryItemSummary(item)
+        assert_that(summ,
+                    has_properties('SubmissionCreatedTime', 42.0,
+                                   'FeedbackCount', 3,
+                                   'HasFile', True,
+                                   'HasGrade', True))
+
+        # and kept current on modification
+        lifecycleevent.modified(item)
+        assert_that(summ,
+                    has_properties('SubmissionCreatedTime', submission.createdTime,
+                                   'FeedbackCount', 0,
+                                   'HasFile', False))
+
+        # legacy items compute it on demand
+        item._summary = None
+        assert_that(summ, has_property('FeedbackCount', 0))
+        assert_that(item._summary, is_(none()))
+
+    def test_summary_grade_removed(self):
+        history = UsersCourseAssignmentHistory()
+        submission = AssignmentSubmission(assignmentId=u'b')
+        pending = QAssignmentSubmissionPendingAssessment(assignmentId=u'b',
+                                                         parts=())
+        item = history.recordSubmission(submission, pending)
+        item.update_summary(HasGrade=True)
+        assert_that(item.summary, has_property('HasGrade', True))
+
+        # a removed grade is still found when its event is notified
+        _on_grade_update_history_item_summary(item, ObjectRemovedEvent(item))
+        assert_that(item.summary, has_property('HasGrade', False))
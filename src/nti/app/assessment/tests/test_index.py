@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import has_property
+from hamcrest import contains_inanyorder
+
+import unittest
+
+from zope import interface
+
+from nti.app.assessment.index import IX_CREATOR
+from nti.app.assessment.index import IX_ASSESSMENT_ID
+
+from nti.app.assessment.index import create_feedback_catalog
+from nti.app.assessment.index import ValidatingFeedbackAssesmentID
+from nti.app.assessment.index import ValidatingFeedbackCreatedUsername
+
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItem
+from nti.app.assessment.interfaces import IUsersCourseAssignmentHistoryItemFeedback
+
+
+class _Object(object):
+
+    __parent__ = None
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _feedback(creator, assignment_id):
+    item = _Object(assignmentId=assignment_id)
+    interface.alsoProvides(item, IUsersCourseAssignmentHistoryItem)
+    container = _Object(__parent__=item)
+    feedback = _Object(creator=_Object(username=creator),
+                       __parent__=container)
+    interface.alsoProvides(feedback, IUsersCourseAssignmentHistoryItemFeedback)
+    return feedback
+
+
+class TestFeedbackIndex(unittest.TestCase):
+
+    def test_validators(self):
+        feedback = _feedback(u'Ichigo', u'tag:assignment')
+        assert_that(ValidatingFeedbackCreatedUsername(feedback),
+                    has_property('creator_username', u'ichigo'))
+        assert_that(ValidatingFeedbackAssesmentID(feedback),
+                    has_property('assesmentId', u'tag:assignment'))
+        # other objects are not indexed
+        other = _Object(creator=u'ichigo')
+        assert_that(hasattr(ValidatingFeedbackCreatedUsername(other),
+                            'creator_username'),
+                    is_(False))
+
+    def test_catalog(self):
+        catalog = create_feedback_catalog()
+        catalog[IX_CREATOR].index_doc(1, _feedback(u'Ichigo', u'tag:a1'))
+        catalog[IX_CREATOR].index_doc(2, _feedback(u'rukia', u'tag:a1'))
+        catalog[IX_ASSESSMENT_ID].index_doc(1, _feedback(u'Ichigo', u'tag:a1'))
+        catalog[IX_ASSESSMENT_ID].index_doc(2, _feedback(u'rukia', u'tag:a2'))
+        result = catalog.apply({IX_CREATOR: {'any_of': (u'ichigo',)}})
+        assert_that(list(result), contains_inanyorder(1))
+        result = catalog.apply({IX_ASSESSMENT_ID: {'any_of': (u'tag:a1', u'tag:a2')}})
+        assert_that(result, has_length(2))
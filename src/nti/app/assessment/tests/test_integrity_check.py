@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import has_length
+from hamcrest import has_entries
+from hamcrest import assert_that
+
+import json
+import unittest
+
+from six import StringIO
+
+import fudge
+
+from transaction.interfaces import TransientError
+
+from nti.app.assessment._integrity_check import REMOVED
+from nti.app.assessment._integrity_check import REINDEXED
+from nti.app.assessment._integrity_check import DUPLICATES
+from nti.app.assessment._integrity_check import UNREGISTERED
+from nti.app.assessment._integrity_check import FIXED_LINEAGE
+from nti.app.assessment._integrity_check import ADJUSTED_CONTAINER
+
+from nti.app.assessment._integrity_check import AssessmentIntegrityChecker
+
+
+class _Site(object):
+
+    def __init__(self, name):
+        self.__name__ = name
+        self.registry = object()
+
+    def getSiteManager(self):
+        return self.registry
+
+
+class _Item(object):
+
+    __parent__ = None
+
+    def __init__(self, ntiid):
+        self.ntiid = ntiid
+
+    def isLocked(self):
+        return False
+
+
+class _IntIds(object):
+
+    def __init__(self, *items):
+        self.ids = {id(x): idx for idx, x in enumerate(items, 1)}
+
+    def queryId(self, item):
+        return self.ids.get(id(item))
+
+    def getId(self, item):
+        return self.ids[id(item)]
+
+
+class _Catalog(object):
+
+    def __init__(self):
+        self.indexed = []
+
+    def get_containers(self, unused_item):
+        return ()
+
+    def index_doc(self, doc_id, unused_item):
+        self.indexed.append(doc_id)
+
+
+class _TransactionManager(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def abort(self):
+        self.calls.append('abort')
+
+    def commit(self):
+        self.calls.append('commit')
+
+
+class _Checker(AssessmentIntegrityChecker):
+
+    def __init__(self, *args, **kwargs):
+        self.attempts = kwargs.pop('attempts')
+        AssessmentIntegrityChecker.__init__(self, *args, **kwargs)
+
+    def _do_site(self, site):
+        self.removed.add(self.attempts[0])
+        if self.attempts.pop(0) == u'conflict':
+            raise TransientError()
+        return 1
+
+
+class TestIntegrityCheck(unittest.TestCase):
+
+    @fudge.patch('nti.app.assessment._integrity_check.get_all_host_sites')
+    def test_sites(self, mock_sites):
+        sites = [_Site(x) for x in ('c', 'a', 'd', 'b')]
+        mock_sites.is_callable().returns(sites)
+        checker = AssessmentIntegrityChecker(intids=object())
+        assert_that([x.__name__ for x in checker.get_sites()],
+                    contains('a', 'b', 'c', 'd'))
+
+        checker = AssessmentIntegrityChecker(worker=1, workers=2,
+                                             intids=object())
+        assert_that([x.__name__ for x in checker.get_sites()],
+                    contains('b', 'd'))
+
+        checker = AssessmentIntegrityChecker(sites=('b', 'c'),
+                                             intids=object())
+        assert_that([x.__name__ for x in checker.get_sites()],
+                    contains('b', 'c'))
+
+    def test_report(self):
+        report = StringIO()
+        checker = AssessmentIntegrityChecker(report=report, intids=object())
+        checker._record((u'tag:ntiid', u'site'), DUPLICATES, Count=2)
+        checker._record((u'tag:ntiid', u'site'), REMOVED)
+        assert_that(report.getvalue(), is_(''))
+        checker._flush()
+        lines = report.getvalue().splitlines()
+        assert_that(lines, has_length(2))
+        assert_that(json.loads(lines[0]),
+                    has_entries('NTIID', 'tag:ntiid',
+                                'Site', 'site',
+                                'Finding', DUPLICATES,
+                                'Count', 2))
+        checker._flush()
+        assert_that(report.getvalue().splitlines(), has_length(2))
+
+    def _findings_of(self, checker):
+        return [x['Finding'] for x in checker._findings]
+
+    @fudge.patch('nti.app.assessment._integrity_check.removeIntId',
+                 'nti.app.assessment._integrity_check.iface_of_assessment')
+    def test_check_counts_unregistered(self, mock_remove, mock_iface):
+        item = _Item(u'tag:q1')
+        mock_iface.is_callable().returns(None)
+        mock_remove.expects_call().with_args(item)
+        container = {u'tag:q1': item}
+        key = (u'tag:q1', u'site')
+        checker = AssessmentIntegrityChecker(intids=_IntIds(item))
+        checker._check_counts({key: [item]}, {}, {key: [container]})
+        assert_that(self._findings_of(checker), contains(UNREGISTERED))
+        assert_that(container, has_length(1))
+
+        checker = AssessmentIntegrityChecker(remove=True,
+                                             intids=_IntIds(item))
+        checker._check_counts({key: [item]}, {}, {key: [container]})
+        assert_that(self._findings_of(checker),
+                    contains(UNREGISTERED, REMOVED))
+        assert_that(checker.removed, contains(u'tag:q1'))
+        assert_that(container, has_length(0))
+
+    @fudge.patch('nti.app.assessment._integrity_check.removeIntId',
+                 'nti.app.assessment._integrity_check.QuestionIndex',
+                 'nti.app.assessment._integrity_check.iface_of_assessment')
+    def test_check_counts_duplicates(self, mock_remove, mock_index, mock_iface):
+        registered, duplicate = _Item(u'tag:q1'), _Item(u'tag:q1')
+        duplicate.__parent__ = object()
+        mock_iface.is_callable().returns(None)
+        mock_remove.expects_call().with_args(duplicate)
+        mock_index.expects('canonicalize_object')
+        key = (u'tag:q1', u'site')
+        checker = AssessmentIntegrityChecker(intids=_IntIds(registered, duplicate))
+        checker._check_counts({key: [registered, duplicate]},
+                              {key: (_Site(u'site'), registered)},
+                              {})
+        assert_that(self._findings_of(checker), contains(DUPLICATES))
+        assert_that(checker.duplicates, is_({u'tag:q1': 1}))
+        assert_that(duplicate.__parent__, is_(None))
+
+    @fudge.patch('nti.app.assessment._integrity_check.removeIntId',
+                 'nti.app.assessment._integrity_check.find_interface',
+                 'nti.app.assessment._integrity_check.get_metadata_catalog')
+    def test_check_registered(self, mock_remove, mock_find, mock_meta):
+        registered, stale = _Item(u'tag:q1'), _Item(u'tag:q1')
+        unit = object()
+        mock_remove.expects_call().with_args(stale)
+        mock_find.is_callable().returns(unit)
+        meta_catalog = _Catalog()
+        mock_meta.is_callable().returns(meta_catalog)
+        container = {u'tag:q1': stale}
+        key = (u'tag:q1', u'site')
+        checker = AssessmentIntegrityChecker(intids=_IntIds(registered, stale))
+        checker.legacy = set()
+        checker.catalog = _Catalog()
+        checker._check_registered({key: (_Site(u'site'), registered)},
+                                  {key: [container]})
+        assert_that(self._findings_of(checker),
+                    contains(REINDEXED, FIXED_LINEAGE, ADJUSTED_CONTAINER))
+        assert_that(registered.__parent__, is_(unit))
+        assert_that(container[u'tag:q1'], is_(registered))
+        assert_that(checker.catalog.indexed, is_([1, 1]))
+        assert_that(meta_catalog.indexed, is_([1, 1]))
+        assert_that(checker.reindexed, contains(u'tag:q1'))
+        assert_that(checker.fixed_lineage, contains(u'tag:q1'))
+        assert_that(checker.adjusted_container, contains(u'tag:q1'))
+
+    def test_check_site_retry(self):
+        tm = _TransactionManager()
+        checker = _Checker(attempts=[u'conflict', u'first', u'second'],
+                           transaction_manager=tm,
+                           intids=object())
+        checker.removed.add(u'previous')
+        assert_that(checker.check_site(_Site(u'a')), is_(1))
+        assert_that(sorted(checker.removed), contains(u'first', u'previous'))
+        checker.check_site(_Site(u'b'))
+        assert_that(sorted(checker.removed),
+                    contains(u'first', u'previous', u'second'))
+        assert_that(checker.checked, is_(2))
+        assert_that(tm.calls, contains('abort', 'commit', 'commit'))
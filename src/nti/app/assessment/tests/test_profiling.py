@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import contains
+from hamcrest import has_entry
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import has_entries
+from hamcrest import contains_string
+
+import unittest
+
+from zope import interface
+
+from nti.app.assessment import profiling
+
+from nti.app.assessment.profiling import RequestProfile
+from nti.app.assessment.profiling import ProfileStatistics
+
+
+class _Catalog(object):
+
+    def __init__(self, name):
+        self.__name__ = name
+
+    def apply(self, query):
+        return query
+
+
+class _Object(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _Request(object):
+
+    view_name = u'Savepoint'
+    request_iface = interface.Interface
+
+    def __init__(self, adapters):
+        self.context = object()
+        self.registry = _Object(adapters=adapters)
+
+
+class TestProfiling(unittest.TestCase):
+
+    def tearDown(self):
+        profiling._state.profile = None
+        profiling._unpatch_all()
+
+    def test_timed(self):
+        calls = []
+
+        def inner():
+            calls.append('inner')
+            return 1
+
+        timed_inner = profiling._timed(inner, u'decorator', u'decorator.inner')
+
+        def outer():
+            calls.append('outer')
+            return timed_inner() + 1
+
+        timed_outer = profiling._timed(outer, u'decorator', u'decorator.outer')
+        # no profile, no counters
+        assert_that(timed_outer(), is_(2))
+
+        profile = profiling._state.profile = RequestProfile()
+        assert_that(timed_outer(), is_(2))
+        # nested calls of a category are counted once
+        assert_that(profile.counters, has_length(1))
+        assert_that(profile.counters[u'decorator.outer'][0], is_(1))
+        assert_that(calls, is_(['outer', 'inner', 'outer', 'inner']))
+
+    def test_catalog_key(self):
+        profile = profiling._state.profile = RequestProfile()
+        apply_ = profiling._timed(profiling._function(_Catalog.apply),
+                                  u'catalog', profiling._catalog_key)
+        apply_(_Catalog(profiling.EVALUATION_CATALOG_NAME), {})
+        apply_(_Catalog(u'nti.dataserver.++etc++metadata-catalog'), {})
+        apply_(_Catalog(u'other'), {})
+        assert_that(sorted(profile.counters),
+                    contains(u'catalog.evaluation', u'catalog.metadata'))
+
+    def test_patch(self):
+        original = _Catalog.__dict__['apply']
+        profiling._patch(_Catalog, 'apply', lambda self, query: None)
+        profiling._patch(_Catalog, 'missing', lambda self: None)
+        assert_that(_Catalog(u'a').apply(1), is_(none()))
+        profiling._unpatch_all()
+        assert_that(_Catalog.__dict__['apply'], is_(original))
+        assert_that(hasattr(_Catalog, 'missing'), is_(False))
+
+    def test_statistics(self):
+        stats = ProfileStatistics(max_endpoints=2)
+        for endpoint, elapsed in ((u'a', 1.0), (u'a', 3.0), (u'b', 1.5), (u'c', 9)):
+            profile = RequestProfile(endpoint)
+            profile.add(u'zodb', 0.5)
+            profile.elapsed = elapsed
+            stats.record(profile)
+        slowest = stats.slowest()
+        assert_that(slowest, has_length(2))
+        assert_that(slowest[0],
+                    has_entries('Endpoint', u'a',
+                                'Count', 2,
+                                'Mean', 2.0,
+                                'Max', 3.0,
+                                'Counters', has_entry(u'zodb',
+                                                      has_entries('Count', 2,
+                                                                  'PerRequest', 1.0))))
+        assert_that(stats.slowest(1, 'Max'), has_length(1))
+
+        profile = RequestProfile(u'a')
+        profile.add(u'catalog.evaluation', 0.002)
+        profile.finish()
+        assert_that(profile.header(),
+                    contains_string('catalog-evaluation;desc="1";dur=2.00'))
+
+    def test_assessment_view(self):
+        def _view():
+            pass
+
+        def _other():
+            pass
+        _view.__module__ = 'nti.app.assessment.views.assessment_views'
+        _other.__module__ = 'nti.app.contenttypes.views'
+
+        class _Adapters(object):
+            view = None
+
+            def lookup(self, *unused_args, **unused_kwargs):
+                return self.view
+
+        adapters = _Adapters()
+        request = _Request(adapters)
+        assert_that(profiling._is_assessment_view(request), is_(False))
+        adapters.view = _other
+        assert_that(profiling._is_assessment_view(request), is_(False))
+        adapters.view = _view
+        assert_that(profiling._is_assessment_view(request), is_(True))
+        # views combined by predicates
+        adapters.view = _Object(views=[(1, _other, None), (2, _view, None)])
+        assert_that(profiling._is_assessment_view(request), is_(True))
+
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import assert_that
+from hamcrest import contains_inanyorder
+
+import random
+import unittest
+
+from nti.app.assessment.common.randomization import get_permutation
+from nti.app.assessment.common.randomization import PermutationGenerator
+
+
+class TestRandomization(unittest.TestCase):
+
+    def test_permutation_generator(self):
+        for seed in (1, 42, 123456789):
+            for size in (0, 1, 5, 20):
+                expected = [u'item%s' % x for x in range(size)]
+                random.Random(seed).shuffle(expected)
+                values = [u'item%s' % x for x in range(size)]
+                generator = PermutationGenerator(seed)
+                generator.shuffle(values)
+                assert_that(values, is_(expected))
+                # every shuffle is the one of a new generator
+                again = [u'item%s' % x for x in range(size)]
+                generator.shuffle(again)
+                assert_that(again, is_(expected))
+
+    def test_get_permutation(self):
+        permutation = get_permutation(7, 10)
+        assert_that(permutation, contains_inanyorder(*range(10)))
+        assert_that(get_permutation(7, 10), is_(permutation))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import contains
+from hamcrest import is_not
+from hamcrest import has_length
+from hamcrest import assert_that
+
+import fudge
+
+import unittest
+
+from nti.app.assessment.common.grading import schedule_regrade
+from nti.app.assessment.common.grading import regrade_evaluation
+from nti.app.assessment.common.grading import get_graded_submission
+
+from nti.app.assessment.regrade import REGRADE_FAILED
+from nti.app.assessment.regrade import REGRADE_RUNNING
+from nti.app.assessment.regrade import REGRADE_PENDING
+
+from nti.app.assessment.regrade import CourseRegradeJobs
+
+
+class _Object(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _item(name, *values):
+    parts = [_Object(assessedValue=x) for x in values]
+    question_set = _Object(questions=[_Object(parts=parts)])
+    return _Object(name=name,
+                   pendingAssessment=_Object(parts=[question_set]))
+
+
+class TestRegradeJobs(unittest.TestCase):
+
+    def test_graded_submission(self):
+        items = [_item('first', 1.0, 0.0),
+                 _item('second', 1.0, 1.0),
+                 _item('third', 0.5, 0.5),
+                 _item('fourth', None, 0.0)]
+        assert_that(get_graded_submission(items, 'most_recent').name,
+                    is_('fourth'))
+        assert_that(get_graded_submission(items, 'highest_grade').name,
+                    is_('second'))
+        # ties go to the most recent item
+        assert_that(get_graded_submission(items[:1] + items[2:3], 'highest_grade').name,
+                    is_('third'))
+
+    def test_jobs(self):
+        jobs = CourseRegradeJobs()
+        job = jobs.create(u'tag:nextthought.com,2011-10:assignment', 10)
+        assert_that(jobs, has_length(1))
+        assert_that(job.state, is_(REGRADE_PENDING))
+        assert_that(job.done, is_(0))
+        assert_that(job.eta, is_(none()))
+
+        job.state = REGRADE_RUNNING
+        job.mark_done((u'ichigo', u'a1'), 4)
+        assert_that(job.is_done((u'ichigo', u'a1')), is_(True))
+        assert_that(job.is_done((u'ichigo', u'a2')), is_(False))
+        assert_that(job.done, is_(4))
+        job.createdTime = job.lastModified - 8
+        assert_that(job.eta, is_(12.0))
+        assert_that(job.is_finished(), is_(False))
+        assert_that(job.is_stale(), is_(False))
+        job.lastModified -= 7200
+        assert_that(job.is_stale(), is_(True))
+        assert_that(job.is_stale(timeout=10000), is_(False))
+
+        assert_that(job.has_cursor, is_(False))
+        assert_that(list(job.iter_cursor()), is_([]))
+        job.set_cursor([((u'aizen', u'a1'), [1, 2]),
+                        ((u'aizen', u'a2'), [3])])
+        job.advance(0)
+        assert_that(list(job.iter_cursor()),
+                    is_([(1, ((u'aizen', u'a2'), (3,)))]))
+
+        jobs.remove(job.evaluationId)
+        assert_that(jobs, has_length(0))
+
+    @fudge.patch('nti.app.assessment.common.grading.evaluation_submissions',
+                 'nti.app.assessment.common.grading.IUsersCourseAssignmentHistoryItem',
+                 'nti.app.assessment.common.grading.get_policy_submission_priority',
+                 'nti.app.assessment.common.grading.reassess_assignment_history_item',
+                 'nti.app.assessment.common.grading.notify')
+    def test_regrade_evaluation(self, mock_subs, mock_iface, mock_priority,
+                                mock_reassess, mock_notify):
+        def _submission(name, username, assignmentId, createdTime, *values):
+            result = _item(name, *values)
+            result.creator = username
+            result.createdTime = createdTime
+            result.Submission = _Object(assignmentId=assignmentId)
+            return result
+        # a question used by two assignments with different policies
+        items = [_submission('a1-late', u'ichigo', u'a1', 2, 0.0),
+                 _submission('a2-best', u'ichigo', u'a2', 1, 1.0),
+                 _submission('a1-early', u'ichigo', u'a1', 0, 1.0),
+                 _submission('a2-late', u'ichigo', u'a2', 3, 0.0),
+                 _submission('a1-other', u'rukia', u'a1', 4, 1.0)]
+        mock_subs.is_callable().returns(items)
+        mock_iface.provides('providedBy').returns(True)
+        policies = {u'a1': 'most_recent', u'a2': 'highest_grade'}
+        mock_priority.is_callable().calls(lambda x, _: policies[x])
+        mock_reassess.is_callable().times_called(5)
+        events = []
+        mock_notify.is_callable().calls(events.append)
+
+        assert_that(regrade_evaluation(None, None), has_length(5))
+        # one event per user and assignment, with its own policy
+        assert_that([x.object.name for x in events],
+                    contains('a1-late', 'a2-best', 'a1-other'))
+
+    @fudge.patch('nti.app.assessment.common.grading.ICourseRegradeJobs',
+                 'nti.app.assessment.common.grading._queue_regrade_batch')
+    def test_schedule_regrade(self, mock_jobs, mock_queue):
+        jobs = CourseRegradeJobs()
+        mock_jobs.is_callable().returns(jobs)
+        mock_queue.expects_call().times_called(3)
+        evaluation = fudge.Fake('evaluation').has_attr(ntiid=u'tag:assignment')
+
+        # edits before the job starts are coalesced
+        job = schedule_regrade(evaluation, None)
+        assert_that(schedule_regrade(evaluation, None), is_(job))
+        assert_that(job.state, is_(REGRADE_PENDING))
+
+        # a running job is run again once done
+        job.state = REGRADE_RUNNING
+        assert_that(schedule_regrade(evaluation, None), is_(job))
+        assert_that(job.rerun, is_(True))
+
+        # a finished job is replaced
+        job.state = REGRADE_FAILED
+        new_job = schedule_regrade(evaluation, None)
+        assert_that(new_job, is_not(job))
+        assert_that(new_job.rerun, is_(False))
+
+        # so is a dead one
+        new_job.lastModified -= 7200
+        assert_that(schedule_regrade(evaluation, None), is_not(new_job))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import assert_that
+
+import csv
+
+import unittest
+
+from collections import OrderedDict
+
+from io import BytesIO
+
+import transaction
+
+from persistent import Persistent
+
+from persistent.list import PersistentList
+
+from persistent.mapping import PersistentMapping
+
+from ZODB import DB
+
+from ZODB.DemoStorage import DemoStorage
+
+from nti.app.assessment.views.report_mixins import AssessmentCSVReportMixin
+
+
+class _Question(Persistent):
+
+    def __init__(self, ntiid, parts):
+        self.ntiid = ntiid
+        self.parts = parts
+
+
+class _Report(AssessmentCSVReportMixin):
+
+    def __init__(self, context, course):
+        self.context = context
+        self.course = course
+
+    def _get_header_row(self, question_order):
+        header_row = ['user']
+        for question in self.context:
+            question_order[question.ntiid] = question
+            header_row.extend(question.parts)
+        return header_row
+
+    def _get_user_rows(self, question_order, column_count):
+        for username, answers in sorted(self.course.items()):
+            row = [username]
+            for ntiid, question in question_order.items():
+                for part in question.parts:
+                    row.append(answers.get(ntiid, {}).get(part, '-'))
+            assert len(row) == column_count
+            yield row
+
+
+class TestReportMixin(unittest.TestCase):
+
+    def setUp(self):
+        self.db = DB(DemoStorage())
+        connection = self.db.open()
+        root = connection.root()
+        root['context'] = PersistentList([_Question('q1', ['a', 'b']),
+                                          _Question('q2', ['c'])])
+        root['course'] = PersistentMapping({
+            'ichigo': PersistentMapping({'q1': {'a': '1', 'b': '2'}}),
+            'rukia': PersistentMapping({'q2': {'c': '3'}}),
+        })
+        transaction.commit()
+        connection.close()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_rows_after_connection_closed(self):
+        tm = transaction.TransactionManager()
+        connection = self.db.open(transaction_manager=tm)
+        root = connection.root()
+        report = _Report(root['context'], root['course'])
+        question_order = OrderedDict()
+        header_row = report._get_header_row(question_order)
+        app_iter = report._iter_report(None, header_row, question_order)
+
+        # the request's objects cannot be loaded once it is done
+        connection.cacheMinimize()
+        tm.abort()
+        connection.close()
+
+        result = b''.join(app_iter)
+        rows = list(csv.reader(BytesIO(result)))
+        assert_that(rows, is_([['user', 'a', 'b', 'c'],
+                               ['ichigo', '1', '2', '-'],
+                               ['rukia', '-', '-', '3']]))
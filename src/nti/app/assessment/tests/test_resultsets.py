@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import has_length
+from hamcrest import assert_that
+
+import unittest
+
+from zope import interface
+
+from nti.app.assessment.common.resultsets import resolve_intids
+
+
+class IMarker(interface.Interface):
+    pass
+
+
+class _Jar(object):
+
+    def __init__(self):
+        self.prefetched = []
+
+    def prefetch(self, oids):
+        self.prefetched.append(list(oids))
+
+
+class _Object(object):
+    """
+    A ghost activated on the access of any attribute.
+    """
+
+    def __init__(self, oid, jar):
+        self._p_oid = oid
+        self._p_jar = jar
+        self._p_changed = None
+
+    def __getattribute__(self, name):
+        if not name.startswith('_p_'):
+            object.__setattr__(self, '_p_changed', False)
+        return object.__getattribute__(self, name)
+
+
+@interface.implementer(IMarker)
+class _Marked(_Object):
+    pass
+
+
+class _IntIds(object):
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def queryObject(self, doc_id):
+        return self.objects.get(doc_id)
+
+
+class TestResultSets(unittest.TestCase):
+
+    def test_resolve_intids(self):
+        jar = _Jar()
+        provided = _Object(3, jar)
+        interface.alsoProvides(provided, IMarker)
+        provided._p_changed = None
+        objects = {
+            1: _Marked(1, jar),
+            2: _Object(2, jar),
+            3: provided,
+            5: _Marked(5, jar),
+        }
+        intids = _IntIds(objects)
+        result = list(resolve_intids((5, 4, 3, 2, 1), intids=intids))
+        assert_that(result, contains(objects[5], objects[3],
+                                     objects[2], objects[1]))
+        assert_that(jar.prefetched, is_([[5, 3, 2, 1]]))
+
+        jar.prefetched = []
+        for obj in objects.values():
+            obj._p_changed = None
+        result = list(resolve_intids((5, 4, 3, 2, 1), IMarker,
+                                     intids=intids, batch_size=2))
+        assert_that(result, contains(objects[5], objects[3], objects[1]))
+        # the ghosts that need an interface check are loaded together
+        assert_that(jar.prefetched, is_([[5], [3, 2], [1]]))
+
+        assert_that(list(resolve_intids(None, intids=intids)), has_length(0))
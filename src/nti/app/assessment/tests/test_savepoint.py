@@ -31,7 +31,13 @@ from nti.app.assessment.savepoint import UsersCourseAssignmentSavepoint
 from nti.app.assessment.savepoint import UsersCourseAssignmentSavepoints
 from nti.app.assessment.savepoint import UsersCourseAssignmentSavepointItem
 
+from nti.app.assessment.savepoint import get_buffered_savepoint
+from nti.app.assessment.savepoint import patch_savepoint_submission
+from nti.app.assessment.savepoint import buffer_savepoint_submission
+
+from nti.assessment.submission import QuestionSubmission
 from nti.assessment.submission import AssignmentSubmission
+from nti.assessment.submission import QuestionSetSubmission
 
 from nti.app.assessment.tests import AssessmentLayerTest
 
@@ -115,6 +121,59 @@ class TestSavepoint(AssessmentLayerTest):
             savepoint.removeSubmission(submission, event=event)
             assert_that(savepoint, has_length(0))
 
+    @WithMockDSTrans
+    def test_patch(self):
+        connection = mock_dataserver.current_transaction
+
+        def _submission(first, second, qset=u'qset'):
+            questions = [QuestionSubmission(questionId=u'q1', parts=[first]),
+                         QuestionSubmission(questionId=u'q2', parts=[second])]
+            part = QuestionSetSubmission(questionSetId=qset,
+                                         questions=questions)
+            return AssignmentSubmission(assignmentId=u'b', parts=(part,))
+
+        savepoint = UsersCourseAssignmentSavepoint()
+        connection.add(savepoint)
+        stored = _submission(u'a', u'b')
+        item = savepoint.recordSubmission(stored)
+        unchanged = stored.parts[0].questions[0]
+
+        assert_that(savepoint.patchSubmission(_submission(u'a', u'c')),
+                    is_(item))
+        questions = item.Submission.parts[0].questions
+        assert_that(questions[0], is_(unchanged))
+        assert_that(questions[1].parts, is_([u'c']))
+        assert_that(questions[1].__parent__, is_(stored.parts[0]))
+
+        # different structure
+        assert_that(patch_savepoint_submission(stored,
+                                               _submission(u'a', u'b', u'other')),
+                    is_(False))
+        assert_that(savepoint.patchSubmission(AssignmentSubmission(assignmentId=u'x')),
+                    is_(none()))
+
+        # save points of another structure replace the stored one
+        replacement = _submission(u'x', u'y', u'other')
+        assert_that(savepoint.replaceSubmission(replacement), is_(item))
+        assert_that(savepoint[u'b'], is_(item))
+        assert_that(item.Submission, is_(replacement))
+        assert_that(replacement.__parent__, is_(item))
+        assert_that(savepoint.replaceSubmission(AssignmentSubmission(assignmentId=u'x')),
+                    is_(none()))
+
+        # save points are buffered until the item is written again
+        assert_that(buffer_savepoint_submission(item, _submission(u'n', u'm')),
+                    is_(True))
+        buffered = get_buffered_savepoint(item)
+        questions = buffered['Submission']['parts'][0]['questions']
+        assert_that(questions[0]['parts'], is_([u'n']))
+        assert_that(item.Submission, is_(replacement))
+        item.updateLastMod(item.lastModified + 1)
+        assert_that(get_buffered_savepoint(item), is_(none()))
+        assert_that(buffer_savepoint_submission(UsersCourseAssignmentSavepointItem(),
+                                                replacement),
+                    is_(False))
+
 
 import fudge
 from six.moves.urllib_parse import unquote
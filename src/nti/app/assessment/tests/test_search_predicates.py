@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import assert_that
+
+import fudge
+
+import unittest
+
+from zope import component
+from zope import interface
+
+from nti.app.assessment.search.interfaces import IBatchSearchHitPredicate
+
+from nti.app.assessment.search.predicates import _SearchHitContext
+
+from nti.app.assessment.search.predicates import allow_search_hits
+from nti.app.assessment.search.predicates import filter_search_hits
+
+from nti.contentsearch.interfaces import ISearchHitPredicate
+
+
+class _Principal(object):
+    id = u'ichigo'
+
+
+class _Predicate(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def allow(self, item, unused_score, unused_query=None):
+        self.calls.append('allow')
+        return item % 2 == 0
+
+    def allow_all(self, items, unused_scores, unused_query=None):
+        self.calls.append('allow_all')
+        return [x % 2 == 0 for x in items]
+
+
+class _IHit(interface.Interface):
+    pass
+
+
+@interface.implementer(_IHit)
+class _Hit(object):
+
+    def __init__(self, value):
+        self.value = value
+
+
+@interface.implementer(IBatchSearchHitPredicate)
+class _BatchPredicate(object):
+
+    calls = []
+
+    def __init__(self, unused_context):
+        pass
+
+    def allow_all(self, items, unused_scores, unused_query=None):
+        self.calls.append(len(items))
+        return [x.value % 2 == 0 for x in items]
+
+
+class TestSearchPredicates(unittest.TestCase):
+
+    def test_allow_search_hits(self):
+        predicate = _Predicate()
+        assert_that(allow_search_hits(predicate, (1, 2, 4)),
+                    is_([False, True, True]))
+        assert_that(predicate.calls, is_(['allow'] * 3))
+
+        predicate = _Predicate()
+        interface.alsoProvides(predicate, IBatchSearchHitPredicate)
+        assert_that(allow_search_hits(predicate, (1, 2, 4), (1.0, 1.0, 1.0)),
+                    is_([False, True, True]))
+        assert_that(predicate.calls, is_(['allow_all']))
+
+    def test_filter_search_hits(self):
+        factory = _BatchPredicate
+        gsm = component.getGlobalSiteManager()
+        gsm.registerSubscriptionAdapter(factory, (_IHit,), ISearchHitPredicate)
+        try:
+            hits = [_Hit(1), _Hit(2), object(), _Hit(4)]
+            assert_that(filter_search_hits(hits),
+                        is_([False, True, True, True]))
+            # a single batch for the page
+            assert_that(_BatchPredicate.calls, is_([3]))
+        finally:
+            gsm.unregisterSubscriptionAdapter(factory, (_IHit,),
+                                              ISearchHitPredicate)
+
+    @fudge.patch('nti.app.assessment.search.predicates.is_instructed_by_name')
+    def test_context_memos(self, mock_instructed):
+        mock_instructed.expects_call().times_called(2).returns(True)
+        context = _SearchHitContext(_Principal())
+        first, second = object(), object()
+        for course in (first, second, first, second):
+            assert_that(context.is_instructor(course), is_(True))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import assert_that
+from hamcrest import same_instance
+
+import unittest
+
+from zope import interface
+
+from nti.app.assessment._submission import get_submission_plan
+
+from nti.assessment.interfaces import IQFilePart
+
+
+class _Object(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _assignment(max_file_size=10):
+    file_part = _Object(max_file_size=max_file_size)
+    interface.alsoProvides(file_part, IQFilePart)
+    question = _Object(ntiid=u'q1', parts=(file_part, _Object()),
+                       lastModified=0)
+    question_set = _Object(ntiid=u'qset', questions=(question,))
+    return _Object(ntiid=u'assignment', version=u'1', lastModified=0,
+                   parts=(_Object(question_set=question_set),))
+
+
+class TestSubmissionPlan(unittest.TestCase):
+
+    def test_plan(self):
+        assignment = _assignment()
+        plan = get_submission_plan(assignment)
+        assert_that(plan.question_set_ids, is_((u'qset',)))
+        parts = plan.question_parts(u'q1')
+        assert_that(parts[0], is_((True, 10, None)))
+        assert_that(parts[1][0], is_(False))
+        assert_that(get_submission_plan(assignment), same_instance(plan))
+
+        # rebuilt on a new version
+        assignment.version = u'2'
+        assert_that(get_submission_plan(assignment), is_not(same_instance(plan)))
+
+        # and when one of its questions is edited
+        question = assignment.parts[0].question_set.questions[0]
+        question.parts[0].max_file_size = 20
+        question.lastModified = 1
+        plan = get_submission_plan(assignment)
+        assert_that(plan.question_parts(u'q1')[0], is_((True, 20, None)))
+        assert_that(get_submission_plan(assignment), same_instance(plan))
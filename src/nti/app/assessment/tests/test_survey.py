@@ -36,12 +36,17 @@ from six.moves.urllib_parse import unquote
 
 import weakref
 
+from zope.annotation.interfaces import IAnnotations
+
 from nti.app.assessment.interfaces import IUsersCourseInquiry
 from nti.app.assessment.interfaces import IUsersCourseInquiryItem
+from nti.app.assessment.interfaces import ICourseRunningAggregatedInquiries
 
 from nti.app.assessment.survey import UsersCourseInquiry
 from nti.app.assessment.survey import UsersCourseInquiries
 from nti.app.assessment.survey import UsersCourseInquiryItem
+from nti.app.assessment.survey import RUNNING_AGGREGATE_COMPACT_SIZE
+from nti.app.assessment.survey import CourseRunningAggregatedInquiries
 
 from nti.app.assessment.tests import AssessmentLayerTest
 from nti.app.assessment.tests import RegisterAssignmentLayerMixin
@@ -52,6 +57,7 @@ from nti.app.testing.decorators import WithSharedApplicationMockDS
 from nti.app.testing.application_webtest import ApplicationLayerTest
 
 from nti.assessment.interfaces import IQSurveySubmission
+from nti.assessment.interfaces import DISCLOSURE_ALWAYS
 from nti.assessment.interfaces import DISCLOSURE_SUBMISSION
 
 from nti.assessment.survey import QPollSubmission
@@ -105,6 +111,41 @@ class TestSurvey(AssessmentLayerTest):
         course_survey.removeSubmission(submission)
         assert_that(course_survey, has_length(0))
 
+    def test_running_aggregates(self):
+        running = CourseRunningAggregatedInquiries()
+        assert_that(running, validly_provides(ICourseRunningAggregatedInquiries))
+
+        # nothing to fold into until the aggregate is built
+        assert_that(running.fold(u'poll', u'ichigo', 1), is_(False))
+        assert_that(running.get(u'poll'), is_(none()))
+
+        running.store(u'poll', [(u'aizen', 2), (u'rukia', 3)])
+        assert_that(running.fold(u'poll', u'ichigo', 4), is_(True))
+        assert_that(running.get(u'poll'), is_(9))
+        assert_that(running.count(u'poll'), is_(3))
+        assert_that(running, has_length(1))
+
+        # folded submissions are removed; stored ones need a rebuild
+        assert_that(running.remove(u'poll', u'ichigo'), is_(True))
+        assert_that(running.get(u'poll'), is_(5))
+        assert_that(running.count(u'poll'), is_(2))
+        assert_that(running.remove(u'poll', u'aizen'), is_(False))
+        assert_that(running.remove(u'other', u'aizen'), is_(True))
+
+        # submissions are compacted, and each is only folded once
+        running.store(u'poll', ())
+        for idx in range(RUNNING_AGGREGATE_COMPACT_SIZE + 1):
+            running.fold(u'poll', idx, 1)
+            running.fold(u'poll', idx, 1)
+        assert_that(running.get(u'poll'), is_(RUNNING_AGGREGATE_COMPACT_SIZE + 1))
+        assert_that(running.remove(u'poll', 0), is_(False))
+        assert_that(running.remove(u'poll', RUNNING_AGGREGATE_COMPACT_SIZE), is_(True))
+
+        running.invalidate(u'poll')
+        assert_that(running.get(u'poll'), is_(none()))
+        assert_that(running.count(u'poll'), is_(0))
+        assert_that(running, has_length(0))
+
 
 COURSE_NTIID = u'tag:nextthought.com,2011-10:NTI-CourseInfo-Fall2013_CLC3403_LawAndJustice'
 COURSE_URL = u'/dataserver2/%2B%2Betc%2B%2Bhostsites/platform.ou.edu/%2B%2Betc%2B%2Bsite/Courses/Fall2013/CLC3403_LawAndJustice'
@@ -430,6 +471,70 @@ class TestSurveyViews(RegisterAssignmentLayerMixin, ApplicationLayerTest):
         # User w/ no submission shouldn't be able to fetch results
         self.testapp.get(results_link, extra_environ=alt_student_env, status=403)
 
+    def _has_running_aggregates(self):
+        with mock_dataserver.mock_db_trans(self.ds, 'janux.ou.edu'):
+            course = find_object_with_ntiid(COURSE_NTIID)
+            course = ICourseInstance(course)
+            running = IAnnotations(course).get(u'RunningAggregatedInquiries')
+            return running is not None
+
+    def _drop_running_aggregates(self):
+        with mock_dataserver.mock_db_trans(self.ds, 'janux.ou.edu'):
+            course = find_object_with_ntiid(COURSE_NTIID)
+            course = ICourseInstance(course)
+            del IAnnotations(course)[u'RunningAggregatedInquiries']
+
+    @WithSharedApplicationMockDS(users=('sjohnson@nextthought.com',),
+                                 testapp=True,
+                                 default_authenticate=True)
+    @fudge.patch('nti.contenttypes.courses.catalog.CourseCatalogEntry.isCourseCurrentlyActive')
+    def test_running_aggregate(self, fake_active):
+        """
+        Free response (non-integer) and multiple choice answers are folded
+        into the running aggregate when submitted; reads never build it.
+        """
+        fake_active.is_callable().returns(True)
+        admin_environ = self._make_extra_environ(username='sjohnson@nextthought.com')
+
+        survey_res = self._create_survey(disclosure=DISCLOSURE_ALWAYS,
+                                         filename="survey.json")
+        survey_href = survey_res['href']
+        assert_that(self._has_running_aggregates(), is_(False))
+
+        answers = (['answer'], ['other'], [1])
+        poll_subs = [QPollSubmission(pollId=poll['NTIID'], parts=parts)
+                     for poll, parts in zip(survey_res['questions'], answers)]
+        submission = QSurveySubmission(surveyId=survey_res['NTIID'],
+                                       questions=poll_subs)
+        ext_obj = to_external_object(submission)
+        del ext_obj['Class']
+        self._test_submission(survey_res['NTIID'], ext_obj)
+        assert_that(self._has_running_aggregates(), is_(True))
+
+        def _check_results():
+            results = self.testapp.get(survey_href + '/@@Aggregated').json_body
+            questions = results['questions']
+            for question in questions:
+                assert_that(question['parts'][0]['Total'], is_(1))
+            assert_that(questions[0]['parts'][0]['Results'],
+                        has_entries({'answer': 1}))
+            assert_that(questions[1]['parts'][0]['Results'],
+                        has_entries({'other': 1}))
+            assert_that(questions[2]['parts'][0]['Results'], has_length(1))
+
+        _check_results()
+        check = self.testapp.get(survey_href + '/@@AggregatedConsistencyCheck',
+                                 extra_environ=admin_environ).json_body
+        assert_that(check, has_entries('Consistent', True,
+                                       'Count', 1,
+                                       'Expected', 1))
+
+        # without a running aggregate, reads fold on the fly and do not
+        # build it
+        self._drop_running_aggregates()
+        _check_results()
+        assert_that(self._has_running_aggregates(), is_(False))
+
     @WithSharedApplicationMockDS(users=('test_full_submission_user', 'sjohnson@nextthought.com',),
                                  testapp=True,
                                  default_authenticate=True)
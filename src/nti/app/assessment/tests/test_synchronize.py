@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import is_in
+from hamcrest import is_not
+from hamcrest import has_key
+from hamcrest import contains
+from hamcrest import not_none
+from hamcrest import has_entry
+from hamcrest import assert_that
+from hamcrest import has_entries
+from hamcrest import same_instance
+from hamcrest import contains_inanyorder
+
+import copy
+import unittest
+
+import simplejson as json
+
+from zope import component
+from zope import interface
+
+from zope.annotation.interfaces import IAttributeAnnotatable
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.assessment import get_evaluation_catalog
+
+from nti.app.assessment._question_map import _AssessmentItemOOBTree
+
+from nti.app.assessment.index import IX_NTIID
+
+from nti.app.assessment.synchronize import ITEM_HASHES_ATTR
+
+from nti.app.assessment.synchronize import hash_assessment_item
+from nti.app.assessment.synchronize import prune_assessment_index
+from nti.app.assessment.synchronize import get_assessment_index_hashes
+from nti.app.assessment.synchronize import iter_assessment_index_items
+from nti.app.assessment.synchronize import diff_assessment_index_hashes
+from nti.app.assessment.synchronize import sync_assessment_index_incrementally
+from nti.app.assessment.synchronize import add_assessment_items_from_new_content
+
+from nti.app.assessment.tests import AssessmentLayerTest
+
+from nti.assessment.interfaces import IQuestion
+from nti.assessment.interfaces import IQuestionSet
+from nti.assessment.interfaces import IQAssessmentItemContainer
+
+from nti.contentlibrary.interfaces import IContentPackage
+
+from nti.dataserver.tests.mock_dataserver import WithMockDSTrans
+
+
+def _index():
+    return {
+        'Items': {
+            'tag:chapter': {
+                'filename': 'chapter.html',
+                'AssessmentItems': {
+                    'tag:q1': {'MimeType': 'question', 'content': u'one'},
+                },
+                'Items': {
+                    'tag:section': {
+                        'NTIID': 'tag:section',
+                        'filename': 'section.html',
+                        'AssessmentItems': {
+                            'tag:q2': {'MimeType': 'question', 'content': u'two'},
+                        },
+                    },
+                    'tag:nameless': {
+                        'filename': 'nameless.html',
+                        'AssessmentItems': {
+                            'tag:q3': {'MimeType': 'question', 'content': u'three'},
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+class TestSynchronize(unittest.TestCase):
+
+    def test_hash(self):
+        assert_that(hash_assessment_item({'a': 1, 'b': [1, 2]}),
+                    is_(hash_assessment_item({'b': [1, 2], 'a': 1})))
+        assert_that(hash_assessment_item({'a': 1}),
+                    is_not(hash_assessment_item({'a': 2})))
+
+    def test_levels(self):
+        levels = {ntiid: level for ntiid, _, level
+                  in iter_assessment_index_items(_index())}
+        assert_that(levels, has_entries('tag:q1', 'tag:chapter',
+                                        'tag:q2', 'tag:section',
+                                        'tag:q3', 'tag:chapter'))
+
+    def test_diff(self):
+        index = _index()
+        stored = get_assessment_index_hashes(index)
+        chapter = index['Items']['tag:chapter']
+        chapter['AssessmentItems']['tag:q1']['content'] = u'uno'
+        chapter['AssessmentItems']['tag:q4'] = {'MimeType': 'question'}
+        section = chapter['Items']['tag:section']
+        section['AssessmentItems']['tag:q3'] = \
+            chapter['Items'].pop('tag:nameless')['AssessmentItems']['tag:q3']
+        section['AssessmentItems'].pop('tag:q2')
+        removed, changed, added, unchanged = \
+            diff_assessment_index_hashes(stored, get_assessment_index_hashes(index))
+        assert_that(removed, contains_inanyorder('tag:q2'))
+        # moved to another level
+        assert_that(changed, contains_inanyorder('tag:q1', 'tag:q3'))
+        assert_that(added, contains_inanyorder('tag:q4'))
+        assert_that(unchanged, is_(set()))
+
+        # duplicates need a full load
+        section['AssessmentItems']['tag:q1'] = {'MimeType': 'question'}
+        assert_that(get_assessment_index_hashes(index), is_(none()))
+
+    def test_prune(self):
+        pruned = prune_assessment_index(_index(), {'tag:q2'})
+        chapter = pruned['Items']['tag:chapter']
+        assert_that(chapter, has_entry('AssessmentItems', {}))
+        assert_that(chapter, has_entry('filename', 'chapter.html'))
+        section = chapter['Items']['tag:section']
+        assert_that(section['AssessmentItems'], has_key('tag:q2'))
+        assert_that(section, has_entry('NTIID', 'tag:section'))
+        hashes = get_assessment_index_hashes(pruned)
+        assert_that(sorted(hashes), is_(['tag:q2']))
+
+
+Q1 = u'tag:nextthought.com,2011-10:testing-NAQ-temp.naq.q1'
+Q2 = u'tag:nextthought.com,2011-10:testing-NAQ-temp.naq.q2'
+Q3 = u'tag:nextthought.com,2011-10:testing-NAQ-temp.naq.q3'
+QSET = u'tag:nextthought.com,2011-10:testing-NAQ-temp.naq.set.qset'
+
+PACKAGE = u'tag:nextthought.com,2011-10:testing-HTML-temp.0'
+CHAPTER = u'tag:nextthought.com,2011-10:testing-HTML-temp.chapter_one'
+
+
+def _question(ntiid, content=u'Arbitrary content goes here.'):
+    return {'Class': 'Question',
+            'MimeType': 'application/vnd.nextthought.naquestion',
+            'NTIID': ntiid,
+            'content': content,
+            'parts': [{'Class': 'FreeResponsePart',
+                       'MimeType': 'application/vnd.nextthought.assessment.freeresponsepart',
+                       'content': content,
+                       'explanation': u'',
+                       'hints': [],
+                       'solutions': []}]}
+
+
+def _package_index(items):
+    return {'Items': {
+                CHAPTER: {'NTIID': CHAPTER,
+                          'filename': 'chapter_one.html',
+                          'href': 'chapter_one.html',
+                          'AssessmentItems': items}},
+            'href': 'index.html'}
+
+
+class _MockKey(object):
+
+    def __init__(self, index, lastModified):
+        self.text = json.dumps(index)
+        self.lastModified = lastModified
+
+    def readContentsAsText(self):
+        return self.text
+
+
+@interface.implementer(IContentPackage, IAttributeAnnotatable)
+class _MockPackage(object):
+
+    children = ()
+
+    def __init__(self, ntiid=PACKAGE):
+        self.ntiid = ntiid
+        self._items = _AssessmentItemOOBTree()
+
+    def __conform__(self, iface):
+        if iface == IQAssessmentItemContainer:
+            return self._items
+
+
+class TestIncrementalSync(AssessmentLayerTest):
+
+    def _indexed(self, ntiid):
+        catalog = get_evaluation_catalog()
+        return list(catalog[IX_NTIID].values_to_documents.get(ntiid) or ())
+
+    def _registered(self, provided, ntiid):
+        intids = component.getUtility(IIntIds)
+        result = component.getUtility(provided, name=ntiid)
+        intid = intids.queryId(result)
+        assert_that(intid, not_none())
+        assert_that(self._indexed(ntiid), contains(intid))
+        return result, intid
+
+    @WithMockDSTrans
+    def test_sync(self):
+        items = {Q1: _question(Q1),
+                 Q2: _question(Q2),
+                 QSET: {'Class': 'QuestionSet',
+                        'MimeType': 'application/vnd.nextthought.naquestionset',
+                        'NTIID': QSET,
+                        'questions': [_question(Q1)]}}
+        index = _package_index(items)
+        original = _MockPackage()
+        add_assessment_items_from_new_content(original, _MockKey(index, 1))
+        assert_that(getattr(original, ITEM_HASHES_ATTR),
+                    has_entries(Q1, not_none(), Q2, not_none()))
+
+        q1, q1_id = self._registered(IQuestion, Q1)
+        q2, q2_id = self._registered(IQuestion, Q2)
+        qset, _ = self._registered(IQuestionSet, QSET)
+        assert_that(qset.questions[0], is_(same_instance(q1)))
+
+        # lock the question set, then remove it and its question from
+        # the index, change a question and add another one, in a
+        # new version of the package
+        qset.lock()
+        index = copy.deepcopy(index)
+        items = index['Items'][CHAPTER]['AssessmentItems']
+        items.pop(QSET)
+        items.pop(Q1)
+        items[Q2] = _question(Q2, u'Changed content.')
+        items[Q3] = _question(Q3)
+        updated = _MockPackage()
+        result = sync_assessment_index_incrementally(original, updated,
+                                                     _MockKey(index, 2))
+        assert_that(result, is_(True))
+
+        # the locked set and its question are kept as they were
+        assert_that(self._registered(IQuestionSet, QSET)[0],
+                    is_(same_instance(qset)))
+        assert_that(self._registered(IQuestion, Q1),
+                    is_((q1, q1_id)))
+
+        # the changed question is registered again
+        new_q2, new_q2_id = self._registered(IQuestion, Q2)
+        assert_that(new_q2, is_not(same_instance(q2)))
+        assert_that(q2_id, is_not(is_in(self._indexed(Q2))))
+        assert_that(new_q2_id, is_not(q2_id))
+        self._registered(IQuestion, Q3)
+
+        # all the items now belong to the new package
+        container = IQAssessmentItemContainer(updated)
+        assert_that(list(container),
+                    contains_inanyorder(Q1, Q2, Q3, QSET))
+        assert_that(list(IQAssessmentItemContainer(original)), is_([]))
+        assert_that(getattr(original, ITEM_HASHES_ATTR), is_(none()))
+        assert_that(sorted(getattr(updated, ITEM_HASHES_ATTR)),
+                    is_(sorted([Q2, Q3])))
+        assert_that(container.lastModified, is_(2))
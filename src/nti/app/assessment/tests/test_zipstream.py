@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import contains
+from hamcrest import assert_that
+from hamcrest import less_than_or_equal_to
+
+import unittest
+
+from io import BytesIO
+
+from zipfile import ZIP_STORED
+from zipfile import ZIP_DEFLATED
+
+from zipfile import ZipFile
+from zipfile import ZipInfo
+
+from nti.app.assessment.zipstream import ZipStream
+from nti.app.assessment.zipstream import is_compressed_file
+from nti.app.assessment.zipstream import compress_type_for_file
+
+
+class TestZipStream(unittest.TestCase):
+
+    def test_compressed_files(self):
+        assert_that(is_compressed_file('essay.docx'), is_(True))
+        assert_that(is_compressed_file('scan', 'image/jpeg'), is_(True))
+        assert_that(is_compressed_file('drawing.svg', 'image/svg+xml'), is_(False))
+        assert_that(is_compressed_file('essay.txt', 'text/plain'), is_(False))
+        assert_that(compress_type_for_file('image.gif'), is_(ZIP_STORED))
+        assert_that(compress_type_for_file('essay.pdf'), is_(ZIP_DEFLATED))
+
+    def test_stream(self):
+        loaded = []
+        closed = []
+
+        def _loader():
+            loaded.append(1)
+            return b'GIF89a' * 10
+
+        stream = ZipStream(chunk_size=16)
+        stream.add_closer(lambda: closed.append(1))
+        stream.writestr(ZipInfo('essay.txt'), b'answer' * 100,
+                        compress_type=ZIP_DEFLATED)
+        stream.writestr(ZipInfo('image.gif'), _loader,
+                        compress_type=ZIP_STORED)
+        # data is not loaded until streamed
+        assert_that(loaded, is_([]))
+
+        chunks = list(stream)
+        for chunk in chunks:
+            assert_that(len(chunk), is_(less_than_or_equal_to(16)))
+        assert_that(loaded, is_([1]))
+
+        zipfile = ZipFile(BytesIO(b''.join(chunks)), 'r')
+        assert_that(zipfile.testzip(), is_(none()))
+        assert_that(zipfile.namelist(), contains('essay.txt', 'image.gif'))
+        assert_that(zipfile.getinfo('image.gif').compress_type, is_(ZIP_STORED))
+        assert_that(zipfile.read('essay.txt'), is_(b'answer' * 100))
+
+        stream.close()
+        assert_that(closed, is_([1]))
@@ -33,6 +33,7 @@ from nti.app.assessment.common.utils import get_user
 
 from nti.app.assessment.interfaces import ACT_DOWNLOAD_GRADES
 
+from nti.app.assessment.interfaces import ISavepointConfig
 from nti.app.assessment.interfaces import ISolutionDecorationConfig
 from nti.app.assessment.interfaces import IUsersCourseAssignmentAttemptMetadata
 from nti.app.assessment.interfaces import IUsersCourseAssignmentAttemptMetadataItem
@@ -410,3 +411,17 @@ class DefaultSolutionDecorationConfig(object):
 class DisabledSolutionDecorationConfig(object):
 
     ShouldExposeSolutions = False
+
+
+@interface.implementer(ISavepointConfig)
+class DefaultSavepointConfig(object):
+
+    Differential = False
+    CoalesceInterval = 0
+
+
+@interface.implementer(ISavepointConfig)
+class DifferentialSavepointConfig(object):
+
+    Differential = True
+    CoalesceInterval = 10
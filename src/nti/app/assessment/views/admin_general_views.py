@@ -8,6 +8,9 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import os
+import six
+
 from persistent.list import PersistentList
 
 from pyramid import httpexceptions as hexc
@@ -29,15 +32,20 @@ from nti.app.assessment import MessageFactory as _
 
 from nti.app.assessment._integrity_check import check_assessment_integrity
 
+from nti.app.assessment._rebuild import SubmissionCatalogRebuilder
+
 from nti.app.assessment.synchronize import add_assessment_items_from_new_content
 from nti.app.assessment.synchronize import remove_assessment_items_from_oldcontent
 
 from nti.app.assessment.index import get_evaluation_catalog
-from nti.app.assessment.index import get_submission_catalog
+
+from nti.app.assessment.profiling import statistics as profile_statistics
+
+from nti.app.assessment.profiling import enable_profiling
+from nti.app.assessment.profiling import disable_profiling
+from nti.app.assessment.profiling import is_profiling_enabled
 
 from nti.app.assessment.interfaces import IQEvaluations
-from nti.app.assessment.interfaces import IUsersCourseInquiries
-from nti.app.assessment.interfaces import IUsersCourseAssignmentHistories
 
 from nti.app.base.abstract_views import AbstractAuthenticatedView
 
@@ -58,7 +66,6 @@ from nti.common.string import is_true
 from nti.contentlibrary.interfaces import IContentPackage
 from nti.contentlibrary.interfaces import IEditableContentPackage
 
-from nti.contenttypes.courses.interfaces import ICourseCatalog
 from nti.contenttypes.courses.interfaces import ICourseInstance
 
 from nti.dataserver import authorization as nauth
@@ -109,7 +116,15 @@ class CheckAssessmentIntegrityView(AbstractAuthenticatedView,
     def _do_call(self):
         values = self.readInput()
         remove = is_true(values.get('remove'))
-        integrity = check_assessment_integrity(remove)
+        sites = values.get('sites') or values.get('site')
+        if isinstance(sites, six.string_types):
+            sites = sites.split()
+        packages = values.get('packages') or values.get('package')
+        if isinstance(packages, six.string_types):
+            packages = packages.split()
+        integrity = check_assessment_integrity(remove,
+                                               sites=sites,
+                                               packages=packages)
         duplicates, removed, reindexed, fixed_lineage, adjusted = integrity
         result = LocatedExternalDict()
         result['Duplicates'] = duplicates
@@ -421,59 +436,126 @@ class RebuildEvaluationCatalogView(AbstractAuthenticatedView):
              context=IDataserverFolder,
              name='RebuildSubmissionCatalog')
 class RebuildSubmissionCatalogView(AbstractAuthenticatedView):
+    """
+    Rebuild the submission catalog.
 
-    def _index_item(self, obj, index, intids):
-        result = False
-        doc_id = intids.queryId(obj)
-        if doc_id is not None:
-            index.index_doc(doc_id, obj)
-            metadata_queue_add(obj)
-            result = True
-        return result
+    By default all courses are indexed in this request. With ``courses``
+    only that many courses are indexed and the rebuild resumes where it
+    stopped on the next call, until ``Finished`` is returned. ``shadow``
+    builds into a new catalog swapped in when the rebuild is finished;
+    ``restart`` discards a rebuild in progress.
+    """
 
-    def _process_course(self, course, index, intids):
-        result = 0
-        for provided in (IUsersCourseAssignmentHistories, IUsersCourseInquiries):
-            container = provided(course, None) or {}
-            for user_data in container.values():
-                for obj in user_data.values():
-                    if self._index_item(obj, index, intids):
-                        result += 1
-                    try:
-                        # Assignment histories now in containers
-                        for submission in obj.values():
-                            if self._index_item(submission, index, intids):
-                                result += 1
-                    except AttributeError:
-                        pass
+    def __call__(self):
+        params = CaseInsensitiveDict(self.request.params)
+        max_courses = params.get('courses') or params.get('batchSize')
+        try:
+            max_courses = int(max_courses) if max_courses else None
+            assert max_courses is None or max_courses > 0
+        except (AssertionError, TypeError, ValueError):
+            raise_json_error(self.request,
+                             hexc.HTTPUnprocessableEntity,
+                             {
+                                 'message': _(u"Invalid number of courses."),
+                             },
+                             None)
+        rebuilder = SubmissionCatalogRebuilder()
+        rebuilder.start(shadow=is_true(params.get('shadow')),
+                        restart=is_true(params.get('restart')))
+        stats = rebuilder.run(max_courses)
+        result = LocatedExternalDict(stats)
+        result[ITEM_COUNT] = result[TOTAL] = stats['Items']
         return result
 
-    def _process_site(self, index, intids, seen):
-        result = 0
-        catalog = component.queryUtility(ICourseCatalog)
-        if catalog is None or catalog.isEmpty():
-            return result
-        for entry in catalog.iterCatalogEntries():
-            course = ICourseInstance(entry)
-            doc_id = intids.queryId(course)
-            if doc_id is None or doc_id in seen:
-                continue
-            seen.add(doc_id)
-            result += self._process_course(course, index, intids)
+
+@view_config(route_name='objects.generic.traversal',
+             renderer='rest',
+             request_method='GET',
+             permission=nauth.ACT_NTI_ADMIN,
+             context=IDataserverFolder,
+             name='AssessmentProfiling')
+class AssessmentProfilingView(AbstractAuthenticatedView):
+    """
+    Return the aggregated profiles of the slowest endpoints served by this
+    process, sorted on ``sort`` (Mean, Max, Total or Count) and limited to
+    ``limit``.
+    """
+
+    sort_fields = ('Mean', 'Max', 'Total', 'Count')
+
+    def _params(self):
+        return CaseInsensitiveDict(self.request.params)
+
+    def _sort_on(self, params):
+        sort_on = params.get('sort') or params.get('sortOn') or 'Mean'
+        for field in self.sort_fields:
+            if field.lower() == sort_on.lower():
+                return field
+        raise_json_error(self.request,
+                         hexc.HTTPUnprocessableEntity,
+                         {
+                             'message': _(u"Invalid sort field."),
+                         },
+                         None)
+
+    def _limit(self, params):
+        limit = params.get('limit') or params.get('batchSize')
+        try:
+            limit = int(limit) if limit else None
+            assert limit is None or limit > 0
+        except (AssertionError, TypeError, ValueError):
+            raise_json_error(self.request,
+                             hexc.HTTPUnprocessableEntity,
+                             {
+                                 'message': _(u"Invalid limit."),
+                             },
+                             None)
+        return limit
+
+    def _profiles(self, params):
+        result = LocatedExternalDict()
+        result['Enabled'] = is_profiling_enabled(self.context)
+        # statistics are not shared by the processes
+        result['Process'] = os.getpid()
+        result['Message'] = _(u"Statistics only cover the requests served by this process.")
+        items = result[ITEMS] = profile_statistics.slowest(self._limit(params),
+                                                           self._sort_on(params))
+        result[ITEM_COUNT] = len(items)
+        result[TOTAL] = len(profile_statistics.endpoints)
         return result
 
     def __call__(self):
-        intids = component.getUtility(IIntIds)
-        # clear indexes
-        sub_catalog = get_submission_catalog()
-        for index in sub_catalog.values():
-            index.clear()
-        # reindex
-        seen = set()
-        total = self._process_site(sub_catalog, intids, seen)
-        for host_site in get_all_host_sites():  # check all sites
-            with current_site(host_site):
-                total += self._process_site(sub_catalog, intids, seen)
-        result = LocatedExternalDict()
-        result[ITEM_COUNT] = result[TOTAL] = total
+        return self._profiles(self._params())
+
+
+@view_config(route_name='objects.generic.traversal',
+             renderer='rest',
+             request_method='POST',
+             permission=nauth.ACT_NTI_ADMIN,
+             context=IDataserverFolder,
+             name='AssessmentProfiling')
+class ToggleAssessmentProfilingView(AssessmentProfilingView,
+                                    ModeledContentUploadRequestUtilsMixin):
+    """
+    Enable or disable profiling in all the processes with ``enable``
+    and/or clear the aggregated profiles of this process with ``reset``.
+    """
+
+    def readInput(self, value=None):
+        if self.request.body:
+            data = super(ToggleAssessmentProfilingView, self).readInput(value)
+            result = CaseInsensitiveDict(data)
+        else:
+            result = CaseInsensitiveDict(self.request.params)
         return result
+
+    def __call__(self):
+        values = self.readInput()
+        if 'enable' in values:
+            if is_true(values.get('enable')):
+                enable_profiling(self.context)
+            else:
+                disable_profiling(self.context)
+        if is_true(values.get('reset')):
+            profile_statistics.clear()
+        return self._profiles(values)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+from requests.structures import CaseInsensitiveDict
+
+from pyramid import httpexceptions as hexc
+
+from pyramid.view import view_config
+from pyramid.view import view_defaults
+
+from nti.app.assessment import MessageFactory as _
+from nti.app.assessment import VIEW_RESPONSE_STATISTICS
+
+from nti.app.assessment.analytics import ATTEMPT_ALL
+from nti.app.assessment.analytics import ATTEMPT_LAST
+from nti.app.assessment.analytics import ATTEMPT_FIRST
+from nti.app.assessment.analytics import HASHED_RESPONSE
+
+from nti.app.assessment.analytics import question_code
+from nti.app.assessment.analytics import response_statistics
+from nti.app.assessment.analytics import rebuild_response_columns
+
+from nti.app.assessment.common.evaluations import get_course_from_evaluation
+
+from nti.app.assessment.interfaces import ICourseResponseColumns
+
+from nti.app.assessment.utils import get_course_from_request
+
+from nti.app.base.abstract_views import AbstractAuthenticatedView
+
+from nti.app.externalization.error import raise_json_error
+
+from nti.assessment.interfaces import IQAssignment
+
+from nti.contenttypes.courses.interfaces import ICourseCatalogEntry
+
+from nti.contenttypes.courses.utils import is_course_instructor
+
+from nti.dataserver import authorization as nauth
+
+from nti.dataserver.authorization import is_admin
+
+from nti.externalization.interfaces import LocatedExternalDict
+from nti.externalization.interfaces import StandardExternalFields
+
+ITEMS = StandardExternalFields.ITEMS
+TOTAL = StandardExternalFields.TOTAL
+ITEM_COUNT = StandardExternalFields.ITEM_COUNT
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _response(key):
+    if key & HASHED_RESPONSE:
+        return '%x' % (key & ~HASHED_RESPONSE)
+    return key
+
+
+@view_config(context=IQAssignment)
+@view_defaults(route_name='objects.generic.traversal',
+               renderer='rest',
+               request_method='GET',
+               name=VIEW_RESPONSE_STATISTICS,
+               permission=nauth.ACT_READ)
+class ResponseStatisticsView(AbstractAuthenticatedView):
+    """
+    Return the p-value and discrimination index of each question, the
+    distractor frequencies of each part and the histogram of the scores
+    of the submissions of an assignment, from the response columns of the
+    course.
+
+    params:
+        attempt: last (default), first or all attempts of each user
+        bins: the number of bins of the score histogram
+    """
+
+    max_bins = 100
+
+    def _params(self):
+        return CaseInsensitiveDict(self.request.params)
+
+    @property
+    def course(self):
+        result = get_course_from_request(self.request)
+        if result is None:
+            result = get_course_from_evaluation(self.context, self.remoteUser)
+        if result is None:
+            raise_json_error(self.request,
+                             hexc.HTTPUnprocessableEntity,
+                             {
+                                 'message': _(u"Cannot find evaluation course."),
+                                 'code': 'CannotFindEvaluationCourse',
+                             },
+                             None)
+        return result
+
+    def _check_access(self, course):
+        if      not is_admin(self.remoteUser) \
+            and not is_course_instructor(course, self.remoteUser):
+            raise_json_error(self.request,
+                             hexc.HTTPForbidden,
+                             {
+                                 'message': _(u"Cannot access response statistics."),
+                             },
+                             None)
+
+    def _attempt(self, values):
+        result = values.get('attempt') or ATTEMPT_LAST
+        if result not in (ATTEMPT_LAST, ATTEMPT_FIRST, ATTEMPT_ALL):
+            raise_json_error(self.request,
+                             hexc.HTTPUnprocessableEntity,
+                             {
+                                 'message': _(u"Invalid attempt."),
+                             },
+                             None)
+        return result
+
+    def _bins(self, values):
+        try:
+            result = int(values.get('bins') or 10)
+            assert 0 < result <= self.max_bins
+        except (AssertionError, TypeError, ValueError):
+            raise_json_error(self.request,
+                             hexc.HTTPUnprocessableEntity,
+                             {
+                                 'message': _(u"Invalid number of bins."),
+                             },
+                             None)
+        return result
+
+    def _questions(self):
+        result = OrderedDict()
+        for question_set in self.context.iter_question_sets():
+            for question in question_set.questions or ():
+                result[question_code(question.ntiid)] = question
+        return result
+
+    def _external_part(self, question, index, stats):
+        parts = getattr(question, 'parts', None) or ()
+        choices = getattr(parts[index], 'choices', None) \
+                  if index < len(parts) else None
+        distractors = []
+        for key, count in stats['Distractors'].most_common():
+            distractor = {'Response': _response(key), 'Count': count}
+            if choices and not key & HASHED_RESPONSE and key < len(choices):
+                distractor['Label'] = choices[key]
+            distractors.append(distractor)
+        return {
+            'Index': index,
+            'PValue': stats['PValue'],
+            'Distractors': distractors,
+        }
+
+    def _external_question(self, code, question, stats):
+        return {
+            'NTIID': getattr(question, 'ntiid', None),
+            'Code': code,
+            'PValue': stats['PValue'],
+            'Discrimination': stats['Discrimination'],
+            'Parts': [self._external_part(question, index, part)
+                      for index, part in sorted(stats['Parts'].items())],
+        }
+
+    def _statistics(self, course, attempt, bins):
+        entry = ICourseCatalogEntry(course, None)
+        result = LocatedExternalDict()
+        result.__name__ = self.request.view_name
+        result.__parent__ = self.context
+        result['NTIID'] = self.context.ntiid
+        result['CatalogEntryNTIID'] = getattr(entry, 'ntiid', None)
+        result['Attempt'] = attempt
+        columns = ICourseResponseColumns(course).get(self.context.ntiid)
+        if columns is None:
+            stats = {'Submissions': 0, 'Users': 0, 'MeanScore': None,
+                     'Histogram': [0] * bins, 'Questions': {}}
+        else:
+            stats = response_statistics(columns, attempt, bins)
+        result['Submissions'] = stats['Submissions']
+        result['Users'] = stats['Users']
+        result['MeanScore'] = stats['MeanScore']
+        result['Histogram'] = stats['Histogram']
+        # in assignment order, unknown (e.g. removed) questions last
+        items = result[ITEMS] = []
+        questions = stats['Questions']
+        for code, question in self._questions().items():
+            if code in questions:
+                items.append(self._external_question(code, question,
+                                                     questions.pop(code)))
+        for code, question_stats in sorted(questions.items()):
+            items.append(self._external_question(code, None, question_stats))
+        result[ITEM_COUNT] = result[TOTAL] = len(items)
+        return result
+
+    def __call__(self):
+        course = self.course
+        self._check_access(course)
+        values = self._params()
+        return self._statistics(course, self._attempt(values), self._bins(values))
+
+
+@view_config(context=IQAssignment)
+@view_defaults(route_name='objects.generic.traversal',
+               renderer='rest',
+               request_method='POST',
+               name=VIEW_RESPONSE_STATISTICS,
+               permission=nauth.ACT_READ)
+class RebuildResponseStatisticsView(ResponseStatisticsView):
+    """
+    Rebuild the response columns of the assignment from its submissions,
+    e.g. for submissions made before the columns existed, and return the
+    statistics.
+    """
+
+    def __call__(self):
+        course = self.course
+        self._check_access(course)
+        values = self._params()
+        attempt, bins = self._attempt(values), self._bins(values)
+        count = rebuild_response_columns(self.context, course)
+        logger.info("Stored the responses of %s submission(s) of %s",
+                    count, self.context.ntiid)
+        return self._statistics(course, attempt, bins)
@@ -13,6 +13,7 @@ logger = __import__('logging').getLogger(__name__)
 
 import csv
 import six
+import hashlib
 
 from itertools import chain
 from collections import defaultdict
@@ -44,14 +45,29 @@ from nti.app.assessment import VIEW_UNLOCK_POLICIES
 from nti.app.assessment import ASSESSMENT_PRACTICE_SUBMISSION
 from nti.app.assessment import VIEW_ASSIGNMENT_SUBMISSIONS_REPORT
 
+from nti.app.assessment.adapters import _history_for_user_in_course
+
+from nti.app.assessment.common.caching import LRUCache
+
 from nti.app.assessment.common.evaluations import get_evaluation_courses
+from nti.app.assessment.common.evaluations import get_course_outline_generation
 from nti.app.assessment.common.evaluations import get_course_from_evaluation
 
+from nti.app.assessment.common.utils import get_available_for_submission_ending
+from nti.app.assessment.common.utils import get_available_for_submission_beginning
+
 from nti.app.assessment.utils import get_course_from_request
 
+from nti.app.assessment.index import get_submission_generation
+
 from nti.app.assessment.interfaces import IQEvaluations
 from nti.app.assessment.interfaces import ICourseAssignmentAttemptMetadata
 
+from nti.app.assessment.metadata import _metadata_for_user_in_course
+from nti.app.assessment.metadata import _metadata_attempts_for_user_in_course
+
+from nti.app.assessment.savepoint import _savepoint_for_user_in_course
+
 from nti.app.assessment.views.report_mixins import plain_text
 from nti.app.assessment.views.report_mixins import _handle_non_gradable_ordering_part
 from nti.app.assessment.views.report_mixins import _handle_non_gradable_matching_part
@@ -153,6 +169,9 @@ from nti.traversal.traversal import find_interface
 ITEMS = StandardExternalFields.ITEMS
 LAST_MODIFIED = StandardExternalFields.LAST_MODIFIED
 
+#: Process wide course outlines; see :meth:`AssignmentsByOutlineNodeView._get_outline`
+_COURSE_OUTLINES = LRUCache(size=500)
+
 # In pyramid 1.4, there is some minor wonkiness with the accept= request predicate.
 # Your view can get called even if no Accept header is present if all the defined
 # views include a non-matching accept predicate. Still, this is much better than
@@ -290,7 +309,7 @@ class AssignmentsByOutlineNodeView(AssignmentsByOutlineNodeMixin):
     def _do_legacy_outline(self, instance, items, outline, reverse_qset):
         """
         Build the outline dict for legacy courses by iterating through
-        the outline nodes.
+        the outline nodes. See :meth:`_build_outline` for the entries.
         """
         def _recur(node):
             if ICourseOutlineContentNode.providedBy(node) and node.ContentNTIID:
@@ -302,7 +321,7 @@ class AssignmentsByOutlineNodeView(AssignmentsByOutlineNodeMixin):
                     for content in chain((content_unit,), content_unit.children or ()):
                         assgs = items.get(content.ntiid)
                         if assgs:
-                            node_results.extend(x.ntiid for x in assgs)
+                            node_results.extend((x.ntiid,) for x in assgs)
                 name = node.LessonOverviewNTIID
                 lesson = component.queryUtility(INTILessonOverview,
                                                 name=name or '')
@@ -311,9 +330,9 @@ class AssignmentsByOutlineNodeView(AssignmentsByOutlineNodeMixin):
                         if INTIAssignmentRef.providedBy(item):
                             node_results.append(item.target or item.ntiid)
                         elif INTIQuestionSetRef.providedBy(item):
-                            ntiid = reverse_qset.get(item.target)
-                            if ntiid:
-                                node_results.append(ntiid)
+                            candidates = reverse_qset.get(item.target)
+                            if candidates:
+                                node_results.append(candidates)
                 if node_results:
                     outline[key] = node_results
             for child in node.values():
@@ -346,21 +365,27 @@ class AssignmentsByOutlineNodeView(AssignmentsByOutlineNodeMixin):
             assgs = items.get(key)
             if assgs and key not in seen:
                 seen.add(key)
-                outline[key] = [x.ntiid for x in assgs]
+                outline[key] = [(x.ntiid,) for x in assgs]
 
             # add target to outline key
             if INTIAssignmentRef.providedBy(obj):
                 outline.setdefault(key, [])
                 outline[key].append(obj.target or obj.ntiid)
             elif INTIQuestionSetRef.providedBy(obj):
-                ntiid = reverse_qset.get(obj.target)
-                if ntiid:
+                candidates = reverse_qset.get(obj.target)
+                if candidates:
                     outline.setdefault(key, [])
-                    outline[key].append(ntiid)
+                    outline[key].append(candidates)
 
         return outline
 
     def _build_outline(self, instance, items, outline):
+        """
+        Build the outline dict of the given items. The entries of a key
+        are either the (always listed) target of an assignment ref or a
+        tuple of candidate assignment ntiids, of which the last one
+        visible to the user is listed.
+        """
         # reverse question set map
         # this is done in case question set refs
         # appear in a lesson overview
@@ -368,7 +393,8 @@ class AssignmentsByOutlineNodeView(AssignmentsByOutlineNodeMixin):
         for assgs in items.values():
             for asg in assgs:
                 for part in asg.parts or ():
-                    reverse_qset[part.question_set.ntiid] = asg.ntiid
+                    reverse_qset.setdefault(part.question_set.ntiid, []).append(asg.ntiid)
+        reverse_qset = {k: tuple(v) for k, v in reverse_qset.items()}
 
         if ILegacyCourseInstance.providedBy(instance):
             result = self._do_legacy_outline(instance,
@@ -379,17 +405,114 @@ class AssignmentsByOutlineNodeView(AssignmentsByOutlineNodeMixin):
             result = self._do_outline(instance, items, outline, reverse_qset)
         return result
 
+    def _get_outline(self, instance):
+        """
+        Return the outline of all the course assignments, whatever their
+        visibility, as a tuple of (key, entries) tuples. It does not depend
+        on the user and is cached until the course assignments or the
+        assessment refs of its lessons change.
+        """
+        key = None
+        entry = ICourseCatalogEntry(instance, None)
+        if entry is not None:
+            key = (entry.ntiid, tuple(get_component_hierarchy_names()))
+        stamp, clean = get_course_outline_generation(instance)
+        stamp = (self._lastModified, stamp)
+        cached = _COURSE_OUTLINES.get(key) if key is not None else None
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        items = {}
+        outline = {}
+        self._build_catalog(instance, items, filtered=False)
+        self._build_outline(instance, items, outline)
+        result = tuple((k, tuple(v)) for k, v in outline.items())
+        if key is not None and clean:
+            _COURSE_OUTLINES.set(key, (stamp, result))
+        return result
+
+    def _filter_outline(self, entries, items, outline):
+        """
+        Fill the outline dict with the given entries, keeping only the
+        assignments in the (visible) items.
+        """
+        visible = {x.ntiid for vals in items.values() for x in vals}
+        for key, values in entries:
+            ntiids = []
+            for value in values:
+                if isinstance(value, six.string_types):
+                    ntiids.append(value)
+                    continue
+                for ntiid in reversed(value):
+                    if ntiid in visible:
+                        ntiids.append(ntiid)
+                        break
+            if ntiids:
+                outline[key] = ntiids
+        return outline
+
+    def _user_stamp(self, instance):
+        """
+        Return the stamp of the state of the remote user in the course
+        that decorates the assignments: submissions, save points, attempt
+        metadata and commenced timed assignments.
+        """
+        user = self.remoteUser
+        result = [getattr(user, 'username', None)]
+        for factory in (_history_for_user_in_course,
+                        _savepoint_for_user_in_course,
+                        _metadata_for_user_in_course,
+                        _metadata_attempts_for_user_in_course):
+            container = factory(instance, user, create=False)
+            result.append(getattr(container, 'lastModified', None))
+        return result
+
+    def _availability_stamp(self, instance, assignments):
+        """
+        Return which of the submission availability dates of the given
+        assignments have passed.
+        """
+        now = datetime.utcnow()
+        result = []
+        for assignment in assignments:
+            beginning = get_available_for_submission_beginning(assignment, instance)
+            ending = get_available_for_submission_ending(assignment, instance)
+            result.append((assignment.ntiid,
+                           beginning is not None and beginning <= now,
+                           ending is not None and ending <= now))
+        return result
+
+    def _etag(self, items):
+        """
+        Return the etag of the response, which is valid as long as the
+        outline, the course submissions, the assignments visible to the
+        user, their availability and the state of the user are.
+        """
+        instance = ICourseInstance(self.request.context)
+        stamp, unused_clean = get_course_outline_generation(instance)
+        submissions, unused_clean = get_submission_generation((instance,))
+        visible = sorted((x for vals in items.values() for x in vals),
+                         key=lambda x: x.ntiid)
+        stamp = repr((self.request.view_name,
+                      self.is_ipad_legacy,
+                      self._lastModified,
+                      stamp,
+                      submissions,
+                      self._user_stamp(instance),
+                      self._availability_stamp(instance, visible)))
+        return hashlib.md5(stamp.encode('utf-8')).hexdigest()
+
     def _external_object(self, obj):
         return obj
 
-    def _build_catalog(self, instance, result):
+    def _build_catalog(self, instance, result, filtered=True):
         catalog = ICourseAssignmentCatalog(instance)
         uber_filter = get_course_assessment_predicate_for_user(self.remoteUser,
                                                                instance)
+        filtered = filtered and not self._is_editor
         # Must grab all assigments in our parent (since they may be referenced
         # in shared lessons.
         assignments = catalog.iter_assignments(course_lineage=True)
-        for asg in (x for x in assignments if self._is_editor or uber_filter(x)):
+        for asg in (x for x in assignments if not filtered or uber_filter(x)):
             container_id = get_containerId(asg)
             if container_id:
                 result.setdefault(container_id, []).append(asg)
@@ -406,13 +529,21 @@ class AssignmentsByOutlineNodeView(AssignmentsByOutlineNodeMixin):
         instance = ICourseInstance(self.request.context)
         result[LAST_MODIFIED] = result.lastModified = self._lastModified
 
+        items = {}
+        self._build_catalog(instance, items)
+        etag = self._etag(items)
+        if etag in self.request.if_none_match:
+            return hexc.HTTPNotModified(etag=etag)
+        self.request.response.etag = etag
+        self.request.response.last_modified = self._lastModified or None
+        # the response is specific to the user
+        self.request.response.cache_control.private = True
+
         if self.is_ipad_legacy:
-            self._build_catalog(instance, result)
+            result.update(items)
         else:
-            items = {}
             outline = result['Outline'] = {}
-            self._build_catalog(instance, items)
-            self._build_outline(instance, items, outline)
+            self._filter_outline(self._get_outline(instance), items, outline)
             result[ITEMS] = final_items = {}
             for key, vals in items.items():
                 final_items[key] = [self._external_object(x) for x in vals]
@@ -714,12 +845,33 @@ class AssignmentSubmissionsReportCSV(AbstractAuthenticatedView, AssessmentCSVRep
                 question_order[question.ntiid] = question
         return header_row
 
+    def _rebind_report(self, loader, question_order):
+        result = super(AssignmentSubmissionsReportCSV, self)._rebind_report(loader,
+                                                                            question_order)
+        # submission dates are adjusted for the reloaded remote user
+        user = loader.load(self.remoteUser)
+        self.timezone_util = component.queryMultiAdapter((user, self.request),
+                                                         IDisplayableTimeProvider)
+        return result
+
+    def _get_question(self, lookup, ntiid):
+        """
+        Return the question with the given ntiid from the lookup, which is
+        seeded with the questions of the assignment, querying the registry
+        at most once for any other question.
+        """
+        try:
+            result = lookup[ntiid]
+        except KeyError:
+            result = lookup[ntiid] = component.queryUtility(IQuestion, name=ntiid)
+        return result
+
     def _get_user_rows(self, question_order, column_count):
         metadata = ICourseAssignmentAttemptMetadata(self.course)
+        question_lookup = dict(question_order)
 
         # Each row contains an assignment submission attempt
         # submitted by a user to this assignment.
-        user_rows = []
         for username, item in metadata.items():
             attempts = item.get(self.context.id)
             if not attempts:
@@ -735,14 +887,11 @@ class AssignmentSubmissionsReportCSV(AbstractAuthenticatedView, AssessmentCSVRep
 
                 row = [username, self._adjust_timestamp(submission.createdTime)]
                 for qset_submission in submission.parts or ():
-                    # Skip the question bank part.
-                    questionSet = component.queryUtility(IQuestionSet,
-                                                         name=qset_submission.questionSetId)
                     user_question_to_results = {}
 
                     for question_submission in qset_submission.questions or ():
-                        question = component.queryUtility(IQuestion,
-                                                          name=question_submission.questionId)
+                        question = self._get_question(question_lookup,
+                                                      question_submission.questionId)
 
                         user_question_results = self._get_user_question_results(question,
                                                                                 question_submission,
@@ -765,8 +914,15 @@ class AssignmentSubmissionsReportCSV(AbstractAuthenticatedView, AssessmentCSVRep
                             row.extend(user_result)
 
                 assert len(row) == column_count
-                user_rows.append(row)
-        return user_rows
+                yield row
 
     def __call__(self):
         return self._write_response()
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:  # pragma: no cover
+    pass
+else:
+    addCleanUp(_COURSE_OUTLINES.clear)
@@ -26,6 +26,8 @@ from nti.app.assessment.common.evaluations import get_course_assignments
 
 from nti.app.assessment.common.inquiries import get_course_inquiries
 
+from nti.app.assessment.decorators.batching import set_batch_decoration_context
+
 from nti.app.base.abstract_views import AbstractAuthenticatedView
 
 from nti.app.externalization.error import raise_json_error
@@ -90,6 +92,8 @@ class CourseViewMixin(AbstractAuthenticatedView, BatchingUtilsMixin):
         result.__name__ = self.request.view_name
         result.__parent__ = self.request.context
         self.request.acl_decoration = False
+        # All items share the course, resolve its facts once when decorating
+        set_batch_decoration_context(self.request, self.remoteUser)
         outline = self._byOutline()
         mimeTypes = self._get_mimeTypes() if mimeTypes is None else mimeTypes
         items = result[ITEMS] = dict() if outline else list()
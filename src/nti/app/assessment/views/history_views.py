@@ -14,15 +14,11 @@ logger = __import__('logging').getLogger(__name__)
 import os
 import sys
 
-from io import BytesIO
 from numbers import Number
 from datetime import datetime
 
 from slugify import UniqueSlugify
 
-from zipfile import ZIP_DEFLATED
-
-from zipfile import ZipFile
 from zipfile import ZipInfo
 
 from zope import component
@@ -52,6 +48,7 @@ from nti.app.assessment import VIEW_COURSE_ASSIGNMENT_BULK_FILE_PART_DOWNLOAD
 
 from nti.app.assessment._submission import get_source
 from nti.app.assessment._submission import check_upload_files
+from nti.app.assessment._submission import get_submission_plan
 from nti.app.assessment._submission import read_multipart_sources
 
 from nti.app.assessment.common.evaluations import get_course_assignments
@@ -70,6 +67,10 @@ from nti.app.assessment.utils import assignment_download_precondition
 from nti.app.assessment.utils import get_current_metadata_attempt_item
 from nti.app.assessment.utils import course_assignments_download_precondition
 
+from nti.app.assessment.zipstream import ZipStream
+from nti.app.assessment.zipstream import PersistentDataLoader
+from nti.app.assessment.zipstream import compress_type_for_file
+
 from nti.app.base.abstract_views import AbstractAuthenticatedView
 
 from nti.app.externalization.error import raise_json_error
@@ -192,7 +193,7 @@ class AssignmentSubmissionPostView(AbstractAuthenticatedView,
             self.request.meta_attempt_item_traversal_context = attempt_item
             if not self.request.POST:
                 submission = self.readCreateUpdateContentObject(creator)
-                check_upload_files(submission)
+                check_upload_files(submission, get_submission_plan(self.context))
             else:
                 extValue = get_source(self.request,
                                       'json',
@@ -210,7 +211,8 @@ class AssignmentSubmissionPostView(AbstractAuthenticatedView,
                 extValue = read_input_data(extValue, self.request)
                 submission = self.readCreateUpdateContentObject(creator,
                                                                 externalValue=extValue)
-                submission = read_multipart_sources(submission, self.request)
+                submission = read_multipart_sources(submission, self.request,
+                                                    get_submission_plan(self.context))
 
             result = component.getMultiAdapter((self.request, submission),
                                                IExceptionResponse)
@@ -329,8 +331,11 @@ class AbstractSubmissionBulkFileDownloadView(AbstractAuthenticatedView):
                         date_time = datetime.utcfromtimestamp(lastModified)
                         info = ZipInfo(full_filename,
                                        date_time=date_time.timetuple())
-                        info.compress_type = ZIP_DEFLATED
-                        zipfile.writestr(info, qp_part.data)
+                        contentType = getattr(qp_part, 'contentType', None)
+                        info.compress_type = compress_type_for_file(qp_part.filename,
+                                                                    contentType)
+                        # The data is only loaded when the entry is streamed
+                        zipfile.writestr(info, self._loader.loader(qp_part))
 
     def _submission_filename(self, unused_item, fn_part, sub_num, q_num, qp_num, qp_part):
         return "%s-%s-%s-%s-%s" % (fn_part,
@@ -368,20 +373,21 @@ class AbstractSubmissionBulkFileDownloadView(AbstractAuthenticatedView):
         if not self._precondition(context, request, self.remoteUser):
             raise hexc.HTTPForbidden()
 
-        buf = BytesIO()
-        zipfile = ZipFile(buf, 'w')
         course = self._get_course(context)
         enrollments = ICourseEnrollments(course)
 
+        # Collect the entries now, while we can traverse the course;
+        # the file data is read as the archive is streamed.
+        self._loader = PersistentDataLoader()
+        zipfile = ZipStream()
+        zipfile.add_closer(self._loader.close)
         self._save_submissions(course, enrollments, zipfile)
         # We could raise a 404 here, but do not currently until clients
         # could handle it, preferring to return an empty zip.
 
-        zipfile.close()
-        buf.seek(0)
-        self.request.response.body = buf.getvalue()
         filename = self._get_filename(course)
         response = self.request.response
+        response.app_iter = zipfile
         response.content_encoding = 'identity'
         response.content_type = 'application/zip; charset=UTF-8'
         response.content_disposition = 'attachment; filename="%s"' % filename
@@ -414,11 +420,9 @@ class AssignmentSubmissionBulkFileDownloadView(AbstractSubmissionBulkFileDownloa
     .. note:: An easy extension to this would be to accept
             a query param giving a list of usernames to include.
 
-    .. note:: The current implementation does not stream;
-            the entire ZIP is buffered (potentially in memory) before being
-            transmitted. Streaming while building a ZIP is somewhat
-            complicated in the ZODB/WSGI combination. It may be possible
-            to do something with app_iter and stream in \"chunks\".
+    .. note:: The ZIP is streamed in chunks through the response's
+            ``app_iter``; only one file is held in memory at a time.
+            Files that are already compressed are stored as-is.
     """
 
     def _get_course(self, context):
@@ -477,11 +481,9 @@ class CourseAssignmentSubmissionBulkFileDownloadView(AbstractSubmissionBulkFileD
     .. note:: An easy extension to this would be to accept
             a query param giving a list of usernames to include.
 
-    .. note:: The current implementation does not stream;
-            the entire ZIP is buffered (potentially in memory) before being
-            transmitted. Streaming while building a ZIP is somewhat
-            complicated in the ZODB/WSGI combination. It may be possible
-            to do something with app_iter and stream in \"chunks\".
+    .. note:: The ZIP is streamed in chunks through the response's
+            ``app_iter``; only one file is held in memory at a time.
+            Files that are already compressed are stored as-is.
     """
 
     def _get_course(self, context):
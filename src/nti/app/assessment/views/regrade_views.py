@@ -17,11 +17,18 @@ from pyramid.view import view_config
 from pyramid.view import view_defaults
 
 from nti.app.assessment import MessageFactory as _
+from nti.app.assessment import VIEW_REGRADE_STATUS
 from nti.app.assessment import VIEW_REGRADE_EVALUATION
 
 from nti.app.assessment.common.evaluations import get_evaluation_courses
 
+from nti.app.assessment.common.grading import start_regrade_job
 from nti.app.assessment.common.grading import regrade_evaluation
+from nti.app.assessment.common.grading import REGRADE_BATCH_SIZE
+
+from nti.app.assessment.common.submissions import count_evaluation_submissions
+
+from nti.app.assessment.regrade import get_regrade_job
 
 from nti.app.assessment.utils import get_course_from_request
 
@@ -32,6 +39,8 @@ from nti.app.externalization.error import raise_json_error
 from nti.assessment.interfaces import IQuestion
 from nti.assessment.interfaces import IQAssignment
 
+from nti.common.string import is_true
+
 from nti.contenttypes.courses.interfaces import ICourseCatalogEntry
 
 from nti.contenttypes.courses.utils import is_course_instructor
@@ -42,6 +51,67 @@ from nti.dataserver.authorization import is_admin
 
 from nti.dataserver.users.users import User
 
+from nti.externalization.interfaces import LocatedExternalDict
+from nti.externalization.interfaces import StandardExternalFields
+
+from nti.links.links import Link
+
+ITEMS = StandardExternalFields.ITEMS
+LINKS = StandardExternalFields.LINKS
+TOTAL = StandardExternalFields.TOTAL
+ITEM_COUNT = StandardExternalFields.ITEM_COUNT
+
+
+def regrade_job_status(evaluation, course, job):
+    entry = ICourseCatalogEntry(course, None)
+    result = LocatedExternalDict()
+    result['NTIID'] = evaluation.ntiid
+    result['CatalogEntryNTIID'] = getattr(entry, 'ntiid', None)
+    if job is None:
+        result['State'] = None
+        return result
+    result['State'] = job.state
+    result['Done'] = job.done
+    result[TOTAL] = job.total
+    result['ETA'] = job.eta
+    result['Error'] = job.error
+    result['CreatedTime'] = job.createdTime
+    result['Last Modified'] = job.lastModified
+    link = Link(evaluation,
+                rel=VIEW_REGRADE_STATUS,
+                elements=('@@' + VIEW_REGRADE_STATUS,),
+                params={'course': result['CatalogEntryNTIID']})
+    result[LINKS] = [link]
+    return result
+
+
+class RegradeViewMixin(object):
+
+    @property
+    def _admin_user(self):
+        return is_admin(self.remoteUser)
+
+    def _get_courses(self, evaluation):
+        result = get_course_from_request(self.request)
+        if result is None:
+            # If no course in request, get all courses for this assignment.
+            result = get_evaluation_courses(evaluation)
+        else:
+            result = (result,)
+        return result
+
+    def _get_evaluation_courses(self):
+        courses = self._get_courses(self.context)
+        if not courses:
+            raise_json_error(self.request,
+                             hexc.HTTPForbidden,
+                             {
+                                 'message': _(u"Cannot find evaluation course."),
+                                 'code': 'CannotFindEvaluationCourse',
+                             },
+                             None)
+        return courses
+
 
 @view_config(context=IQuestion)
 @view_config(context=IQAssignment)
@@ -50,11 +120,13 @@ from nti.dataserver.users.users import User
                request_method='POST',
                name=VIEW_REGRADE_EVALUATION,
                permission=nauth.ACT_READ)
-class RegradeEvaluationView(AbstractAuthenticatedView):
-
-    @property
-    def _admin_user(self):
-        return is_admin(self.remoteUser)
+class RegradeEvaluationView(AbstractAuthenticatedView, RegradeViewMixin):
+    """
+    Regrade the submissions of an evaluation. Evaluations with more than
+    a batch of submissions (or when ``batched`` is given) are regraded
+    by a job in committed batches; its progress is returned. A job in
+    progress is restarted when ``restart`` is given.
+    """
 
     def _get_instructor(self):
         params = CaseInsensitiveDict(self.request.params)
@@ -72,14 +144,16 @@ class RegradeEvaluationView(AbstractAuthenticatedView):
                              None)
         return result
 
-    def _get_courses(self, evaluation):
-        result = get_course_from_request(self.request)
-        if result is None:
-            # If no course in request, get all courses for this assignment.
-            result = get_evaluation_courses(evaluation)
-        else:
-            result = (result,)
-        return result
+    def _is_batched(self, course):
+        params = CaseInsensitiveDict(self.request.params)
+        if is_true(params.get('batched')):
+            return True
+        count = count_evaluation_submissions(self.context, course)
+        return count > REGRADE_BATCH_SIZE
+
+    def _is_restart(self):
+        params = CaseInsensitiveDict(self.request.params)
+        return is_true(params.get('restart'))
 
     def _validate_regrade(self, course, user):
         # Only admins or instructors are able to make this call.
@@ -101,15 +175,8 @@ class RegradeEvaluationView(AbstractAuthenticatedView):
         if self._admin_user:
             # We allow admin users to regrade as instructors.
             user = self._get_instructor()
-        courses = self._get_courses(self.context)
-        if not courses:
-            raise_json_error(self.request,
-                             hexc.HTTPForbidden,
-                             {
-                                 'message': _(u"Cannot find evaluation course."),
-                                 'code': 'CannotFindEvaluationCourse',
-                             },
-                             None)
+        jobs = []
+        courses = self._get_evaluation_courses()
         for course in courses:
             self._validate_regrade(course, user)
             entry = ICourseCatalogEntry(course, None)
@@ -117,7 +184,47 @@ class RegradeEvaluationView(AbstractAuthenticatedView):
             logger.info('%s regrading %s (%s) (course=%s)',
                         user.username, self.context.ntiid,
                         self.remoteUser.username, entry_ntiid)
-            # The grade object itself actually arbitrarily picks an
-            # instructor as the creator.
-            regrade_evaluation(self.context, course)
+            if self._is_batched(course):
+                job = start_regrade_job(self.context, course,
+                                        restart=self._is_restart())
+                jobs.append(regrade_job_status(self.context, course, job))
+            else:
+                # The grade object itself actually arbitrarily picks an
+                # instructor as the creator.
+                regrade_evaluation(self.context, course)
+        if jobs:
+            result = LocatedExternalDict()
+            result[ITEMS] = jobs
+            result[ITEM_COUNT] = result[TOTAL] = len(jobs)
+            return result
         return self.context
+
+
+@view_config(context=IQuestion)
+@view_config(context=IQAssignment)
+@view_defaults(route_name='objects.generic.traversal',
+               renderer='rest',
+               request_method='GET',
+               name=VIEW_REGRADE_STATUS,
+               permission=nauth.ACT_READ)
+class RegradeStatusView(AbstractAuthenticatedView, RegradeViewMixin):
+
+    def _check_access(self, course):
+        if      not self._admin_user \
+            and not is_course_instructor(course, self.remoteUser):
+            raise_json_error(self.request,
+                             hexc.HTTPForbidden,
+                             {
+                                 'message': _(u"Cannot access regrade status."),
+                             },
+                             None)
+
+    def __call__(self):
+        result = LocatedExternalDict()
+        items = result[ITEMS] = []
+        for course in self._get_evaluation_courses():
+            self._check_access(course)
+            job = get_regrade_job(course, self.context.ntiid)
+            items.append(regrade_job_status(self.context, course, job))
+        result[ITEM_COUNT] = result[TOTAL] = len(items)
+        return result
@@ -10,7 +10,6 @@ from __future__ import absolute_import
 
 import csv
 import six
-import random
 
 from collections import OrderedDict
 
@@ -18,6 +17,9 @@ from io import BytesIO
 
 from pyramid import httpexceptions as hexc
 
+from zope.component.hooks import getSite
+from zope.component.hooks import site as current_site
+
 from zope.location import LocationIterator
 
 from nti.contentfragments.interfaces import IPlainTextContentFragment
@@ -25,8 +27,12 @@ from nti.contentfragments.interfaces import IPlainTextContentFragment
 from nti.assessment.randomized import shuffle_list
 from nti.assessment.randomized.interfaces import IQRandomizedPart
 
+from nti.app.assessment.common.randomization import PermutationGenerator
+
 from nti.app.assessment.views import MessageFactory as _
 
+from nti.app.assessment.zipstream import PersistentDataLoader
+
 from nti.app.externalization.error import raise_json_error
 
 from nti.appserver.pyramid_authorization import has_permission
@@ -40,6 +46,9 @@ from nti.dataserver.authorization import ACT_CONTENT_EDIT
 
 from nti.dataserver.authorization_acl import has_permission as _ds_has_permission
 
+#: The size of the chunks a report is streamed with
+REPORT_CHUNK_SIZE = 64 * 1024
+
 logger = __import__('logging').getLogger(__name__)
 
 
@@ -177,7 +186,7 @@ class AssessmentCSVReportMixin(object):
         if IQRandomizedPart.providedBy(part) \
             and not is_instructor_or_editor \
             and not _ds_has_permission(ACT_CONTENT_EDIT, part, user.username):
-            return random.Random(attempt.Seed)
+            return PermutationGenerator(attempt.Seed)
         return None
 
     def _get_function_for_question_type(self, poll_or_question_part):
@@ -255,28 +264,70 @@ class AssessmentCSVReportMixin(object):
         raise NotImplementedError
 
     def _get_user_rows(self, question_order, column_count):
+        """
+        Return an iterable of user rows; this may be a generator.
+        """
         raise NotImplementedError
 
+    def _rebind_report(self, loader, question_order):
+        """
+        Reload the persistent state the rows are produced from on the
+        private connection of the given loader, returning the question
+        order with its questions reloaded too.
+
+        Subclasses reading any other state while producing rows, e.g. the
+        remote user, must reload it here.
+        """
+        self.context = loader.load(self.context)
+        self.course = loader.load(self.course)
+        return OrderedDict((ntiid, loader.load(question))
+                           for ntiid, question in question_order.items())
+
+    def _next_report_chunk(self, rows, csv_writer, stream):
+        for row in rows:
+            csv_writer.writerow(row)
+            if stream.tell() >= REPORT_CHUNK_SIZE:
+                break
+        result = stream.getvalue()
+        stream.seek(0)
+        stream.truncate()
+        return result
+
+    def _iter_report(self, site, header_row, question_order):
+        # The response is iterated after the request's connection has
+        # been closed, so the rows are produced from objects loaded on a
+        # private connection, within the (reloaded) site of the request.
+        # Nothing found during the request may be read from here on.
+        loader = PersistentDataLoader()
+        try:
+            site = loader.load(site)
+            question_order = self._rebind_report(loader, question_order)
+
+            stream = BytesIO()
+            csv_writer = csv.writer(stream)
+            csv_writer.writerow(header_row)
+            with current_site(site):
+                rows = self._get_user_rows(question_order, len(header_row))
+            while True:
+                # only hold the site while rows are being produced
+                with current_site(site):
+                    chunk = self._next_report_chunk(rows, csv_writer, stream)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            loader.close()
+
     def _write_response(self):
         self._check_permission()
 
-        stream = BytesIO()
-        csv_writer = csv.writer(stream)
-
         question_order = OrderedDict()
         header_row = self._get_header_row(question_order)
 
-        csv_writer.writerow(header_row)
-
-        column_count = len(header_row)
-
-        user_rows = self._get_user_rows(question_order, column_count)
-        for row in user_rows:
-            csv_writer.writerow(row)
-
-        stream.flush()
-        stream.seek(0)
-        self.request.response.body_file = stream
-        self.request.response.content_type = 'text/csv; charset=UTF-8'
-        self.request.response.content_disposition = 'attachment; filename="%s"' % self._get_filename()
-        return self.request.response
+        response = self.request.response
+        response.app_iter = self._iter_report(getSite(),
+                                              header_row,
+                                              question_order)
+        response.content_type = 'text/csv; charset=UTF-8'
+        response.content_disposition = 'attachment; filename="%s"' % self._get_filename()
+        return response
@@ -9,6 +9,8 @@ __docformat__ = "restructuredtext en"
 
 logger = __import__('logging').getLogger(__name__)
 
+import time
+
 from zope import component
 from zope import interface
 
@@ -20,6 +22,7 @@ from nti.app.assessment import MessageFactory as _
 
 from nti.app.assessment._submission import get_source
 from nti.app.assessment._submission import check_upload_files
+from nti.app.assessment._submission import get_submission_plan
 from nti.app.assessment._submission import read_multipart_sources
 
 from nti.app.assessment.common.evaluations import is_assignment_available
@@ -28,10 +31,15 @@ from nti.app.assessment.common.evaluations import is_assignment_available_for_su
 
 from nti.app.assessment.common.submissions import check_submission_version
 
+from nti.app.assessment.interfaces import ISavepointConfig
 from nti.app.assessment.interfaces import IUsersCourseAssignmentSavepoint
 from nti.app.assessment.interfaces import IUsersCourseAssignmentSavepoints
 from nti.app.assessment.interfaces import IUsersCourseAssignmentSavepointItem
 
+from nti.app.assessment.savepoint import submission_has_files
+from nti.app.assessment.savepoint import get_buffered_savepoint
+from nti.app.assessment.savepoint import discard_buffered_savepoint
+from nti.app.assessment.savepoint import buffer_savepoint_submission
 from nti.app.assessment.savepoint import UsersCourseAssignmentSavepointItem
 
 from nti.app.assessment.utils import get_course_from_request
@@ -132,7 +140,7 @@ class AssignmentSubmissionSavepointPostView(AbstractAuthenticatedView,
 
         if not self.request.POST:
             submission = self.readCreateUpdateContentObject(creator)
-            check_upload_files(submission)
+            check_upload_files(submission, get_submission_plan(self.context))
         else:
             # try legacy submssion.
             extValue = get_source(self.request, 'json')
@@ -151,7 +159,8 @@ class AssignmentSubmissionSavepointPostView(AbstractAuthenticatedView,
                                  None)
             submission = self.readCreateUpdateContentObject(creator,
                                                             externalValue=extValue)
-            submission = read_multipart_sources(submission, self.request)
+            submission = read_multipart_sources(submission, self.request,
+                                                get_submission_plan(self.context))
 
         # Must check version before checking timed commence status.
         check_submission_version(submission, self.context)
@@ -181,7 +190,54 @@ class AssignmentSubmissionSavepointPostView(AbstractAuthenticatedView,
         # Now record the submission.
         self.request.response.status_int = 201
 
+        config = component.queryUtility(ISavepointConfig)
+        existing = savepoint.get(submission.assignmentId)
+        if      existing is not None \
+            and self._coalesce(config, existing, submission) \
+            and buffer_savepoint_submission(existing, submission):
+            return self._coalesced(existing, submission)
+
+        # the posted save point supersedes any buffered one
+        if existing is not None:
+            discard_buffered_savepoint(existing)
+        recorded = None
+        if existing is not None and getattr(config, 'Differential', False):
+            # only write the changed question responses
+            recorded = savepoint.patchSubmission(submission)
+        if recorded is None:
+            recorded = self._record(savepoint, submission)
+        return self._to_external(recorded, recorded)
+
+    def _coalesce(self, config, existing, submission):
+        # Coalesced save points are never written, so the stored item was
+        # last modified by the last save point committed; the window does
+        # not slide with the ones posted inside it.
+        interval = getattr(config, 'CoalesceInterval', None) or 0
+        return interval > 0 \
+           and time.time() - (existing.lastModified or 0) < interval \
+           and not submission_has_files(submission)
+
+    def _coalesced(self, existing, submission):
+        """
+        Return the stored save point with the responses of a save point
+        that was buffered, rather than written, inside the coalescing
+        window of the stored one. The next save point posted after the
+        window is written.
+        """
+        logger.debug("Coalescing savepoint of %s for %s",
+                     submission.assignmentId, self.remoteUser)
+        result = self._to_external(get_buffered_savepoint(existing), existing)
+        result['Coalesced'] = True
+        return result
+
+    def _to_external(self, item, recorded):
+        result = to_external_object(item)
+        result['href'] = "/%s/Objects/%s" % (get_ds2(self.request),
+                                             to_external_ntiid_oid(recorded))
+        interface.alsoProvides(result, INoHrefInResponse)
+        return result
 
+    def _record(self, savepoint, submission):
         # In the past we would record the submission directly here but
         # that led to two validation passes of the sometimes large and
         # deeply nested submission object when it is set through the
@@ -195,13 +251,7 @@ class AssignmentSubmissionSavepointPostView(AbstractAuthenticatedView,
         item = UsersCourseAssignmentSavepointItem()
         item.__dict__['Submission'] = submission
         submission.__parent__ = item
-        result = recorded = savepoint.recordSavepointItem(item)
-        
-        result = to_external_object(result)
-        result['href'] = "/%s/Objects/%s" % (get_ds2(self.request),
-                                             to_external_ntiid_oid(recorded))
-        interface.alsoProvides(result, INoHrefInResponse)
-        return result
+        return savepoint.recordSavepointItem(item)
 
 
 @view_config(route_name="objects.generic.traversal",
@@ -240,9 +290,16 @@ class AssignmentSubmissionSavepointGetView(AbstractAuthenticatedView):
                                               IUsersCourseAssignmentSavepoint)
         try:
             result = savepoint[self.context.ntiid]
-            return result
         except KeyError:
             return hexc.HTTPNotFound()
+        # serve the responses buffered by this process, if any
+        buffered = get_buffered_savepoint(result)
+        if buffered is not None:
+            buffered['href'] = "/%s/Objects/%s" % (get_ds2(self.request),
+                                                   to_external_ntiid_oid(result))
+            interface.alsoProvides(buffered, INoHrefInResponse)
+            return buffered
+        return result
 
 
 @view_config(route_name="objects.generic.traversal",
@@ -33,6 +33,9 @@ from nti.app.assessment.common.inquiries import can_disclose_inquiry
 from nti.app.assessment.common.inquiries import aggregate_page_inquiry
 from nti.app.assessment.common.inquiries import get_course_from_inquiry
 from nti.app.assessment.common.inquiries import aggregate_course_inquiry
+from nti.app.assessment.common.inquiries import get_running_inquiry_aggregate
+from nti.app.assessment.common.inquiries import query_running_inquiry_aggregates
+from nti.app.assessment.common.inquiries import check_running_inquiry_aggregate
 
 from nti.app.assessment.common.submissions import inquiry_submissions
 from nti.app.assessment.common.submissions import check_full_submission
@@ -249,9 +252,9 @@ class InquirySubmissionPostView(AbstractAuthenticatedView,
         recorded = course_inquiry.recordSubmission(submission)
         result = UsersCourseInquiryItemResponse(Submission=recorded)
         if allow_to_disclose_inquiry(self.context, course, self.remoteUser):
-            result.Aggregated = aggregate_course_inquiry(self.context,
-                                                         course,
-                                                         recorded)
+            result.Aggregated = get_running_inquiry_aggregate(self.context,
+                                                              course,
+                                                              recorded)
 
         result = to_external_object(result)
         result['href'] = "/%s/Objects/%s" % (get_ds2(self.request),
@@ -432,6 +435,10 @@ class InquiryCloseView(AbstractAuthenticatedView, InquiryViewMixin):
         container = ICourseAggregatedInquiries(course)
         # pylint: disable=no-member
         container[self.context.ntiid] = result
+        # closed inquiries are served from the container above
+        running = query_running_inquiry_aggregates(course)
+        if running is not None and self.context.ntiid in running:
+            running.invalidate(self.context.ntiid)
         return result
 
 
@@ -485,7 +492,7 @@ class InquiryAggregatedGetView(AbstractAuthenticatedView, InquiryViewMixin):
             container = ICourseAggregatedInquiries(course)
             result = container[self.context.ntiid]
         else:
-            result = aggregate_course_inquiry(self.context, course)
+            result = get_running_inquiry_aggregate(self.context, course)
         if result is None:
             return hexc.HTTPNoContent()
 
@@ -500,6 +507,37 @@ class InquiryAggregatedGetView(AbstractAuthenticatedView, InquiryViewMixin):
         return result
 
 
+@view_config(request_method='GET')
+@view_config(request_method='POST')
+@view_defaults(route_name="objects.generic.traversal",
+               context=IQInquiry,
+               renderer='rest',
+               permission=nauth.ACT_READ,
+               name="AggregatedConsistencyCheck")
+class InquiryAggregatedConsistencyCheckView(AbstractAuthenticatedView, InquiryViewMixin):
+    """
+    Compare the running aggregate of an open inquiry against a full fold
+    of its submissions. A POST also rebuilds an inconsistent aggregate.
+    """
+
+    def __call__(self):
+        course = self.course
+        if not (is_course_instructor(course, self.remoteUser)
+                or has_permission(nauth.ACT_NTI_ADMIN, course, self.request)):
+            raise_json_error(self.request,
+                             hexc.HTTPForbidden,
+                             {
+                                 'message': _(u"Cannot check inquiry results.")
+                             },
+                             None)
+        rebuild = self.request.method == 'POST'
+        result = LocatedExternalDict()
+        result.update(check_running_inquiry_aggregate(self.context,
+                                                      course,
+                                                      rebuild=rebuild))
+        return result
+
+
 @view_config(route_name="objects.generic.traversal",
              context=IQInquirySubmission,
              renderer='rest',
@@ -581,8 +619,7 @@ class SurveyReportCSV(AbstractAuthenticatedView, InquiryViewMixin, AssessmentCSV
             question_order[question.ntiid] = question
         return header_row
 
-    def _get_user_rows(self, question_order, column_count):
-        user_rows = []
+    def _iter_user_rows(self, question_order, column_count):
         # For each user submission, construct a row with their responses.
         submissions = inquiry_submissions(self.context, self.course)
         for item in submissions:
@@ -610,10 +647,13 @@ class SurveyReportCSV(AbstractAuthenticatedView, InquiryViewMixin, AssessmentCSV
                     row.extend(user_result)
 
             assert len(row) == column_count
-            user_rows.append(row)
+            yield row
 
+    def _get_user_rows(self, question_order, column_count):
+        user_rows = self._iter_user_rows(question_order, column_count)
         # If we have usernames, we should sort by that column.
-        # Otherwise we expect these to be sorted by submission time.
+        # Otherwise we expect these to be sorted by submission time,
+        # and the rows are written as they are produced.
         if self.include_usernames:
             user_rows = sorted(user_rows, key=lambda x: x[0])
         return user_rows
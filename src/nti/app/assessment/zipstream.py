@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming ZIP output.
+
+Entries are collected as lightweight (info, loader) pairs and the archive
+is produced chunk by chunk as the response is iterated, so at most one
+entry's data is held in memory at a time.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+
+from zipfile import ZIP_STORED
+from zipfile import ZIP_DEFLATED
+
+from zipfile import ZipFile
+
+import transaction
+
+from ZODB.interfaces import IConnection
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The size of the chunks yielded to the WSGI server
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+#: File extensions whose content is already compressed
+COMPRESSED_EXTENSIONS = frozenset((
+    '.7z', '.bz2', '.docx', '.epub', '.gif', '.gz', '.jpeg', '.jpg',
+    '.m4a', '.mov', '.mp3', '.mp4', '.odp', '.ods', '.odt', '.ogg',
+    '.png', '.pptx', '.rar', '.tgz', '.webm', '.webp', '.xlsx', '.xz',
+    '.zip',
+))
+
+#: Content type prefixes whose content is already compressed
+COMPRESSED_CONTENT_TYPES = (
+    'image/', 'video/', 'audio/',
+    'application/zip', 'application/gzip', 'application/x-gzip',
+    'application/x-7z-compressed', 'application/x-rar-compressed',
+    'application/vnd.openxmlformats-officedocument',
+)
+
+
+def is_compressed_file(filename, contentType=None):
+    """
+    Return whether the named file is likely to be already compressed,
+    in which case deflating it again only costs CPU.
+    """
+    contentType = (contentType or '').lower()
+    if contentType.startswith('image/svg'):
+        return False
+    if contentType.startswith(COMPRESSED_CONTENT_TYPES):
+        return True
+    ext = os.path.splitext(filename or '')[1].lower()
+    return ext in COMPRESSED_EXTENSIONS
+
+
+def compress_type_for_file(filename, contentType=None):
+    if is_compressed_file(filename, contentType):
+        return ZIP_STORED
+    return ZIP_DEFLATED
+
+
+class _ZipOutputBuffer(object):
+    """
+    A write-only, non-seekable file-like object that collects the
+    output of a :class:`zipfile.ZipFile` until it is drained.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(data)
+        self._position += len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        result = b''.join(self._chunks)
+        self._chunks = []
+        return result
+
+
+class PersistentDataLoader(object):
+    """
+    Loads the data of persistent files through private connections.
+
+    A streamed response is iterated after the request's connection has
+    been closed, so the data cannot be read through the objects found
+    during the request. We remember their oids and load them again on
+    our own connection when the entry is written.
+    """
+
+    def __init__(self):
+        self._connections = {}
+
+    def _connection(self, db):
+        key = db.database_name
+        try:
+            result = self._connections[key][1]
+        except KeyError:
+            tm = transaction.TransactionManager()
+            result = db.open(transaction_manager=tm)
+            self._connections[key] = (tm, result)
+        return result
+
+    def loader(self, context, attr='data'):
+        """
+        Return a callable that returns the value of the specified
+        attribute of the context when called.
+        """
+        oid = getattr(context, '_p_oid', None)
+        connection = IConnection(context, None) if oid else None
+        if connection is None:
+            # not persistent (or not yet stored); read it directly
+            return lambda: getattr(context, attr)
+        db = connection.db()
+
+        def _load():
+            obj = self._connection(db).get(oid)
+            return getattr(obj, attr)
+        return _load
+
+    def load(self, context):
+        """
+        Return the given object as loaded on our private connection, or
+        the object itself if it is not persistent.
+        """
+        oid = getattr(context, '_p_oid', None)
+        connection = IConnection(context, None) if oid else None
+        if connection is None:
+            return context
+        return self._connection(connection.db()).get(oid)
+
+    def close(self):
+        for tm, connection in self._connections.values():
+            try:
+                tm.abort()
+                connection.close()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Cannot close connection")
+        self._connections.clear()
+
+
+class ZipStream(object):
+    """
+    A WSGI ``app_iter`` that writes a ZIP archive as it is iterated.
+
+    Entries are added with :meth:`writestr` with either the data or a
+    callable returning it; callables are not invoked until the entry is
+    written.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._closers = []
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def writestr(self, info, data, compress_type=None):
+        if compress_type is not None:
+            info.compress_type = compress_type
+        self._entries.append((info, data))
+
+    def add_closer(self, closer):
+        """
+        Register a callable invoked when the stream is closed.
+        """
+        self._closers.append(closer)
+
+    def _split(self, data):
+        size = self.chunk_size
+        for idx in range(0, len(data), size):
+            yield data[idx:idx + size]
+
+    def __iter__(self):
+        out = _ZipOutputBuffer()
+        zipfile = ZipFile(out, 'w', allowZip64=True)
+        entries, self._entries = self._entries, []
+        for info, data in entries:
+            if callable(data):
+                data = data()
+            zipfile.writestr(info, data)
+            data = None
+            for chunk in self._split(out.drain()):
+                yield chunk
+        zipfile.close()
+        for chunk in self._split(out.drain()):
+            yield chunk
+
+    def close(self):
+        closers, self._closers = self._closers, []
+        for closer in closers:
+            closer()